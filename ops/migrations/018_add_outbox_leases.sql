@@ -0,0 +1,15 @@
+-- Migration 018: heartbeat leases for outbox workers
+-- Run: psql -U $DB_USER -d chatbot -f ops/migrations/018_add_outbox_leases.sql
+
+ALTER TABLE outbox_messages ADD COLUMN IF NOT EXISTS locked_by TEXT NULL;
+ALTER TABLE outbox_messages ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ NULL;
+
+CREATE INDEX IF NOT EXISTS outbox_messages_lease_idx
+    ON outbox_messages (lease_expires_at)
+    WHERE status = 'PROCESSING';
+
+-- Verify
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'outbox_messages'
+ORDER BY ordinal_position;
@@ -0,0 +1,16 @@
+-- Migration 019: per-tenant fair share for outbox claims
+-- Run: psql -U $DB_USER -d chatbot -f ops/migrations/019_add_outbox_fair_share.sql
+
+ALTER TABLE client_settings
+  ADD COLUMN IF NOT EXISTS outbox_weight INTEGER DEFAULT 1,
+  ADD COLUMN IF NOT EXISTS outbox_max_concurrency INTEGER DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS outbox_messages_client_status_idx
+    ON outbox_messages (client_id, status);
+
+-- Verify
+SELECT column_name, data_type, column_default
+FROM information_schema.columns
+WHERE table_name = 'client_settings'
+  AND column_name IN ('outbox_weight', 'outbox_max_concurrency')
+ORDER BY ordinal_position;
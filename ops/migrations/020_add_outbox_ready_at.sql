@@ -0,0 +1,13 @@
+-- Migration 020: adaptive coalescing window for outbox messages
+-- Run: psql -U $DB_USER -d chatbot -f ops/migrations/020_add_outbox_ready_at.sql
+
+ALTER TABLE outbox_messages ADD COLUMN IF NOT EXISTS ready_at TIMESTAMPTZ NULL;
+
+CREATE INDEX IF NOT EXISTS outbox_messages_conversation_created_idx
+    ON outbox_messages (conversation_id, created_at DESC);
+
+-- Verify
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'outbox_messages'
+ORDER BY ordinal_position;
@@ -0,0 +1,16 @@
+-- Migration 021: claims and retry state for the learning queue
+-- Run: psql -U $DB_USER -d chatbot -f ops/migrations/021_add_learning_index_claims.sql
+
+ALTER TABLE learned_responses ADD COLUMN IF NOT EXISTS index_attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE learned_responses ADD COLUMN IF NOT EXISTS index_lease_expires_at TIMESTAMPTZ NULL;
+ALTER TABLE learned_responses ADD COLUMN IF NOT EXISTS index_last_error TEXT NULL;
+
+CREATE INDEX IF NOT EXISTS learned_responses_index_queue_idx
+    ON learned_responses (created_at)
+    WHERE status = 'approved' AND qdrant_point_id IS NULL;
+
+-- Verify
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'learned_responses'
+ORDER BY ordinal_position;
@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
-" \\Полный сброс коллекции truffles_knowledge\\\
+"""Полный сброс коллекции truffles_knowledge"""
+import os
+
 import requests
-import sys
+
+try:
+    import redis
+except ImportError:  # без redis-py API увидит сброс только после рестарта
+    redis = None
 
 QDRANT = 'http://172.24.0.3:6333'
 API_KEY = 'REDACTED_PASSWORD'
 HEADERS = {'api-key': API_KEY, 'Content-Type': 'application/json'}
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://truffles_redis_1:6379/0')
+KNOWLEDGE_VERSION_PREFIX = 'truffles:knowledge_version'
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'truffles-api', 'app', 'knowledge')
 
 # Удалить
 r = requests.delete(f'{QDRANT}/collections/truffles_knowledge', headers=HEADERS)
@@ -23,3 +32,17 @@ print(f'Create: {r.status_code}')
 r = requests.post(f'{QDRANT}/collections/truffles_knowledge/points/count', headers=HEADERS, json={})
 count = r.json().get('result', {}).get('count', '?')
 print(f'Points: {count}')
+
+# Сбросить версии базы знаний: кэш RAG в API ключуется версией и после сброса не отдаёт старые результаты
+if redis is None:
+    print('Knowledge versions: redis-py не установлен, кэш RAG в API сбросится только после рестарта')
+else:
+    try:
+        client = redis.Redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+        slugs = {key.decode().rsplit(':', 1)[-1] for key in client.scan_iter(f'{KNOWLEDGE_VERSION_PREFIX}:*')}
+        if os.path.isdir(KNOWLEDGE_DIR):
+            slugs.update(name for name in os.listdir(KNOWLEDGE_DIR) if os.path.isdir(os.path.join(KNOWLEDGE_DIR, name)))
+        for slug in sorted(slugs):
+            print(f'Knowledge version {slug}: {client.incr(f"{KNOWLEDGE_VERSION_PREFIX}:{slug}")}')
+    except Exception as exc:
+        print(f'Knowledge versions: не удалось обновить ({exc})')
@@ -3,23 +3,33 @@
 Синхронизация базы знаний одного клиента.
 
 Использование:
-  python3 sync_client.py <client_slug> [docs_folder] [--validate] [--validate-only]
+  python3 sync_client.py <client_slug> [docs_folder] [--validate] [--validate-only] [--dry-run]
 
 Примеры:
   python3 sync_client.py demo_salon
   python3 sync_client.py demo_salon /path/to/docs
   python3 sync_client.py demo_salon --validate-only
+  python3 sync_client.py demo_salon --dry-run
 """
 import argparse
 import hashlib
+import json
 import os
 import re
 import subprocess
 import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 import yaml
 
+try:
+    import redis
+except ImportError:  # redis-py опционален: без него API увидит изменения только после рестарта
+    redis = None
+
 # === КОНФИГ ===
 def _resolve_docker_ip(container_name: str) -> str | None:
     try:
@@ -40,6 +50,8 @@ if not BGE_URL:
     bge_ip = _resolve_docker_ip("bge-m3")
     BGE_URL = f"http://{bge_ip}:80/embed" if bge_ip else "http://bge-m3:80/embed"
 
+EMBEDDING_MODEL_ID = os.environ.get("EMBEDDING_MODEL_ID", "bge-m3")
+
 QDRANT_URL = os.environ.get("QDRANT_URL")
 if not QDRANT_URL:
     qdrant_ip = _resolve_docker_ip("truffles_qdrant_1")
@@ -53,6 +65,18 @@ QDRANT_API_KEY = (
 )
 QDRANT_API_KEY = QDRANT_API_KEY.strip()
 
+REDIS_URL = os.environ.get("REDIS_URL")
+if not REDIS_URL:
+    redis_ip = _resolve_docker_ip("truffles_redis_1")
+    REDIS_URL = f"redis://{redis_ip}:6379/0" if redis_ip else "redis://truffles_redis_1:6379/0"
+KNOWLEDGE_VERSION_PREFIX = "truffles:knowledge_version"
+
+# Пайплайн загрузки: BGE/TEI принимают список inputs, Qdrant — пачки points
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "4"))
+UPSERT_BATCH_SIZE = int(os.environ.get("UPSERT_BATCH_SIZE", "256"))
+INGEST_RETRIES = int(os.environ.get("INGEST_RETRIES", "3"))
+
 _REQUIRED_CLIENT_PACK_FIELDS = [
     "client_pack.salon.name",
     "client_pack.salon.city",
@@ -128,10 +152,128 @@ def validate_client_pack(truth_path: str) -> bool:
     return True
 
 
-def get_embedding(text):
-    """Получить embedding от BGE-M3"""
-    resp = requests.post(BGE_URL, json={"inputs": text}, timeout=30)
-    return resp.json()[0]
+class IngestError(Exception):
+    pass
+
+
+def _with_retries(action, what):
+    """Повторить пачку с backoff: один сбой BGE/Qdrant не должен ронять весь онбординг"""
+    for attempt in range(1, INGEST_RETRIES + 1):
+        try:
+            return action()
+        except Exception as exc:
+            if attempt == INGEST_RETRIES:
+                raise IngestError(f"{what}: {exc}") from exc
+            delay = 0.5 * 2 ** (attempt - 1)
+            print(f"⚠️ {what}: {exc}, повтор {attempt}/{INGEST_RETRIES - 1} через {delay:.1f}s")
+            time.sleep(delay)
+
+
+def get_embeddings(texts):
+    """Embeddings для пачки текстов одним запросом к BGE-M3/TEI"""
+    resp = requests.post(BGE_URL, json={"inputs": texts}, timeout=60)
+    resp.raise_for_status()
+    vectors = resp.json()
+    if not isinstance(vectors, list) or len(vectors) != len(texts) or not all(
+        isinstance(vector, list) and vector for vector in vectors
+    ):
+        raise ValueError(f"ожидалось {len(texts)} векторов")
+    return vectors
+
+
+def embed_texts(texts, label="embeddings"):
+    """Все embeddings по порядку: пачки по EMBED_BATCH_SIZE, до EMBED_CONCURRENCY пачек параллельно"""
+    vectors = [None] * len(texts)
+    for start, batch_vectors in _embed_batches(texts, label):
+        vectors[start:start + len(batch_vectors)] = batch_vectors
+    return vectors
+
+
+def _embed_batches(texts, label):
+    """Отдаёт (offset, vectors) по мере готовности пачек, печатает прогресс и скорость"""
+    batches = [(start, texts[start:start + EMBED_BATCH_SIZE]) for start in range(0, len(texts), EMBED_BATCH_SIZE)]
+    if not batches:
+        return
+    started = time.monotonic()
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, EMBED_CONCURRENCY)) as pool:
+        futures = {
+            pool.submit(_with_retries, lambda batch=batch: get_embeddings(batch), f"{label}: embedding пачки @{start}"): (
+                start
+            )
+            for start, batch in batches
+        }
+        for future in as_completed(futures):
+            batch_vectors = future.result()
+            done += len(batch_vectors)
+            elapsed = max(time.monotonic() - started, 1e-6)
+            print(f"  {label}: {done}/{len(texts)} embeddings ({done / elapsed:.1f}/s)")
+            yield futures[future], batch_vectors
+
+
+def _upsert_points(collection, points, wait):
+    resp = requests.put(
+        f"{QDRANT_URL}/collections/{collection}/points",
+        params={"wait": "true" if wait else "false"},
+        headers={"api-key": QDRANT_API_KEY, "Content-Type": "application/json"},
+        json={"points": points},
+        timeout=60,
+    )
+    result = resp.json()
+    if result.get("status") != "ok":
+        raise ValueError(f"Qdrant upsert: {result}")
+    return result
+
+
+def _check_points_exist(collection, point_ids):
+    found = 0
+    for start in range(0, len(point_ids), UPSERT_BATCH_SIZE):
+        resp = requests.post(
+            f"{QDRANT_URL}/collections/{collection}/points",
+            headers={"api-key": QDRANT_API_KEY, "Content-Type": "application/json"},
+            json={"ids": point_ids[start:start + UPSERT_BATCH_SIZE], "with_payload": False, "with_vector": False},
+            timeout=60,
+        )
+        found += len(resp.json().get("result") or [])
+    if found != len(point_ids):
+        # wait=false: часть пачек может ещё применяться, _with_retries подождёт
+        raise ValueError(f"в {collection} найдено {found} из {len(point_ids)} points")
+
+
+def ingest_points(collection, items, text_of, build_point, label):
+    """
+    Потоковая загрузка: пачки embeddings считаются параллельно, готовые points уходят в
+    Qdrant пачками по UPSERT_BATCH_SIZE с wait=false, последняя пачка — с wait=true.
+    В конце проверяем, что все id на месте. Возвращает загруженные points.
+    """
+    started = time.monotonic()
+    points = []
+    pending = []
+    uploaded = 0
+
+    def flush(wait):
+        nonlocal pending, uploaded
+        if not pending:
+            return
+        batch, pending = pending, []
+        _with_retries(lambda: _upsert_points(collection, batch, wait), f"{label}: upsert {len(batch)} points")
+        uploaded += len(batch)
+        print(f"  {label}: {uploaded}/{len(items)} points отправлено в {collection}")
+
+    for start, vectors in _embed_batches([text_of(item) for item in items], label):
+        for offset, vector in enumerate(vectors):
+            point = build_point(items[start + offset], vector)
+            points.append(point)
+            pending.append(point)
+        if len(pending) >= UPSERT_BATCH_SIZE:
+            flush(wait=False)
+    flush(wait=True)
+
+    point_ids = [point["id"] for point in points]
+    _with_retries(lambda: _check_points_exist(collection, point_ids), f"{label}: проверка консистентности")
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(f"✓ {label}: {len(points)} points за {elapsed:.1f}s ({len(points) / elapsed:.1f}/s)")
+    return points
 
 
 def _load_truth_data(client_slug: str) -> dict:
@@ -271,14 +413,68 @@ def _delete_client_services(client_slug: str) -> None:
             print("✓ Старые сервисы удалены")
 
 
-def _upsert_services(points: list[dict]) -> dict:
-    resp = requests.put(
-        f"{QDRANT_URL}/collections/{SERVICES_COLLECTION}/points",
-        headers={"api-key": QDRANT_API_KEY, "Content-Type": "application/json"},
-        json={"points": points},
-        timeout=60,
-    )
-    return resp.json()
+def _write_services_snapshot(client_slug: str, points: list[dict]) -> None:
+    """Снимок services_index рядом с SALON_TRUTH.yaml: API держит его в памяти вместо поиска в Qdrant."""
+    truth_path = _truth_path(client_slug)
+    snapshot_path = os.path.join(os.path.dirname(truth_path), "services_index.json")
+    with open(truth_path, "rb") as handle:
+        truth_sha256 = hashlib.sha256(handle.read()).hexdigest()
+    snapshot = {
+        "client_slug": client_slug,
+        "truth_sha256": truth_sha256,
+        "points": [{"payload": point["payload"], "vector": point["vector"]} for point in points],
+    }
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(snapshot, handle, ensure_ascii=False)
+    os.replace(tmp_path, snapshot_path)
+    print(f"✓ Локальный снимок services_index: {snapshot_path}")
+
+
+def _collect_question_type_examples(truth: dict) -> dict[str, list[str]]:
+    """Те же примеры, что берёт API для semantic_question_type (domain_pack.typical_questions)."""
+    domain_pack = truth.get("domain_pack") if isinstance(truth, dict) else None
+    typical = domain_pack.get("typical_questions") if isinstance(domain_pack, dict) else None
+    if not isinstance(typical, dict):
+        return {}
+    examples: dict[str, list[str]] = {}
+    for kind in ("pricing", "duration", "hours"):
+        block = typical.get(kind)
+        groups = block.values() if isinstance(block, dict) else [block]
+        examples[kind] = [
+            str(phrase).strip() for items in groups if isinstance(items, list) for phrase in items if str(phrase).strip()
+        ]
+    return examples
+
+
+def sync_question_type_embeddings(client_slug: str) -> int:
+    """Предрасчёт BGE-векторов примеров типов вопросов, чтобы API не считал их после рестарта."""
+    examples = _collect_question_type_examples(_load_truth_data(client_slug))
+    if not any(examples.values()):
+        return 0
+    truth_path = _truth_path(client_slug)
+    with open(truth_path, "rb") as handle:
+        truth_sha256 = hashlib.sha256(handle.read()).hexdigest()
+
+    phrases = [(kind, phrase) for kind, kind_phrases in examples.items() for phrase in kind_phrases]
+    try:
+        vectors = embed_texts([phrase for _, phrase in phrases], "question_types")
+    except IngestError as exc:
+        print(f"❌ {exc}")
+        return 0
+    artifact_examples: dict[str, list[dict]] = {kind: [] for kind in examples}
+    for (kind, phrase), vector in zip(phrases, vectors):
+        artifact_examples[kind].append({"text": phrase, "vector": vector})
+    total = len(phrases)
+
+    artifact = {"truth_sha256": truth_sha256, "model_id": EMBEDDING_MODEL_ID, "examples": artifact_examples}
+    artifact_path = os.path.join(os.path.dirname(truth_path), "question_type_embeddings.json")
+    tmp_path = f"{artifact_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(artifact, handle, ensure_ascii=False)
+    os.replace(tmp_path, artifact_path)
+    print(f"✓ Векторы примеров типов вопросов: {artifact_path} ({total})")
+    return total
 
 
 def sync_services_index(client_slug: str) -> int:
@@ -288,9 +484,10 @@ def sync_services_index(client_slug: str) -> int:
         print("❌ Нет услуг для синхронизации services_index")
         return 0
 
-    first_vector = get_embedding(entries[0]["canonical_name"])
-    if not isinstance(first_vector, list):
-        print("❌ Некорректный embedding для services_index")
+    try:
+        first_vector = get_embeddings([entries[0]["canonical_name"]])[0]
+    except Exception as exc:
+        print(f"❌ Некорректный embedding для services_index: {exc}")
         return 0
 
     vector_size = len(first_vector)
@@ -300,12 +497,9 @@ def sync_services_index(client_slug: str) -> int:
     print(f"Удаляю старые сервисы {client_slug}...")
     _delete_client_services(client_slug)
 
-    points: list[dict] = []
-    for idx, entry in enumerate(entries):
+    def build_point(entry, vector):
         name = entry["canonical_name"]
-        vector = first_vector if idx == 0 else get_embedding(name)
         point_id_source = f"{client_slug}:{entry.get('entry_type')}:{name}:{entry.get('category') or ''}"
-        point_id = hashlib.md5(point_id_source.encode("utf-8")).hexdigest()
         payload = {
             "client_slug": client_slug,
             "canonical_name": name,
@@ -315,69 +509,145 @@ def sync_services_index(client_slug: str) -> int:
         entry_type = entry.get("entry_type")
         if entry_type:
             payload["entry_type"] = entry_type
-        points.append(
-            {
-                "id": point_id,
-                "vector": vector,
-                "payload": payload,
-            }
-        )
+        return {
+            "id": hashlib.md5(point_id_source.encode("utf-8")).hexdigest(),
+            "vector": vector,
+            "payload": payload,
+        }
 
-    if points:
-        print(f"Загружаю {len(points)} сервисов в {SERVICES_COLLECTION}...")
-        result = _upsert_services(points)
-        if result.get("status") == "ok":
-            print(f"✅ Успешно загружено {len(points)} сервисов")
-        else:
-            print(f"❌ Ошибка: {result}")
+    print(f"Загружаю {len(entries)} сервисов в {SERVICES_COLLECTION}...")
+    try:
+        points = ingest_points(
+            SERVICES_COLLECTION,
+            entries,
+            lambda entry: entry["canonical_name"],
+            build_point,
+            "services_index",
+        )
+    except IngestError as exc:
+        print(f"❌ Ошибка: {exc}")
+        return 0
+    print(f"✅ Успешно загружено {len(points)} сервисов")
+    try:
+        _write_services_snapshot(client_slug, points)
+    except OSError as exc:
+        print(f"⚠️ Не удалось записать снимок services_index: {exc}")
     return len(points)
 
 
-def delete_client_docs(client_slug):
-    """Удалить все документы клиента из Qdrant"""
-    print(f"Удаляю старые документы {client_slug}...")
+def bump_knowledge_version(client_slug):
+    """Сообщить API, что база знаний клиента изменилась (BM25-индекс пересоберётся)."""
+    if redis is None:
+        print("⚠️ redis-py не установлен: версия базы знаний не обновлена")
+        return None
+    try:
+        client = redis.Redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+        version = int(client.incr(f"{KNOWLEDGE_VERSION_PREFIX}:{client_slug}"))
+    except Exception as exc:
+        print(f"⚠️ Не удалось обновить версию базы знаний: {exc}")
+        return None
+    print(f"✓ Версия базы знаний {client_slug}: {version}")
+    return version
+
+
+def _qdrant_post(path, payload, timeout=60):
     resp = requests.post(
-        f"{QDRANT_URL}/collections/{QDRANT_COLLECTION}/points/delete",
+        f"{QDRANT_URL}/collections/{QDRANT_COLLECTION}/{path}",
         headers={"api-key": QDRANT_API_KEY, "Content-Type": "application/json"},
-        json={
-            "filter": {
-                "must": [
-                    {"key": "metadata.client_slug", "match": {"value": client_slug}}
-                ]
-            }
-        },
-        timeout=30
+        json=payload,
+        timeout=timeout,
     )
-    result = resp.json()
+    return resp.json()
+
+
+def _client_filter(client_slug):
+    """Только чанки документов клиента: у выученных ответов (learning_service) в той же
+    коллекции нет metadata.doc_id, синк их не видит и не удаляет"""
+    return {
+        "must": [{"key": "metadata.client_slug", "match": {"value": client_slug}}],
+        "must_not": [{"is_empty": {"key": "metadata.doc_id"}}],
+    }
+
+
+def delete_client_docs(client_slug):
+    """Удалить все документы клиента из Qdrant"""
+    print(f"Удаляю старые документы {client_slug}...")
+    result = _qdrant_post("points/delete", {"filter": _client_filter(client_slug)}, timeout=30)
     if result.get("status") == "ok":
         print("✓ Старые документы удалены")
     return result
 
-def upsert_to_qdrant(points):
-    """Загрузить points в Qdrant"""
-    resp = requests.put(
-        f"{QDRANT_URL}/collections/{QDRANT_COLLECTION}/points",
-        headers={"api-key": QDRANT_API_KEY, "Content-Type": "application/json"},
-        json={"points": points},
-        timeout=60
-    )
-    return resp.json()
+
+def delete_points(point_ids):
+    """Удалить points по id"""
+    return _qdrant_post("points/delete", {"points": list(point_ids)}, timeout=30)
+
+
+def set_points_metadata(point_id, metadata):
+    """Обновить metadata без пересчёта вектора (чанк не изменился, сдвинулся номер секции)"""
+    return _qdrant_post("points/payload", {"points": [point_id], "payload": {"metadata": metadata}}, timeout=30)
+
+
+def fetch_client_manifest(client_slug):
+    """Что сейчас лежит в Qdrant у клиента: id -> {content_hash, metadata}"""
+    manifest = {}
+    offset = None
+    while True:
+        body = {
+            "filter": _client_filter(client_slug),
+            "limit": 256,
+            "with_payload": True,
+            "with_vector": False,
+        }
+        if offset is not None:
+            body["offset"] = offset
+        response = _qdrant_post("points/scroll", body)
+        if response.get("status") != "ok":
+            # Пустой манифест при ошибке = всё "добавлено" и ничего не удалено: прерываем синк
+            raise IngestError(f"Qdrant scroll: {response}")
+        result = response.get("result") or {}
+        for point in result.get("points") or []:
+            payload = point.get("payload") or {}
+            manifest[str(point["id"])] = {
+                "content_hash": payload.get("content_hash"),
+                "metadata": payload.get("metadata") or {},
+            }
+        offset = result.get("next_page_offset")
+        if offset is None:
+            return manifest
+
+
+def _content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _chunk_point_id(client_slug, doc_name, section_key):
+    """Стабильный id чанка: клиент + документ + заголовок секции (не зависит от запуска и пути)"""
+    return str(uuid.UUID(hashlib.md5(f"{client_slug}:{doc_name}:{section_key}".encode("utf-8")).hexdigest()))
+
 
 def split_into_chunks(text, doc_name, doc_id, client_slug):
     """Разбить текст на chunks по заголовкам"""
     chunks = []
     sections = re.split(r'\n(?=##?\s)', text)
-    
+    title_counts = {}
+
     for i, section in enumerate(sections):
         section = section.strip()
         if len(section) < 50:
             continue
-        
+
         lines = section.split('\n')
         title = lines[0].replace('#', '').strip() if lines else f"Section {i}"
-        
+        # Повторяющиеся заголовки различаем по порядку, а не по номеру секции:
+        # вставка новой секции выше не меняет id остальных.
+        occurrence = title_counts.get(title, 0)
+        title_counts[title] = occurrence + 1
+
         chunks.append({
+            "id": _chunk_point_id(client_slug, doc_name, f"{title}#{occurrence}"),
             "content": section,
+            "content_hash": _content_hash(section),
             "metadata": {
                 "client_slug": client_slug,
                 "doc_id": doc_id,
@@ -386,58 +656,124 @@ def split_into_chunks(text, doc_name, doc_id, client_slug):
                 "section_index": i
             }
         })
-    
+
     return chunks
 
-def sync_folder(client_slug, docs_dir):
-    """Синхронизировать папку с документами"""
+
+def diff_chunks(chunks, manifest):
+    """Разложить чанки на новые/изменённые/сдвинутые/без изменений и найти удалённые id"""
+    diff = {"added": [], "changed": [], "moved": [], "unchanged": [], "removed": []}
+    seen = set()
+    for chunk in chunks:
+        seen.add(chunk["id"])
+        current = manifest.get(chunk["id"])
+        if current is None:
+            diff["added"].append(chunk)
+        elif current["content_hash"] != chunk["content_hash"]:
+            diff["changed"].append(chunk)
+        elif current["metadata"] != chunk["metadata"]:
+            diff["moved"].append(chunk)
+        else:
+            diff["unchanged"].append(chunk)
+    diff["removed"] = sorted(point_id for point_id in manifest if point_id not in seen)
+    return diff
+
+
+def print_diff_report(diff, manifest):
+    print(
+        f"Изменения: +{len(diff['added'])} новых, ~{len(diff['changed'])} изменённых, "
+        f"↕{len(diff['moved'])} сдвинутых, -{len(diff['removed'])} удалённых, "
+        f"={len(diff['unchanged'])} без изменений"
+    )
+    for label, key in (("+", "added"), ("~", "changed"), ("↕", "moved")):
+        for chunk in diff[key]:
+            print(f"  {label} {chunk['metadata']['doc_name']}: {chunk['metadata']['section_title'][:50]}")
+    for point_id in diff["removed"]:
+        metadata = manifest[point_id]["metadata"]
+        print(f"  - {metadata.get('doc_name', '?')}: {str(metadata.get('section_title', point_id))[:50]}")
+
+
+def collect_folder_chunks(client_slug, docs_dir):
+    files = sorted(f for f in os.listdir(docs_dir) if f.endswith('.md'))
+    chunks = []
+    for filename in files:
+        filepath = os.path.join(docs_dir, filename)
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        doc_id = hashlib.md5(filename.encode()).hexdigest()[:12]
+        file_chunks = split_into_chunks(content, filename, doc_id, client_slug)
+        print(f"  {filename}: {len(file_chunks)} chunks")
+        chunks.extend(file_chunks)
+    return files, chunks
+
+
+def sync_folder(client_slug, docs_dir, dry_run=False):
+    """
+    Инкрементально синхронизировать папку с документами.
+
+    Пересчитываются и загружаются только новые и изменённые чанки, удалённые — удаляются
+    после загрузки, так что у клиента нет окна без базы знаний.
+    """
     if not os.path.exists(docs_dir):
         print(f"❌ Папка не найдена: {docs_dir}")
         return 0
-    
-    # Собираем все .md файлы
-    files = [f for f in os.listdir(docs_dir) if f.endswith('.md')]
+
+    files, chunks = collect_folder_chunks(client_slug, docs_dir)
     if not files:
         print(f"❌ Нет .md файлов в {docs_dir}")
         return 0
-    
-    print(f"Найдено файлов: {len(files)}")
-    
-    # Удаляем старые документы клиента
-    delete_client_docs(client_slug)
-    
-    # Обрабатываем каждый файл
-    all_points = []
-    point_id = abs(hash(client_slug)) % 100000000
-    
-    for filename in files:
-        filepath = os.path.join(docs_dir, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        doc_id = hashlib.md5(filepath.encode()).hexdigest()[:12]
-        chunks = split_into_chunks(content, filename, doc_id, client_slug)
-        print(f"  {filename}: {len(chunks)} chunks")
-        
-        for chunk in chunks:
-            print(f"    Embedding: {chunk['metadata']['section_title'][:30]}...")
-            vector = get_embedding(chunk["content"])
-            all_points.append({
-                "id": point_id,
-                "vector": vector,
-                "payload": chunk
-            })
-            point_id += 1
-    
-    if all_points:
-        print(f"\nЗагружаю {len(all_points)} chunks в Qdrant...")
-        result = upsert_to_qdrant(all_points)
+    print(f"Найдено файлов: {len(files)}, chunks: {len(chunks)}")
+
+    manifest = fetch_client_manifest(client_slug)
+    diff = diff_chunks(chunks, manifest)
+    print_diff_report(diff, manifest)
+    if dry_run:
+        print("Dry run: Qdrant не изменён")
+        return len(chunks)
+
+    to_embed = diff["added"] + diff["changed"]
+    points = []
+    if to_embed:
+        print(f"\nЗагружаю {len(to_embed)} chunks в Qdrant...")
+        try:
+            points = ingest_points(
+                QDRANT_COLLECTION,
+                to_embed,
+                lambda chunk: chunk["content"],
+                lambda chunk, vector: {
+                    "id": chunk["id"],
+                    "vector": vector,
+                    "payload": {
+                        "content": chunk["content"],
+                        "content_hash": chunk["content_hash"],
+                        "metadata": chunk["metadata"],
+                    },
+                },
+                "knowledge",
+            )
+        except IngestError as exc:
+            # Удалённые не трогаем: лучше устаревший чанк, чем дыра в базе знаний.
+            # Часть пачек могла успеть загрузиться — версию всё равно поднимаем.
+            print(f"❌ Ошибка: {exc}")
+            bump_knowledge_version(client_slug)
+            return len(chunks)
+        print(f"✅ Успешно загружено {len(points)} chunks")
+
+    for chunk in diff["moved"]:
+        set_points_metadata(chunk["id"], chunk["metadata"])
+
+    if diff["removed"]:
+        result = delete_points(diff["removed"])
         if result.get("status") == "ok":
-            print(f"✅ Успешно загружено {len(all_points)} chunks")
+            print(f"✓ Удалено {len(diff['removed'])} устаревших chunks")
         else:
-            print(f"❌ Ошибка: {result}")
-    
-    return len(all_points)
+            print(f"❌ Ошибка удаления: {result}")
+
+    if points or diff["moved"] or diff["removed"]:
+        bump_knowledge_version(client_slug)
+    return len(chunks)
+
 
 def main():
     parser = argparse.ArgumentParser(description="Синхронизация базы знаний одного клиента.")
@@ -453,6 +789,11 @@ def main():
         action="store_true",
         help="Только проверить client_pack и выйти без синхронизации",
     )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Показать, какие chunks будут добавлены/обновлены/удалены, без записи в Qdrant",
+    )
     args = parser.parse_args()
 
     client_slug = args.client_slug
@@ -476,11 +817,22 @@ def main():
     print(f"Папка: {docs_dir}")
     print(f"=" * 50)
 
-    total = sync_folder(client_slug, docs_dir)
+    try:
+        total = sync_folder(client_slug, docs_dir, dry_run=args.dry_run)
+    except IngestError as exc:
+        print(f"❌ Не удалось прочитать текущие chunks клиента, синхронизация прервана: {exc}")
+        sys.exit(1)
+    if args.dry_run:
+        return
     services_total = sync_services_index(client_slug)
+    try:
+        question_types_total = sync_question_type_embeddings(client_slug)
+    except (OSError, requests.RequestException) as exc:
+        question_types_total = 0
+        print(f"⚠️ Не удалось предрассчитать векторы типов вопросов: {exc}")
 
     print(f"\n{'=' * 50}")
-    print(f"ИТОГО: {total} chunks, services_index={services_total}")
+    print(f"ИТОГО: {total} chunks, services_index={services_total}, question_types={question_types_total}")
     print(f"{'=' * 50}")
 
 if __name__ == "__main__":
@@ -1,16 +1,158 @@
+import asyncio
+import os
+import ssl
+from typing import Any, Callable, TypeVar
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.engine import URL
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from app.config import settings
 
+try:
+    import asyncpg  # type: ignore  # noqa: F401
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+except Exception:  # pragma: no cover
+    asyncpg = None
+    AsyncSession = None
+    async_sessionmaker = None
+    create_async_engine = None
+
+T = TypeVar("T")
+
 engine = create_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def _is_env_enabled(value: str | None, default: bool = True) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+# libpq connection parameters asyncpg.connect() does not accept; the ssl ones are turned
+# into its `ssl` argument, the rest into their asyncpg equivalents or dropped.
+_LIBPQ_SSL_PARAMS = {"sslmode", "sslrootcert", "sslcert", "sslkey", "sslcrl", "sslpassword"}
+_LIBPQ_ONLY_PARAMS = _LIBPQ_SSL_PARAMS | {
+    "connect_timeout",
+    "application_name",
+    "options",
+    "client_encoding",
+    "gssencmode",
+    "channel_binding",
+    "keepalives",
+    "keepalives_idle",
+    "keepalives_interval",
+    "keepalives_count",
+}
+
+
+def _asyncpg_ssl(query: dict) -> ssl.SSLContext | str | None:
+    mode = query.get("sslmode")
+    if mode == "disable" or not any(query.get(name) for name in ("sslrootcert", "sslcert")):
+        return mode
+    context = ssl.create_default_context(cafile=query.get("sslrootcert") or None)
+    if query.get("sslcert"):
+        context.load_cert_chain(query["sslcert"], query.get("sslkey") or None, query.get("sslpassword") or None)
+    if mode != "verify-full":
+        context.check_hostname = False
+    if mode in {None, "prefer", "allow", "require"} and not query.get("sslrootcert"):
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def build_async_url(url: URL) -> tuple[URL, dict[str, Any]]:
+    """
+    asyncpg URL and connect_args for a sync (psycopg2) database URL.
+
+    DATABASE_URL is written for libpq: `?sslmode=require` and friends would reach
+    asyncpg.connect() as unknown keyword arguments, so they are translated here.
+    """
+    query = {key: value for key, value in url.query.items() if isinstance(value, str)}
+    connect_args: dict[str, Any] = {}
+    ssl_arg = _asyncpg_ssl(query)
+    if ssl_arg is not None:
+        connect_args["ssl"] = ssl_arg
+    if query.get("connect_timeout"):
+        connect_args["timeout"] = float(query["connect_timeout"])
+    if query.get("application_name"):
+        connect_args["server_settings"] = {"application_name": query["application_name"]}
+    async_url = url.set(
+        drivername="postgresql+asyncpg",
+        query={key: value for key, value in url.query.items() if key not in _LIBPQ_ONLY_PARAMS},
+    )
+    return async_url, connect_args
+
+
+def _build_async_engine(url: URL | None = None):
+    if asyncpg is None or not _is_env_enabled(os.environ.get("DB_ASYNC_ENABLED"), default=True):
+        return None
+    url = url or engine.url
+    if url.get_backend_name() != "postgresql":
+        return None
+    pool_size = int(float(os.environ.get("DB_ASYNC_POOL_SIZE", "10")))
+    async_url, connect_args = build_async_url(url)
+    return create_async_engine(
+        async_url,
+        connect_args=connect_args,
+        pool_size=max(pool_size, 1),
+        pool_pre_ping=True,
+    )
+
+
+async_engine = _build_async_engine()
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if async_engine is not None else None
+)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database session is not configured (asyncpg missing or DB_ASYNC_ENABLED=0)")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _call_with_session(func: Callable[..., T], args: tuple, kwargs: dict) -> T:
+    db = SessionLocal()
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a sync `func(db, ...)` DB helper without blocking the event loop.
+
+    With asyncpg the helper runs on an AsyncSession through run_sync (same code, non-blocking
+    driver); without it, on a fresh sync session in a worker thread.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(func, *args, **kwargs)
+    return await asyncio.to_thread(_call_with_session, func, args, kwargs)
+
+
+async def run_on_session(func: Callable[..., T], db: Session, *args: Any, **kwargs: Any) -> T:
+    """
+    Run a sync `func(db, ...)` on the caller's session in a worker thread.
+
+    Unlike run_db the loaded objects stay attached to `db`, so request handlers that keep
+    using them can move their queries and commits off the event loop.
+    """
+    return await asyncio.to_thread(func, db, *args, **kwargs)
+
+
+async def dispose_async_engine() -> None:
+    if async_engine is not None:
+        await async_engine.dispose()
@@ -0,0 +1,161 @@
+"""
+Learning worker.
+
+Drains the learned_responses queue filled by learning_service.enqueue_learning: each pass
+claims up to LEARNING_QUEUE_BATCH_SIZE approved answers without a Qdrant point, collapses
+near-duplicates, embeds them in one BGE request and upserts them in one Qdrant PUT.
+Runs embedded in the API process (LEARNING_WORKER_ENABLED=1). Claimed rows are locked with
+SKIP LOCKED and leased, so replicas do not index the same rows; a failed batch is retried
+group by group, and rows that keep failing are parked after LEARNING_QUEUE_MAX_ATTEMPTS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+
+from app.database import run_db
+from app.logging_config import get_logger
+from app.services.alert_service import alert_error, alert_warning
+from app.services.learning_service import (
+    claim_learning_batch,
+    collapse_learning_items,
+    index_learning_batch,
+    record_learning_failures,
+    record_learning_results,
+)
+
+learning_logger = get_logger("learning_worker")
+
+
+def _is_env_enabled(value: str | None, default: bool = True) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def is_learning_worker_enabled() -> bool:
+    if os.environ.get("PYTEST_CURRENT_TEST"):
+        return False
+    return _is_env_enabled(os.environ.get("LEARNING_WORKER_ENABLED"), default=True)
+
+
+def _get_learning_worker_settings() -> tuple[float, int]:
+    interval_seconds = max(float(os.environ.get("LEARNING_QUEUE_INTERVAL_SECONDS", "5")), 0.5)
+    batch_size = max(int(os.environ.get("LEARNING_QUEUE_BATCH_SIZE", "50")), 1)
+    return interval_seconds, batch_size
+
+
+def _get_learning_retry_settings() -> tuple[float, int, float]:
+    lease_seconds = max(float(os.environ.get("LEARNING_QUEUE_LEASE_SECONDS", "120")), 10.0)
+    max_attempts = max(int(os.environ.get("LEARNING_QUEUE_MAX_ATTEMPTS", "8")), 1)
+    retry_backoff_seconds = max(float(os.environ.get("LEARNING_QUEUE_RETRY_BACKOFF_SECONDS", "30")), 0.0)
+    return lease_seconds, max_attempts, retry_backoff_seconds
+
+
+class LearningWorker:
+    def __init__(self) -> None:
+        self._stop = asyncio.Event()
+
+    def request_stop(self) -> None:
+        self._stop.set()
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _index(self, items: list[dict]) -> tuple[dict, dict]:
+        """Index the batch in bulk; if that fails, retry group by group so one bad row fails alone."""
+        try:
+            return await asyncio.to_thread(index_learning_batch, items), {}
+        except Exception as exc:
+            if len(items) == 1:
+                return {"point_ids": {}, "superseded": []}, {items[0]["id"]: str(exc)}
+            learning_logger.warning(
+                "Learning batch failed, indexing groups one by one",
+                extra={"context": {"claimed": len(items), "error": str(exc)}},
+            )
+        result: dict = {"point_ids": {}, "superseded": []}
+        errors: dict = {}
+        for kept, duplicates in collapse_learning_items(items):
+            group = [kept, *duplicates]
+            try:
+                group_result = await asyncio.to_thread(index_learning_batch, group)
+            except Exception as exc:
+                errors.update({item["id"]: str(exc) for item in group})
+                continue
+            result["point_ids"].update(group_result["point_ids"])
+            result["superseded"].extend(group_result["superseded"])
+        return result, errors
+
+    async def run_pass(self, *, limit: int) -> dict[str, int]:
+        lease_seconds, max_attempts, retry_backoff_seconds = _get_learning_retry_settings()
+        items = await run_db(claim_learning_batch, limit=limit, lease_seconds=lease_seconds, max_attempts=max_attempts)
+        if not items:
+            return {"claimed": 0, "indexed": 0, "collapsed": 0, "failed": 0}
+        result, errors = await self._index(items)
+        if result["point_ids"]:
+            await run_db(record_learning_results, point_ids=result["point_ids"], superseded=result["superseded"])
+        parked = []
+        if errors:
+            parked = await run_db(
+                record_learning_failures,
+                errors=errors,
+                max_attempts=max_attempts,
+                retry_backoff_seconds=retry_backoff_seconds,
+            )
+        stats = {
+            "claimed": len(items),
+            "indexed": len(result["point_ids"]) - len(result["superseded"]),
+            "collapsed": len(result["superseded"]),
+            "failed": len(errors),
+        }
+        context = {**stats, "client_slugs": sorted({item["client_slug"] for item in items})}
+        if errors:
+            learning_logger.warning(
+                "Learning rows failed",
+                extra={"context": {**context, "error": next(iter(errors.values()))}},
+            )
+        if parked:
+            # Alert once per row when it stops being retried, not on every failed pass.
+            alert_error(
+                "Learning rows parked",
+                {"rows": [str(row_id) for row_id in parked], "error": next(iter(errors.values()))},
+            )
+        if result["point_ids"]:
+            learning_logger.info("Learning batch indexed", extra={"context": context})
+            alert_warning("Learning success", context)
+        return stats
+
+    async def run(self) -> None:
+        learning_logger.info("Learning worker started")
+        while not self._stop.is_set():
+            interval_seconds, batch_size = _get_learning_worker_settings()
+            try:
+                stats = await self.run_pass(limit=batch_size)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                learning_logger.error("Learning batch failed", extra={"context": {"error": str(exc)}})
+                alert_error("Learning service error", {"error": str(exc)})
+                await self._sleep(interval_seconds * 4)
+                continue
+            if stats["claimed"] < batch_size:
+                await self._sleep(interval_seconds)
+
+    async def drain(self, task: asyncio.Task, *, timeout: float = 10.0) -> None:
+        """Finish the current pass; past the deadline cancel it (unindexed rows stay queued)."""
+        self.request_stop()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        except asyncio.CancelledError:
+            pass
+        learning_logger.info("Learning worker stopped")
@@ -5,11 +5,15 @@ from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal, get_db
-from app.logging_config import get_logger, setup_logging
+from app.database import dispose_async_engine, get_db
+from app.learning_worker import LearningWorker, is_learning_worker_enabled
+from app.logging_config import setup_logging
 from app.models import Conversation, Handover, Message, User
+from app.outbox_worker import OutboxWorker
 from app.routers import admin, alerts, callback, message, reminders, telegram_webhook, webhook
-from app.services.outbox_service import claim_pending_outbox_batches, release_stale_processing
+from app.services.demo_salon_knowledge import get_question_type_warmup_status, start_question_type_warmup
+from app.services.http_clients import close_http_clients
+from app.services.llm.executor import shutdown_llm_executor
 
 setup_logging()
 
@@ -40,8 +44,10 @@ app.include_router(telegram_webhook.router)
 app.include_router(alerts.router)
 app.include_router(admin.router)
 
-outbox_logger = get_logger("outbox_worker")
+_outbox_worker: OutboxWorker | None = None
 _outbox_worker_task: asyncio.Task | None = None
+_learning_worker: LearningWorker | None = None
+_learning_worker_task: asyncio.Task | None = None
 
 
 def _is_env_enabled(value: str | None, default: bool = True) -> bool:
@@ -56,94 +62,61 @@ def _is_outbox_worker_enabled() -> bool:
     return _is_env_enabled(os.environ.get("OUTBOX_WORKER_ENABLED"), default=True)
 
 
-def _get_outbox_worker_settings() -> tuple[float, int, int, int, float, int]:
-    interval_seconds = float(os.environ.get("OUTBOX_WORKER_INTERVAL_SECONDS", "2"))
-    interval_seconds = max(interval_seconds, 0.1)
-    limit = int(os.environ.get("OUTBOX_PROCESS_LIMIT", "10"))
-    idle_seconds = int(float(os.environ.get("OUTBOX_COALESCE_SECONDS", "8")))
-    max_attempts = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "5"))
-    retry_backoff_seconds = float(os.environ.get("OUTBOX_RETRY_BACKOFF_SECONDS", "2"))
-    stale_seconds = int(float(os.environ.get("OUTBOX_STALE_PROCESSING_SECONDS", "120")))
-    stale_seconds = max(stale_seconds, 0)
-    return interval_seconds, limit, idle_seconds, max_attempts, retry_backoff_seconds, stale_seconds
-
-
-async def _outbox_worker_loop() -> None:
-    while True:
-        try:
-            (
-                interval_seconds,
-                limit,
-                idle_seconds,
-                max_attempts,
-                retry_backoff_seconds,
-                stale_seconds,
-            ) = (
-                _get_outbox_worker_settings()
-            )
-            await asyncio.sleep(interval_seconds)
-            db = SessionLocal()
-            try:
-                released = release_stale_processing(
-                    db,
-                    stale_seconds=stale_seconds,
-                    max_attempts=max_attempts,
-                    retry_backoff_seconds=retry_backoff_seconds,
-                )
-                if released["released"] or released["failed"]:
-                    outbox_logger.warning(
-                        "Outbox stale processing released",
-                        extra={"context": {**released, "stale_seconds": stale_seconds}},
-                    )
-                rows = claim_pending_outbox_batches(db, limit=limit, idle_seconds=idle_seconds)
-                if rows:
-                    results = await webhook._process_outbox_rows(
-                        db,
-                        rows,
-                        max_attempts=max_attempts,
-                        retry_backoff_seconds=retry_backoff_seconds,
-                    )
-                    outbox_logger.info(
-                        "Outbox worker processed",
-                        extra={"context": results},
-                    )
-            finally:
-                db.close()
-        except asyncio.CancelledError:
-            break
-        except Exception as exc:
-            outbox_logger.error(
-                "Outbox worker loop failed",
-                extra={"context": {"error": str(exc)}},
-            )
-
-
 @app.on_event("startup")
 async def start_outbox_worker() -> None:
-    global _outbox_worker_task
+    global _outbox_worker, _outbox_worker_task
     if not _is_outbox_worker_enabled():
         return
     if _outbox_worker_task is None or _outbox_worker_task.done():
-        _outbox_worker_task = asyncio.create_task(_outbox_worker_loop())
-        outbox_logger.info("Outbox worker started")
+        _outbox_worker = OutboxWorker()
+        _outbox_worker_task = asyncio.create_task(_outbox_worker.run())
+
+
+@app.on_event("startup")
+async def start_learning_worker() -> None:
+    global _learning_worker, _learning_worker_task
+    if not is_learning_worker_enabled():
+        return
+    if _learning_worker_task is None or _learning_worker_task.done():
+        _learning_worker = LearningWorker()
+        _learning_worker_task = asyncio.create_task(_learning_worker.run())
+
+
+@app.on_event("startup")
+async def warm_example_embeddings() -> None:
+    start_question_type_warmup()
 
 
 @app.on_event("shutdown")
 async def stop_outbox_worker() -> None:
-    global _outbox_worker_task
-    if _outbox_worker_task is None:
+    global _outbox_worker, _outbox_worker_task
+    if _outbox_worker is None or _outbox_worker_task is None:
         return
-    _outbox_worker_task.cancel()
-    try:
-        await _outbox_worker_task
-    except asyncio.CancelledError:
-        pass
+    await _outbox_worker.drain(_outbox_worker_task)
+    _outbox_worker = None
     _outbox_worker_task = None
 
 
+@app.on_event("shutdown")
+async def stop_learning_worker() -> None:
+    global _learning_worker, _learning_worker_task
+    if _learning_worker is None or _learning_worker_task is None:
+        return
+    await _learning_worker.drain(_learning_worker_task)
+    _learning_worker = None
+    _learning_worker_task = None
+
+
+@app.on_event("shutdown")
+async def close_shared_resources() -> None:
+    await close_http_clients()
+    shutdown_llm_executor()
+    await dispose_async_engine()
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "warmup": {"question_types": get_question_type_warmup_status()}}
 
 
 @app.get("/db-check")
@@ -24,3 +24,5 @@ class ClientSettings(Base):
     require_branch_for_pricing = Column(Boolean, default=True)
     auto_approve_roles = Column(Text, default="owner,admin")
     webhook_secret = Column(Text)
+    outbox_weight = Column(Integer, default=1)
+    outbox_max_concurrency = Column(Integer, default=0)
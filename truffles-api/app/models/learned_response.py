@@ -29,6 +29,9 @@ class LearnedResponse(Base):
     approved_at = Column(TIMESTAMP(timezone=True))
     rejected_at = Column(TIMESTAMP(timezone=True))
     qdrant_point_id = Column(Text)
+    index_attempts = Column(Integer, default=0)
+    index_lease_expires_at = Column(TIMESTAMP(timezone=True))
+    index_last_error = Column(Text)
 
     use_count = Column(Integer, default=0)
     last_used_at = Column(TIMESTAMP(timezone=True))
@@ -18,6 +18,9 @@ class OutboxMessage(Base):
     status = Column(Text, nullable=False, default="PENDING")
     attempts = Column(Integer, nullable=False, default=0)
     next_attempt_at = Column(TIMESTAMP(timezone=True))
+    ready_at = Column(TIMESTAMP(timezone=True))
     last_error = Column(Text)
+    locked_by = Column(Text)
+    lease_expires_at = Column(TIMESTAMP(timezone=True))
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
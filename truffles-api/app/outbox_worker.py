@@ -0,0 +1,345 @@
+"""
+Outbox worker.
+
+Runs embedded in the API process (OUTBOX_WORKER_ENABLED=1) or standalone:
+
+    python -m app.outbox_worker
+
+Standalone replicas scale independently of the web pods (run those with
+OUTBOX_WORKER_ENABLED=0). Claimed rows carry a lease that is renewed by a
+heartbeat thread while the worker is alive (a thread, so blocking work on the
+event loop cannot starve it); on SIGTERM the worker finishes the current pass
+within OUTBOX_DRAIN_SECONDS or hands its unanswered rows back to the queue.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+
+from app.database import SessionLocal, dispose_async_engine, engine, run_db
+from app.logging_config import get_logger, setup_logging
+from app.routers import webhook
+from app.services.coalesce_service import get_coalesce_max_wait_seconds
+from app.services.http_clients import close_http_clients
+from app.services.llm.executor import shutdown_llm_executor
+from app.services.outbox_listener import (
+    OUTBOX_BACKLOG_WAKEUP_KEY,
+    RETRY_WAKEUP_KEY,
+    OutboxNotifyListener,
+    OutboxWakeupSchedule,
+)
+from app.services.outbox_service import (
+    claim_pending_outbox_batches,
+    release_stale_processing,
+    release_worker_claims,
+    renew_outbox_leases,
+)
+
+outbox_logger = get_logger("outbox_worker")
+
+
+def _is_env_enabled(value: str | None, default: bool = True) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _get_outbox_worker_settings() -> tuple[float, int, int, int, float, int]:
+    interval_seconds = float(os.environ.get("OUTBOX_WORKER_INTERVAL_SECONDS", "2"))
+    interval_seconds = max(interval_seconds, 0.1)
+    limit = int(os.environ.get("OUTBOX_PROCESS_LIMIT", "10"))
+    idle_seconds = int(float(os.environ.get("OUTBOX_COALESCE_SECONDS", "8")))
+    max_attempts = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "5"))
+    retry_backoff_seconds = float(os.environ.get("OUTBOX_RETRY_BACKOFF_SECONDS", "2"))
+    stale_seconds = int(float(os.environ.get("OUTBOX_STALE_PROCESSING_SECONDS", "120")))
+    stale_seconds = max(stale_seconds, 0)
+    return interval_seconds, limit, idle_seconds, max_attempts, retry_backoff_seconds, stale_seconds
+
+
+def _get_outbox_listen_settings() -> tuple[bool, float]:
+    enabled = _is_env_enabled(os.environ.get("OUTBOX_NOTIFY_ENABLED"), default=True)
+    fallback_poll_seconds = float(os.environ.get("OUTBOX_FALLBACK_POLL_SECONDS", "30"))
+    return enabled, max(fallback_poll_seconds, 1.0)
+
+
+def _get_outbox_lease_settings() -> tuple[float, float]:
+    lease_seconds = max(float(os.environ.get("OUTBOX_LEASE_SECONDS", "60")), 3.0)
+    drain_seconds = max(float(os.environ.get("OUTBOX_DRAIN_SECONDS", "20")), 0.0)
+    return lease_seconds, drain_seconds
+
+
+def _get_outbox_listen_dsn() -> str:
+    return engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def build_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class OutboxWorker:
+    def __init__(self, *, worker_id: str | None = None):
+        self.worker_id = worker_id or build_worker_id()
+        self._stop = asyncio.Event()
+        self._listener: OutboxNotifyListener | None = None
+        self._schedule: OutboxWakeupSchedule | None = None
+        self._next_listen_attempt = 0.0
+        self._delivered_ids: set[str] = set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def request_stop(self) -> None:
+        if self._stop.is_set():
+            return
+        outbox_logger.info("Outbox worker stop requested", extra={"context": {"worker_id": self.worker_id}})
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.wake()
+
+    async def wait_stop_requested(self) -> None:
+        await self._stop.wait()
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def _heartbeat(self, stop: threading.Event, lease_seconds: float) -> None:
+        interval = max(lease_seconds / 3, 1.0)
+        while not stop.wait(interval):
+            db = SessionLocal()
+            try:
+                renew_outbox_leases(db, worker_id=self.worker_id, lease_seconds=lease_seconds)
+            except Exception as exc:
+                outbox_logger.warning(
+                    "Outbox lease heartbeat failed",
+                    extra={"context": {"worker_id": self.worker_id, "error": str(exc)}},
+                )
+            finally:
+                db.close()
+
+    def _start_heartbeat(self, lease_seconds: float) -> threading.Event:
+        stop = threading.Event()
+        threading.Thread(
+            target=self._heartbeat,
+            args=(stop, lease_seconds),
+            name="outbox-lease-heartbeat",
+            daemon=True,
+        ).start()
+        return stop
+
+    async def run_pass(
+        self,
+        *,
+        limit: int,
+        idle_seconds: int,
+        max_attempts: int,
+        retry_backoff_seconds: float,
+        stale_seconds: int,
+        release_stale: bool = True,
+    ) -> dict[str, int]:
+        lease_seconds, _ = _get_outbox_lease_settings()
+        db = SessionLocal()
+        heartbeat_stop: threading.Event | None = None
+        try:
+            if release_stale:
+                released = await run_db(
+                    release_stale_processing,
+                    stale_seconds=stale_seconds,
+                    max_attempts=max_attempts,
+                    retry_backoff_seconds=retry_backoff_seconds,
+                )
+                if released["released"] or released["failed"]:
+                    outbox_logger.warning(
+                        "Outbox stale processing released",
+                        extra={"context": {**released, "stale_seconds": stale_seconds}},
+                    )
+            rows = await run_db(
+                claim_pending_outbox_batches,
+                limit=limit,
+                idle_seconds=idle_seconds,
+                worker_id=self.worker_id,
+                lease_seconds=lease_seconds,
+                max_wait_seconds=get_coalesce_max_wait_seconds(),
+            )
+            if not rows:
+                return {"claimed": 0, "sent": 0, "failed": 0, "retry_scheduled": 0}
+            heartbeat_stop = self._start_heartbeat(lease_seconds)
+            results = await webhook._process_outbox_rows(
+                db,
+                rows,
+                max_attempts=max_attempts,
+                retry_backoff_seconds=retry_backoff_seconds,
+                session_factory=SessionLocal,
+                delivered_ids=self._delivered_ids,
+            )
+            # Every row is finalized now; only an interrupted pass leaves ids for release_claims.
+            self._delivered_ids.clear()
+            outbox_logger.info(
+                "Outbox worker processed",
+                extra={"context": {**results, "worker_id": self.worker_id}},
+            )
+            return results
+        finally:
+            if heartbeat_stop is not None:
+                heartbeat_stop.set()
+            db.close()
+
+    async def _tick(self) -> None:
+        (
+            interval_seconds,
+            limit,
+            idle_seconds,
+            max_attempts,
+            retry_backoff_seconds,
+            stale_seconds,
+        ) = (
+            _get_outbox_worker_settings()
+        )
+        listen_enabled, fallback_poll_seconds = _get_outbox_listen_settings()
+        pass_kwargs = {
+            "limit": limit,
+            "idle_seconds": idle_seconds,
+            "max_attempts": max_attempts,
+            "retry_backoff_seconds": retry_backoff_seconds,
+            "stale_seconds": stale_seconds,
+        }
+
+        listener = self._listener
+        now = time.monotonic()
+        if listen_enabled and (listener is None or not listener.active) and now >= self._next_listen_attempt:
+            if listener is not None:
+                listener.close()
+            listener = self._listener = OutboxNotifyListener(_get_outbox_listen_dsn())
+            if listener.start():
+                self._schedule = OutboxWakeupSchedule(sweep_seconds=fallback_poll_seconds)
+            else:
+                self._next_listen_attempt = now + fallback_poll_seconds
+
+        schedule = self._schedule
+        if not listen_enabled or listener is None or not listener.active or schedule is None:
+            # Fixed-interval polling when NOTIFY is disabled or the listener is down.
+            await self._sleep(interval_seconds)
+            if not self.stopping:
+                await self.run_pass(**pass_kwargs)
+            return
+
+        schedule.sweep_seconds = fallback_poll_seconds
+        schedule.note_received(
+            listener.drain(),
+            idle_seconds=idle_seconds,
+            max_wait_seconds=get_coalesce_max_wait_seconds(),
+        )
+        wait_seconds = schedule.seconds_until_due(time.monotonic())
+        if wait_seconds > 0:
+            await listener.wait(wait_seconds)
+            return
+
+        now = time.monotonic()
+        release_stale = schedule.sweep_due(now)
+        if release_stale:
+            schedule.mark_swept(now)
+        schedule.pop_due(now)
+        results = await self.run_pass(release_stale=release_stale, **pass_kwargs)
+        if results.get("claimed", 0) >= limit:
+            # Backlog: claim the next page right away.
+            schedule.note(OUTBOX_BACKLOG_WAKEUP_KEY, time.monotonic())
+        if results.get("retry_scheduled"):
+            schedule.note(RETRY_WAKEUP_KEY, time.monotonic() + retry_backoff_seconds)
+
+    async def run(self) -> None:
+        outbox_logger.info("Outbox worker started", extra={"context": {"worker_id": self.worker_id}})
+        try:
+            while not self.stopping:
+                try:
+                    await self._tick()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    outbox_logger.error(
+                        "Outbox worker loop failed",
+                        extra={"context": {"error": str(exc)}},
+                    )
+                    await self._sleep(1)
+        finally:
+            if self._listener is not None:
+                self._listener.close()
+
+    async def release_claims(self) -> int:
+        try:
+            released = await run_db(
+                release_worker_claims,
+                worker_id=self.worker_id,
+                delivered_ids=list(self._delivered_ids),
+            )
+        except Exception as exc:
+            outbox_logger.error(
+                "Outbox claims release failed",
+                extra={"context": {"worker_id": self.worker_id, "error": str(exc)}},
+            )
+            return 0
+        if released:
+            outbox_logger.warning(
+                "Outbox claims released on shutdown",
+                extra={"context": {"worker_id": self.worker_id, "released": released}},
+            )
+        return released
+
+    async def drain(self, task: asyncio.Task, *, timeout: float | None = None) -> None:
+        """
+        Stop after the current pass; past the deadline cancel it and requeue our rows.
+
+        Rows whose reply was already sent are marked SENT rather than requeued.
+        """
+        if timeout is None:
+            _, timeout = _get_outbox_lease_settings()
+        self.request_stop()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        except asyncio.CancelledError:
+            pass
+        await self.release_claims()
+        outbox_logger.info("Outbox worker stopped", extra={"context": {"worker_id": self.worker_id}})
+
+
+async def serve() -> None:
+    worker = OutboxWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.request_stop)
+    task = asyncio.create_task(worker.run())
+    stop_waiter = asyncio.create_task(worker.wait_stop_requested())
+    try:
+        done, _ = await asyncio.wait({task, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            stop_waiter.cancel()
+            task.result()
+            return
+        await worker.drain(task)
+    finally:
+        await close_http_clients()
+        shutdown_llm_executor()
+        await dispose_async_engine()
+
+
+def main() -> None:
+    setup_logging()
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,18 @@ from pydantic import BaseModel, field_validator
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models import Client, ClientSettings, Prompt
+from app.services.ai_service import get_retrieval_cache_stats
 from app.services.alert_service import alert_warning
+from app.services.coalesce_service import get_coalesce_max_wait_seconds
 from app.services.health_service import check_and_heal_conversations, get_system_health
-from app.services.outbox_service import claim_pending_outbox_batches, release_stale_processing
+from app.services.knowledge_service import get_embedding_cache_stats
+from app.services.outbox_service import (
+    claim_pending_outbox_batches,
+    get_outbox_tenant_stats,
+    release_stale_processing,
+)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -50,6 +57,8 @@ class SettingsUpdate(BaseModel):
     manager_scope: Optional[str] = None
     require_branch_for_pricing: Optional[bool] = None
     auto_approve_roles: Optional[list[str]] = None
+    outbox_weight: Optional[int] = None
+    outbox_max_concurrency: Optional[int] = None
 
     @field_validator("auto_approve_roles", mode="before")
     @classmethod
@@ -290,6 +299,14 @@ async def get_settings(client_slug: str, db: Session = Depends(get_db)):
             else True
         ),
         "auto_approve_roles": auto_approve_roles,
+        "outbox_weight": (
+            settings.outbox_weight if settings and settings.outbox_weight is not None else 1
+        ),
+        "outbox_max_concurrency": (
+            settings.outbox_max_concurrency
+            if settings and settings.outbox_max_concurrency is not None
+            else 0
+        ),
     }
 
 
@@ -305,6 +322,8 @@ async def update_settings(client_slug: str, data: SettingsUpdate, db: Session =
     - branch_resolution_mode: by_instance/ask_user/hybrid
     - manager_scope: branch/global
     - auto_approve_roles: owner/admin/manager/support
+    - outbox_weight: 1-100
+    - outbox_max_concurrency: 0-100 (0 = no cap)
     """
     # Find client
     client = db.query(Client).filter(Client.name == client_slug).first()
@@ -349,6 +368,14 @@ async def update_settings(client_slug: str, data: SettingsUpdate, db: Session =
                 detail=f"auto_approve_roles invalid: {', '.join(unknown_roles)}",
             )
 
+    if data.outbox_weight is not None:
+        if not 1 <= data.outbox_weight <= 100:
+            raise HTTPException(status_code=400, detail="outbox_weight must be 1-100")
+
+    if data.outbox_max_concurrency is not None:
+        if not 0 <= data.outbox_max_concurrency <= 100:
+            raise HTTPException(status_code=400, detail="outbox_max_concurrency must be 0-100")
+
     # Find or create settings
     settings = db.query(ClientSettings).filter(ClientSettings.client_id == client.id).first()
 
@@ -375,6 +402,10 @@ async def update_settings(client_slug: str, data: SettingsUpdate, db: Session =
         settings.require_branch_for_pricing = data.require_branch_for_pricing
     if data.auto_approve_roles is not None:
         settings.auto_approve_roles = ",".join(data.auto_approve_roles)
+    if data.outbox_weight is not None:
+        settings.outbox_weight = data.outbox_weight
+    if data.outbox_max_concurrency is not None:
+        settings.outbox_max_concurrency = data.outbox_max_concurrency
 
     db.commit()
 
@@ -402,7 +433,12 @@ async def process_outbox(
         max_attempts=max_attempts,
         retry_backoff_seconds=retry_backoff_seconds,
     )
-    rows = claim_pending_outbox_batches(db, limit=limit, idle_seconds=idle_seconds)
+    rows = claim_pending_outbox_batches(
+        db,
+        limit=limit,
+        idle_seconds=idle_seconds,
+        max_wait_seconds=get_coalesce_max_wait_seconds(),
+    )
 
     from app.routers.webhook import _process_outbox_rows
 
@@ -411,6 +447,7 @@ async def process_outbox(
         rows,
         max_attempts=max_attempts,
         retry_backoff_seconds=retry_backoff_seconds,
+        session_factory=SessionLocal,
     )
     if released["released"] or released["failed"]:
         results["released_stale"] = released["released"]
@@ -418,6 +455,16 @@ async def process_outbox(
     return results
 
 
+@router.get("/outbox/stats")
+async def outbox_stats(
+    db: Session = Depends(get_db),
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+):
+    """Per-tenant outbox queue depth and wait time."""
+    _require_admin_token(x_admin_token)
+    return {"tenants": get_outbox_tenant_stats(db)}
+
+
 # === MEDIA CLEANUP ===
 
 
@@ -568,7 +615,10 @@ async def get_metrics(
 @router.get("/health")
 async def system_health(db: Session = Depends(get_db)):
     """Get system health status."""
-    return get_system_health(db)
+    health = get_system_health(db)
+    health["embedding_cache"] = get_embedding_cache_stats()
+    health["retrieval_cache"] = get_retrieval_cache_stats()
+    return health
 
 
 @router.post("/heal")
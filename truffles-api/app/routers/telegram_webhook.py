@@ -5,7 +5,7 @@ from typing import Optional
 from fastapi import APIRouter, BackgroundTasks, Depends, Request
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal, get_db
+from app.database import SessionLocal, get_db, run_on_session
 from app.logging_config import get_logger
 from app.models import ClientSettings, Conversation, Handover
 from app.schemas.telegram import TelegramMessage, TelegramUpdate, TelegramWebhookResponse
@@ -60,20 +60,8 @@ async def handle_telegram_webhook(
         logger.debug(f"Telegram webhook received: {body}")
 
         update = TelegramUpdate(**body)
-
-        # Handle callback query (button click)
-        if update.callback_query:
-            return await handle_callback_query(update, db)
-
-        # Handle message from manager (media or text)
-        if update.message:
-            media_payload = _extract_media_payload(update.message)
-            if media_payload:
-                return await handle_manager_media(update, media_payload, db, background_tasks)
-            if update.message.text:
-                return await handle_manager_message(update, db)
-
-        return TelegramWebhookResponse(success=True, message="No actionable content")
+        # Handlers query the DB and call the Telegram API synchronously: keep them off the loop.
+        return await run_on_session(_dispatch_update, db, update, background_tasks)
 
     except Exception as e:
         logger.error(f"Telegram webhook error: {e}", exc_info=True)
@@ -82,11 +70,31 @@ async def handle_telegram_webhook(
 
 # Backward-compatible alias used in ops docs
 @router.post("/telegram-callback", response_model=TelegramWebhookResponse)
-async def handle_telegram_callback(request: Request, db: Session = Depends(get_db)):
-    return await handle_telegram_webhook(request, db)
+async def handle_telegram_callback(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    return await handle_telegram_webhook(request, background_tasks, db)
+
+
+def _dispatch_update(db: Session, update: TelegramUpdate, background_tasks: BackgroundTasks) -> TelegramWebhookResponse:
+    # Handle callback query (button click)
+    if update.callback_query:
+        return handle_callback_query(update, db)
+
+    # Handle message from manager (media or text)
+    if update.message:
+        media_payload = _extract_media_payload(update.message)
+        if media_payload:
+            return handle_manager_media(update, media_payload, db, background_tasks)
+        if update.message.text:
+            return handle_manager_message(update, db)
+
+    return TelegramWebhookResponse(success=True, message="No actionable content")
 
 
-async def handle_manager_message(update: TelegramUpdate, db: Session) -> TelegramWebhookResponse:
+def handle_manager_message(update: TelegramUpdate, db: Session) -> TelegramWebhookResponse:
     """Handle text message from manager -> forward to WhatsApp client."""
     message = update.message
     logger.info(f"Manager message received: chat_id={message.chat.id}, from={message.from_user.id if message.from_user else 'unknown'}, text={message.text[:50] if message.text else 'none'}...")
@@ -319,7 +327,7 @@ def _process_manager_media_background(task: dict) -> None:
         db.close()
 
 
-async def handle_manager_media(
+def handle_manager_media(
     update: TelegramUpdate,
     media_payload: dict,
     db: Session,
@@ -402,7 +410,7 @@ def get_bot_token_by_chat(db: Session, chat_id: int) -> Optional[str]:
     return settings.telegram_bot_token if settings else None
 
 
-async def handle_callback_query(update: TelegramUpdate, db: Session) -> TelegramWebhookResponse:
+def handle_callback_query(update: TelegramUpdate, db: Session) -> TelegramWebhookResponse:
     """Handle callback query (button click): take, resolve, skip."""
     callback = update.callback_query
 
@@ -1,25 +1,28 @@
 import asyncio
 import base64
+import copy
+import functools
 import hashlib
+import json
 import mimetypes
 import os
 import re
+import threading
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Awaitable, Callable
 from urllib.parse import urlparse
 from uuid import UUID, uuid4
 
-import httpx
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import FileResponse
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from starlette.requests import ClientDisconnect
 
-from app.database import get_db
+from app.database import SessionLocal, get_db, run_db, run_on_session
 from app.logging_config import get_logger
 from app.models import Branch, Client, ClientSettings, Conversation, Handover, Message, User
 from app.schemas.webhook import WebhookBody, WebhookRequest, WebhookResponse
@@ -27,24 +30,31 @@ from app.services.ai_service import (
     ACKNOWLEDGEMENT_RESPONSE,
     BOT_STATUS_RESPONSE,
     GREETING_RESPONSE,
+    HIGH_CONFIDENCE_THRESHOLD,
     MID_CONFIDENCE_THRESHOLD,
     OUT_OF_DOMAIN_RESPONSE,
     THANKS_RESPONSE,
+    AIGenerationRequest,
+    agenerate_prepared_response,
+    attach_retrieval_context,
     classify_confirmation,
     detect_multi_intent,
     detect_refusal_flags,
+    get_rag_confidence,
     is_acknowledgement_message,
     is_bot_status_question,
     is_greeting_message,
     is_low_signal_message,
     is_thanks_message,
     normalize_for_matching,
+    prepare_ai_generation,
     rewrite_for_service_match,
     rewrite_query_for_retrieval,
     transcribe_audio_with_fallback,
 )
 from app.services.alert_service import alert_warning
 from app.services.chatflow_service import send_bot_response, verify_signed_media_path
+from app.services.coalesce_service import CoalesceDecision, plan_coalesce_window
 from app.services.conversation_service import (
     get_or_create_conversation,
     get_or_create_user,
@@ -64,6 +74,7 @@ from app.services.demo_salon_knowledge import (
     semantic_service_match,
 )
 from app.services.escalation_service import get_telegram_credentials, send_telegram_notification
+from app.services.http_clients import async_http_client
 from app.services.intent_service import (
     DomainIntent,
     Intent,
@@ -75,8 +86,16 @@ from app.services.intent_service import (
     is_rejection,
     should_escalate,
 )
-from app.services.message_service import generate_bot_response, save_message, select_handover_user_message
-from app.services.outbox_service import build_inbound_message_id, enqueue_outbox_message, mark_outbox_status
+from app.services.latency_budget import budget_timeout, fork_message_budget, start_message_budget
+from app.services.llm import run_blocking, run_enrichment
+from app.services.message_service import agenerate_bot_response, save_message, select_handover_user_message
+from app.services.outbox_service import (
+    OutboxRow,
+    build_inbound_message_id,
+    enqueue_outbox_message,
+    finalize_outbox_rows,
+)
+from app.services.result import Result
 from app.services.state_machine import ConversationState
 from app.services.state_service import escalate_to_pending, manager_resolve
 from app.services.telegram_service import TelegramService
@@ -126,6 +145,32 @@ def _get_outbox_window_merge_seconds() -> float:
     return max(0.0, seconds)
 
 
+def _get_outbox_concurrency() -> int:
+    raw = os.environ.get("OUTBOX_CONCURRENCY", "4")
+    try:
+        concurrency = int(float(raw))
+    except (TypeError, ValueError):
+        return 1
+    return max(1, concurrency)
+
+
+def _get_enrichment_settings() -> tuple[bool, float]:
+    enabled = _is_env_enabled(os.environ.get("ENRICHMENT_FANOUT_ENABLED"), default=True)
+    raw = os.environ.get("ENRICHMENT_DEADLINE_SECONDS", "2.5")
+    try:
+        deadline_seconds = float(raw)
+    except (TypeError, ValueError):
+        deadline_seconds = 2.5
+    return enabled, max(0.0, deadline_seconds)
+
+
+def _get_speculative_llm_settings() -> tuple[bool, set[str]]:
+    enabled = _is_env_enabled(os.environ.get("SPECULATIVE_LLM_ENABLED"), default=False)
+    raw_types = os.environ.get("SPECULATIVE_LLM_POLICY_TYPES", "demo_salon")
+    policy_types = {item.strip().casefold() for item in raw_types.split(",") if item.strip()}
+    return enabled, policy_types
+
+
 def _coerce_outbox_created_at(value: datetime | None) -> datetime:
     if not isinstance(value, datetime):
         return datetime.min.replace(tzinfo=timezone.utc)
@@ -134,16 +179,16 @@ def _coerce_outbox_created_at(value: datetime | None) -> datetime:
     return value
 
 
-def _split_outbox_batches(batch_sorted: list[dict], window_seconds: float) -> list[list[dict]]:
+def _split_outbox_batches(batch_sorted: list[OutboxRow], window_seconds: float) -> list[list[OutboxRow]]:
     if not batch_sorted:
         return []
     if window_seconds <= 0:
         return [batch_sorted]
-    groups: list[list[dict]] = []
-    current: list[dict] = []
+    groups: list[list[OutboxRow]] = []
+    current: list[OutboxRow] = []
     last_created: datetime | None = None
     for row in batch_sorted:
-        created_at = _coerce_outbox_created_at(row.get("created_at"))
+        created_at = _coerce_outbox_created_at(row.created_at)
         if not current:
             current.append(row)
             last_created = created_at
@@ -529,6 +574,78 @@ def _read_media_bytes_from_storage(storage_path: str | None, max_bytes: int) ->
         return None, f"read_failed:{exc}"
 
 
+def _is_outbox_media_offload_enabled() -> bool:
+    return _is_env_enabled(os.environ.get("OUTBOX_MEDIA_OFFLOAD_ENABLED"), default=True)
+
+
+def _outbox_media_path(digest: str) -> Path:
+    return Path(MEDIA_STORAGE_DEFAULT_DIR) / "outbox" / digest[:2] / digest
+
+
+def _offload_outbox_media(payload_json: dict) -> dict:
+    """
+    Move inline base64 media out of an outbox payload into the content-addressed store.
+
+    The JSONB keeps only base64_sha256/base64_path; the worker reads the bytes back in
+    the media branch (_rehydrate_outbox_media). On any storage error the payload is
+    returned unchanged, so enqueue never depends on the media disk.
+    """
+    body = payload_json.get("body") if isinstance(payload_json, dict) else None
+    media = body.get("mediaData") if isinstance(body, dict) else None
+    if not isinstance(media, dict):
+        return payload_json
+    base64_data = media.get("base64")
+    if not isinstance(base64_data, str) or not base64_data or not _is_outbox_media_offload_enabled():
+        return payload_json
+    try:
+        decoded = base64.b64decode(base64_data, validate=False)
+        if len(decoded) > MEDIA_STORAGE_MAX_BYTES:
+            return payload_json
+        digest = hashlib.sha256(decoded).hexdigest()
+        target_path = _outbox_media_path(digest)
+        try:
+            # Dedup hit: refresh mtime so the media cleanup TTL counts from the newest reference.
+            os.utime(target_path)
+        except FileNotFoundError:
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target_path.with_name(f"{digest}.{uuid4().hex[:8]}.tmp")
+            tmp_path.write_bytes(decoded)
+            os.replace(tmp_path, target_path)
+    except Exception as exc:
+        logger.warning("Outbox media offload failed", extra={"context": {"error": str(exc)}})
+        return payload_json
+
+    offloaded_media = {key: value for key, value in media.items() if key != "base64"}
+    offloaded_media["base64_sha256"] = digest
+    offloaded_media["base64_path"] = str(target_path)
+    offloaded_media.setdefault("size", len(decoded))
+    return {**payload_json, "body": {**body, "mediaData": offloaded_media}}
+
+
+def _rehydrate_outbox_media(payload: WebhookRequest) -> WebhookRequest:
+    """
+    Return a payload with base64 media read back from the store (media rows only).
+
+    A missing or corrupted file raises, so the row is retried (and eventually failed)
+    instead of being answered without the customer's media.
+    """
+    media = payload.body.mediaData
+    if not isinstance(media, dict) or media.get("base64") or not media.get("base64_path"):
+        return payload
+    data, error = _read_media_bytes_from_storage(media.get("base64_path"), MEDIA_STORAGE_MAX_BYTES)
+    if data is not None and hashlib.sha256(data).hexdigest() != media.get("base64_sha256"):
+        data, error = None, "hash_mismatch"
+    if data is None:
+        logger.warning(
+            "Outbox media rehydrate failed",
+            extra={"context": {"path": media.get("base64_path"), "error": error}},
+        )
+        raise RuntimeError(f"outbox_media_unavailable:{error}")
+    hydrated = payload.model_copy(deep=True)
+    hydrated.body.mediaData = {**media, "base64": base64.b64encode(data).decode("ascii")}
+    return hydrated
+
+
 async def _download_media_bytes(media: MediaInfo, policy: dict, max_bytes: int) -> tuple[bytes | None, str | None]:
     if not media.url:
         return None, "missing_url"
@@ -539,7 +656,7 @@ async def _download_media_bytes(media: MediaInfo, policy: dict, max_bytes: int)
     size_bytes = 0
     data = bytearray()
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with async_http_client("media") as client:
             async with client.stream("GET", media.url) as response:
                 response.raise_for_status()
                 async for chunk in response.aiter_bytes():
@@ -567,6 +684,7 @@ async def _maybe_transcribe_voice(
     media_decision: MediaDecision | None,
     storage_path: str | None,
     saved_message: Message | None,
+    timing_context: dict | None = None,
 ) -> tuple[str | None, str | None, dict | None]:
     enabled, max_bytes, model, language, primary_provider, fallback_provider, timeout_seconds, min_chars = (
         _get_transcription_settings()
@@ -624,7 +742,7 @@ async def _maybe_transcribe_voice(
         asr_meta["asr_failed"] = True
         return None, source_error or "missing_audio", asr_meta
 
-    transcript, asr_meta, status = transcribe_audio_with_fallback(
+    transcript, asr_meta, status = await transcribe_audio_with_fallback(
         audio_bytes,
         filename=_guess_transcript_filename(media),
         mime_type=media.mime,
@@ -632,7 +750,7 @@ async def _maybe_transcribe_voice(
         language=language,
         primary_provider=primary_provider,
         fallback_provider=fallback_provider,
-        timeout_seconds=timeout_seconds,
+        timeout_seconds=budget_timeout(timing_context, timeout_seconds),
         min_chars=min_chars,
     )
     if not transcript:
@@ -880,7 +998,7 @@ async def _store_media_locally(
     digest = hashlib.sha256()
     size_bytes = 0
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with async_http_client("media") as client:
             async with client.stream("GET", media.url) as response:
                 response.raise_for_status()
                 with target_path.open("wb") as handle:
@@ -1523,6 +1641,10 @@ async def is_duplicate_message_id(
         except Exception as e:
             logger.warning(f"Dedup redis unavailable, falling back to DB: {e}")
 
+    return await run_on_session(_is_duplicate_in_db, db, client_id, message_id)
+
+
+def _is_duplicate_in_db(db: Session, client_id, message_id: str) -> bool:
     # Persistent dedup in DB (message_dedup) to survive restarts/retries.
     try:
         result = db.execute(
@@ -1779,6 +1901,9 @@ def _should_escalate_to_pending(policy: dict[str, bool], intent: Intent) -> bool
     return bool(policy.get("allow_handover_create")) and should_escalate(intent)
 
 
+_QUESTION_TYPE_NOT_FETCHED = object()
+
+
 @dataclass(frozen=True)
 class DecisionSignals:
     intent: Intent
@@ -1787,6 +1912,243 @@ class DecisionSignals:
     is_ack: bool
     is_low_signal: bool
     is_status_question: bool
+    question_type: Any = _QUESTION_TYPE_NOT_FETCHED
+    enrichment_timed_out: tuple[str, ...] = ()
+
+
+class EnrichmentFanout:
+    """
+    Independent pre-decision enrichment calls started together under one shared deadline.
+
+    Each call runs in the enrichment pool, so a call stuck past the deadline holds an
+    enrichment thread, not one reply generation needs. A consumer gets the result if the
+    call finished before the deadline (or has finished by the time it is asked), otherwise
+    None and it falls back. Deferred calls start only when first asked for, with a deadline
+    of their own, so messages that exit before their consumer never pay for them.
+    close() cancels whatever is still pending once the message is done.
+    """
+
+    def __init__(
+        self,
+        calls: dict[str, Callable[[], Any]],
+        *,
+        deadline_seconds: float,
+        deferred: dict[str, Callable[[], Any]] | None = None,
+    ):
+        self.started_at = time.monotonic()
+        self.deadline_seconds = deadline_seconds
+        self.timed_out: set[str] = set()
+        self.elapsed_ms: dict[str, float] = {}
+        self._deferred = dict(deferred or {})
+        self._deadlines: dict[str, float] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        for name, call in calls.items():
+            self._start(name, call)
+
+    def _start(self, name: str, call: Callable[[], Any]) -> None:
+        started_at = time.monotonic()
+        self._deadlines[name] = started_at + self.deadline_seconds
+        self._tasks[name] = asyncio.create_task(self._run(name, call, started_at))
+
+    async def _run(self, name: str, call: Callable[[], Any], started_at: float) -> Any:
+        try:
+            return await run_enrichment(call)
+        except Exception as exc:
+            logger.warning("Enrichment call failed", extra={"context": {"call": name, "error": str(exc)}})
+            return None
+        finally:
+            self.elapsed_ms[name] = round((time.monotonic() - started_at) * 1000, 2)
+
+    def has(self, name: str) -> bool:
+        return name in self._tasks or name in self._deferred
+
+    async def result(self, name: str) -> Any:
+        if name in self._deferred:
+            self._start(name, self._deferred.pop(name))
+        task = self._tasks.get(name)
+        if task is None:
+            return None
+        if not task.done():
+            remaining = self._deadlines[name] - time.monotonic()
+            if remaining > 0:
+                await asyncio.wait({task}, timeout=remaining)
+        if not task.done():
+            self.timed_out.add(name)
+            return None
+        return task.result()
+
+    async def signals(self, decision_text: str) -> DecisionSignals:
+        """Everything the decision stage consumes, collected into one DecisionSignals."""
+        signals = await self.result("signals")
+        if signals is None:
+            signals = _detect_intent_signals(decision_text, use_llm=False)
+        question_type = await self.result("question_type")
+        return replace(signals, question_type=question_type, enrichment_timed_out=tuple(sorted(self.timed_out)))
+
+    def close(self) -> None:
+        """Cancel calls still pending; a call already running in a thread finishes there unobserved."""
+        self._deferred.clear()
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+
+_speculative_llm_tasks: set[asyncio.Task] = set()
+
+
+def _fork_timing_context(timing_context: dict) -> dict:
+    """
+    Context for work running beside the request: public values are deep-copied so neither
+    side sees the other's writes, the retrieval memo stays shared (it is locked) and the
+    budget keeps its deadline with a skip list of its own.
+    """
+    snapshot = timing_context.copy()
+    forked = {key: value for key, value in snapshot.items() if key.startswith("_")}
+    forked.update(copy.deepcopy({key: value for key, value in snapshot.items() if not key.startswith("_")}))
+    fork_message_budget(forked)
+    return forked
+
+
+def _speculative_llm_key(
+    conversation: Conversation,
+    message_text: str,
+    *,
+    append_user_message: bool,
+    pending_hint: bool,
+) -> tuple:
+    """
+    Adoption key: the prompt inputs plus a stamp of the conversation state and context.
+
+    A stage that changes the state or the context (booking slots, intent queue, carryover)
+    without replying makes the speculative answer stale; the decision trace is bookkeeping
+    and is left out of the stamp.
+    """
+    context = {key: value for key, value in _get_conversation_context(conversation).items() if key != DECISION_TRACE_KEY}
+    stamp = hashlib.sha256(json.dumps(context, sort_keys=True, default=str).encode()).hexdigest()
+    return (message_text, append_user_message, pending_hint, conversation.state, stamp)
+
+
+def _prepare_speculative_llm(
+    cancelled: threading.Event,
+    *,
+    conversation_id: UUID,
+    message_text: str,
+    client_slug: str,
+    append_user_message: bool,
+    pending_hint: bool,
+    timing_context: dict,
+) -> Result | AIGenerationRequest | None:
+    """
+    Speculative prompt preparation on its own DB session (the request session stays on the loop).
+
+    Generation only starts if RAG confidence lands in the mid band, where the LLM answer is
+    the likely outcome; the cancel flag is checked before each expensive step.
+    """
+    db = SessionLocal()
+    try:
+        if cancelled.is_set():
+            return None
+        _, rag_score = get_rag_confidence(
+            db=db,
+            conversation_id=conversation_id,
+            client_slug=client_slug,
+            user_message=message_text,
+            timing_context=timing_context,
+        )
+        timing_context["speculative_rag_score"] = round(rag_score, 4)
+        if not MID_CONFIDENCE_THRESHOLD <= rag_score < HIGH_CONFIDENCE_THRESHOLD:
+            return None
+        conversation = db.get(Conversation, conversation_id)
+        if cancelled.is_set() or conversation is None:
+            return None
+        if conversation.state not in (ConversationState.BOT_ACTIVE.value, ConversationState.PENDING.value):
+            return Result.success((None, "bot_inactive"))
+        return prepare_ai_generation(
+            db,
+            conversation.client_id,
+            client_slug,
+            conversation.id,
+            message_text,
+            append_user_message=append_user_message,
+            pending_hint=pending_hint,
+            timing_context=timing_context,
+        )
+    finally:
+        db.close()
+
+
+async def _run_speculative_llm(cancelled: threading.Event, **kwargs) -> Result | None:
+    """Prepare in the blocking pool, then await the LLM call so cancelling the task aborts it."""
+    prepared = await run_blocking(_prepare_speculative_llm, cancelled, **kwargs)
+    if not isinstance(prepared, AIGenerationRequest):
+        return prepared
+    if cancelled.is_set():
+        return None
+    return await agenerate_prepared_response(prepared, kwargs["timing_context"])
+
+
+class SpeculativeLLMCall:
+    """
+    LLM reply started in parallel with the deterministic stages (truth gate, multi-truth, booking).
+
+    The primary LLM stage adopts the result if its inputs still match; any reply sent before
+    that cancels it. Cancelling cancels the task, which aborts an in-flight LLM request; the
+    preparation thread cannot be interrupted, so it also gets a flag checked between steps.
+    """
+
+    def __init__(
+        self,
+        call: Callable[[threading.Event], Awaitable[Any]],
+        *,
+        key: tuple,
+        timing_context: dict,
+    ):
+        self.started_at = time.monotonic()
+        self.key = key
+        self.timing_context = timing_context
+        self.outcome: str | None = None
+        self._cancelled = threading.Event()
+        self._task = asyncio.create_task(self._run(call))
+        _speculative_llm_tasks.add(self._task)
+        self._task.add_done_callback(_speculative_llm_tasks.discard)
+
+    async def _run(self, call: Callable[[threading.Event], Awaitable[Any]]) -> Any:
+        try:
+            return await call(self._cancelled)
+        except Exception as exc:
+            logger.warning("Speculative LLM call failed", extra={"context": {"error": str(exc)}})
+            return None
+
+    def _log_outcome(self) -> None:
+        logger.info(
+            "Speculative LLM",
+            extra={
+                "context": {
+                    "outcome": self.outcome,
+                    "elapsed_ms": round((time.monotonic() - self.started_at) * 1000, 2),
+                }
+            },
+        )
+
+    def cancel(self, reason: str) -> None:
+        if self.outcome is not None:
+            return
+        self.outcome = reason
+        self._cancelled.set()
+        self._task.cancel()
+        self._log_outcome()
+
+    async def take(self, key: tuple) -> tuple[Any, dict]:
+        """Result and its timing context, or (None, {}) when it is stale, skipped or failed."""
+        if self.outcome is not None:
+            return None, {}
+        if key != self.key:
+            self.cancel("stale")
+            return None, {}
+        result = await self._task
+        self.outcome = "adopted" if result is not None else "skipped"
+        self._log_outcome()
+        return result, self.timing_context
 
 
 @dataclass(frozen=True)
@@ -1817,7 +2179,23 @@ def _detect_fast_intent(
     return None
 
 
-def _detect_intent_signals(message_text: str) -> DecisionSignals:
+def _classify_intent_without_llm(message_text: str) -> Intent:
+    """Keyword part of classify_intent; used when the LLM result missed the enrichment deadline."""
+    if is_opt_out_message(message_text):
+        return Intent.REJECTION
+    if is_frustration_message(message_text):
+        return Intent.FRUSTRATION
+    if is_human_request_message(message_text):
+        return Intent.HUMAN_REQUEST
+    return Intent.OTHER
+
+
+def _detect_intent_signals(
+    message_text: str,
+    *,
+    use_llm: bool = True,
+    timing_context: dict | None = None,
+) -> DecisionSignals:
     is_greeting = is_greeting_message(message_text)
     is_thanks = is_thanks_message(message_text)
     is_ack = is_acknowledgement_message(message_text)
@@ -1833,9 +2211,12 @@ def _detect_intent_signals(message_text: str) -> DecisionSignals:
     elif is_ack or is_low_signal:
         intent = Intent.OTHER
         logger.info("Intent shortcut: acknowledgement/low-signal -> other")
-    else:
-        intent = classify_intent(message_text)
+    elif use_llm:
+        intent = classify_intent(message_text, timing_context=timing_context)
         logger.info(f"Intent classified: {intent.value}")
+    else:
+        intent = _classify_intent_without_llm(message_text)
+        logger.info(f"Intent classified without LLM: {intent.value}")
 
     return DecisionSignals(
         intent=intent,
@@ -2596,7 +2977,12 @@ def _maybe_store_service_carryover(
     )
 
 
-def _detect_info_class_intents(message_text: str | None, *, intent_decomp_set: set[str]) -> tuple[set[str], dict[str, Any]]:
+def _detect_info_class_intents(
+    message_text: str | None,
+    *,
+    intent_decomp_set: set[str],
+    question_type: Any = _QUESTION_TYPE_NOT_FETCHED,
+) -> tuple[set[str], dict[str, Any]]:
     intents = {intent for intent in intent_decomp_set if intent in INFO_INTENTS}
     meta: dict[str, Any] = {}
     normalized = normalize_for_matching(message_text) if message_text else ""
@@ -2618,11 +3004,11 @@ def _detect_info_class_intents(message_text: str | None, *, intent_decomp_set: s
         intents.add("location")
     if hours_signal:
         intents.add("hours")
-    question_type = None
-    try:
-        question_type = semantic_question_type(message_text)
-    except Exception:
-        question_type = None
+    if question_type is _QUESTION_TYPE_NOT_FETCHED:
+        try:
+            question_type = semantic_question_type(message_text)
+        except Exception:
+            question_type = None
     if question_type and question_type.kind in INFO_INTENTS:
         intents.add(question_type.kind)
         meta["question_type"] = question_type.kind
@@ -3759,6 +4145,27 @@ def _is_booking_time_service_decision(decision: DemoSalonDecision | None) -> boo
     return intent.strip().casefold() in BOOKING_TIME_SERVICE_INTENTS
 
 
+def _run_truth_gate(
+    truth_gate: Callable[..., Any],
+    message_text: str,
+    *,
+    policy_type: str | None,
+    client_slug: str | None,
+    intent_decomp: dict | None,
+    memo: dict[str, Any] | None = None,
+) -> Any:
+    """Truth-gate decision for the text; `memo` keeps one decision per text within a message."""
+    if memo is not None and message_text in memo:
+        return memo[message_text]
+    if policy_type == "demo_salon":
+        decision = truth_gate(message_text, client_slug=client_slug, intent_decomp=intent_decomp)
+    else:
+        decision = truth_gate(message_text)
+    if memo is not None:
+        memo[message_text] = decision
+    return decision
+
+
 def _extract_truth_gate_info_intents(
     message_text: str,
     *,
@@ -3766,16 +4173,21 @@ def _extract_truth_gate_info_intents(
     policy_type: str | None,
     client_slug: str | None,
     intent_decomp: dict | None,
+    truth_gate_memo: dict[str, Any] | None = None,
 ) -> list[str]:
     if not message_text or not policy_handler:
         return []
     truth_gate = policy_handler.get("truth_gate")
     if not truth_gate:
         return []
-    if policy_type == "demo_salon":
-        decision = truth_gate(message_text, client_slug=client_slug, intent_decomp=intent_decomp)
-    else:
-        decision = truth_gate(message_text)
+    decision = _run_truth_gate(
+        truth_gate,
+        message_text,
+        policy_type=policy_type,
+        client_slug=client_slug,
+        intent_decomp=intent_decomp,
+        memo=truth_gate_memo,
+    )
     if not decision or getattr(decision, "action", None) != "reply":
         return []
     intent = getattr(decision, "intent", None)
@@ -3986,30 +4398,40 @@ def _get_request_webhook_secret(request: Request) -> str | None:
 
 async def _process_outbox_rows(
     db: Session,
-    rows: list[dict],
+    rows: list[OutboxRow | dict],
     *,
     max_attempts: int,
     retry_backoff_seconds: float,
+    session_factory: Callable[[], Session] | None = None,
+    delivered_ids: set[str] | None = None,
 ) -> dict[str, int]:
+    """
+    Process claimed outbox rows.
+
+    Conversations run concurrently (up to OUTBOX_CONCURRENCY) when session_factory is given,
+    each task on its own DB session; rows of one conversation are always handled in order.
+    Ids of rows whose reply went out are added to delivered_ids as soon as it is sent, so a
+    worker cancelled before finalizing knows not to requeue them.
+    """
     results = {"claimed": len(rows), "sent": 0, "failed": 0, "retry_scheduled": 0}
     if not rows:
         return results
 
+    outbox_rows = [row if isinstance(row, OutboxRow) else OutboxRow.from_mapping(row) for row in rows]
     picked_at = datetime.now(timezone.utc)
     pick_info: dict[str, dict[str, object]] = {}
-    for row in rows:
-        outbox_id = row.get("id")
+    for row in outbox_rows:
+        outbox_id = row.id
         if not outbox_id:
             continue
-        payload_json = row.get("payload_json") or {}
-        created_at = row.get("created_at")
-        conversation_id = row.get("conversation_id")
+        created_at = row.created_at
+        conversation_id = row.conversation_id
         outbox_id_str = str(outbox_id)
         pick_info[outbox_id_str] = {
             "picked_at": picked_at,
             "created_at": created_at,
             "conversation_id": conversation_id,
-            "client_slug": payload_json.get("client_slug"),
+            "client_slug": row.client_slug,
         }
         logger.info(
             "Outbox picked",
@@ -4017,7 +4439,7 @@ async def _process_outbox_rows(
                 "context": {
                     "outbox_id": outbox_id_str,
                     "conversation_id": str(conversation_id) if conversation_id else None,
-                    "client_slug": payload_json.get("client_slug"),
+                    "client_slug": row.client_slug,
                     "created_at": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
                     "outbox_picked_at": picked_at.isoformat(),
                 }
@@ -4049,36 +4471,36 @@ async def _process_outbox_rows(
             context["error"] = error
         logger.info("Outbox done", extra={"context": context})
 
-    def _row_has_media(row: dict) -> bool:
-        payload_json = row.get("payload_json") or {}
-        try:
-            payload = WebhookRequest.model_validate(payload_json)
-        except Exception:
-            return False
-        message_type = (payload.body.messageType or "").strip().lower()
-        return bool(payload.body.mediaData) or (message_type and message_type != "text")
+    finalized_ids: set[str] = set()
 
-    async def _process_single_row(row: dict, *, conversation_id: str) -> None:
-        outbox_id = row.get("id")
+    async def _finalize_rows(outbox_ids: list, *, outcome: str, last_error: str | None = None) -> None:
+        counts = await run_db(
+            finalize_outbox_rows,
+            outbox_ids=outbox_ids,
+            outcome=outcome,
+            last_error=last_error,
+            max_attempts=max_attempts,
+            retry_backoff_seconds=retry_backoff_seconds,
+        )
+        finalized_ids.update(str(outbox_id) for outbox_id in outbox_ids if outbox_id)
+        results["sent"] += counts["SENT"]
+        results["failed"] += counts["FAILED"]
+        results["retry_scheduled"] += counts["PENDING"]
+
+    async def _process_single_row(row: OutboxRow, *, conversation_id: str, db: Session) -> None:
+        outbox_id = row.id
         if not outbox_id:
             return
-        payload_json = row.get("payload_json") or {}
-        try:
-            payload = WebhookRequest.model_validate(payload_json)
-        except Exception as exc:
-            mark_outbox_status(
-                db,
-                outbox_id=outbox_id,
-                status="FAILED",
-                last_error=f"invalid_payload:{exc}"[:500],
-                next_attempt_at=None,
-            )
-            results["failed"] += 1
+        payload = row.payload
+        if payload is None:
+            await _finalize_rows([outbox_id], outcome="FAILED", last_error=f"invalid_payload:{row.parse_error}"[:500])
             return
 
         try:
             outbox_ids = [str(outbox_id)]
             timing_start = time.monotonic()
+            if row.has_media:
+                payload = _rehydrate_outbox_media(payload)
             response = await _handle_webhook_payload(
                 payload,
                 db,
@@ -4087,7 +4509,9 @@ async def _process_outbox_rows(
                 skip_persist=True,
                 conversation_id=UUID(conversation_id),
                 outbox_ids=outbox_ids,
-                outbox_created_at=row.get("created_at"),
+                outbox_created_at=row.created_at,
+                outbox_ready_at=row.eligible_at,
+                delivered_outbox_ids=delivered_ids,
             )
             if not response.success:
                 raise RuntimeError(response.message)
@@ -4104,14 +4528,7 @@ async def _process_outbox_rows(
                 },
             )
             _log_outbox_done(str(outbox_id))
-            mark_outbox_status(
-                db,
-                outbox_id=outbox_id,
-                status="SENT",
-                last_error=None,
-                next_attempt_at=None,
-            )
-            results["sent"] += 1
+            await _finalize_rows([outbox_id], outcome="SENT")
         except Exception as exc:
             try:
                 db.rollback()
@@ -4134,75 +4551,54 @@ async def _process_outbox_rows(
                 },
             )
             _log_outbox_done(str(outbox_id), error=str(exc))
-            now = datetime.now(timezone.utc)
-            attempts = int(row.get("attempts") or 0)
-            if attempts >= max_attempts:
-                mark_outbox_status(
-                    db,
-                    outbox_id=outbox_id,
-                    status="FAILED",
-                    last_error=str(exc)[:500],
-                    next_attempt_at=None,
-                )
-                results["failed"] += 1
-                return
-            backoff = retry_backoff_seconds * (2 ** max(attempts - 1, 0))
-            next_attempt_at = now + timedelta(seconds=backoff)
-            mark_outbox_status(
-                db,
-                outbox_id=outbox_id,
-                status="PENDING",
-                last_error=str(exc)[:500],
-                next_attempt_at=next_attempt_at,
-            )
-            results["retry_scheduled"] += 1
+            await _finalize_rows([outbox_id], outcome="RETRY", last_error=str(exc)[:500])
 
-    batches: dict[str, list[dict]] = {}
-    for row in rows:
-        conversation_id = row.get("conversation_id")
-        if not conversation_id:
+    batches: dict[str, list[OutboxRow]] = {}
+    for row in outbox_rows:
+        if not row.conversation_id:
             continue
-        batches.setdefault(str(conversation_id), []).append(row)
-
-    for conversation_id, batch in batches.items():
-        batch_sorted = sorted(
-            batch,
-            key=lambda r: r.get("created_at")
-            if isinstance(r.get("created_at"), datetime)
-            else datetime.min.replace(tzinfo=timezone.utc),
-        )
-        if any(_row_has_media(row) for row in batch_sorted):
+        batches.setdefault(str(row.conversation_id), []).append(row)
+
+    async def _process_conversation(conversation_id: str, batch: list[OutboxRow], db: Session) -> None:
+        batch_sorted = sorted(batch, key=lambda r: _coerce_outbox_created_at(r.created_at))
+        if any(row.has_media for row in batch_sorted):
             for row in batch_sorted:
-                await _process_single_row(row, conversation_id=str(conversation_id))
+                await _process_single_row(row, conversation_id=str(conversation_id), db=db)
             logger.info(
                 "Outbox processed (media rows)",
                 extra={"context": {"conversation_id": conversation_id, "count": len(batch_sorted)}},
             )
-            continue
+            return
 
         window_seconds = _get_outbox_window_merge_seconds()
         grouped_batches = _split_outbox_batches(batch_sorted, window_seconds)
         for group in grouped_batches:
-            outbox_ids = [row.get("id") for row in group]
+            outbox_ids = [row.id for row in group]
             message_texts = []
             forwarded_in_batch = False
             group_created_at = None
+            group_ready_at = None
             for row in group:
-                payload_json = row.get("payload_json") or {}
-                try:
-                    payload = WebhookRequest.model_validate(payload_json)
-                except Exception:
+                payload = row.payload
+                if payload is None:
                     continue
-                created_at = _coerce_outbox_created_at(row.get("created_at"))
+                created_at = _coerce_outbox_created_at(row.created_at)
                 if created_at and (group_created_at is None or created_at > group_created_at):
                     group_created_at = created_at
+                if isinstance(row.eligible_at, datetime):
+                    ready_at = _coerce_outbox_created_at(row.eligible_at)
+                    if group_ready_at is None or ready_at > group_ready_at:
+                        group_ready_at = ready_at
                 if payload.body.metadata and payload.body.metadata.forwarded_to_telegram:
                     forwarded_in_batch = True
                 text = payload.body.message or ""
                 if text.strip():
                     message_texts.append(text.strip())
 
-            base_payload = WebhookRequest.model_validate(group[-1].get("payload_json") or {})
+            if group[-1].payload is None:
+                raise ValueError(f"invalid_payload:{group[-1].parse_error}")
+            # Copy: the coalesced text must not leak into the row's own parsed payload.
+            base_payload = group[-1].payload.model_copy(deep=True)
             combined_text = " ".join(message_texts).strip()
             if combined_text:
                 base_payload.body.message = combined_text
@@ -4215,7 +4611,7 @@ async def _process_outbox_rows(
                     "context": {
                         "outbox_ids": [str(oid) for oid in outbox_ids if oid],
                         "conversation_id": conversation_id,
-                        "attempts": group[-1].get("attempts"),
+                        "attempts": group[-1].attempts,
                         "coalesced_count": len(group),
                         "window_merge_seconds": window_seconds,
                     }
@@ -4234,6 +4630,8 @@ async def _process_outbox_rows(
                     batch_messages=message_texts,
                     outbox_ids=[str(oid) for oid in outbox_ids if oid],
                     outbox_created_at=group_created_at,
+                    outbox_ready_at=group_ready_at,
+                    delivered_outbox_ids=delivered_ids,
                 )
                 if not response.success:
                     raise RuntimeError(response.message)
@@ -4251,16 +4649,7 @@ async def _process_outbox_rows(
                 for outbox_id in outbox_ids:
                     if outbox_id:
                         _log_outbox_done(str(outbox_id))
-                for outbox_id in outbox_ids:
-                    if outbox_id:
-                        mark_outbox_status(
-                            db,
-                            outbox_id=outbox_id,
-                            status="SENT",
-                            last_error=None,
-                            next_attempt_at=None,
-                        )
-                results["sent"] += len(outbox_ids)
+                await _finalize_rows(outbox_ids, outcome="SENT")
                 logger.info(
                     "Outbox processed",
                     extra={"context": {"conversation_id": conversation_id, "coalesced_count": len(group)}},
@@ -4288,32 +4677,7 @@ async def _process_outbox_rows(
                 for outbox_id in outbox_ids:
                     if outbox_id:
                         _log_outbox_done(str(outbox_id), error=str(exc))
-                now = datetime.now(timezone.utc)
-                for row in group:
-                    outbox_id = row.get("id")
-                    if not outbox_id:
-                        continue
-                    attempts = int(row.get("attempts") or 0)
-                    if attempts >= max_attempts:
-                        mark_outbox_status(
-                            db,
-                            outbox_id=outbox_id,
-                            status="FAILED",
-                            last_error=str(exc)[:500],
-                            next_attempt_at=None,
-                        )
-                        results["failed"] += 1
-                        continue
-                    backoff = retry_backoff_seconds * (2 ** max(attempts - 1, 0))
-                    next_attempt_at = now + timedelta(seconds=backoff)
-                    mark_outbox_status(
-                        db,
-                        outbox_id=outbox_id,
-                        status="PENDING",
-                        last_error=str(exc)[:500],
-                        next_attempt_at=next_attempt_at,
-                    )
-                    results["retry_scheduled"] += 1
+                await _finalize_rows(outbox_ids, outcome="RETRY", last_error=str(exc)[:500])
                 logger.error(
                     "Outbox processing failed",
                     extra={
@@ -4325,6 +4689,53 @@ async def _process_outbox_rows(
                     },
                 )
 
+    async def _process_conversation_or_retry(conversation_id: str, batch: list[OutboxRow], db: Session) -> None:
+        try:
+            await _process_conversation(conversation_id, batch, db)
+        except Exception as exc:
+            logger.error(
+                "Outbox conversation task failed",
+                extra={"context": {"conversation_id": conversation_id, "error": str(exc)}},
+            )
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            # Send the rows that were not finalized yet back to PENDING now instead of
+            # leaving them PROCESSING until the lease reaper notices.
+            unfinished = [row.id for row in batch if row.id and str(row.id) not in finalized_ids]
+            if not unfinished:
+                return
+            try:
+                await _finalize_rows(unfinished, outcome="RETRY", last_error=str(exc)[:500])
+            except Exception as finalize_exc:
+                # Last resort: release_stale_processing picks the rows up after the lease.
+                logger.error(
+                    "Outbox retry scheduling failed",
+                    extra={"context": {"conversation_id": conversation_id, "error": str(finalize_exc)}},
+                )
+
+    concurrency = min(_get_outbox_concurrency(), len(batches)) if session_factory else 1
+    if concurrency <= 1:
+        for conversation_id, batch in batches.items():
+            await _process_conversation_or_retry(conversation_id, batch, db)
+        return results
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run_conversation(conversation_id: str, batch: list[OutboxRow]) -> None:
+        async with semaphore:
+            task_db = session_factory()
+            try:
+                await _process_conversation_or_retry(conversation_id, batch, task_db)
+            finally:
+                task_db.close()
+
+    logger.info(
+        "Outbox concurrent processing",
+        extra={"context": {"conversations": len(batches), "concurrency": concurrency}},
+    )
+    await asyncio.gather(*(_run_conversation(cid, batch) for cid, batch in batches.items()))
     return results
 
 
@@ -4336,6 +4747,83 @@ async def debug_webhook(request: Request):
     return {"received": body}
 
 
+def _commit_session(db: Session) -> None:
+    db.commit()
+
+
+def _load_client(db: Session, client_slug: str) -> tuple[Client | None, ClientSettings | None]:
+    client = db.query(Client).filter(Client.name == client_slug).first()
+    if not client:
+        return None, None
+    return client, db.query(ClientSettings).filter(ClientSettings.client_id == client.id).first()
+
+
+def _load_outbox_conversation(
+    db: Session,
+    client_id: UUID,
+    conversation_id: UUID,
+    *,
+    message_id: str | None,
+    outbox_created_at: datetime | None,
+    message_text: str,
+) -> tuple[Conversation | None, User | None, Message | None]:
+    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+    if not conversation:
+        return None, None, None
+    user = db.query(User).filter(User.id == conversation.user_id).first()
+    if not user:
+        return conversation, None, None
+    saved_message = None
+    if message_id:
+        saved_message = _find_message_by_message_id(db, client_id, message_id)
+    if not saved_message and outbox_created_at:
+        saved_message = _find_message_by_conversation_created_at(
+            db,
+            conversation.id,
+            outbox_created_at,
+            message_text=message_text,
+        )
+    return conversation, user, saved_message
+
+
+def _resolve_inbound_conversation(db: Session, client_id: UUID, remote_jid: str) -> tuple[User, Conversation]:
+    user = get_or_create_user(db, client_id, remote_jid)
+    conversation = find_active_conversation_by_channel_ref(db, client_id, remote_jid)
+    if not conversation:
+        conversation = get_or_create_conversation(db, client_id, user.id, "whatsapp")
+    return user, conversation
+
+
+def _enqueue_inbound(
+    db: Session,
+    payload: dict,
+    *,
+    client_id: UUID,
+    conversation_id: UUID,
+    inbound_message_id: str,
+    message_text: str,
+    message_type: str | None,
+) -> tuple[bool, CoalesceDecision | None]:
+    payload_json = _offload_outbox_media(payload)
+    coalesce = plan_coalesce_window(
+        db,
+        conversation_id,
+        message_text,
+        message_type=message_type,
+        now=datetime.now(timezone.utc),
+    )
+    enqueued = enqueue_outbox_message(
+        db,
+        client_id=client_id,
+        conversation_id=conversation_id,
+        inbound_message_id=inbound_message_id,
+        payload_json=payload_json,
+        coalesce_seconds=coalesce.seconds if coalesce else None,
+    )
+    db.commit()
+    return enqueued, coalesce
+
+
 @router.post("/webhook/{client_slug}", response_model=WebhookResponse)
 async def handle_webhook_direct(client_slug: str, request: Request, db: Session = Depends(get_db)):
     """Handle direct ChatFlow webhook without wrapper."""
@@ -4344,11 +4832,10 @@ async def handle_webhook_direct(client_slug: str, request: Request, db: Session
         return parsed
 
     provided_secret = _get_request_webhook_secret(request)
-    client = db.query(Client).filter(Client.name == parsed.client_slug).first()
+    client, settings = await run_on_session(_load_client, db, parsed.client_slug)
     if not client:
         return WebhookResponse(success=False, message=f"Client '{parsed.client_slug}' not found")
 
-    settings = db.query(ClientSettings).filter(ClientSettings.client_id == client.id).first()
     expected_secret = _get_client_webhook_secret(settings)
     if expected_secret:
         if not provided_secret or provided_secret != expected_secret:
@@ -4396,16 +4883,62 @@ async def _handle_webhook_payload(
     batch_messages: list[str] | None = None,
     outbox_ids: list[str] | None = None,
     outbox_created_at: datetime | None = None,
+    outbox_ready_at: datetime | None = None,
+    delivered_outbox_ids: set[str] | None = None,
 ) -> WebhookResponse:
     """Shared webhook processing for inbound ChatFlow payloads."""
+    speculative_calls: list[SpeculativeLLMCall] = []
+    enrichment_fanouts: list[EnrichmentFanout] = []
+    try:
+        return await _process_webhook_payload(
+            payload,
+            db,
+            provided_secret=provided_secret,
+            enforce_secret=enforce_secret,
+            enqueue_only=enqueue_only,
+            skip_persist=skip_persist,
+            conversation_id=conversation_id,
+            batch_messages=batch_messages,
+            outbox_ids=outbox_ids,
+            outbox_created_at=outbox_created_at,
+            outbox_ready_at=outbox_ready_at,
+            delivered_outbox_ids=delivered_outbox_ids,
+            speculative_calls=speculative_calls,
+            enrichment_fanouts=enrichment_fanouts,
+        )
+    finally:
+        for fanout in enrichment_fanouts:
+            fanout.close()
+        # Every exit that did not adopt the speculative reply (escalation, mute, error) stops it,
+        # not only the paths that send a deterministic reply.
+        for call in speculative_calls:
+            call.cancel("abandoned")
+
+
+async def _process_webhook_payload(
+    payload: WebhookRequest,
+    db: Session,
+    *,
+    provided_secret: str | None,
+    enforce_secret: bool,
+    enqueue_only: bool,
+    skip_persist: bool,
+    conversation_id: UUID | None,
+    batch_messages: list[str] | None,
+    outbox_ids: list[str] | None,
+    outbox_created_at: datetime | None,
+    outbox_ready_at: datetime | None,
+    delivered_outbox_ids: set[str] | None,
+    speculative_calls: list[SpeculativeLLMCall],
+    enrichment_fanouts: list[EnrichmentFanout],
+) -> WebhookResponse:
     logger.info(f"Webhook received: client_slug={payload.client_slug}")
 
     # Get client by slug
-    client = db.query(Client).filter(Client.name == payload.client_slug).first()
+    client, settings = await run_on_session(_load_client, db, payload.client_slug)
     if not client:
         return WebhookResponse(success=False, message=f"Client '{payload.client_slug}' not found")
 
-    settings = db.query(ClientSettings).filter(ClientSettings.client_id == client.id).first()
     if enforce_secret:
         expected_secret = _get_client_webhook_secret(settings)
         if expected_secret:
@@ -4447,6 +4980,14 @@ async def _handle_webhook_payload(
     if outbox_ids:
         timing_context["outbox_ids"] = list(outbox_ids)
         timing_context["outbox_id"] = outbox_ids[0] if len(outbox_ids) == 1 else outbox_ids[0]
+    # Queue wait counts from when the message became claimable (end of the coalescing window
+    # or retry backoff), not from created_at: that wait was deliberate.
+    queued_seconds = 0.0
+    queued_since = outbox_ready_at if isinstance(outbox_ready_at, datetime) else outbox_created_at
+    if isinstance(queued_since, datetime):
+        queued_seconds = (datetime.now(timezone.utc) - _coerce_outbox_created_at(queued_since)).total_seconds()
+    start_message_budget(timing_context, queued_seconds=queued_seconds)
+    attach_retrieval_context(timing_context)
 
     outbound_idempotency_key = message_id or build_inbound_message_id(
         message_id,
@@ -4465,7 +5006,7 @@ async def _handle_webhook_payload(
         media_redis_client = _get_debounce_redis(redis_url, socket_timeout_seconds)
 
     def _log_timing(stage: str, elapsed_ms: float, extra: dict | None = None) -> None:
-        context = dict(timing_context)
+        context = {key: value for key, value in timing_context.copy().items() if not key.startswith("_")}
         if extra:
             context.update(extra)
         context["stage"] = stage
@@ -4473,6 +5014,8 @@ async def _handle_webhook_payload(
         logger.info("Timing", extra={"context": context})
 
     def _send_response(text: str) -> bool:
+        if speculative is not None:
+            speculative.cancel("deterministic_reply")
         send_start = time.monotonic()
         sent = send_bot_response(
             db,
@@ -4483,12 +5026,28 @@ async def _handle_webhook_payload(
             raise_on_fail=skip_persist,
         )
         _log_timing("send_ms", (time.monotonic() - send_start) * 1000, {"send_ok": sent})
+        if sent and outbox_ids and delivered_outbox_ids is not None:
+            delivered_outbox_ids.update(outbox_ids)
         return sent
 
-    def _ensure_rag_rewrite() -> None:
+    enrichment: EnrichmentFanout | None = None
+    speculative: SpeculativeLLMCall | None = None
+    truth_gate_memo: dict[str, Any] = {}
+
+    async def _ensure_rag_rewrite() -> None:
         if timing_context.get("rag_rewrite_logged"):
             return
-        rag_rewrite_meta = rewrite_query_for_retrieval(message_text, client_slug=payload.client_slug)
+        if enrichment is not None and enrichment.has("rag_rewrite"):
+            rag_rewrite_meta = await enrichment.result("rag_rewrite")
+            if rag_rewrite_meta is None:
+                rag_rewrite_meta = {"rewrite_used": False, "rewrite_text": "", "reason": "deadline"}
+        else:
+            rag_rewrite_meta = await run_blocking(
+                rewrite_query_for_retrieval,
+                message_text,
+                client_slug=payload.client_slug,
+                timing_context=timing_context,
+            )
         if not isinstance(rag_rewrite_meta, dict):
             return
         timing_context["rag_rewrite"] = rag_rewrite_meta
@@ -4538,22 +5097,20 @@ async def _handle_webhook_payload(
     if skip_persist:
         if not conversation_id:
             return WebhookResponse(success=False, message="Missing conversation_id")
-        conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        conversation, user, saved_message = await run_on_session(
+            _load_outbox_conversation,
+            db,
+            client.id,
+            conversation_id,
+            message_id=message_id,
+            outbox_created_at=outbox_created_at,
+            message_text=message_text,
+        )
         if not conversation:
             return WebhookResponse(success=False, message="Conversation not found")
-        user = db.query(User).filter(User.id == conversation.user_id).first()
         if not user:
             return WebhookResponse(success=False, message="User not found")
         timing_context["conversation_id"] = str(conversation.id)
-        if message_id:
-            saved_message = _find_message_by_message_id(db, client.id, message_id)
-        if not saved_message and outbox_created_at:
-            saved_message = _find_message_by_conversation_created_at(
-                db,
-                conversation.id,
-                outbox_created_at,
-                message_text=message_text,
-            )
         _ensure_rag_meta_defaults(saved_message)
         if media_info and saved_message:
             saved_media = saved_message.message_metadata.get("media") if isinstance(saved_message.message_metadata, dict) else None
@@ -4583,13 +5140,8 @@ async def _handle_webhook_payload(
             if metadata:
                 metadata.messageId = message_id
 
-        # 1. Get or create user
-        user = get_or_create_user(db, client.id, remote_jid)
-
-        # 2. Find existing conversation by handover.channel_ref or create new
-        conversation = find_active_conversation_by_channel_ref(db, client.id, remote_jid)
-        if not conversation:
-            conversation = get_or_create_conversation(db, client.id, user.id, "whatsapp")
+        # 1-2. Get or create user, find the conversation by handover.channel_ref or create new
+        user, conversation = await run_on_session(_resolve_inbound_conversation, db, client.id, remote_jid)
         timing_context["conversation_id"] = str(conversation.id)
 
         if media_info and media_decision is None and media_policy:
@@ -4624,7 +5176,8 @@ async def _handle_webhook_payload(
             if media_decision:
                 media_meta["decision"] = _serialize_media_decision(media_decision)
             message_metadata["media"] = media_meta
-        saved_message = save_message(
+        saved_message = await run_on_session(
+            save_message,
             db,
             conversation.id,
             client.id,
@@ -4639,7 +5192,7 @@ async def _handle_webhook_payload(
                 conversation.state in [ConversationState.PENDING.value, ConversationState.MANAGER_ACTIVE.value]
                 and conversation.telegram_topic_id
             ):
-                bot_token, chat_id = get_telegram_credentials(db, client.id)
+                bot_token, chat_id = await run_on_session(get_telegram_credentials, db, client.id)
                 if bot_token and chat_id:
                     already_forwarded = bool(metadata and metadata.forwarded_to_telegram)
                     if not already_forwarded:
@@ -4670,7 +5223,8 @@ async def _handle_webhook_payload(
                                         }
                                         _update_message_media_metadata(saved_message, update_payload)
                             caption = _build_media_caption(message_text, media_info)
-                            forward_result = _send_telegram_media(
+                            forward_result = await run_blocking(
+                                _send_telegram_media,
                                 telegram=telegram,
                                 chat_id=chat_id,
                                 topic_id=conversation.telegram_topic_id,
@@ -4679,7 +5233,8 @@ async def _handle_webhook_payload(
                                 stored_path=storage_path,
                             )
                         else:
-                            forward_result = telegram.send_message(
+                            forward_result = await run_blocking(
+                                telegram.send_message,
                                 chat_id=chat_id,
                                 text=f"👤 <b>Клиент:</b> {message_text}",
                                 message_thread_id=conversation.telegram_topic_id,
@@ -4712,13 +5267,15 @@ async def _handle_webhook_payload(
             inbound_message_id = build_inbound_message_id(
                 message_id, remote_jid, metadata.timestamp if metadata else None, message_text
             )
-            payload_json = payload.model_dump(exclude_none=True)
-            enqueued = enqueue_outbox_message(
+            enqueued, coalesce = await run_on_session(
+                _enqueue_inbound,
                 db,
+                payload.model_dump(exclude_none=True),
                 client_id=client.id,
                 conversation_id=conversation.id,
                 inbound_message_id=inbound_message_id,
-                payload_json=payload_json,
+                message_text=message_text,
+                message_type=message_type,
             )
             if enqueued:
                 logger.info(
@@ -4728,6 +5285,8 @@ async def _handle_webhook_payload(
                             "client_slug": payload.client_slug,
                             "conversation_id": str(conversation.id),
                             "inbound_message_id": inbound_message_id,
+                            "coalesce_seconds": coalesce.seconds if coalesce else None,
+                            "coalesce_reason": coalesce.reason if coalesce else None,
                         }
                     },
                 )
@@ -4742,7 +5301,6 @@ async def _handle_webhook_payload(
                         }
                     },
                 )
-            db.commit()
             return WebhookResponse(success=True, message="Accepted", conversation_id=conversation.id, bot_response=None)
 
     routing = _get_routing_policy(conversation.state)
@@ -4759,6 +5317,7 @@ async def _handle_webhook_payload(
             media_decision=media_decision,
             storage_path=stored_path,
             saved_message=saved_message,
+            timing_context=timing_context,
         )
         if saved_message and asr_meta:
             _update_message_asr_metadata(saved_message, asr_meta)
@@ -4808,10 +5367,16 @@ async def _handle_webhook_payload(
             return text
         return _apply_quiet_hours_notice(text, quiet_hours_notice)
 
-    def _send_and_save(text: str, *, allow_quiet_hours: bool = True) -> tuple[str, bool]:
+    def _save_and_send(session: Session, final_text: str) -> bool:
+        save_message(session, conversation.id, client.id, role="assistant", content=final_text)
+        return _send_response(final_text)
+
+    async def _send_and_save(text: str, *, allow_quiet_hours: bool = True) -> tuple[str, bool]:
         final_text = _finalize_bot_response(text, allow_quiet_hours=allow_quiet_hours)
-        save_message(db, conversation.id, client.id, role="assistant", content=final_text)
-        sent = _send_response(final_text)
+        # Cancel on the loop: the save and the send run in a worker thread.
+        if speculative is not None:
+            speculative.cancel("deterministic_reply")
+        sent = await run_on_session(_save_and_send, db, final_text)
         return final_text, sent
     previous_last_message_at = conversation.last_message_at
     conversation.last_message_at = now
@@ -4995,11 +5560,11 @@ async def _handle_webhook_payload(
                                 or matched_branch.slug
                                 or "филиал"
                             )
-                            bot_response, sent = _send_and_save(bot_response)
+                            bot_response, sent = await _send_and_save(bot_response)
                             result_message = (
                                 "Branch selected (prompted)" if sent else "Branch selection response failed"
                             )
-                            db.commit()
+                            await run_on_session(_commit_session, db)
                             return WebhookResponse(
                                 success=True,
                                 message=result_message,
@@ -5012,13 +5577,13 @@ async def _handle_webhook_payload(
                             context, _build_branch_selection(branches, now)
                         )
                         _set_conversation_context(conversation, context)
-                        prompt, sent = _send_and_save(prompt)
+                        prompt, sent = await _send_and_save(prompt)
                         result_message = (
                             "Branch selection requested (retry)"
                             if sent
                             else "Branch selection prompt failed"
                         )
-                        db.commit()
+                        await run_on_session(_commit_session, db)
                         return WebhookResponse(
                             success=True,
                             message=result_message,
@@ -5029,11 +5594,11 @@ async def _handle_webhook_payload(
                     prompt = _build_branch_prompt(branches)
                     context = _set_branch_selection(context, _build_branch_selection(branches, now))
                     _set_conversation_context(conversation, context)
-                    prompt, sent = _send_and_save(prompt)
+                    prompt, sent = await _send_and_save(prompt)
                     result_message = (
                         "Branch selection requested" if sent else "Branch selection prompt failed"
                     )
-                    db.commit()
+                    await run_on_session(_commit_session, db)
                     return WebhookResponse(
                         success=True,
                         message=result_message,
@@ -5094,7 +5659,7 @@ async def _handle_webhook_payload(
                     "shield_reason": reason,
                 },
             )
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message="Shield drop",
@@ -5146,10 +5711,10 @@ async def _handle_webhook_payload(
                 result_message = f"Shield escalation, telegram={'sent' if telegram_sent else 'failed'}"
             else:
                 result_message = f"Shield escalation failed: {esc_result.error}"
-        bot_response, sent = _send_and_save(bot_response, allow_quiet_hours=False)
+        bot_response, sent = await _send_and_save(bot_response, allow_quiet_hours=False)
         if not sent:
             result_message = f"{result_message}; response_send=failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message=result_message,
@@ -5280,7 +5845,7 @@ async def _handle_webhook_payload(
                 "state": conversation.state,
             },
         )
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message="Manager active, message forwarded",
@@ -5292,7 +5857,8 @@ async def _handle_webhook_payload(
     batch_messages = _coerce_batch_messages(message_text, batch_messages)
     signal_messages = list(batch_messages)
     opt_out_in_batch = any(is_opt_out_message(msg) for msg in signal_messages)
-    booking_signal, booking_block_meta = _evaluate_booking_signal(
+    booking_signal, booking_block_meta = await run_blocking(
+        _evaluate_booking_signal,
         signal_messages,
         client_slug=payload.client_slug,
         message_text=message_text,
@@ -5321,7 +5887,8 @@ async def _handle_webhook_payload(
                     if isinstance(stored_messages, list) and stored_messages:
                         batch_messages = _coerce_batch_messages("", stored_messages)
                         signal_messages = list(batch_messages)
-                        booking_signal, booking_block_meta = _evaluate_booking_signal(
+                        booking_signal, booking_block_meta = await run_blocking(
+                            _evaluate_booking_signal,
                             signal_messages,
                             client_slug=payload.client_slug,
                             message_text=signal_messages[-1] if signal_messages else message_text,
@@ -5355,9 +5922,9 @@ async def _handle_webhook_payload(
                         },
                     )
                     bot_response = MSG_REENGAGE_DECLINED
-                    bot_response, sent = _send_and_save(bot_response)
+                    bot_response, sent = await _send_and_save(bot_response)
                     result_message = "Re-engage declined" if sent else "Re-engage decline send failed"
-                    db.commit()
+                    await run_on_session(_commit_session, db)
                     return WebhookResponse(
                         success=True,
                         message=result_message,
@@ -5378,9 +5945,9 @@ async def _handle_webhook_payload(
                         },
                     )
                     bot_response = MSG_REENGAGE_CONFIRM
-                    bot_response, sent = _send_and_save(bot_response)
+                    bot_response, sent = await _send_and_save(bot_response)
                     result_message = "Re-engage confirmation requested" if sent else "Re-engage confirmation failed"
-                    db.commit()
+                    await run_on_session(_commit_session, db)
                     return WebhookResponse(
                         success=True,
                         message=result_message,
@@ -5408,9 +5975,9 @@ async def _handle_webhook_payload(
             },
         )
         bot_response = MSG_REENGAGE_CONFIRM
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         result_message = "Re-engage confirmation requested" if sent else "Re-engage confirmation failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message=result_message,
@@ -5447,7 +6014,7 @@ async def _handle_webhook_payload(
                     "opt_out_in_batch": opt_out_in_batch,
                 },
             )
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message="Bot muted, forwarded to topic" if conversation.telegram_topic_id else "Bot muted",
@@ -5480,11 +6047,11 @@ async def _handle_webhook_payload(
                             batch_messages = _coerce_batch_messages(message_text, None)
                     else:
                         bot_response = MSG_ASR_CONFIRM_DECLINED
-                        bot_response, sent = _send_and_save(bot_response)
+                        bot_response, sent = await _send_and_save(bot_response)
                         result_message = (
                             "ASR confirm missing transcript" if sent else "ASR confirm response failed"
                         )
-                        db.commit()
+                        await run_on_session(_commit_session, db)
                         return WebhookResponse(
                             success=True,
                             message=result_message,
@@ -5495,9 +6062,9 @@ async def _handle_webhook_payload(
                     context = _set_asr_confirmation(context, None)
                     _set_conversation_context(conversation, context)
                     bot_response = MSG_ASR_CONFIRM_DECLINED
-                    bot_response, sent = _send_and_save(bot_response)
+                    bot_response, sent = await _send_and_save(bot_response)
                     result_message = "ASR confirm declined" if sent else "ASR confirm decline failed"
-                    db.commit()
+                    await run_on_session(_commit_session, db)
                     return WebhookResponse(
                         success=True,
                         message=result_message,
@@ -5523,9 +6090,9 @@ async def _handle_webhook_payload(
                     saved_message,
                     {"asr_confirm_requested": True, "asr_low_confidence": True},
                 )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = "ASR confirmation requested" if sent else "ASR confirmation send failed"
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -5554,9 +6121,9 @@ async def _handle_webhook_payload(
                 source="pending",
                 fast_intent=False,
             )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = "Pending opt-out handled" if sent else "Pending opt-out send failed"
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -5580,9 +6147,9 @@ async def _handle_webhook_payload(
             source="pending",
             fast_intent=False,
         )
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         result_message = "Pending wait response sent" if sent else "Pending wait response failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message=result_message,
@@ -5593,9 +6160,9 @@ async def _handle_webhook_payload(
     if has_media:
         if not media_info:
             bot_response = MSG_MEDIA_UNSUPPORTED
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = "Media unsupported response sent" if sent else "Media response failed"
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -5615,9 +6182,9 @@ async def _handle_webhook_payload(
 
         if media_decision and not media_decision.allowed:
             bot_response = media_decision.response or MSG_MEDIA_UNSUPPORTED
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = "Media rejected response sent" if sent else "Media response failed"
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -5703,11 +6270,11 @@ async def _handle_webhook_payload(
                         media_response = MSG_MEDIA_STYLE_REFERENCE
                     else:
                         bot_response = MSG_AI_ERROR
-                        bot_response, sent = _send_and_save(bot_response)
+                        bot_response, sent = await _send_and_save(bot_response)
                         result_message = (
                             "Style reference escalation failed" if sent else "Media escalation response failed"
                         )
-                        db.commit()
+                        await run_on_session(_commit_session, db)
                         return WebhookResponse(
                             success=True,
                             message=result_message,
@@ -5768,9 +6335,9 @@ async def _handle_webhook_payload(
 
         if media_response is not None and conversation.state != ConversationState.MANAGER_ACTIVE.value:
             bot_response = media_response
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = "Media response sent" if sent else "Media response failed"
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -5782,7 +6349,7 @@ async def _handle_webhook_payload(
     append_user_message = True
     if conversation.state in [ConversationState.BOT_ACTIVE.value, ConversationState.PENDING.value] and not batch_messages_provided:
         # Persist user message + last_message_at before waiting.
-        db.commit()
+        await run_on_session(_commit_session, db)
 
         debounce_enabled, _, ttl_seconds, redis_url, socket_timeout_seconds = _get_debounce_settings()
         buffer_enabled, max_buffer_messages = _get_message_buffer_settings()
@@ -5851,7 +6418,8 @@ async def _handle_webhook_payload(
         if conversation.bot_status == "muted" or (conversation.bot_muted_until and conversation.bot_muted_until > now):
             signal_messages = _coerce_batch_messages(message_text, batch_messages)
             opt_out_in_batch = any(is_opt_out_message(msg) for msg in signal_messages)
-            booking_signal, booking_block_meta = _evaluate_booking_signal(
+            booking_signal, booking_block_meta = await run_blocking(
+                _evaluate_booking_signal,
                 signal_messages,
                 client_slug=payload.client_slug,
                 message_text=message_text,
@@ -5944,10 +6512,10 @@ async def _handle_webhook_payload(
                             bot_response = MSG_AI_ERROR
                             result_message = f"Handover confirm escalation failed: {esc_result.error}"
 
-                    bot_response, sent = _send_and_save(bot_response)
+                    bot_response, sent = await _send_and_save(bot_response)
                     if not sent:
                         result_message = f"{result_message}; response_send=failed"
-                    db.commit()
+                    await run_on_session(_commit_session, db)
                     return WebhookResponse(
                         success=True,
                         message=result_message,
@@ -5961,9 +6529,9 @@ async def _handle_webhook_payload(
                     _reset_low_confidence_retry(conversation)
 
                     bot_response = MSG_HANDOVER_DECLINED
-                    bot_response, sent = _send_and_save(bot_response)
+                    bot_response, sent = await _send_and_save(bot_response)
                     result_message = "Handover declined, asked for salon details" if sent else "Handover decline send failed"
-                    db.commit()
+                    await run_on_session(_commit_session, db)
                     return WebhookResponse(
                         success=True,
                         message=result_message,
@@ -5994,7 +6562,8 @@ async def _handle_webhook_payload(
             booking_active = False
     booking_block_meta = None
     if not bypass_domain_flows:
-        booking_signal, booking_block_meta = _evaluate_booking_signal(
+        booking_signal, booking_block_meta = await run_blocking(
+            _evaluate_booking_signal,
             booking_messages,
             client_slug=payload.client_slug,
             message_text=message_text,
@@ -6018,8 +6587,40 @@ async def _handle_webhook_payload(
     pending_expected_reply_type: str | None = None
     intent_queue_expected_next: str | None = None
     intent_queue_event: dict | None = None
+    enrichment_enabled, enrichment_deadline_seconds = _get_enrichment_settings()
+    if enrichment_enabled and routing["allow_bot_reply"] and not bypass_domain_flows and message_text:
+        # Independent LLM/embedding lookups start together; later stages pick up what finished in time.
+        enrichment_calls: dict[str, Callable[[], Any]] = {
+            "multi_intent": functools.partial(
+                detect_multi_intent, message_text, client_slug=payload.client_slug, timing_context=timing_context
+            ),
+            "question_type": functools.partial(semantic_question_type, message_text),
+        }
+        if not timing_context.get("rag_rewrite_logged"):
+            enrichment_calls["rag_rewrite"] = functools.partial(
+                rewrite_query_for_retrieval,
+                message_text,
+                client_slug=payload.client_slug,
+                timing_context=timing_context,
+            )
+        enrichment = EnrichmentFanout(
+            enrichment_calls,
+            deadline_seconds=budget_timeout(timing_context, enrichment_deadline_seconds),
+            # The LLM intent classifier only matters if the message reaches the decision stage.
+            deferred={
+                "signals": functools.partial(
+                    _detect_intent_signals, _normalize_message_text(message_text), timing_context=timing_context
+                ),
+            },
+        )
+        enrichment_fanouts.append(enrichment)
     if routing["allow_bot_reply"] and not bypass_domain_flows and message_text:
-        intent_decomp_payload = detect_multi_intent(message_text, client_slug=payload.client_slug)
+        if enrichment is not None:
+            intent_decomp_payload = await enrichment.result("multi_intent")
+        else:
+            intent_decomp_payload = await run_blocking(
+                detect_multi_intent, message_text, client_slug=payload.client_slug, timing_context=timing_context
+            )
         if isinstance(intent_decomp_payload, dict):
             intent_decomp_used = True
             raw_intents = intent_decomp_payload.get("intents")
@@ -6286,6 +6887,56 @@ async def _handle_webhook_payload(
         booking_wants_flow = False
     booking_blocked = bool(booking_block_meta)
 
+    speculative_enabled, speculative_policy_types = _get_speculative_llm_settings()
+    if (
+        speculative_enabled
+        and (policy_type or "").casefold() in speculative_policy_types
+        and routing["allow_bot_reply"]
+        and not bypass_domain_flows
+        and not booking_wants_flow
+        and message_text
+        and policy_handler
+        and conversation.state in (ConversationState.BOT_ACTIVE.value, ConversationState.PENDING.value)
+    ):
+        # Low truth-gate match predicts an LLM fallthrough: start generation alongside the
+        # deterministic stages; the RAG mid-band check runs inside the speculative call.
+        # The decision is memoized, so the later truth-gate stages reuse it instead of re-running.
+        truth_gate = policy_handler.get("truth_gate")
+        truth_decision = None
+        if truth_gate:
+            truth_decision = await run_blocking(
+                _run_truth_gate,
+                truth_gate,
+                message_text,
+                policy_type=policy_type,
+                client_slug=payload.client_slug,
+                intent_decomp=intent_decomp_payload,
+                memo=truth_gate_memo,
+            )
+        if truth_decision is None:
+            await _ensure_rag_rewrite()
+            pending_hint = conversation.state == ConversationState.PENDING.value
+            speculative_context = _fork_timing_context(timing_context)
+            speculative = SpeculativeLLMCall(
+                functools.partial(
+                    _run_speculative_llm,
+                    conversation_id=conversation.id,
+                    message_text=message_text,
+                    client_slug=payload.client_slug,
+                    append_user_message=append_user_message,
+                    pending_hint=pending_hint,
+                    timing_context=speculative_context,
+                ),
+                key=_speculative_llm_key(
+                    conversation,
+                    message_text,
+                    append_user_message=append_user_message,
+                    pending_hint=pending_hint,
+                ),
+                timing_context=speculative_context,
+            )
+            speculative_calls.append(speculative)
+
     multi_intent_primary = None
     multi_intent_secondary: list[str] = []
     multi_intent_followup = None
@@ -6324,9 +6975,9 @@ async def _handle_webhook_payload(
             source="opt_out",
             fast_intent=False,
         )
-        bot_response, sent = _send_and_save(bot_response, allow_quiet_hours=False)
+        bot_response, sent = await _send_and_save(bot_response, allow_quiet_hours=False)
         result_message = f"Muted (opt-out #{conversation.no_count})" if sent else "Opt-out response failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message=result_message,
@@ -6397,7 +7048,7 @@ async def _handle_webhook_payload(
                 source="policy_gate",
                 fast_intent=False,
             )
-            bot_response, sent = _send_and_save(bot_response, allow_quiet_hours=False)
+            bot_response, sent = await _send_and_save(bot_response, allow_quiet_hours=False)
             if not sent:
                 result_message = f"{result_message}; response_send=failed"
             _log_timing(
@@ -6405,7 +7056,7 @@ async def _handle_webhook_payload(
                 (time.monotonic() - policy_t0) * 1000,
                 {"policy_type": policy_type, "booking_wants_flow": booking_wants_flow, "gate": "escalation"},
             )
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -6426,9 +7077,13 @@ async def _handle_webhook_payload(
         and not bypass_domain_flows
         and message_text
     ):
-        early_info_intents, early_info_meta = _detect_info_class_intents(
+        early_info_intents, early_info_meta = await run_blocking(
+            _detect_info_class_intents,
             message_text,
             intent_decomp_set=set(),
+            question_type=(
+                await enrichment.result("question_type") if enrichment is not None else _QUESTION_TYPE_NOT_FETCHED
+            ),
         )
         if not (
             is_greeting_message(message_text)
@@ -6486,13 +7141,13 @@ async def _handle_webhook_payload(
                     "expected_reply_reason": "off_topic",
                 },
             )
-        bot_response, sent = _send_and_save(bot_response, allow_quiet_hours=False)
+        bot_response, sent = await _send_and_save(bot_response, allow_quiet_hours=False)
         result_message = (
             "Expected reply off-topic response sent"
             if sent
             else "Expected reply off-topic response failed"
         )
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message=result_message,
@@ -6510,7 +7165,7 @@ async def _handle_webhook_payload(
         and not in_domain_signal
     )
     if expected_reply_invalid_choice:
-        semantic_match = semantic_service_match(message_text, payload.client_slug)
+        semantic_match = await run_blocking(semantic_service_match, message_text, payload.client_slug)
         if not semantic_match:
             clarify_intent = current_goal or "info"
             context = _get_conversation_context(conversation)
@@ -6590,13 +7245,13 @@ async def _handle_webhook_payload(
                         "expected_reply_reason": "invalid_choice",
                     },
                 )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = (
                 "Expected reply invalid choice response sent"
                 if sent
                 else "Expected reply invalid choice response failed"
             )
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -6625,9 +7280,9 @@ async def _handle_webhook_payload(
             source="domain_router",
             fast_intent=False,
         )
-        bot_response, sent = _send_and_save(bot_response, allow_quiet_hours=False)
+        bot_response, sent = await _send_and_save(bot_response, allow_quiet_hours=False)
         result_message = "Out-of-domain early response sent" if sent else "Out-of-domain early response failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message=result_message,
@@ -6737,11 +7392,11 @@ async def _handle_webhook_payload(
                 message_count=message_count,
                 reason="intent_queue_choice",
             )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = (
                 "Intent queue info reply sent" if sent else "Intent queue info reply failed"
             )
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -6809,9 +7464,9 @@ async def _handle_webhook_payload(
         )
         bot_response = prompt or MSG_BOOKING_ASK_DATETIME
         _reset_low_confidence_retry(conversation)
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         result_message = "Intent queue booking prompt sent" if sent else "Intent queue booking prompt failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message=result_message,
@@ -6841,12 +7496,14 @@ async def _handle_webhook_payload(
 
         truth_gate_intents: list[str] = []
         if "booking" in intent_decomp_set:
-            truth_gate_intents = _extract_truth_gate_info_intents(
+            truth_gate_intents = await run_blocking(
+                _extract_truth_gate_info_intents,
                 message_text,
                 policy_handler=policy_handler,
                 policy_type=policy_type,
                 client_slug=payload.client_slug,
                 intent_decomp=intent_decomp_payload,
+                truth_gate_memo=truth_gate_memo,
             )
         for intent_name in truth_gate_intents:
             if intent_name not in seen_intents:
@@ -6962,9 +7619,9 @@ async def _handle_webhook_payload(
                         message_count=message_count,
                         reason="intent_queue",
                     )
-                bot_response, sent = _send_and_save(bot_response)
+                bot_response, sent = await _send_and_save(bot_response)
                 result_message = "Intent queue info reply sent" if sent else "Intent queue info reply failed"
-                db.commit()
+                await run_on_session(_commit_session, db)
                 return WebhookResponse(
                     success=True,
                     message=result_message,
@@ -7120,10 +7777,10 @@ async def _handle_webhook_payload(
             else:
                 result_message = "Consult escalation skipped (already pending)"
 
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             if not sent:
                 result_message = f"{result_message}; response_send=failed"
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -7134,9 +7791,9 @@ async def _handle_webhook_payload(
         bot_response = consult_decision.response
         bot_response = _combine_sidecar(bot_response, intent_queue_followup)
         _reset_low_confidence_retry(conversation)
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         result_message = "Consult reply sent" if sent else "Consult reply send failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message=result_message,
@@ -7171,8 +7828,10 @@ async def _handle_webhook_payload(
         and not booking_active
     ):
         multi_intent_payload = intent_decomp_payload
-        if not multi_intent_payload:
-            multi_intent_payload = detect_multi_intent(message_text, client_slug=payload.client_slug)
+        if not multi_intent_payload and enrichment is None:
+            multi_intent_payload = await run_blocking(
+                detect_multi_intent, message_text, client_slug=payload.client_slug, timing_context=timing_context
+            )
         if isinstance(multi_intent_payload, dict) and multi_intent_payload.get("multi_intent") is True:
             primary = multi_intent_payload.get("primary_intent")
             secondary = multi_intent_payload.get("secondary_intents") or []
@@ -7248,7 +7907,8 @@ async def _handle_webhook_payload(
                 if not info_decision:
                     service_matcher = policy_handler.get("service_matcher")
                     if service_matcher:
-                        info_decision = service_matcher(
+                        info_decision = await run_blocking(
+                            service_matcher,
                             booking_interrupt_text,
                             client_slug=payload.client_slug,
                             intent_decomp=intent_decomp_payload,
@@ -7258,20 +7918,22 @@ async def _handle_webhook_payload(
                 if not info_decision:
                     truth_gate = policy_handler.get("truth_gate")
                     if truth_gate:
-                        if policy_type == "demo_salon":
-                            info_decision = truth_gate(
-                                booking_interrupt_text,
-                                client_slug=payload.client_slug,
-                                intent_decomp=intent_decomp_payload,
-                            )
-                        else:
-                            info_decision = truth_gate(booking_interrupt_text)
+                        info_decision = await run_blocking(
+                            _run_truth_gate,
+                            truth_gate,
+                            booking_interrupt_text,
+                            policy_type=policy_type,
+                            client_slug=payload.client_slug,
+                            intent_decomp=intent_decomp_payload,
+                            memo=truth_gate_memo,
+                        )
                         if info_decision:
                             info_source = "truth_gate"
             if not info_decision and batch_non_booking_message and not booking_info_intents:
                 service_matcher = policy_handler.get("service_matcher")
                 if service_matcher:
-                    info_decision = service_matcher(
+                    info_decision = await run_blocking(
+                        service_matcher,
                         booking_interrupt_text,
                         client_slug=payload.client_slug,
                         intent_decomp=intent_decomp_payload,
@@ -7281,20 +7943,22 @@ async def _handle_webhook_payload(
                 if not info_decision:
                     truth_gate = policy_handler.get("truth_gate")
                     if truth_gate:
-                        if policy_type == "demo_salon":
-                            info_decision = truth_gate(
-                                booking_interrupt_text,
-                                client_slug=payload.client_slug,
-                                intent_decomp=intent_decomp_payload,
-                            )
-                        else:
-                            info_decision = truth_gate(booking_interrupt_text)
+                        info_decision = await run_blocking(
+                            _run_truth_gate,
+                            truth_gate,
+                            booking_interrupt_text,
+                            policy_type=policy_type,
+                            client_slug=payload.client_slug,
+                            intent_decomp=intent_decomp_payload,
+                            memo=truth_gate_memo,
+                        )
                         if info_decision:
                             info_source = "truth_gate"
             if not info_decision and booking_time_service_candidate:
                 service_matcher = policy_handler.get("service_matcher")
                 if service_matcher:
-                    candidate = service_matcher(
+                    candidate = await run_blocking(
+                        service_matcher,
                         booking_interrupt_text,
                         client_slug=payload.client_slug,
                         intent_decomp=intent_decomp_payload,
@@ -7305,14 +7969,15 @@ async def _handle_webhook_payload(
                 if not info_decision:
                     truth_gate = policy_handler.get("truth_gate")
                     if truth_gate:
-                        if policy_type == "demo_salon":
-                            candidate = truth_gate(
-                                booking_interrupt_text,
-                                client_slug=payload.client_slug,
-                                intent_decomp=intent_decomp_payload,
-                            )
-                        else:
-                            candidate = truth_gate(booking_interrupt_text)
+                        candidate = await run_blocking(
+                            _run_truth_gate,
+                            truth_gate,
+                            booking_interrupt_text,
+                            policy_type=policy_type,
+                            client_slug=payload.client_slug,
+                            intent_decomp=intent_decomp_payload,
+                            memo=truth_gate_memo,
+                        )
                         if _is_booking_time_service_decision(candidate):
                             info_decision = candidate
                             info_source = "truth_gate"
@@ -7512,9 +8177,9 @@ async def _handle_webhook_payload(
                 bot_response = _combine_sidecar(prompt or "", info_decision.response or "")
                 bot_response = bot_response.strip()
                 _reset_low_confidence_retry(conversation)
-                bot_response, sent = _send_and_save(bot_response)
+                bot_response, sent = await _send_and_save(bot_response)
                 result_message = "Booking info interrupt sent" if sent else "Booking info interrupt failed"
-                db.commit()
+                await run_on_session(_commit_session, db)
                 return WebhookResponse(
                     success=True,
                     message=result_message,
@@ -7563,11 +8228,11 @@ async def _handle_webhook_payload(
                 fast_intent=False,
             )
             bot_response = _combine_sidecar(MSG_BOOKING_CANCELLED, multi_intent_booking_followup)
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = "Booking cancelled" if sent else "Booking cancel response failed"
             _log_timing("booking_ms", (time.monotonic() - booking_t0) * 1000)
             booking_logged = True
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
             )
@@ -7595,11 +8260,11 @@ async def _handle_webhook_payload(
                 fast_intent=False,
             )
             bot_response = _combine_sidecar(MSG_BOOKING_REENGAGE, multi_intent_booking_followup)
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = "Booking paused" if sent else "Booking pause response failed"
             _log_timing("booking_ms", (time.monotonic() - booking_t0) * 1000)
             booking_logged = True
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
             )
@@ -7685,11 +8350,11 @@ async def _handle_webhook_payload(
                 )
                 bot_response = _combine_sidecar(prompt, policy_price_sidecar)
                 bot_response = _combine_sidecar(bot_response, multi_intent_booking_followup)
-                bot_response, sent = _send_and_save(bot_response)
+                bot_response, sent = await _send_and_save(bot_response)
                 result_message = "Booking slot requested" if sent else "Booking slot response failed"
                 _log_timing("booking_ms", (time.monotonic() - booking_t0) * 1000)
                 booking_logged = True
-                db.commit()
+                await run_on_session(_commit_session, db)
                 return WebhookResponse(
                     success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
                 )
@@ -7758,12 +8423,12 @@ async def _handle_webhook_payload(
                 source="booking",
                 fast_intent=False,
             )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             if not sent:
                 result_message = f"{result_message}; response_send=failed"
             _log_timing("booking_ms", (time.monotonic() - booking_t0) * 1000)
             booking_logged = True
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
             )
@@ -7810,10 +8475,10 @@ async def _handle_webhook_payload(
             source="fast_intent",
             fast_intent=True,
         )
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         if not sent:
             result_message = f"{result_message}; response_send=failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True,
             message=result_message,
@@ -7881,10 +8546,10 @@ async def _handle_webhook_payload(
                         message_count=message_count,
                         reason="multi_truth",
                     )
-                    bot_response, sent = _send_and_save(bot_response)
+                    bot_response, sent = await _send_and_save(bot_response)
                     if not sent:
                         result_message = f"{result_message}; response_send=failed"
-                    db.commit()
+                    await run_on_session(_commit_session, db)
                     return WebhookResponse(
                         success=True,
                         message=result_message,
@@ -7892,9 +8557,13 @@ async def _handle_webhook_payload(
                         bot_response=bot_response,
                     )
 
-        info_class_intents, _ = _detect_info_class_intents(
+        info_class_intents, _ = await run_blocking(
+            _detect_info_class_intents,
             message_text,
             intent_decomp_set=intent_decomp_set,
+            question_type=(
+                await enrichment.result("question_type") if enrichment is not None else _QUESTION_TYPE_NOT_FETCHED
+            ),
         )
         class_router_result = _build_class_router_result(
             info_intents=info_class_intents,
@@ -8016,9 +8685,9 @@ async def _handle_webhook_payload(
                     message_count=message_count,
                     reason="class_router",
                 )
-                bot_response, sent = _send_and_save(bot_response)
+                bot_response, sent = await _send_and_save(bot_response)
                 result_message = "Info class reply sent" if sent else "Info class reply failed"
-                db.commit()
+                await run_on_session(_commit_session, db)
                 return WebhookResponse(
                     success=True,
                     message=result_message,
@@ -8028,7 +8697,8 @@ async def _handle_webhook_payload(
 
         service_matcher = policy_handler.get("service_matcher")
         service_decision = (
-            service_matcher(
+            await run_blocking(
+                service_matcher,
                 message_text,
                 client_slug=payload.client_slug,
                 intent_decomp=intent_decomp_payload,
@@ -8140,10 +8810,10 @@ async def _handle_webhook_payload(
                 message_count=message_count,
                 reason="service_matcher",
             )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             if not sent:
                 result_message = f"{result_message}; response_send=failed"
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -8152,16 +8822,32 @@ async def _handle_webhook_payload(
             )
 
     if routing["allow_bot_reply"]:
-        _ensure_rag_rewrite()
-        llm_primary_result = generate_bot_response(
-            db,
-            conversation,
-            message_text,
-            payload.client_slug,
-            append_user_message=append_user_message,
-            pending_hint=conversation.state == ConversationState.PENDING.value,
-            timing_context=timing_context,
-        )
+        await _ensure_rag_rewrite()
+        pending_hint = conversation.state == ConversationState.PENDING.value
+        if speculative is not None:
+            llm_primary_result, speculative_context = await speculative.take(
+                _speculative_llm_key(
+                    conversation,
+                    message_text,
+                    append_user_message=append_user_message,
+                    pending_hint=pending_hint,
+                )
+            )
+            timing_context["speculative_llm"] = speculative.outcome
+            if llm_primary_result is not None:
+                timing_context.update(
+                    {key: value for key, value in speculative_context.items() if key.startswith(("rag_", "llm_"))}
+                )
+        if llm_primary_result is None:
+            llm_primary_result = await agenerate_bot_response(
+                db,
+                conversation,
+                message_text,
+                payload.client_slug,
+                append_user_message=append_user_message,
+                pending_hint=pending_hint,
+                timing_context=timing_context,
+            )
         _record_rag_meta()
         if not llm_primary_result.ok:
             llm_primary_failed = True
@@ -8237,10 +8923,10 @@ async def _handle_webhook_payload(
                                 "llm_cache_hit": llm_cache_hit,
                             },
                         )
-                    bot_response, sent = _send_and_save(bot_response, allow_quiet_hours=False)
+                    bot_response, sent = await _send_and_save(bot_response, allow_quiet_hours=False)
                     if not sent:
                         result_message = f"{result_message}; response_send=failed"
-                    db.commit()
+                    await run_on_session(_commit_session, db)
                     return WebhookResponse(
                         success=True,
                         message=result_message,
@@ -8262,7 +8948,7 @@ async def _handle_webhook_payload(
                     timing_context,
                 )
                 _record_decision_trace(conversation, trace)
-                bot_response, sent = _send_and_save(bot_response)
+                bot_response, sent = await _send_and_save(bot_response)
                 result_message = "Message sent" if sent else "Failed to send"
                 if saved_message:
                     llm_used = bool(timing_context.get("llm_used")) if timing_context else False
@@ -8281,7 +8967,7 @@ async def _handle_webhook_payload(
                             "llm_cache_hit": llm_cache_hit,
                         },
                     )
-                db.commit()
+                await run_on_session(_commit_session, db)
                 return WebhookResponse(
                     success=True,
                     message=result_message,
@@ -8300,14 +8986,15 @@ async def _handle_webhook_payload(
         truth_gate = policy_handler.get("truth_gate")
         decision = None
         if truth_gate:
-            if policy_type == "demo_salon":
-                decision = truth_gate(
-                    message_text,
-                    client_slug=payload.client_slug,
-                    intent_decomp=intent_decomp_payload,
-                )
-            else:
-                decision = truth_gate(message_text)
+            decision = await run_blocking(
+                _run_truth_gate,
+                truth_gate,
+                message_text,
+                policy_type=policy_type,
+                client_slug=payload.client_slug,
+                intent_decomp=intent_decomp_payload,
+                memo=truth_gate_memo,
+            )
         if decision:
             if decision.intent == "price_query":
                 price_item_fn = policy_handler.get("price_item")
@@ -8461,7 +9148,7 @@ async def _handle_webhook_payload(
                 message_count=message_count,
                 reason="truth_gate",
             )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             if not sent:
                 result_message = f"{result_message}; response_send=failed"
             _log_timing(
@@ -8469,7 +9156,7 @@ async def _handle_webhook_payload(
                 (time.monotonic() - policy_t0) * 1000,
                 {"policy_type": policy_type, "booking_wants_flow": booking_wants_flow, "gate": "truth_fallback"},
             )
-            db.commit()
+            await run_on_session(_commit_session, db)
             return WebhookResponse(
                 success=True,
                 message=result_message,
@@ -8485,7 +9172,15 @@ async def _handle_webhook_payload(
     # 10. Classify intent (expensive). Protect against accidental escalations on short/noisy messages.
     intent_t0 = time.monotonic()
     decision_text = _normalize_message_text(message_text)
-    signals = _detect_intent_signals(decision_text)
+    if enrichment is not None:
+        signals = await enrichment.signals(decision_text)
+        _log_timing(
+            "enrichment_ms",
+            (time.monotonic() - enrichment.started_at) * 1000,
+            {"enrichment_calls_ms": dict(enrichment.elapsed_ms), "enrichment_timed_out": list(signals.enrichment_timed_out)},
+        )
+    else:
+        signals = await run_blocking(_detect_intent_signals, decision_text, timing_context=timing_context)
     intent = signals.intent
     is_greeting = signals.is_greeting
     is_thanks = signals.is_thanks
@@ -8536,9 +9231,11 @@ async def _handle_webhook_payload(
 
     domain_out_hits = int(domain_meta.get("out_hits") or 0)
     domain_strict_in_hits = int(domain_meta.get("strict_in_hits") or 0)
-    info_class_intents, info_class_meta = _detect_info_class_intents(
+    info_class_intents, info_class_meta = await run_blocking(
+        _detect_info_class_intents,
         message_text,
         intent_decomp_set=intent_decomp_set,
+        question_type=signals.question_type,
     )
     class_router_result = _build_class_router_result(
         info_intents=info_class_intents,
@@ -8600,6 +9297,7 @@ async def _handle_webhook_payload(
             "out_hits": domain_out_hits,
             "strict_in_hits": domain_strict_in_hits,
             "info_intents": sorted(info_class_intents),
+            "enrichment_timed_out": list(signals.enrichment_timed_out),
         },
     )
 
@@ -8631,9 +9329,9 @@ async def _handle_webhook_payload(
                 "state": conversation.state,
             },
         )
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         result_message = "Greeting response sent" if sent else "Greeting response failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
         )
@@ -8648,9 +9346,9 @@ async def _handle_webhook_payload(
                 "state": conversation.state,
             },
         )
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         result_message = "Pending status response sent" if sent else "Pending status response failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
         )
@@ -8666,9 +9364,9 @@ async def _handle_webhook_payload(
                 "state": conversation.state,
             },
         )
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         result_message = "Bot status response sent" if sent else "Bot status response failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
         )
@@ -8683,9 +9381,9 @@ async def _handle_webhook_payload(
                 "state": conversation.state,
             },
         )
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         result_message = "Style reference prompt sent" if sent else "Style reference prompt failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
         )
@@ -8710,9 +9408,9 @@ async def _handle_webhook_payload(
             user_text=message_text,
             miss_type="out_of_domain",
         )
-        bot_response, sent = _send_and_save(bot_response, allow_quiet_hours=False)
+        bot_response, sent = await _send_and_save(bot_response, allow_quiet_hours=False)
         result_message = "Out-of-domain response sent" if sent else "Out-of-domain response failed"
-        db.commit()
+        await run_on_session(_commit_session, db)
         return WebhookResponse(
             success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
         )
@@ -8734,7 +9432,7 @@ async def _handle_webhook_payload(
 
         if reused:
             bot_response = MSG_ESCALATED
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = (
                 f"Escalation reused ({intent.value}), telegram={'sent' if telegram_sent else 'failed'}"
             )
@@ -8769,7 +9467,7 @@ async def _handle_webhook_payload(
                         "telegram_sent": telegram_sent,
                     },
                 )
-                bot_response, sent = _send_and_save(bot_response)
+                bot_response, sent = await _send_and_save(bot_response)
                 result_message = f"Escalated ({intent.value}), telegram={'sent' if telegram_sent else 'failed'}"
             else:
                 logger.error(f"Escalation failed: {result.error}")
@@ -8784,8 +9482,8 @@ async def _handle_webhook_payload(
                         "error": result.error_code,
                     },
                 )
-                _ensure_rag_rewrite()
-                gen_result = generate_bot_response(
+                await _ensure_rag_rewrite()
+                gen_result = await agenerate_bot_response(
                     db,
                     conversation,
                     message_text,
@@ -8797,7 +9495,7 @@ async def _handle_webhook_payload(
                 _record_rag_meta()
                 if gen_result.ok and gen_result.value[0]:
                     bot_response = gen_result.value[0]
-                    bot_response, sent = _send_and_save(bot_response)
+                    bot_response, sent = await _send_and_save(bot_response)
                 result_message = f"Escalation failed ({result.error_code}), responded normally"
 
     elif decision.action == "pending_escalation":
@@ -8811,7 +9509,7 @@ async def _handle_webhook_payload(
                 "intent": intent.value,
             },
         )
-        bot_response, sent = _send_and_save(bot_response)
+        bot_response, sent = await _send_and_save(bot_response)
         result_message = "Escalation skipped (pending), status response sent" if sent else "Pending status response failed"
 
     elif decision.action == "rejection":
@@ -8829,7 +9527,7 @@ async def _handle_webhook_payload(
                     "state": conversation.state,
                 },
             )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = "Request cancelled, bot reactivated"
         else:
             mute_first, mute_second = get_mute_settings(db, client.id)
@@ -8855,7 +9553,7 @@ async def _handle_webhook_payload(
                     "no_count": conversation.no_count,
                 },
             )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = f"Muted (rejection #{conversation.no_count})"
 
     elif decision.action == "ai_response":
@@ -8863,8 +9561,8 @@ async def _handle_webhook_payload(
         llm_primary_used = False
         gen_result = llm_primary_result
         if gen_result is None:
-            _ensure_rag_rewrite()
-            gen_result = generate_bot_response(
+            await _ensure_rag_rewrite()
+            gen_result = await agenerate_bot_response(
                 db,
                 conversation,
                 message_text,
@@ -8887,7 +9585,7 @@ async def _handle_webhook_payload(
                     "error": gen_result.error,
                 },
             )
-            bot_response, sent = _send_and_save(bot_response)
+            bot_response, sent = await _send_and_save(bot_response)
             result_message = f"AI error: {gen_result.error}"
         else:
             response_text, confidence = gen_result.value
@@ -8923,11 +9621,16 @@ async def _handle_webhook_payload(
                     llm_primary_reason = "low_confidence"
                 else:
                     if not out_of_domain_signal:
-                        semantic_result = semantic_service_match(message_text, payload.client_slug)
+                        semantic_result = await run_blocking(semantic_service_match, message_text, payload.client_slug)
                         if not semantic_result:
-                            rewrite_query = rewrite_for_service_match(message_text, payload.client_slug)
+                            rewrite_query = await run_blocking(
+                                rewrite_for_service_match,
+                                message_text,
+                                payload.client_slug,
+                                timing_context=timing_context,
+                            )
                             if rewrite_query:
-                                semantic_result = semantic_service_match(rewrite_query, payload.client_slug)
+                                semantic_result = await run_blocking(semantic_service_match, rewrite_query, payload.client_slug)
                     if semantic_result:
                         rewrite_used = bool(rewrite_query)
                         bot_response = semantic_result.response
@@ -8965,11 +9668,11 @@ async def _handle_webhook_payload(
                                     "llm_cache_hit": llm_cache_hit,
                                 },
                             )
-                        bot_response, sent = _send_and_save(bot_response)
+                        bot_response, sent = await _send_and_save(bot_response)
                         result_message = (
                             "Service semantic matcher reply sent" if sent else "Service semantic matcher send failed"
                         )
-                        db.commit()
+                        await run_on_session(_commit_session, db)
                         return WebhookResponse(
                             success=True,
                             message=result_message,
@@ -8987,7 +9690,7 @@ async def _handle_webhook_payload(
                                 "state": conversation.state,
                             },
                         )
-                        bot_response, sent = _send_and_save(bot_response)
+                        bot_response, sent = await _send_and_save(bot_response)
                         result_message = "Low confidence while pending, responded without re-escalation"
                     else:
                         # Low RAG confidence — ask clarifying question before escalation (up to a limit).
@@ -9042,7 +9745,7 @@ async def _handle_webhook_payload(
                                     "retry_count": retry_count + 1,
                                 },
                             )
-                            bot_response, sent = _send_and_save(bot_response)
+                            bot_response, sent = await _send_and_save(bot_response)
                             result_message = "Low confidence: asked clarification before escalation"
                         else:
                             confirmation = {
@@ -9065,7 +9768,7 @@ async def _handle_webhook_payload(
                                     "retry_count": retry_count,
                                 },
                             )
-                            bot_response, sent = _send_and_save(bot_response)
+                            bot_response, sent = await _send_and_save(bot_response)
                             result_message = (
                                 "Low confidence: asked for handover confirmation"
                                 if sent
@@ -9098,7 +9801,7 @@ async def _handle_webhook_payload(
                     timing_context,
                 )
                 _record_decision_trace(conversation, trace)
-                bot_response, sent = _send_and_save(bot_response)
+                bot_response, sent = await _send_and_save(bot_response)
                 result_message = "Message sent" if sent else "Failed to send"
             else:
                 _record_knowledge_backlog(
@@ -9128,7 +9831,7 @@ async def _handle_webhook_payload(
                             "retry_count": retry_count + 1,
                         },
                     )
-                    bot_response, sent = _send_and_save(bot_response)
+                    bot_response, sent = await _send_and_save(bot_response)
                     result_message = "No response: asked clarification"
                 else:
                     confirmation = {
@@ -9151,7 +9854,7 @@ async def _handle_webhook_payload(
                             "retry_count": retry_count,
                         },
                     )
-                    bot_response, sent = _send_and_save(bot_response)
+                    bot_response, sent = await _send_and_save(bot_response)
                     result_message = (
                         "No response: asked for handover confirmation"
                         if sent
@@ -9185,7 +9888,7 @@ async def _handle_webhook_payload(
         )
         result_message = f"Unknown state: {conversation.state}"
 
-    db.commit()
+    await run_on_session(_commit_session, db)
 
     return WebhookResponse(
         success=True, message=result_message, conversation_id=conversation.id, bot_response=bot_response
@@ -4,6 +4,7 @@ from app.services.conversation_service import (
     update_conversation_state,
 )
 from app.services.message_service import (
+    agenerate_bot_response,
     generate_bot_response,
     save_message,
 )
@@ -2,7 +2,10 @@ import hashlib
 import json
 import os
 import re
+import threading
 import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import List, Optional, Tuple
 from uuid import UUID
 
@@ -12,8 +15,16 @@ from sqlalchemy.orm import Session
 from app.logging_config import get_logger
 from app.models import Message, Prompt
 from app.services.alert_service import alert_error
-from app.services.knowledge_service import format_knowledge_context, search_knowledge
-from app.services.llm import OpenAIProvider
+from app.services.http_clients import async_http_client
+from app.services.knowledge_service import (
+    format_knowledge_context,
+    read_shared_knowledge_version,
+    search_knowledge,
+    search_knowledge_batch,
+)
+from app.services.latency_budget import budget_timeout, has_budget_for_optional
+from app.services.llm import OpenAIProvider, run_blocking
+from app.services.qdrant_batch import QdrantSearchError
 from app.services.result import Result
 
 logger = get_logger("ai_service")
@@ -28,6 +39,10 @@ HIGH_CONFIDENCE_THRESHOLD = 0.85
 MID_CONFIDENCE_THRESHOLD = 0.5
 # Minimum RAG score to consider knowledge reliable (legacy name used in tests)
 KNOWLEDGE_CONFIDENCE_THRESHOLD = MID_CONFIDENCE_THRESHOLD
+# timing_context key of the per-message RetrievalContext (underscore: not written to timing logs)
+RETRIEVAL_CONTEXT_KEY = "_retrieval"
+RETRIEVAL_CACHE_SIZE = int(os.environ.get("RETRIEVAL_CACHE_SIZE", "512"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.environ.get("RETRIEVAL_CACHE_TTL_SECONDS", "600"))
 
 # Common short-form greetings/thanks/acknowledgements.
 GREETING_PHRASES = {
@@ -242,7 +257,8 @@ def _log_timing(
 ) -> None:
     context: dict = {}
     if timing_context:
-        context.update(timing_context)
+        # copy() is atomic under the GIL; enrichment threads and the loop write the same context.
+        context.update({key: value for key, value in timing_context.copy().items() if not key.startswith("_")})
     if extra:
         context.update(extra)
     context["stage"] = stage
@@ -399,7 +415,7 @@ def _is_valid_transcript(text: str | None, min_chars: int) -> bool:
     return len(cleaned) >= min_chars
 
 
-def _transcribe_with_openai(
+async def _transcribe_with_openai(
     *,
     audio_bytes: bytes,
     filename: str,
@@ -411,10 +427,10 @@ def _transcribe_with_openai(
     if not OPENAI_API_KEY:
         return None, "missing_openai_key"
     provider = get_llm_provider()
-    if not hasattr(provider, "transcribe_audio"):
+    if not hasattr(provider, "atranscribe"):
         return None, "provider_missing_transcribe"
     try:
-        transcript = provider.transcribe_audio(
+        transcript = await provider.atranscribe(
             audio_bytes=audio_bytes,
             filename=filename,
             mime_type=mime_type,
@@ -429,7 +445,7 @@ def _transcribe_with_openai(
     return cleaned or None, None
 
 
-def _transcribe_with_elevenlabs(
+async def _transcribe_with_elevenlabs(
     *,
     audio_bytes: bytes,
     filename: str,
@@ -444,8 +460,8 @@ def _transcribe_with_elevenlabs(
     if language:
         data["language_code"] = language
     try:
-        with httpx.Client(timeout=timeout_seconds or 10.0) as client:
-            response = client.post(
+        async with async_http_client("elevenlabs", timeout=timeout_seconds or 10.0) as client:
+            response = await client.post(
                 ELEVENLABS_ASR_URL,
                 headers={"xi-api-key": ELEVENLABS_API_KEY},
                 files=files,
@@ -473,7 +489,7 @@ def _transcribe_with_elevenlabs(
     return cleaned or None, None
 
 
-def transcribe_audio_with_fallback(
+async def transcribe_audio_with_fallback(
     audio_bytes: bytes,
     *,
     filename: str,
@@ -507,7 +523,7 @@ def transcribe_audio_with_fallback(
     error = None
     if primary == "openai_whisper":
         openai_model = model or "whisper-1"
-        transcript, error = _transcribe_with_openai(
+        transcript, error = await _transcribe_with_openai(
             audio_bytes=audio_bytes,
             filename=filename,
             mime_type=mime_type,
@@ -517,7 +533,7 @@ def transcribe_audio_with_fallback(
         )
         meta["asr_model"] = openai_model
     elif primary == "elevenlabs":
-        transcript, error = _transcribe_with_elevenlabs(
+        transcript, error = await _transcribe_with_elevenlabs(
             audio_bytes=audio_bytes,
             filename=filename,
             mime_type=mime_type,
@@ -560,7 +576,7 @@ def transcribe_audio_with_fallback(
         transcript = None
         if fallback == "openai_whisper":
             openai_model = model or "whisper-1"
-            transcript, error = _transcribe_with_openai(
+            transcript, error = await _transcribe_with_openai(
                 audio_bytes=audio_bytes,
                 filename=filename,
                 mime_type=mime_type,
@@ -570,7 +586,7 @@ def transcribe_audio_with_fallback(
             )
             meta["asr_model"] = openai_model
         elif fallback == "elevenlabs":
-            transcript, error = _transcribe_with_elevenlabs(
+            transcript, error = await _transcribe_with_elevenlabs(
                 audio_bytes=audio_bytes,
                 filename=filename,
                 mime_type=mime_type,
@@ -650,13 +666,16 @@ def normalize_for_matching(text: str) -> str:
     return normalized
 
 
-def rewrite_for_service_match(text: str, client_slug: str) -> str | None:
+def rewrite_for_service_match(text: str, client_slug: str, timing_context: dict | None = None) -> str | None:
     normalized = normalize_for_matching(text)
     if not normalized or len(normalized) < 3:
         return None
     if not OPENAI_API_KEY:
         logger.warning("Service rewrite skipped: OPENAI_API_KEY missing")
         return None
+    if not has_budget_for_optional(timing_context, "service_rewrite"):
+        return None
+    timeout_seconds = budget_timeout(timing_context, SERVICE_REWRITE_TIMEOUT_SECONDS)
 
     system_prompt = (
         "Ты переписываешь текст клиента в короткий запрос для поиска услуги салона. "
@@ -684,7 +703,7 @@ def rewrite_for_service_match(text: str, client_slug: str) -> str | None:
             temperature=temperature,
             max_tokens=SERVICE_REWRITE_MAX_TOKENS,
             model=FAST_MODEL,
-            timeout_seconds=SERVICE_REWRITE_TIMEOUT_SECONDS,
+            timeout_seconds=timeout_seconds,
         )
     except httpx.TimeoutException as exc:
         _log_timing(
@@ -694,11 +713,11 @@ def rewrite_for_service_match(text: str, client_slug: str) -> str | None:
                 "model_name": FAST_MODEL,
                 "model_tier": "fast",
                 "timeout": True,
-                "timeout_seconds": SERVICE_REWRITE_TIMEOUT_SECONDS,
+                "timeout_seconds": timeout_seconds,
                 "client_slug": client_slug,
             },
         )
-        logger.warning(f"Service rewrite timeout after {SERVICE_REWRITE_TIMEOUT_SECONDS}s: {exc}")
+        logger.warning(f"Service rewrite timeout after {timeout_seconds}s: {exc}")
         return None
 
     _log_timing(
@@ -742,13 +761,20 @@ def rewrite_for_service_match(text: str, client_slug: str) -> str | None:
     return query
 
 
-def rewrite_query_for_retrieval(text: str, client_slug: str | None = None) -> dict:
+def rewrite_query_for_retrieval(
+    text: str,
+    client_slug: str | None = None,
+    timing_context: dict | None = None,
+) -> dict:
     normalized = normalize_for_matching(text)
     if not normalized or len(normalized) < 3:
         return {"rewrite_used": False, "rewrite_text": "", "reason": "too_short"}
     if not OPENAI_API_KEY:
         logger.warning("RAG rewrite skipped: OPENAI_API_KEY missing")
         return {"rewrite_used": False, "rewrite_text": "", "reason": "missing_api_key"}
+    if not has_budget_for_optional(timing_context, "rag_rewrite"):
+        return {"rewrite_used": False, "rewrite_text": "", "reason": "budget"}
+    timeout_seconds = budget_timeout(timing_context, RAG_REWRITE_TIMEOUT_SECONDS)
 
     system_prompt = (
         "Ты переписываешь запрос клиента для поиска по базе знаний. "
@@ -777,7 +803,7 @@ def rewrite_query_for_retrieval(text: str, client_slug: str | None = None) -> di
             temperature=temperature,
             max_tokens=RAG_REWRITE_MAX_TOKENS,
             model=FAST_MODEL,
-            timeout_seconds=RAG_REWRITE_TIMEOUT_SECONDS,
+            timeout_seconds=timeout_seconds,
         )
     except httpx.TimeoutException as exc:
         _log_timing(
@@ -787,11 +813,11 @@ def rewrite_query_for_retrieval(text: str, client_slug: str | None = None) -> di
                 "model_name": FAST_MODEL,
                 "model_tier": "fast",
                 "timeout": True,
-                "timeout_seconds": RAG_REWRITE_TIMEOUT_SECONDS,
+                "timeout_seconds": timeout_seconds,
                 "client_slug": client_slug,
             },
         )
-        logger.warning(f"RAG rewrite timeout after {RAG_REWRITE_TIMEOUT_SECONDS}s: {exc}")
+        logger.warning(f"RAG rewrite timeout after {timeout_seconds}s: {exc}")
         return {"rewrite_used": False, "rewrite_text": "", "reason": "timeout"}
 
     _log_timing(
@@ -840,7 +866,11 @@ def rewrite_query_for_retrieval(text: str, client_slug: str | None = None) -> di
     return {"rewrite_used": True, "rewrite_text": rewrite_text, "reason": "rewritten"}
 
 
-def detect_multi_intent(text: str, client_slug: str | None = None) -> dict | None:
+def detect_multi_intent(
+    text: str,
+    client_slug: str | None = None,
+    timing_context: dict | None = None,
+) -> dict | None:
     def _clean_service_query(value: str | None) -> str:
         if not isinstance(value, str):
             return ""
@@ -1027,6 +1057,7 @@ def detect_multi_intent(text: str, client_slug: str | None = None) -> dict | Non
 
     llm = get_llm_provider()
     temperature = 1.0 if FAST_MODEL.strip().lower().startswith("gpt-5") else 0.0
+    timeout_seconds = budget_timeout(timing_context, MULTI_INTENT_TIMEOUT_SECONDS)
     llm_start = time.monotonic()
     try:
         response = llm.generate(
@@ -1034,7 +1065,7 @@ def detect_multi_intent(text: str, client_slug: str | None = None) -> dict | Non
             temperature=temperature,
             max_tokens=MULTI_INTENT_MAX_TOKENS,
             model=FAST_MODEL,
-            timeout_seconds=MULTI_INTENT_TIMEOUT_SECONDS,
+            timeout_seconds=timeout_seconds,
         )
     except httpx.TimeoutException as exc:
         _log_timing(
@@ -1044,10 +1075,10 @@ def detect_multi_intent(text: str, client_slug: str | None = None) -> dict | Non
                 "model_name": FAST_MODEL,
                 "model_tier": "fast",
                 "timeout": True,
-                "timeout_seconds": MULTI_INTENT_TIMEOUT_SECONDS,
+                "timeout_seconds": timeout_seconds,
             },
         )
-        logger.warning(f"Multi-intent timeout after {MULTI_INTENT_TIMEOUT_SECONDS}s: {exc}")
+        logger.warning(f"Multi-intent timeout after {timeout_seconds}s: {exc}")
         return _fallback_payload()
     except Exception as exc:
         _log_timing(
@@ -1317,6 +1348,7 @@ def _record_rag_trace(
     query: str,
     results: list[dict],
     rag_scores: dict | None,
+    source: str = "search",
 ) -> None:
     if timing_context is None:
         return
@@ -1328,6 +1360,14 @@ def _record_rag_trace(
         "query": query,
         "results": len(results),
     }
+    if source == "memo":
+        trace_payload["memo_hit"] = True
+        timing_context["rag_memo_hits"] = timing_context.get("rag_memo_hits", 0) + 1
+    elif source == "cache":
+        trace_payload["cache_hit"] = True
+        timing_context["rag_cache_hits"] = timing_context.get("rag_cache_hits", 0) + 1
+    else:
+        timing_context["rag_cache_misses"] = timing_context.get("rag_cache_misses", 0) + 1
     if isinstance(rag_scores, dict):
         trace_payload["rag_scores"] = rag_scores
     timing_context.setdefault("rag_trace", []).append(trace_payload)
@@ -1339,6 +1379,280 @@ def _record_rag_trace(
             timing_context["rag_scores"] = rag_scores
 
 
+class RetrievalContext:
+    """
+    Retrieval memo for one inbound message (one _handle_webhook_payload call).
+
+    The confidence check and generation (and the speculative LLM thread) resolve the same
+    queries and history; the memo returns the first result instead of repeating Qdrant,
+    BM25 and DB round-trips. It is attached to timing_context under RETRIEVAL_CONTEXT_KEY.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._retrievals: dict[tuple[str, str], tuple[list[dict], dict | None]] = {}
+        self._history: dict[tuple[str, int], list[dict]] = {}
+
+    def get_retrieval(self, client_slug: str, query: str) -> tuple[list[dict], dict | None] | None:
+        with self._lock:
+            return self._retrievals.get((client_slug, query))
+
+    def store_retrieval(self, client_slug: str, query: str, results: list[dict], rag_scores: dict | None) -> None:
+        with self._lock:
+            self._retrievals[(client_slug, query)] = (results, rag_scores)
+
+    def get_history(self, conversation_id: UUID, limit: int) -> List[dict] | None:
+        with self._lock:
+            history = self._history.get((str(conversation_id), limit))
+        return list(history) if history is not None else None
+
+    def store_history(self, conversation_id: UUID, limit: int, history: List[dict]) -> None:
+        with self._lock:
+            self._history[(str(conversation_id), limit)] = list(history)
+
+
+def attach_retrieval_context(timing_context: dict) -> RetrievalContext:
+    retrieval_context = RetrievalContext()
+    timing_context[RETRIEVAL_CONTEXT_KEY] = retrieval_context
+    return retrieval_context
+
+
+def _get_retrieval_context(timing_context: dict | None) -> RetrievalContext | None:
+    if not timing_context:
+        return None
+    retrieval_context = timing_context.get(RETRIEVAL_CONTEXT_KEY)
+    return retrieval_context if isinstance(retrieval_context, RetrievalContext) else None
+
+
+_retrieval_cache: OrderedDict[tuple[str, str, int], tuple[float, list[dict], dict | None]] = OrderedDict()
+_retrieval_cache_lock = threading.Lock()
+_retrieval_cache_stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+
+def _is_retrieval_cache_enabled() -> bool:
+    if os.environ.get("PYTEST_CURRENT_TEST"):
+        return False
+    return _is_env_enabled(os.environ.get("RETRIEVAL_CACHE_ENABLED"), default=True)
+
+
+def _retrieval_cache_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+def _copy_retrieval(results: list[dict], rag_scores: dict | None) -> tuple[list[dict], dict | None]:
+    return [dict(item) for item in results], dict(rag_scores) if isinstance(rag_scores, dict) else rag_scores
+
+
+def _read_retrieval_cache(
+    key: tuple[str, str, int],
+    *,
+    count: bool = True,
+) -> tuple[list[dict], dict | None] | None:
+    now = time.monotonic()
+    with _retrieval_cache_lock:
+        cached = _retrieval_cache.get(key)
+        if cached is None or now - cached[0] > RETRIEVAL_CACHE_TTL_SECONDS:
+            if cached is not None:
+                del _retrieval_cache[key]
+            if count:
+                _retrieval_cache_stats["misses"] += 1
+            return None
+        _retrieval_cache.move_to_end(key)
+        if count:
+            _retrieval_cache_stats["hits"] += 1
+        return _copy_retrieval(cached[1], cached[2])
+
+
+def _write_retrieval_cache(key: tuple[str, str, int], results: list[dict], rag_scores: dict | None) -> None:
+    results, rag_scores = _copy_retrieval(results, rag_scores)
+    with _retrieval_cache_lock:
+        _retrieval_cache[key] = (time.monotonic(), results, rag_scores)
+        _retrieval_cache.move_to_end(key)
+        while len(_retrieval_cache) > RETRIEVAL_CACHE_SIZE:
+            _retrieval_cache.popitem(last=False)
+
+
+def clear_retrieval_cache() -> None:
+    with _retrieval_cache_lock:
+        _retrieval_cache.clear()
+
+
+def get_retrieval_cache_stats() -> dict:
+    stats = dict(_retrieval_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["size"] = len(_retrieval_cache)
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def _retrieval_cache_key(client_slug: str, query: str, version: int | None = None) -> tuple[str, str, int] | None:
+    if not _is_retrieval_cache_enabled():
+        return None
+    if version is None:
+        version = read_shared_knowledge_version(client_slug)
+    if version is None:
+        _retrieval_cache_stats["bypassed"] += 1
+        return None
+    return (client_slug, _retrieval_cache_query(query), version)
+
+
+def _retrieve_knowledge(
+    query: str,
+    client_slug: str,
+    timing_context: dict | None,
+) -> tuple[list[dict], dict | None, str]:
+    """
+    Vector + hybrid retrieval for query.
+
+    The source is "memo" (same message), "cache" (same query for this tenant at the current
+    knowledge version) or "search". The version is read from Redis on every lookup, so a bump
+    from ops/sync_client.py or learning_service hides older entries at once; without Redis
+    the cross-message cache is bypassed rather than risk serving pre-sync results. A result
+    built after a failed vector search is not written to that cache.
+    """
+    retrieval_context = _get_retrieval_context(timing_context)
+    if retrieval_context is not None:
+        cached = retrieval_context.get_retrieval(client_slug, query)
+        if cached is not None:
+            results, rag_scores = cached
+            return list(results), rag_scores, "memo"
+
+    cache_key = _retrieval_cache_key(client_slug, query)
+    if cache_key is not None:
+        cached = _read_retrieval_cache(cache_key)
+        if cached is not None:
+            results, rag_scores = cached
+            if retrieval_context is not None:
+                retrieval_context.store_retrieval(client_slug, query, list(results), rag_scores)
+            return results, rag_scores, "cache"
+
+    try:
+        vector_results = search_knowledge(query, client_slug, limit=3, raise_on_error=True)
+        vector_search_ok = True
+    except QdrantSearchError:
+        # Answer from BM25 alone, but keep the degraded result out of the shared cache.
+        vector_results = []
+        vector_search_ok = False
+    from app.services.intent_service import hybrid_retrieve_knowledge
+
+    results, rag_scores = hybrid_retrieve_knowledge(
+        query=query,
+        client_slug=client_slug,
+        vector_results=vector_results,
+        limit=3,
+    )
+    if retrieval_context is not None:
+        retrieval_context.store_retrieval(client_slug, query, list(results), rag_scores)
+    if cache_key is not None and vector_search_ok:
+        _write_retrieval_cache(cache_key, results, rag_scores)
+    return results, rag_scores, "search"
+
+
+def _is_rag_batch_enabled() -> bool:
+    if os.environ.get("PYTEST_CURRENT_TEST"):
+        return False
+    return _is_env_enabled(os.environ.get("RAG_BATCH_SEARCH_ENABLED"), default=True)
+
+
+def _prefetch_knowledge(queries: list[str], client_slug: str, timing_context: dict | None) -> None:
+    """
+    Retrieve the queries a message is likely to need with one batched Qdrant call.
+
+    Results go into the message memo (and the cross-message cache), so the later
+    _retrieve_knowledge calls for these queries are memo hits. Queries already in the
+    memo or the cache are left alone; a single remaining query is not worth a batch.
+    """
+    retrieval_context = _get_retrieval_context(timing_context)
+    if retrieval_context is None or not _is_rag_batch_enabled():
+        return
+    pending: list[tuple[str, tuple[str, str, int] | None]] = []
+    for query in dict.fromkeys(query for query in queries if query):
+        if retrieval_context.get_retrieval(client_slug, query) is not None:
+            continue
+        cache_key = _retrieval_cache_key(client_slug, query)
+        if cache_key is not None and _read_retrieval_cache(cache_key, count=False) is not None:
+            continue
+        pending.append((query, cache_key))
+    if len(pending) < 2:
+        return
+
+    from app.services.intent_service import hybrid_retrieve_knowledge
+
+    started = time.monotonic()
+    try:
+        vector_batches = search_knowledge_batch([query for query, _ in pending], client_slug, limit=3)
+    except Exception as exc:
+        logger.warning(f"RAG batch prefetch failed: {exc}")
+        return
+    for (query, cache_key), vector_results in zip(pending, vector_batches):
+        results, rag_scores = hybrid_retrieve_knowledge(
+            query=query,
+            client_slug=client_slug,
+            vector_results=vector_results,
+            limit=3,
+        )
+        retrieval_context.store_retrieval(client_slug, query, list(results), rag_scores)
+        if cache_key is not None:
+            _write_retrieval_cache(cache_key, results, rag_scores)
+    if timing_context is not None:
+        timing_context["rag_batch_prefetch"] = {
+            "queries": len(pending),
+            "ms": int((time.monotonic() - started) * 1000),
+        }
+
+
+def _prefetch_contextual_retrieval(
+    *,
+    db: Session,
+    conversation_id: UUID,
+    client_slug: str,
+    user_message: str,
+    query_for_rag: str,
+    timing_context: dict | None,
+    history: List[dict] | None = None,
+) -> None:
+    """
+    For follow-ups that may need the contextual retry, fetch both queries in one round-trip.
+
+    Only when the retry can still run: it needs budget for the optional stage, and a primary
+    result already in the memo or cache decides the retry on its own (the retry path then
+    fetches the contextual query itself if the score is low).
+    """
+    retrieval_context = _get_retrieval_context(timing_context)
+    if retrieval_context is None or not _is_rag_batch_enabled():
+        return
+    if not has_budget_for_optional(timing_context, "rag_retry"):
+        return
+    if retrieval_context.get_retrieval(client_slug, query_for_rag) is not None:
+        return
+    cache_key = _retrieval_cache_key(client_slug, query_for_rag)
+    if cache_key is not None and _read_retrieval_cache(cache_key, count=False) is not None:
+        return
+    history = history or _get_history_memoized(db, conversation_id, MAX_HISTORY_MESSAGES, timing_context)
+    contextual_query = _build_contextual_search_query(history, user_message)
+    if not contextual_query or contextual_query == user_message:
+        return
+    _prefetch_knowledge([query_for_rag, _sanitize_query_for_rag(contextual_query)], client_slug, timing_context)
+
+
+def _get_history_memoized(
+    db: Session,
+    conversation_id: UUID,
+    limit: int,
+    timing_context: dict | None,
+) -> List[dict]:
+    retrieval_context = _get_retrieval_context(timing_context)
+    if retrieval_context is not None:
+        cached = retrieval_context.get_history(conversation_id, limit)
+        if cached is not None:
+            timing_context["history_memo_hits"] = timing_context.get("history_memo_hits", 0) + 1
+            return cached
+    history = get_conversation_history(db, conversation_id, limit=limit)
+    if retrieval_context is not None:
+        retrieval_context.store_history(conversation_id, limit, history)
+    return history
+
+
 def _is_context_dependent_message(text: str) -> bool:
     """
     Detect short follow-up replies that often require previous context.
@@ -1409,17 +1723,18 @@ def get_rag_confidence(
     results: list[dict] = []
 
     query_for_rag = _resolve_rag_query(user_message, timing_context)
-    try:
-        rag_start = time.monotonic()
-        vector_results = search_knowledge(query_for_rag, client_slug, limit=3)
-        from app.services.intent_service import hybrid_retrieve_knowledge
-
-        results, rag_scores = hybrid_retrieve_knowledge(
-            query=query_for_rag,
+    if is_low_signal_message(user_message) or _is_context_dependent_message(user_message):
+        _prefetch_contextual_retrieval(
+            db=db,
+            conversation_id=conversation_id,
             client_slug=client_slug,
-            vector_results=vector_results,
-            limit=3,
+            user_message=user_message,
+            query_for_rag=query_for_rag,
+            timing_context=timing_context,
         )
+    try:
+        rag_start = time.monotonic()
+        results, rag_scores, rag_source = _retrieve_knowledge(query_for_rag, client_slug, timing_context)
         _log_timing(
             "rag_ms",
             (time.monotonic() - rag_start) * 1000,
@@ -1427,6 +1742,7 @@ def get_rag_confidence(
             extra={
                 "phase": "confidence",
                 "retry": False,
+                "rag_source": rag_source,
                 "query_len": len(query_for_rag),
                 "results": len(results),
             },
@@ -1438,28 +1754,25 @@ def get_rag_confidence(
             query=query_for_rag,
             results=results,
             rag_scores=rag_scores if isinstance(rag_scores, dict) else None,
+            source=rag_source,
         )
         if results:
             max_score = max(r.get("score", 0.0) for r in results)
     except Exception as exc:
         logger.warning(f"RAG confidence check failed: {exc}")
 
-    if not results or max_score < MID_CONFIDENCE_THRESHOLD:
+    if (not results or max_score < MID_CONFIDENCE_THRESHOLD) and has_budget_for_optional(
+        timing_context, "rag_retry"
+    ):
         if is_low_signal_message(user_message) or _is_context_dependent_message(user_message):
-            history = get_conversation_history(db, conversation_id, limit=MAX_HISTORY_MESSAGES)
+            history = _get_history_memoized(db, conversation_id, MAX_HISTORY_MESSAGES, timing_context)
             contextual_query = _build_contextual_search_query(history, user_message)
             if contextual_query and contextual_query != user_message:
                 contextual_query = _sanitize_query_for_rag(contextual_query)
                 try:
                     rag_start = time.monotonic()
-                    vector_results = search_knowledge(contextual_query, client_slug, limit=3)
-                    from app.services.intent_service import hybrid_retrieve_knowledge
-
-                    retry_results, rag_scores = hybrid_retrieve_knowledge(
-                        query=contextual_query,
-                        client_slug=client_slug,
-                        vector_results=vector_results,
-                        limit=3,
+                    retry_results, rag_scores, rag_source = _retrieve_knowledge(
+                        contextual_query, client_slug, timing_context
                     )
                     _log_timing(
                         "rag_ms",
@@ -1468,6 +1781,7 @@ def get_rag_confidence(
                         extra={
                             "phase": "confidence",
                             "retry": True,
+                            "rag_source": rag_source,
                             "query_len": len(contextual_query),
                             "results": len(retry_results),
                         },
@@ -1479,6 +1793,7 @@ def get_rag_confidence(
                         query=contextual_query,
                         results=retry_results,
                         rag_scores=rag_scores if isinstance(rag_scores, dict) else None,
+                        source=rag_source,
                     )
                     if retry_results:
                         retry_score = max(r.get("score", 0.0) for r in retry_results)
@@ -1490,7 +1805,20 @@ def get_rag_confidence(
     return max_score >= MID_CONFIDENCE_THRESHOLD, max_score
 
 
-def generate_ai_response(
+@dataclass(frozen=True)
+class AIGenerationRequest:
+    """A prepared LLM call: prompt messages plus what is needed to finish the result."""
+
+    client_id: UUID
+    client_slug: str
+    user_message: str
+    messages: List[dict]
+    model_name: str
+    model_tier: str
+    confidence_level: str
+
+
+def prepare_ai_generation(
     db: Session,
     client_id: UUID,
     client_slug: str,
@@ -1499,14 +1827,12 @@ def generate_ai_response(
     append_user_message: bool = True,
     pending_hint: bool = False,
     timing_context: dict | None = None,
-) -> Result[Tuple[Optional[str], str]]:
+) -> Result[Tuple[Optional[str], str]] | AIGenerationRequest:
     """
-    Generate AI response using LLM with knowledge base.
+    Everything before the LLM call: shortcuts, RAG, confidence, LLM cache, prompt.
 
-    Returns Result with tuple:
-    - (response_text, "high") — уверенный ответ
-    - (response_text, "medium") — ответ с умеренной уверенностью
-    - (None, "low_confidence") — нужна эскалация
+    Returns the final Result when no LLM call is needed, otherwise the request to send.
+    All DB and retrieval work happens here, so the LLM call itself can run on the loop.
     """
     if is_greeting_message(user_message):
         return Result.success((GREETING_RESPONSE, "medium"))
@@ -1524,7 +1850,7 @@ def generate_ai_response(
     history: List[dict] | None = None
     if is_low_signal_message(user_message):
         if _is_short_confirmation(user_message):
-            history = get_conversation_history(db, conversation_id, limit=10)
+            history = _get_history_memoized(db, conversation_id, 10, timing_context)
             last_assistant = _get_last_assistant_message(history)
             if last_assistant and _assistant_expects_yes_no(last_assistant):
                 followup_confirmation = True
@@ -1549,18 +1875,22 @@ def generate_ai_response(
         knowledge_results = []
         max_score = 0.0
         query_for_rag = _resolve_rag_query(user_message, timing_context)
+        if not is_whitelisted_message(user_message) and (
+            followup_confirmation or _is_context_dependent_message(user_message)
+        ):
+            _prefetch_contextual_retrieval(
+                db=db,
+                conversation_id=conversation_id,
+                client_slug=client_slug,
+                user_message=user_message,
+                query_for_rag=query_for_rag,
+                timing_context=timing_context,
+                history=history,
+            )
 
         try:
             rag_start = time.monotonic()
-            vector_results = search_knowledge(query_for_rag, client_slug, limit=3)
-            from app.services.intent_service import hybrid_retrieve_knowledge
-
-            knowledge_results, rag_scores = hybrid_retrieve_knowledge(
-                query=query_for_rag,
-                client_slug=client_slug,
-                vector_results=vector_results,
-                limit=3,
-            )
+            knowledge_results, rag_scores, rag_source = _retrieve_knowledge(query_for_rag, client_slug, timing_context)
             _log_timing(
                 "rag_ms",
                 (time.monotonic() - rag_start) * 1000,
@@ -1568,6 +1898,7 @@ def generate_ai_response(
                 extra={
                     "phase": "generate",
                     "retry": False,
+                    "rag_source": rag_source,
                     "query_len": len(query_for_rag),
                     "results": len(knowledge_results),
                 },
@@ -1579,6 +1910,7 @@ def generate_ai_response(
                 query=query_for_rag,
                 results=knowledge_results,
                 rag_scores=rag_scores if isinstance(rag_scores, dict) else None,
+                source=rag_source,
             )
             if knowledge_results:
                 max_score = max(r.get("score", 0) for r in knowledge_results)
@@ -1588,10 +1920,14 @@ def generate_ai_response(
         whitelisted = is_whitelisted_message(user_message)
 
         # 2.1 If query is a short follow-up and knowledge is weak, retry RAG with recent context.
-        if not whitelisted and (not knowledge_results or max_score < MID_CONFIDENCE_THRESHOLD):
+        if (
+            not whitelisted
+            and (not knowledge_results or max_score < MID_CONFIDENCE_THRESHOLD)
+            and has_budget_for_optional(timing_context, "rag_retry")
+        ):
             if followup_confirmation or _is_context_dependent_message(user_message):
-                history_for_query = history or get_conversation_history(
-                    db, conversation_id, limit=MAX_HISTORY_MESSAGES
+                history_for_query = history or _get_history_memoized(
+                    db, conversation_id, MAX_HISTORY_MESSAGES, timing_context
                 )
                 contextual_query = _build_contextual_search_query(history_for_query, user_message)
 
@@ -1599,14 +1935,8 @@ def generate_ai_response(
                     contextual_query = _sanitize_query_for_rag(contextual_query)
                     try:
                         rag_start = time.monotonic()
-                        vector_results = search_knowledge(contextual_query, client_slug, limit=3)
-                        from app.services.intent_service import hybrid_retrieve_knowledge
-
-                        retry_results, rag_scores = hybrid_retrieve_knowledge(
-                            query=contextual_query,
-                            client_slug=client_slug,
-                            vector_results=vector_results,
-                            limit=3,
+                        retry_results, rag_scores, rag_source = _retrieve_knowledge(
+                            contextual_query, client_slug, timing_context
                         )
                         _log_timing(
                             "rag_ms",
@@ -1615,6 +1945,7 @@ def generate_ai_response(
                             extra={
                                 "phase": "generate",
                                 "retry": True,
+                                "rag_source": rag_source,
                                 "query_len": len(contextual_query),
                                 "results": len(retry_results),
                             },
@@ -1626,6 +1957,7 @@ def generate_ai_response(
                             query=contextual_query,
                             results=retry_results,
                             rag_scores=rag_scores if isinstance(rag_scores, dict) else None,
+                            source=rag_source,
                         )
                         if retry_results:
                             retry_score = max(r.get("score", 0) for r in retry_results)
@@ -1686,7 +2018,7 @@ def generate_ai_response(
         messages.append({"role": "system", "content": full_system})
 
         # 5. Add conversation history (last 10 messages for context)
-        history = history or get_conversation_history(db, conversation_id, limit=MAX_HISTORY_MESSAGES)
+        history = history or _get_history_memoized(db, conversation_id, MAX_HISTORY_MESSAGES, timing_context)
         messages.extend(history)
 
         # 6. Add current user message (if not already in history)
@@ -1694,59 +2026,184 @@ def generate_ai_response(
             if not history or history[-1].get("content") != user_message:
                 messages.append({"role": "user", "content": user_message})
 
-        # 7. Generate response
-        llm = get_llm_provider()
-        logger.debug(f"Calling LLM with {len(messages)} messages")
-        llm_start = time.monotonic()
-        try:
-            if timing_context is not None:
-                timing_context["llm_used"] = True
-            response = llm.generate(
-                messages,
-                temperature=1.0,
-                max_tokens=LLM_MAX_TOKENS,
-                timeout_seconds=LLM_TIMEOUT_SECONDS,
-                model=model_name,
-            )
-        except httpx.TimeoutException as exc:
-            if timing_context is not None:
-                timing_context["llm_timeout"] = True
-            _log_timing(
-                "llm_ms",
-                (time.monotonic() - llm_start) * 1000,
-                timing_context=timing_context,
-                extra={
-                    "phase": "generate",
-                    "messages": len(messages),
-                    "model_name": model_name,
-                    "model_tier": model_tier,
-                    "timeout": True,
-                    "timeout_seconds": LLM_TIMEOUT_SECONDS,
-                },
-            )
-            logger.warning(f"LLM timeout after {LLM_TIMEOUT_SECONDS}s: {exc}")
-            return Result.success((None, "low_confidence"))
-        if timing_context is not None:
-            timing_context["llm_timeout"] = False
-        _log_timing(
-            "llm_ms",
-            (time.monotonic() - llm_start) * 1000,
-            timing_context=timing_context,
-            extra={
-                "phase": "generate",
-                "messages": len(messages),
-                "model_name": model_name,
-                "model_tier": model_tier,
-                "timeout": False,
-            },
+        return AIGenerationRequest(
+            client_id=client_id,
+            client_slug=client_slug,
+            user_message=user_message,
+            messages=messages,
+            model_name=model_name,
+            model_tier=model_tier,
+            confidence_level=confidence_level,
         )
-        logger.debug(f"LLM response: {response.content[:100] if response.content else 'EMPTY'}...")
-
-        if response.content:
-            _write_llm_cache(user_message, client_slug, response.content, confidence_level)
-        return Result.success((response.content, confidence_level))
 
     except Exception as e:
-        logger.error(f"AI generation error: {e}", exc_info=True)
-        alert_error("AI generation failed", {"client_id": str(client_id), "error": str(e)})
-        return Result.failure(str(e), "ai_error")
+        return _generation_failure(client_id, e)
+
+
+def _generation_failure(client_id: UUID, exc: Exception) -> Result[Tuple[Optional[str], str]]:
+    logger.error(f"AI generation error: {exc}", exc_info=True)
+    alert_error("AI generation failed", {"client_id": str(client_id), "error": str(exc)})
+    return Result.failure(str(exc), "ai_error")
+
+
+def _log_llm_timing(
+    request: AIGenerationRequest,
+    llm_start: float,
+    timing_context: dict | None,
+    *,
+    timeout_seconds: float | None = None,
+) -> None:
+    extra = {
+        "phase": "generate",
+        "messages": len(request.messages),
+        "model_name": request.model_name,
+        "model_tier": request.model_tier,
+        "timeout": timeout_seconds is not None,
+    }
+    if timeout_seconds is not None:
+        extra["timeout_seconds"] = timeout_seconds
+    _log_timing("llm_ms", (time.monotonic() - llm_start) * 1000, timing_context=timing_context, extra=extra)
+
+
+def _llm_timeout_result(
+    request: AIGenerationRequest,
+    llm_start: float,
+    timing_context: dict | None,
+    timeout_seconds: float,
+    exc: Exception,
+) -> Result[Tuple[Optional[str], str]]:
+    if timing_context is not None:
+        timing_context["llm_timeout"] = True
+    _log_llm_timing(request, llm_start, timing_context, timeout_seconds=timeout_seconds)
+    logger.warning(f"LLM timeout after {timeout_seconds}s: {exc}")
+    return Result.success((None, "low_confidence"))
+
+
+def _llm_response_result(
+    request: AIGenerationRequest,
+    response,
+    llm_start: float,
+    timing_context: dict | None,
+) -> Result[Tuple[Optional[str], str]]:
+    if timing_context is not None:
+        timing_context["llm_timeout"] = False
+    _log_llm_timing(request, llm_start, timing_context)
+    logger.debug(f"LLM response: {response.content[:100] if response.content else 'EMPTY'}...")
+
+    if response.content:
+        _write_llm_cache(request.user_message, request.client_slug, response.content, request.confidence_level)
+    return Result.success((response.content, request.confidence_level))
+
+
+def _start_llm_call(request: AIGenerationRequest, timing_context: dict | None) -> tuple[float, float]:
+    logger.debug(f"Calling LLM with {len(request.messages)} messages")
+    if timing_context is not None:
+        timing_context["llm_used"] = True
+    return budget_timeout(timing_context, LLM_TIMEOUT_SECONDS), time.monotonic()
+
+
+def generate_prepared_response(
+    request: AIGenerationRequest,
+    timing_context: dict | None = None,
+) -> Result[Tuple[Optional[str], str]]:
+    """Blocking LLM call for a prepared request."""
+    timeout_seconds, llm_start = _start_llm_call(request, timing_context)
+    try:
+        response = get_llm_provider().generate(
+            request.messages,
+            temperature=1.0,
+            max_tokens=LLM_MAX_TOKENS,
+            timeout_seconds=timeout_seconds,
+            model=request.model_name,
+        )
+    except httpx.TimeoutException as exc:
+        return _llm_timeout_result(request, llm_start, timing_context, timeout_seconds, exc)
+    except Exception as exc:
+        return _generation_failure(request.client_id, exc)
+    return _llm_response_result(request, response, llm_start, timing_context)
+
+
+async def agenerate_prepared_response(
+    request: AIGenerationRequest,
+    timing_context: dict | None = None,
+) -> Result[Tuple[Optional[str], str]]:
+    """
+    LLM call for a prepared request, awaited on the loop.
+
+    Cancelling the awaiting task cancels the HTTP request, so a reply that is no longer
+    needed (budget spent, deterministic reply sent) stops costing tokens and a connection.
+    """
+    timeout_seconds, llm_start = _start_llm_call(request, timing_context)
+    try:
+        response = await get_llm_provider().agenerate(
+            request.messages,
+            temperature=1.0,
+            max_tokens=LLM_MAX_TOKENS,
+            timeout_seconds=timeout_seconds,
+            model=request.model_name,
+        )
+    except httpx.TimeoutException as exc:
+        return _llm_timeout_result(request, llm_start, timing_context, timeout_seconds, exc)
+    except Exception as exc:
+        return _generation_failure(request.client_id, exc)
+    return _llm_response_result(request, response, llm_start, timing_context)
+
+
+def generate_ai_response(
+    db: Session,
+    client_id: UUID,
+    client_slug: str,
+    conversation_id: UUID,
+    user_message: str,
+    append_user_message: bool = True,
+    pending_hint: bool = False,
+    timing_context: dict | None = None,
+) -> Result[Tuple[Optional[str], str]]:
+    """
+    Generate AI response using LLM with knowledge base.
+
+    Returns Result with tuple:
+    - (response_text, "high") — уверенный ответ
+    - (response_text, "medium") — ответ с умеренной уверенностью
+    - (None, "low_confidence") — нужна эскалация
+    """
+    prepared = prepare_ai_generation(
+        db,
+        client_id,
+        client_slug,
+        conversation_id,
+        user_message,
+        append_user_message=append_user_message,
+        pending_hint=pending_hint,
+        timing_context=timing_context,
+    )
+    if isinstance(prepared, Result):
+        return prepared
+    return generate_prepared_response(prepared, timing_context)
+
+
+async def agenerate_ai_response(
+    db: Session,
+    client_id: UUID,
+    client_slug: str,
+    conversation_id: UUID,
+    user_message: str,
+    append_user_message: bool = True,
+    pending_hint: bool = False,
+    timing_context: dict | None = None,
+) -> Result[Tuple[Optional[str], str]]:
+    """generate_ai_response with the preparation in the blocking pool and a cancellable LLM call."""
+    prepared = await run_blocking(
+        prepare_ai_generation,
+        db,
+        client_id,
+        client_slug,
+        conversation_id,
+        user_message,
+        append_user_message=append_user_message,
+        pending_hint=pending_hint,
+        timing_context=timing_context,
+    )
+    if isinstance(prepared, Result):
+        return prepared
+    return await agenerate_prepared_response(prepared, timing_context)
@@ -6,6 +6,7 @@ from typing import Optional
 import httpx
 
 from app.logging_config import get_logger
+from app.services.http_clients import http_client
 
 logger = get_logger("alert_service")
 
@@ -37,7 +38,7 @@ def send_alert(level: str, message: str, context: Optional[dict] = None) -> bool
         text += f"\n\n```\n{context_str}\n```"
 
     try:
-        with httpx.Client(timeout=10) as client:
+        with http_client("telegram", timeout=10) as client:
             response = client.post(
                 f"https://api.telegram.org/bot{ALERT_BOT_TOKEN}/sendMessage",
                 json={"chat_id": ALERT_CHAT_ID, "text": text, "parse_mode": "Markdown"},
@@ -0,0 +1,254 @@
+"""In-process BM25 index over a client's truffles_knowledge payloads."""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from app.logging_config import get_logger
+from app.services.http_clients import http_client
+from app.services.knowledge_service import get_knowledge_version
+
+logger = get_logger("bm25_index")
+
+QDRANT_HOST = os.environ.get("QDRANT_HOST", "http://qdrant:6333")
+QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY")
+QDRANT_COLLECTION = os.environ.get("QDRANT_COLLECTION", "truffles_knowledge")
+
+RAG_BM25_MAX_DOCS = int(os.environ.get("RAG_BM25_MAX_DOCS", "200"))
+RAG_BM25_TIMEOUT_SECONDS = float(os.environ.get("RAG_BM25_TIMEOUT_SECONDS", "0.8"))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize_for_bm25(text: str) -> list[str]:
+    if not text:
+        return []
+    tokens = re.findall(r"[\w]+", text.casefold())
+    return [token for token in tokens if len(token) > 1]
+
+
+def fetch_bm25_corpus(client_slug: str, *, max_docs: int) -> list[dict]:
+    if not client_slug or max_docs <= 0:
+        return []
+    headers = {"api-key": QDRANT_API_KEY} if QDRANT_API_KEY else None
+    points: list[dict] = []
+    offset = None
+    limit = min(100, max_docs)
+    with http_client("qdrant", timeout=RAG_BM25_TIMEOUT_SECONDS) as client:
+        while len(points) < max_docs:
+            payload = {
+                "limit": limit,
+                "with_payload": True,
+                "with_vectors": False,
+                "filter": {"must": [{"key": "metadata.client_slug", "match": {"value": client_slug}}]},
+            }
+            if offset is not None:
+                payload["offset"] = offset
+            response = client.post(
+                f"{QDRANT_HOST}/collections/{QDRANT_COLLECTION}/points/scroll",
+                headers=headers,
+                json=payload,
+            )
+            if response.status_code != 200:
+                # A partial corpus would be cached for the whole knowledge version: fail the build.
+                raise RuntimeError(f"BM25 scroll failed: {response.status_code} for {client_slug}")
+            data = response.json().get("result") or {}
+            batch = data.get("points") or []
+            points.extend(batch)
+            offset = data.get("next_page_offset")
+            if not offset or not batch:
+                break
+            limit = min(100, max_docs - len(points))
+    return points[:max_docs]
+
+
+@dataclass
+class BM25Index:
+    """Inverted index with postings, per-document lengths and idf, versioned per client."""
+
+    client_slug: str
+    version: int
+    docs: list[dict] = field(default_factory=list)
+    doc_lens: list[int] = field(default_factory=list)
+    postings: dict[str, list[tuple[int, int]]] = field(default_factory=dict)
+    idf: dict[str, float] = field(default_factory=dict)
+    doc_ids: dict[str, int] = field(default_factory=dict)
+    total_len: int = 0
+    doc_count: int = 0
+    built_at: float = 0.0
+
+    @property
+    def avg_len(self) -> float:
+        return self.total_len / max(self.doc_count, 1)
+
+    def _append(self, point_id: Any, text: str, metadata: dict | None) -> bool:
+        tokens = tokenize_for_bm25(text)
+        if not tokens:
+            return False
+        key = str(point_id) if point_id is not None else None
+        if key is not None and key in self.doc_ids:
+            # Qdrant upsert replaced an existing point: drop the old postings first.
+            self._remove(self.doc_ids[key])
+        doc_index = len(self.docs)
+        metadata = metadata or {}
+        self.docs.append(
+            {
+                "id": point_id,
+                "text": text,
+                "source": metadata.get("doc_name"),
+                "metadata": metadata,
+            }
+        )
+        self.doc_lens.append(len(tokens))
+        self.total_len += len(tokens)
+        self.doc_count += 1
+        tf: dict[str, int] = {}
+        for token in tokens:
+            tf[token] = tf.get(token, 0) + 1
+        for token, freq in tf.items():
+            self.postings.setdefault(token, []).append((doc_index, freq))
+        if key is not None:
+            self.doc_ids[key] = doc_index
+        return True
+
+    def _remove(self, doc_index: int) -> None:
+        # Tombstone keeps doc indexes stable for the remaining postings.
+        self.total_len -= self.doc_lens[doc_index]
+        self.doc_count -= 1
+        self.doc_lens[doc_index] = 0
+        self.docs[doc_index] = {}
+        for term in list(self.postings):
+            remaining = [entry for entry in self.postings[term] if entry[0] != doc_index]
+            if remaining:
+                self.postings[term] = remaining
+            else:
+                del self.postings[term]
+
+    def _refresh_idf(self) -> None:
+        self.idf = {
+            term: math.log((self.doc_count - len(entries) + 0.5) / (len(entries) + 0.5) + 1)
+            for term, entries in self.postings.items()
+        }
+
+    def add_points(self, points: Iterable[dict]) -> int:
+        """Index Qdrant-shaped points ({"id", "payload": {"content", "metadata"}})."""
+        added = 0
+        for point in points:
+            payload = point.get("payload") or {}
+            if self._append(point.get("id"), payload.get("content") or "", payload.get("metadata") or {}):
+                added += 1
+        self._refresh_idf()
+        return added
+
+    def search(self, query: str, *, limit: int) -> list[dict]:
+        query_tokens = tokenize_for_bm25(query)
+        if not query_tokens or not self.doc_count:
+            return []
+        avg_len = max(self.avg_len, 1)
+        scores: dict[int, float] = {}
+        for term in query_tokens:
+            entries = self.postings.get(term)
+            if not entries:
+                continue
+            idf = self.idf.get(term, 0.0)
+            for doc_index, freq in entries:
+                dl = self.doc_lens[doc_index]
+                denom = freq + BM25_K1 * (1 - BM25_B + BM25_B * (dl / avg_len))
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * (
+                    (freq * (BM25_K1 + 1)) / max(denom, 1e-9)
+                )
+        ranked = sorted(
+            ((doc_index, score) for doc_index, score in scores.items() if score > 0),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        results: list[dict] = []
+        for doc_index, score in ranked[: max(limit, 1)]:
+            meta = dict(self.docs[doc_index])
+            meta["bm25_score"] = score
+            results.append(meta)
+        return results
+
+
+_indexes: dict[str, BM25Index] = {}
+_indexes_lock = threading.Lock()
+# One build lock per client: a slow Qdrant scroll for one client must not block the others.
+_build_locks: dict[str, threading.Lock] = {}
+
+
+def build_bm25_index(client_slug: str, *, version: int | None = None) -> BM25Index:
+    build_start = time.monotonic()
+    if version is None:
+        version = get_knowledge_version(client_slug)
+    corpus = fetch_bm25_corpus(client_slug, max_docs=RAG_BM25_MAX_DOCS)
+    index = BM25Index(client_slug=client_slug, version=version)
+    index.add_points(corpus)
+    index.built_at = time.time()
+    logger.info(
+        "BM25 index built",
+        extra={
+            "context": {
+                "client_slug": client_slug,
+                "version": version,
+                "docs": index.doc_count,
+                "terms": len(index.postings),
+                "elapsed_ms": round((time.monotonic() - build_start) * 1000, 2),
+            }
+        },
+    )
+    return index
+
+
+def get_bm25_index(client_slug: str) -> BM25Index | None:
+    """Return the cached index for the client, rebuilding it when the knowledge version moved."""
+    if not client_slug:
+        return None
+    version = get_knowledge_version(client_slug)
+    index = _indexes.get(client_slug)
+    if index is not None and index.version == version:
+        return index
+    with _indexes_lock:
+        build_lock = _build_locks.setdefault(client_slug, threading.Lock())
+    with build_lock:
+        index = _indexes.get(client_slug)
+        if index is not None and index.version == version:
+            return index
+        # Raises on a failed scroll, so nothing is cached and the next message retries.
+        index = build_bm25_index(client_slug, version=version)
+        with _indexes_lock:
+            _indexes[client_slug] = index
+    return index
+
+
+def apply_points_to_bm25_index(client_slug: str, points: list[dict], *, version: int) -> bool:
+    """
+    Incrementally index points just written by this process.
+
+    `version` is the knowledge version after the write. The patch is applied only when the
+    cached index was current right before it; otherwise the index is dropped and rebuilt lazily.
+    """
+    with _indexes_lock:
+        index = _indexes.get(client_slug)
+        if index is None:
+            return False
+        if index.version != version - 1:
+            _indexes.pop(client_slug, None)
+            return False
+        index.add_points(points)
+        index.version = version
+    return True
+
+
+def invalidate_bm25_index(client_slug: str | None = None) -> None:
+    with _indexes_lock:
+        if client_slug is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(client_slug, None)
@@ -6,12 +6,12 @@ from typing import Optional
 from urllib.parse import quote
 from uuid import UUID
 
-import httpx
 from sqlalchemy.orm import Session
 
 from app.logging_config import get_logger
 from app.models import Client
 from app.services.alert_service import alert_critical
+from app.services.http_clients import http_client
 
 logger = get_logger("chatflow_service")
 
@@ -82,7 +82,7 @@ def send_whatsapp_message(
         }
         if idempotency_key:
             params["msg_id"] = idempotency_key
-        with httpx.Client(timeout=30.0) as client:
+        with http_client("chatflow") as client:
             response = client.get(CHATFLOW_API_URL, params=params)
             logger.info(
                 f"ChatFlow response: status={response.status_code}, jid={remote_jid}, body={response.text[:200]}"
@@ -192,7 +192,7 @@ def send_whatsapp_media(
             params["caption"] = " "
 
     try:
-        with httpx.Client(timeout=timeout_seconds) as client:
+        with http_client("chatflow", timeout=timeout_seconds) as client:
             response = client.get(url, params=params)
             logger.info(
                 f"ChatFlow media response: status={response.status_code}, jid={remote_jid}, body={response.text[:200]}"
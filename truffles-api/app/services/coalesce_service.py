@@ -0,0 +1,163 @@
+"""Adaptive per-conversation coalescing window for the outbox."""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from statistics import median
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.logging_config import get_logger
+
+logger = get_logger("coalesce_service")
+
+# Gaps longer than this are separate turns, not a typing burst.
+BURST_GAP_SECONDS = 20.0
+DEFAULT_BURST_GAP_SECONDS = 3.0
+HISTORY_LIMIT = 20
+SHORT_MESSAGE_CHARS = 20
+
+TERMINAL_RE = re.compile(r"[?？!.)]\s*$|[\U0001F300-\U0001FAFF]\s*$")
+CONTINUATION_RE = re.compile(r"([,:;\-–—…]|\.\.\.|\bи|\bа|\bно|\bили|\bеще|\bещё)\s*$", re.IGNORECASE)
+GREETING_RE = re.compile(
+    r"^(привет|здравствуйте|здравствуй|добрый\s+(день|вечер|утро)|доброе\s+утро|салем|сәлем|hello|hi)[\s!.,)]*$",
+    re.IGNORECASE,
+)
+
+
+def _is_env_enabled(value: str | None, default: bool = True) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def get_coalesce_settings() -> tuple[bool, float, float]:
+    enabled = _is_env_enabled(os.environ.get("OUTBOX_COALESCE_ADAPTIVE"), default=True)
+    max_seconds = max(float(os.environ.get("OUTBOX_COALESCE_SECONDS", "8")), 0.0)
+    min_seconds = float(os.environ.get("OUTBOX_COALESCE_MIN_SECONDS", "1"))
+    min_seconds = min(max(min_seconds, 0.0), max_seconds)
+    return enabled, min_seconds, max_seconds
+
+
+def get_coalesce_max_wait_seconds() -> float | None:
+    """Hard upper bound from a conversation's first queued message to its claim."""
+    enabled, _, max_seconds = get_coalesce_settings()
+    if not enabled:
+        return None
+    raw = float(os.environ.get("OUTBOX_COALESCE_MAX_WAIT_SECONDS", "15"))
+    return max(raw, max_seconds)
+
+
+@dataclass
+class CoalesceDecision:
+    seconds: float
+    reason: str
+    typical_gap: float | None = None
+    in_burst: bool = False
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def decide_coalesce_seconds(
+    message_text: str | None,
+    *,
+    message_type: str | None = None,
+    history: list[tuple[datetime, int]] | None = None,
+    now: datetime,
+    min_seconds: float,
+    max_seconds: float,
+) -> CoalesceDecision:
+    """
+    Decide how long to wait for more messages before answering this one.
+
+    history is the conversation's recent inbound (created_at, text length), newest first.
+    Signals: terminal punctuation, greeting/continuation fragments, the user's usual
+    message length, their usual gap inside a burst, and whether a burst is in progress.
+    """
+    history = sorted(history or [], key=lambda item: item[0])
+    burst_gaps = []
+    for previous, current in zip(history, history[1:]):
+        gap = (current[0] - previous[0]).total_seconds()
+        if 0 <= gap <= BURST_GAP_SECONDS:
+            burst_gaps.append(gap)
+    typical_gap = _percentile(burst_gaps, 0.75) if len(burst_gaps) >= 3 else None
+    expected_gap = typical_gap if typical_gap is not None else DEFAULT_BURST_GAP_SECONDS
+
+    last_gap = (now - history[-1][0]).total_seconds() if history else None
+    in_burst = last_gap is not None and 0 <= last_gap <= BURST_GAP_SECONDS
+    lengths = [length for _, length in history if length]
+    chunky_user = len(lengths) >= 3 and median(lengths) < SHORT_MESSAGE_CHARS
+
+    text_value = (message_text or "").strip()
+    kind = (message_type or "text").strip().lower()
+
+    if kind and kind != "text":
+        seconds, reason = min_seconds * 2, "media"
+    elif not text_value or GREETING_RE.match(text_value) or CONTINUATION_RE.search(text_value):
+        seconds, reason = expected_gap + 1.0, "fragment"
+    elif TERMINAL_RE.search(text_value) and (len(text_value) >= 8 or not chunky_user):
+        if in_burst:
+            seconds, reason = expected_gap * 0.5, "complete_in_burst"
+        else:
+            seconds, reason = min_seconds, "complete"
+    elif len(text_value) < SHORT_MESSAGE_CHARS or chunky_user:
+        seconds, reason = expected_gap + 0.5, "short_open"
+    else:
+        seconds, reason = expected_gap, "open"
+
+    seconds = min(max(seconds, min_seconds), max_seconds)
+    return CoalesceDecision(seconds=round(seconds, 2), reason=reason, typical_gap=typical_gap, in_burst=in_burst)
+
+
+def load_coalesce_history(db: Session, conversation_id, *, limit: int = HISTORY_LIMIT) -> list[tuple[datetime, int]]:
+    rows = db.execute(
+        text(
+            """
+            SELECT created_at, COALESCE(LENGTH(payload_json->'body'->>'message'), 0) AS text_len
+            FROM outbox_messages
+            WHERE conversation_id = :conversation_id
+            ORDER BY created_at DESC
+            LIMIT :limit
+            """
+        ),
+        {"conversation_id": conversation_id, "limit": limit},
+    ).all()
+    return [(row[0], int(row[1] or 0)) for row in rows if isinstance(row[0], datetime)]
+
+
+def plan_coalesce_window(
+    db: Session,
+    conversation_id,
+    message_text: str | None,
+    *,
+    message_type: str | None,
+    now: datetime,
+) -> CoalesceDecision | None:
+    """Adaptive delay for a new outbox message; None keeps the fixed OUTBOX_COALESCE_SECONDS."""
+    enabled, min_seconds, max_seconds = get_coalesce_settings()
+    if not enabled or conversation_id is None:
+        return None
+    try:
+        # Savepoint: a failed lookup must not leave the caller's transaction aborted
+        # before it inserts the outbox row.
+        with db.begin_nested():
+            history = load_coalesce_history(db, conversation_id)
+    except Exception as exc:
+        logger.warning("Coalesce history unavailable", extra={"context": {"error": str(exc)}})
+        return None
+    return decide_coalesce_seconds(
+        message_text,
+        message_type=message_type,
+        history=history,
+        now=now,
+        min_seconds=min_seconds,
+        max_seconds=max_seconds,
+    )
@@ -1,25 +1,35 @@
 from __future__ import annotations
 
 import hashlib
+import json
 import math
 import os
 import re
+import threading
 from dataclasses import dataclass
 from datetime import datetime, time, timezone
 from functools import lru_cache
 from pathlib import Path
+from time import perf_counter
 from typing import Any
 from zoneinfo import ZoneInfo
 
-import httpx
 import yaml
 
 from app.logging_config import get_logger
-from app.services.knowledge_service import get_embedding
+from app.services.http_clients import http_client
+from app.services.knowledge_service import EMBEDDING_MODEL_ID, get_embedding
+from app.services.services_index import search_local_services_index, truth_file_hash
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None
 
 _DEMO_SALON_DIR = Path(__file__).resolve().parents[1] / "knowledge" / "demo_salon"
 _TRUTH_PATH = _DEMO_SALON_DIR / "SALON_TRUTH.yaml"
 _INTENTS_PATH = _DEMO_SALON_DIR / "INTENTS_PHRASES_DEMO_SALON.yaml"
+_QUESTION_TYPE_ARTIFACT_PATH = _DEMO_SALON_DIR / "question_type_embeddings.json"
 _SERVICES_COLLECTION = "services_index"
 
 _SERVICE_MATCH_THRESHOLD = float(os.environ.get("SERVICE_SEMANTIC_MATCH_THRESHOLD", "0.40"))
@@ -890,6 +900,14 @@ def _coerce_embedding(raw: Any) -> list[float] | None:
         return None
 
 
+@lru_cache(maxsize=8192)
+def _trigram_slot(gram: str, dim: int) -> tuple[int, float]:
+    digest = hashlib.sha256(gram.encode("utf-8")).digest()
+    bucket = int.from_bytes(digest[:4], "little") % dim
+    sign = 1.0 if digest[4] % 2 == 0 else -1.0
+    return bucket, sign
+
+
 def _local_text_embedding(text: str, dim: int = 64) -> list[float]:
     normalized = _normalize_text(text)
     if not normalized:
@@ -902,9 +920,7 @@ def _local_text_embedding(text: str, dim: int = 64) -> list[float]:
         grams.append(normalized)
     vector = [0.0] * dim
     for gram in grams:
-        digest = hashlib.sha256(gram.encode("utf-8")).digest()
-        bucket = int.from_bytes(digest[:4], "little") % dim
-        sign = 1.0 if digest[4] % 2 == 0 else -1.0
+        bucket, sign = _trigram_slot(gram, dim)
         vector[bucket] += sign
     norm = math.sqrt(sum(value * value for value in vector))
     if norm:
@@ -912,9 +928,61 @@ def _local_text_embedding(text: str, dim: int = 64) -> list[float]:
     return vector
 
 
+def _truth_version() -> str | None:
+    return truth_file_hash(_TRUTH_PATH)
+
+
+def _load_question_type_artifact(truth_version: str | None) -> dict[str, list[float]]:
+    """Persisted example vectors by phrase, if built from this truth file with this embedding model."""
+    if not truth_version:
+        return {}
+    try:
+        artifact = json.loads(_QUESTION_TYPE_ARTIFACT_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except Exception as exc:
+        logger.warning("question_type artifact unreadable", extra={"context": {"error": str(exc)}})
+        return {}
+    if (
+        not isinstance(artifact, dict)
+        or artifact.get("truth_sha256") != truth_version
+        or artifact.get("model_id") != EMBEDDING_MODEL_ID
+    ):
+        logger.info("question_type artifact is stale, embedding examples live")
+        return {}
+
+    vectors: dict[str, list[float]] = {}
+    examples = artifact.get("examples")
+    for items in (examples.values() if isinstance(examples, dict) else []):
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            vector = _coerce_embedding(item.get("vector"))
+            if isinstance(item.get("text"), str) and vector:
+                vectors[item["text"]] = vector
+    return vectors
+
+
+def _save_question_type_artifact(truth_version: str, examples: dict[str, list[tuple[str, list[float]]]]) -> None:
+    artifact = {
+        "truth_sha256": truth_version,
+        "model_id": EMBEDDING_MODEL_ID,
+        "examples": {
+            kind: [{"text": text, "vector": vector} for text, vector in items] for kind, items in examples.items()
+        },
+    }
+    tmp_path = _QUESTION_TYPE_ARTIFACT_PATH.with_name(f"{_QUESTION_TYPE_ARTIFACT_PATH.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(artifact, handle, ensure_ascii=False)
+    os.replace(tmp_path, _QUESTION_TYPE_ARTIFACT_PATH)
+
+
 @lru_cache(maxsize=4)
-def _question_type_embeddings(use_fallback: bool) -> dict[str, list[list[float]]]:
+def _question_type_embeddings(use_fallback: bool, truth_version: str | None = None) -> dict[str, list[list[float]]]:
+    # BGE vectors come from the artifact written by ops/sync_client.py (or by startup warmup);
+    # only phrases missing from it are embedded live.
     examples = _question_type_examples()
+    persisted = {} if use_fallback else _load_question_type_artifact(truth_version)
     embeddings: dict[str, list[list[float]]] = {}
     for kind, phrases in examples.items():
         vectors: list[list[float]] = []
@@ -922,6 +990,8 @@ def _question_type_embeddings(use_fallback: bool) -> dict[str, list[list[float]]
             vector: list[float] | None = None
             if use_fallback:
                 vector = _local_text_embedding(phrase)
+            elif phrase in persisted:
+                vector = persisted[phrase]
             else:
                 try:
                     vector = _coerce_embedding(get_embedding(phrase))
@@ -934,6 +1004,160 @@ def _question_type_embeddings(use_fallback: bool) -> dict[str, list[list[float]]
     return embeddings
 
 
+@dataclass(frozen=True)
+class QuestionTypeMatrix:
+    """All example vectors stacked into one pre-normalized float32 matrix, rows grouped by kind."""
+
+    kinds: tuple[str, ...]
+    starts: Any
+    matrix: Any
+
+    @classmethod
+    def build(cls, embeddings: dict[str, list[list[float]]]) -> "QuestionTypeMatrix | None":
+        if np is None or not embeddings:
+            return None
+        kinds = tuple(embeddings)
+        rows = [vector for kind in kinds for vector in embeddings[kind]]
+        if len({len(vector) for vector in rows}) != 1:
+            return None
+        matrix = np.asarray(rows, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0
+        sizes = [len(embeddings[kind]) for kind in kinds]
+        starts = np.cumsum([0, *sizes[:-1]])
+        return cls(kinds=kinds, starts=starts, matrix=np.ascontiguousarray(matrix / norms))
+
+    def scores(self, query_vector: list[float], include_kinds: set[str]) -> dict[str, float] | None:
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape != (self.matrix.shape[1],):
+            return None
+        norm = float(np.linalg.norm(query))
+        if norm == 0.0:
+            return {kind: 0.0 for kind in self.kinds if kind in include_kinds}
+        best = np.maximum.reduceat(self.matrix @ (query / norm), self.starts)
+        return {kind: max(float(score), 0.0) for kind, score in zip(self.kinds, best) if kind in include_kinds}
+
+
+_question_type_matrices: dict[bool, tuple[dict[str, list[list[float]]], QuestionTypeMatrix | None]] = {}
+
+
+def _question_type_matrix(
+    use_fallback: bool,
+    embeddings: dict[str, list[list[float]]],
+) -> QuestionTypeMatrix | None:
+    # Rebuilt only when the cached embeddings object changes (new truth version or cache_clear).
+    cached = _question_type_matrices.get(use_fallback)
+    if cached is not None and cached[0] is embeddings:
+        return cached[1]
+    matrix = QuestionTypeMatrix.build(embeddings)
+    _question_type_matrices[use_fallback] = (embeddings, matrix)
+    return matrix
+
+
+_question_type_warmup: dict[str, Any] = {"state": "idle"}
+_question_type_warmup_lock = threading.Lock()
+
+
+def get_question_type_warmup_status() -> dict[str, Any]:
+    return dict(_question_type_warmup)
+
+
+def warm_question_type_embeddings() -> dict[str, Any]:
+    """Fill the example-embedding cache (and its matrix) before the first message needs it.
+
+    Vectors come from the on-disk artifact when it matches the current truth hash and
+    embedding model; otherwise they are embedded live and the artifact is rewritten so
+    the next restart starts warm.
+    """
+    started = perf_counter()
+    _question_type_warmup.update({"state": "running"})
+    try:
+        truth_version = _truth_version()
+        examples = _question_type_examples()
+        persisted = _load_question_type_artifact(truth_version)
+        phrases = [phrase for items in examples.values() for phrase in items]
+        missing = [phrase for phrase in phrases if phrase not in persisted]
+        embeddings = _question_type_embeddings(False, truth_version)
+        _question_type_matrix(False, embeddings)
+
+        complete = all(len(embeddings.get(kind, [])) == len(items) for kind, items in examples.items())
+        if not complete:
+            # BGE may still be starting: do not pin a partial set, let the next message retry.
+            _question_type_embeddings.cache_clear()
+        persisted_now = False
+        if missing and complete and truth_version:
+            try:
+                _save_question_type_artifact(
+                    truth_version,
+                    {kind: list(zip(items, embeddings.get(kind, []))) for kind, items in examples.items()},
+                )
+                persisted_now = True
+            except OSError as exc:
+                logger.warning("question_type artifact write failed", extra={"context": {"error": str(exc)}})
+        status = {
+            "state": "ready" if complete else "partial",
+            "source": "artifact" if not missing else "live",
+            "examples": sum(len(vectors) for vectors in embeddings.values()),
+            "embedded_live": len(missing),
+            "artifact_written": persisted_now,
+            "model_id": EMBEDDING_MODEL_ID,
+            "seconds": round(perf_counter() - started, 3),
+        }
+    except Exception as exc:
+        status = {"state": "failed", "error": str(exc), "seconds": round(perf_counter() - started, 3)}
+        logger.warning("question_type warmup failed", extra={"context": {"error": str(exc)}})
+    _question_type_warmup.clear()
+    _question_type_warmup.update(status)
+    logger.info("question_type warmup finished", extra={"context": dict(status)})
+    return dict(status)
+
+
+def _is_env_enabled(value: str | None, default: bool = True) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def start_question_type_warmup() -> bool:
+    """Run the warmup on a daemon thread; /health reports its progress."""
+    if os.environ.get("PYTEST_CURRENT_TEST") or not _is_env_enabled(os.environ.get("QUESTION_TYPE_WARMUP_ENABLED")):
+        _question_type_warmup.update({"state": "disabled"})
+        return False
+    with _question_type_warmup_lock:
+        if _question_type_warmup.get("state") in {"pending", "running"}:
+            return False
+        _question_type_warmup.clear()
+        _question_type_warmup.update({"state": "pending"})
+    thread = threading.Thread(target=warm_question_type_embeddings, name="question-type-warmup", daemon=True)
+    thread.start()
+    return True
+
+
+def _question_type_scores(
+    query_vector: list[float],
+    use_fallback: bool,
+    embeddings: dict[str, list[list[float]]],
+    include_kinds: set[str],
+) -> dict[str, float]:
+    """Best cosine score per kind: one matmul with NumPy, pairwise loop without it."""
+    matrix = _question_type_matrix(use_fallback, embeddings)
+    if matrix is not None:
+        scores = matrix.scores(query_vector, include_kinds)
+        if scores is not None:
+            return scores
+    scores: dict[str, float] = {}
+    for kind, vectors in embeddings.items():
+        if kind not in include_kinds:
+            continue
+        best = 0.0
+        for vector in vectors:
+            score = _cosine_similarity(query_vector, vector)
+            if score > best:
+                best = score
+        scores[kind] = best
+    return scores
+
+
 def _cosine_similarity(vector_a: list[float], vector_b: list[float]) -> float:
     if not vector_a or not vector_b:
         return 0.0
@@ -974,11 +1198,12 @@ def semantic_question_type(
             extra={"context": {"error": error_detail or "embedding_unavailable"}},
         )
 
-    examples = _question_type_embeddings(use_fallback)
+    truth_version = _truth_version()
+    examples = _question_type_embeddings(use_fallback, truth_version)
     if not examples and not use_fallback:
         use_fallback = True
         query_vector = _local_text_embedding(text)
-        examples = _question_type_embeddings(True)
+        examples = _question_type_embeddings(True, truth_version)
         logger.warning(
             "question_type fallback to local embedding",
             extra={"context": {"error": "no_examples_with_bge"}},
@@ -986,16 +1211,7 @@ def semantic_question_type(
     if not examples:
         return None
 
-    scores: dict[str, float] = {}
-    for kind, vectors in examples.items():
-        if kind not in include_kinds:
-            continue
-        best = 0.0
-        for vector in vectors:
-            score = _cosine_similarity(query_vector, vector)
-            if score > best:
-                best = score
-        scores[kind] = best
+    scores = _question_type_scores(query_vector, use_fallback, examples, include_kinds)
 
     if not scores:
         return [] if return_multi else None
@@ -1028,17 +1244,8 @@ def semantic_question_type(
 
     if not use_fallback:
         fallback_vector = _local_text_embedding(text)
-        fallback_examples = _question_type_embeddings(True)
-        fallback_scores: dict[str, float] = {}
-        for kind, vectors in fallback_examples.items():
-            if kind not in include_kinds:
-                continue
-            best = 0.0
-            for vector in vectors:
-                score = _cosine_similarity(fallback_vector, vector)
-                if score > best:
-                    best = score
-            fallback_scores[kind] = best
+        fallback_examples = _question_type_embeddings(True, truth_version)
+        fallback_scores = _question_type_scores(fallback_vector, True, fallback_examples, include_kinds)
         picked_fallback = _pick_types(fallback_scores)
         if return_multi:
             return picked_fallback
@@ -1177,12 +1384,16 @@ def _search_services_index(text: str, client_slug: str, limit: int) -> list[dict
         logger.warning("services_index embedding failed", extra={"context": {"error": str(exc)}})
         return []
 
+    local_results = search_local_services_index(client_slug, embedding, limit)
+    if local_results is not None:
+        return local_results
+
     headers = {}
     if _QDRANT_API_KEY:
         headers["api-key"] = _QDRANT_API_KEY
 
     try:
-        with httpx.Client(timeout=15.0) as client:
+        with http_client("qdrant", timeout=15.0) as client:
             response = client.post(
                 f"{_QDRANT_HOST}/collections/{_SERVICES_COLLECTION}/points/search",
                 headers=headers,
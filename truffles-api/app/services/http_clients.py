@@ -0,0 +1,203 @@
+"""
+Process-wide pooled HTTP clients, one per upstream.
+
+Each upstream (Qdrant, BGE embeddings, OpenAI, ChatFlow, Telegram, ...) gets its own
+keep-alive pool with its own timeout and limits, so repeated calls reuse TCP/TLS
+connections instead of paying a handshake per request. HTTP/2 is used where the
+upstream supports it and the optional `h2` package is installed.
+
+Call sites use the context managers so that pooling can be switched off
+(HTTP_POOL_ENABLED=0, and always under pytest): then a fresh client is opened and
+closed per call, exactly as before.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator
+
+import httpx
+
+from app.logging_config import get_logger
+
+logger = get_logger("http_clients")
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    timeout: float
+    max_connections: int
+    max_keepalive: int
+    http2: bool = False
+
+
+UPSTREAMS: dict[str, UpstreamConfig] = {
+    "qdrant": UpstreamConfig(timeout=30.0, max_connections=32, max_keepalive=16),
+    "embeddings": UpstreamConfig(timeout=30.0, max_connections=32, max_keepalive=16),
+    "openai": UpstreamConfig(timeout=60.0, max_connections=32, max_keepalive=16, http2=True),
+    "elevenlabs": UpstreamConfig(timeout=10.0, max_connections=8, max_keepalive=4, http2=True),
+    "chatflow": UpstreamConfig(timeout=30.0, max_connections=16, max_keepalive=8),
+    "telegram": UpstreamConfig(timeout=30.0, max_connections=16, max_keepalive=8, http2=True),
+    "media": UpstreamConfig(timeout=15.0, max_connections=8, max_keepalive=4),
+}
+DEFAULT_UPSTREAM = UpstreamConfig(timeout=30.0, max_connections=8, max_keepalive=4)
+
+_clients: dict[str, httpx.Client] = {}
+_async_clients: dict[str, tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+_closing_tasks: set[asyncio.Task] = set()
+_clients_lock = threading.Lock()
+
+
+def _is_env_enabled(value: str | None, default: bool = True) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _is_pool_enabled() -> bool:
+    if os.environ.get("PYTEST_CURRENT_TEST"):
+        return False
+    return _is_env_enabled(os.environ.get("HTTP_POOL_ENABLED"), default=True)
+
+
+def _is_http2_available() -> bool:
+    if not _is_env_enabled(os.environ.get("HTTP2_ENABLED"), default=True):
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def get_upstream_config(upstream: str) -> UpstreamConfig:
+    return UPSTREAMS.get(upstream, DEFAULT_UPSTREAM)
+
+
+def _build_client_kwargs(upstream: str) -> dict:
+    config = get_upstream_config(upstream)
+    keepalive_seconds = float(os.environ.get("HTTP_POOL_KEEPALIVE_SECONDS", "30"))
+    return {
+        "timeout": config.timeout,
+        "limits": httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive,
+            keepalive_expiry=keepalive_seconds,
+        ),
+        "http2": config.http2 and _is_http2_available(),
+    }
+
+
+class _TimeoutBoundClient:
+    """Pooled client view that applies a per-call-site timeout to every request."""
+
+    _REQUEST_METHODS = {"request", "stream", "get", "post", "put", "patch", "delete", "head", "options"}
+
+    def __init__(self, client: httpx.Client | httpx.AsyncClient, timeout: float):
+        self._client = client
+        self._timeout = timeout
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if name not in self._REQUEST_METHODS:
+            return attr
+
+        def bound(*args, **kwargs):
+            kwargs.setdefault("timeout", self._timeout)
+            return attr(*args, **kwargs)
+
+        return bound
+
+
+def get_http_client(upstream: str) -> httpx.Client:
+    client = _clients.get(upstream)
+    if client is not None and not client.is_closed:
+        return client
+    with _clients_lock:
+        client = _clients.get(upstream)
+        if client is None or client.is_closed:
+            client = httpx.Client(**_build_client_kwargs(upstream))
+            _clients[upstream] = client
+    return client
+
+
+async def _aclose_quietly(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except Exception as exc:
+        logger.warning("HTTP client close failed", extra={"context": {"error": str(exc)}})
+
+
+def _close_replaced_async_client(client_loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> None:
+    """Close a client left behind by another loop; its connections belong to that loop."""
+    if client.is_closed:
+        return
+    if client_loop.is_running():
+        asyncio.run_coroutine_threadsafe(_aclose_quietly(client), client_loop)
+        return
+    loop = asyncio.get_running_loop()
+    task = loop.create_task(_aclose_quietly(client))
+    _closing_tasks.add(task)
+    task.add_done_callback(_closing_tasks.discard)
+
+
+def get_async_http_client(upstream: str) -> httpx.AsyncClient:
+    """Pooled async client for the running event loop (re-created if the loop changed)."""
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(upstream)
+    if entry is not None and entry[0] is loop and not entry[1].is_closed:
+        return entry[1]
+    client = httpx.AsyncClient(**_build_client_kwargs(upstream))
+    _async_clients[upstream] = (loop, client)
+    if entry is not None and entry[0] is not loop:
+        _close_replaced_async_client(*entry)
+    return client
+
+
+@contextmanager
+def http_client(upstream: str, *, timeout: float | None = None) -> Iterator[httpx.Client]:
+    """
+    Yield a client for the upstream.
+
+    timeout overrides the upstream default for this call site only.
+    """
+    if not _is_pool_enabled():
+        with httpx.Client(timeout=timeout if timeout is not None else get_upstream_config(upstream).timeout) as client:
+            yield client
+        return
+    client = get_http_client(upstream)
+    yield _TimeoutBoundClient(client, timeout) if timeout is not None else client
+
+
+@asynccontextmanager
+async def async_http_client(upstream: str, *, timeout: float | None = None) -> AsyncIterator[httpx.AsyncClient]:
+    if not _is_pool_enabled():
+        async with httpx.AsyncClient(
+            timeout=timeout if timeout is not None else get_upstream_config(upstream).timeout
+        ) as client:
+            yield client
+        return
+    client = get_async_http_client(upstream)
+    yield _TimeoutBoundClient(client, timeout) if timeout is not None else client
+
+
+async def close_http_clients() -> None:
+    """Close every pooled client; called on app/worker shutdown."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as exc:
+            logger.warning("HTTP client close failed", extra={"context": {"error": str(exc)}})
+
+    loop = asyncio.get_running_loop()
+    async_clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client_loop, client in async_clients:
+        if client_loop is loop:
+            await _aclose_quietly(client)
+        else:
+            _close_replaced_async_client(client_loop, client)
@@ -1,4 +1,3 @@
-import math
 import os
 import re
 import time
@@ -14,16 +13,14 @@ from app.services.ai_service import (
     get_llm_provider,
     normalize_for_matching,
 )
+from app.services.bm25_index import get_bm25_index, tokenize_for_bm25
+from app.services.latency_budget import budget_timeout
 
 logger = get_logger("intent_service")
 
-QDRANT_HOST = os.environ.get("QDRANT_HOST", "http://qdrant:6333")
 QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY")
-QDRANT_COLLECTION = os.environ.get("QDRANT_COLLECTION", "truffles_knowledge")
 
 RAG_BM25_LIMIT = int(os.environ.get("RAG_BM25_LIMIT", "5"))
-RAG_BM25_MAX_DOCS = int(os.environ.get("RAG_BM25_MAX_DOCS", "200"))
-RAG_BM25_TIMEOUT_SECONDS = float(os.environ.get("RAG_BM25_TIMEOUT_SECONDS", "0.8"))
 RAG_HYBRID_VECTOR_WEIGHT = float(os.environ.get("RAG_HYBRID_VECTOR_WEIGHT", "0.6"))
 RAG_HYBRID_BM25_WEIGHT = float(os.environ.get("RAG_HYBRID_BM25_WEIGHT", "0.4"))
 
@@ -153,7 +150,7 @@ def is_frustration_message(message: str) -> bool:
     return any(pattern.search(normalized) for pattern in FRUSTRATION_PATTERNS)
 
 
-def classify_intent(message: str) -> Intent:
+def classify_intent(message: str, timing_context: dict | None = None) -> Intent:
     """Classify user message intent using LLM."""
     try:
         if is_opt_out_message(message):
@@ -170,6 +167,7 @@ def classify_intent(message: str) -> Intent:
         prompt = CLASSIFY_PROMPT.format(message=message)
         messages = [{"role": "user", "content": prompt}]
 
+        timeout_seconds = budget_timeout(timing_context, INTENT_TIMEOUT_SECONDS)
         llm_start = time.monotonic()
         try:
             response = llm.generate(
@@ -177,7 +175,7 @@ def classify_intent(message: str) -> Intent:
                 temperature=1.0,
                 max_tokens=100,
                 model=FAST_MODEL,
-                timeout_seconds=INTENT_TIMEOUT_SECONDS,
+                timeout_seconds=timeout_seconds,
             )
         except httpx.TimeoutException as exc:
             logger.info(
@@ -189,11 +187,11 @@ def classify_intent(message: str) -> Intent:
                         "model_name": FAST_MODEL,
                         "model_tier": "fast",
                         "timeout": True,
-                        "timeout_seconds": INTENT_TIMEOUT_SECONDS,
+                        "timeout_seconds": timeout_seconds,
                     }
                 },
             )
-            logger.warning(f"Intent LLM timeout after {INTENT_TIMEOUT_SECONDS}s: {exc}")
+            logger.warning(f"Intent LLM timeout after {timeout_seconds}s: {exc}")
             return Intent.OTHER
 
         logger.info(
@@ -461,123 +459,17 @@ def is_strong_out_of_domain(
     return strong, meta
 
 
-def _tokenize_for_bm25(text: str) -> list[str]:
-    if not text:
-        return []
-    tokens = re.findall(r"[\w]+", text.casefold())
-    return [token for token in tokens if len(token) > 1]
-
-
-def _fetch_bm25_corpus(client_slug: str, *, max_docs: int) -> list[dict]:
-    if not client_slug or max_docs <= 0:
-        return []
-    headers = {"api-key": QDRANT_API_KEY} if QDRANT_API_KEY else None
-    points: list[dict] = []
-    offset = None
-    limit = min(100, max_docs)
-    with httpx.Client(timeout=RAG_BM25_TIMEOUT_SECONDS) as client:
-        while len(points) < max_docs:
-            payload = {
-                "limit": limit,
-                "with_payload": True,
-                "with_vectors": False,
-                "filter": {"must": [{"key": "metadata.client_slug", "match": {"value": client_slug}}]},
-            }
-            if offset is not None:
-                payload["offset"] = offset
-            response = client.post(
-                f"{QDRANT_HOST}/collections/{QDRANT_COLLECTION}/points/scroll",
-                headers=headers,
-                json=payload,
-            )
-            if response.status_code != 200:
-                logger.warning(
-                    "BM25 scroll failed",
-                    extra={"context": {"status": response.status_code, "client_slug": client_slug}},
-                )
-                break
-            data = response.json().get("result") or {}
-            batch = data.get("points") or []
-            points.extend(batch)
-            offset = data.get("next_page_offset")
-            if not offset or not batch:
-                break
-            limit = min(100, max_docs - len(points))
-    return points[:max_docs]
-
-
 def _bm25_search(query: str, client_slug: str) -> list[dict]:
-    query_tokens = _tokenize_for_bm25(query)
-    if not query_tokens:
+    if not tokenize_for_bm25(query):
         return []
     try:
-        corpus = _fetch_bm25_corpus(client_slug, max_docs=RAG_BM25_MAX_DOCS)
+        index = get_bm25_index(client_slug)
     except Exception as exc:
-        logger.warning(f"BM25 corpus fetch failed: {exc}")
+        logger.warning(f"BM25 index build failed: {exc}")
         return []
-    if not corpus:
-        return []
-
-    doc_tokens: list[list[str]] = []
-    doc_meta: list[dict] = []
-    for point in corpus:
-        payload = point.get("payload") or {}
-        text = payload.get("content") or ""
-        tokens = _tokenize_for_bm25(text)
-        if not tokens:
-            continue
-        doc_tokens.append(tokens)
-        doc_meta.append(
-            {
-                "id": point.get("id"),
-                "text": text,
-                "source": payload.get("metadata", {}).get("doc_name"),
-                "metadata": payload.get("metadata", {}),
-            }
-        )
-
-    if not doc_tokens:
-        return []
-
-    doc_count = len(doc_tokens)
-    avg_len = sum(len(tokens) for tokens in doc_tokens) / max(doc_count, 1)
-    df: dict[str, int] = {}
-    for tokens in doc_tokens:
-        for token in set(tokens):
-            df[token] = df.get(token, 0) + 1
-
-    k1 = 1.5
-    b = 0.75
-    scores: list[tuple[int, float]] = []
-    for idx, tokens in enumerate(doc_tokens):
-        dl = len(tokens)
-        tf: dict[str, int] = {}
-        for token in tokens:
-            tf[token] = tf.get(token, 0) + 1
-        score = 0.0
-        for term in query_tokens:
-            term_df = df.get(term, 0)
-            if term_df == 0:
-                continue
-            idf = math.log((doc_count - term_df + 0.5) / (term_df + 0.5) + 1)
-            freq = tf.get(term, 0)
-            if freq == 0:
-                continue
-            denom = freq + k1 * (1 - b + b * (dl / max(avg_len, 1)))
-            score += idf * ((freq * (k1 + 1)) / max(denom, 1e-9))
-        if score > 0:
-            scores.append((idx, score))
-
-    if not scores:
+    if index is None:
         return []
-    scores.sort(key=lambda item: item[1], reverse=True)
-    top = scores[: max(RAG_BM25_LIMIT, 1)]
-    results: list[dict] = []
-    for idx, score in top:
-        meta = dict(doc_meta[idx])
-        meta["bm25_score"] = score
-        results.append(meta)
-    return results
+    return index.search(query, limit=RAG_BM25_LIMIT)
 
 
 def hybrid_retrieve_knowledge(
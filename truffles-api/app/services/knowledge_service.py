@@ -1,10 +1,18 @@
+import array
+import hashlib
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from typing import List
 
 import httpx
 
 from app.logging_config import get_logger
 from app.services.alert_service import alert_warning
+from app.services.http_clients import http_client
+from app.services.qdrant_batch import QdrantSearchError, VectorQuery, search_batch
 
 logger = get_logger("knowledge_service")
 
@@ -12,11 +20,129 @@ QDRANT_HOST = os.environ.get("QDRANT_HOST", "http://qdrant:6333")
 QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY")
 QDRANT_COLLECTION = "truffles_knowledge"
 BGE_M3_URL = os.environ.get("BGE_M3_URL", "http://bge-m3:80/embed")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://truffles_redis_1:6379/0")
+KNOWLEDGE_VERSION_PREFIX = "truffles:knowledge_version"
+KNOWLEDGE_VERSION_TTL_SECONDS = float(os.environ.get("KNOWLEDGE_VERSION_TTL_SECONDS", "2"))
+KNOWLEDGE_REDIS_SOCKET_TIMEOUT_SECONDS = float(os.environ.get("KNOWLEDGE_REDIS_SOCKET_TIMEOUT_SECONDS", "0.3"))
+EMBEDDING_MODEL_ID = os.environ.get("EMBEDDING_MODEL_ID", "bge-m3")
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.environ.get("EMBEDDING_CACHE_TTL_SECONDS", "604800"))
+EMBEDDING_CACHE_PREFIX = "truffles:embedding"
 
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover
+    redis = None
 
-def get_embedding(text: str) -> List[float]:
+_knowledge_redis_client = None
+_knowledge_redis_url = None
+_version_lock = threading.Lock()
+# client_slug -> (version, fetched_at monotonic)
+_knowledge_versions: dict[str, tuple[int, float]] = {}
+
+_embedding_cache: OrderedDict[str, List[float]] = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+_embedding_cache_stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "errors": 0}
+
+
+def _is_env_enabled(value: str | None, default: bool = True) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _get_knowledge_redis():
+    """Shared raw-bytes Redis client for knowledge versions and the embedding cache."""
+    global _knowledge_redis_client, _knowledge_redis_url
+    if redis is None:
+        return None
+    if os.environ.get("PYTEST_CURRENT_TEST"):
+        return None
+    if _knowledge_redis_client is None or _knowledge_redis_url != REDIS_URL:
+        _knowledge_redis_url = REDIS_URL
+        _knowledge_redis_client = redis.Redis.from_url(
+            REDIS_URL,
+            socket_timeout=KNOWLEDGE_REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_connect_timeout=KNOWLEDGE_REDIS_SOCKET_TIMEOUT_SECONDS,
+        )
+    return _knowledge_redis_client
+
+
+def _knowledge_version_key(client_slug: str) -> str:
+    return f"{KNOWLEDGE_VERSION_PREFIX}:{client_slug}"
+
+
+def get_knowledge_version(client_slug: str, *, max_age_seconds: float | None = None) -> int:
+    """
+    Return the knowledge change counter for a client.
+
+    The counter lives in Redis so that writers in other processes (ops/sync_client.py)
+    are visible here; reads are cached in-process for max_age_seconds.
+    """
+    if not client_slug:
+        return 0
+    max_age = KNOWLEDGE_VERSION_TTL_SECONDS if max_age_seconds is None else max_age_seconds
+    now = time.monotonic()
+    cached = _knowledge_versions.get(client_slug)
+    if cached and max_age > 0 and now - cached[1] < max_age:
+        return cached[0]
+
+    local_version = cached[0] if cached else 0
+    cache = _get_knowledge_redis()
+    if cache is None:
+        _knowledge_versions[client_slug] = (local_version, now)
+        return local_version
+    try:
+        raw = cache.get(_knowledge_version_key(client_slug))
+        version = int(raw) if raw else 0
+    except Exception as exc:
+        logger.warning(f"Knowledge version read failed: {exc}")
+        version = local_version
+    _knowledge_versions[client_slug] = (version, now)
+    return version
+
+
+def read_shared_knowledge_version(client_slug: str) -> int | None:
+    """
+    Fresh knowledge version from Redis, or None when Redis cannot be read.
+
+    Unlike get_knowledge_version there is no local fallback: callers that must never
+    serve data from before a cross-process write (ops sync) treat None as "unknown".
+    """
+    cache = _get_knowledge_redis()
+    if not client_slug or cache is None:
+        return None
+    try:
+        raw = cache.get(_knowledge_version_key(client_slug))
+    except Exception as exc:
+        logger.warning(f"Knowledge version read failed: {exc}")
+        return None
+    version = int(raw) if raw else 0
+    _knowledge_versions[client_slug] = (version, time.monotonic())
+    return version
+
+
+def bump_knowledge_version(client_slug: str) -> int:
+    """Increment the knowledge change counter after writing points for a client."""
+    if not client_slug:
+        return 0
+    with _version_lock:
+        cached = _knowledge_versions.get(client_slug)
+        version = (cached[0] if cached else 0) + 1
+        cache = _get_knowledge_redis()
+        if cache is not None:
+            try:
+                version = int(cache.incr(_knowledge_version_key(client_slug)))
+            except Exception as exc:
+                logger.warning(f"Knowledge version bump failed: {exc}")
+        _knowledge_versions[client_slug] = (version, time.monotonic())
+    logger.info("Knowledge version bumped", extra={"context": {"client_slug": client_slug, "version": version}})
+    return version
+
+
+def _fetch_embedding(text: str) -> List[float]:
     """Get embedding from BGE-M3 service."""
-    with httpx.Client(timeout=30.0) as client:
+    with http_client("embeddings") as client:
         response = client.post(BGE_M3_URL, json={"inputs": text})
         if response.status_code != 200:
             raise Exception(f"BGE-M3 error: {response.status_code} - {response.text}")
@@ -28,19 +154,129 @@ def get_embedding(text: str) -> List[float]:
         return data.get("embedding") or data.get("embeddings") or data
 
 
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Embed several texts in one BGE-M3 request (bulk indexing; bypasses the query cache)."""
+    if not texts:
+        return []
+    with http_client("embeddings") as client:
+        response = client.post(BGE_M3_URL, json={"inputs": texts})
+        if response.status_code != 200:
+            raise Exception(f"BGE-M3 error: {response.status_code} - {response.text}")
+        data = response.json()
+    if not isinstance(data, list) or len(data) != len(texts) or not all(isinstance(item, list) for item in data):
+        raise Exception(f"BGE-M3 returned {len(data) if isinstance(data, list) else 'no'} vectors for {len(texts)} texts")
+    return data
+
+
+def _is_embedding_cache_enabled() -> bool:
+    if os.environ.get("PYTEST_CURRENT_TEST"):
+        return False
+    return EMBEDDING_CACHE_SIZE > 0 and _is_env_enabled(os.environ.get("EMBEDDING_CACHE_ENABLED"), default=True)
+
+
+def _normalize_embedding_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def _build_embedding_cache_key(text: str, model_id: str = EMBEDDING_MODEL_ID) -> str:
+    digest = hashlib.sha256(f"{model_id}:{_normalize_embedding_text(text)}".encode("utf-8")).hexdigest()
+    return f"{EMBEDDING_CACHE_PREFIX}:{model_id}:{digest}"
+
+
+def _remember_embedding(key: str, vector: List[float]) -> None:
+    with _embedding_cache_lock:
+        _embedding_cache[key] = vector
+        _embedding_cache.move_to_end(key)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+
+def _read_redis_embedding(key: str) -> List[float] | None:
+    if not _is_env_enabled(os.environ.get("EMBEDDING_CACHE_REDIS_ENABLED"), default=True):
+        return None
+    cache = _get_knowledge_redis()
+    if cache is None:
+        return None
+    try:
+        raw = cache.get(key)
+    except Exception as exc:
+        _embedding_cache_stats["errors"] += 1
+        logger.warning(f"Embedding cache read failed: {exc}")
+        return None
+    if not raw:
+        return None
+    return array.array("f", raw).tolist()
+
+
+def _write_redis_embedding(key: str, vector: List[float]) -> None:
+    if not _is_env_enabled(os.environ.get("EMBEDDING_CACHE_REDIS_ENABLED"), default=True):
+        return
+    cache = _get_knowledge_redis()
+    if cache is None:
+        return
+    try:
+        cache.setex(key, EMBEDDING_CACHE_TTL_SECONDS, array.array("f", vector).tobytes())
+    except Exception as exc:
+        _embedding_cache_stats["errors"] += 1
+        logger.warning(f"Embedding cache write failed: {exc}")
+
+
+def get_embedding(text: str) -> List[float]:
+    """
+    Get embedding for text, going through the in-process LRU and the Redis tier.
+
+    One inbound message embeds the same text from several places (RAG confidence,
+    generation, question type, services index); only the first call reaches BGE-M3.
+    """
+    if not _is_embedding_cache_enabled():
+        return _fetch_embedding(text)
+
+    key = _build_embedding_cache_key(text)
+    with _embedding_cache_lock:
+        cached = _embedding_cache.get(key)
+        if cached is not None:
+            _embedding_cache.move_to_end(key)
+            _embedding_cache_stats["local_hits"] += 1
+            return cached
+
+    cached = _read_redis_embedding(key)
+    if cached:
+        _embedding_cache_stats["redis_hits"] += 1
+        _remember_embedding(key, cached)
+        return cached
+
+    _embedding_cache_stats["misses"] += 1
+    vector = _fetch_embedding(text)
+    if isinstance(vector, list) and vector and all(isinstance(value, (int, float)) for value in vector):
+        _remember_embedding(key, vector)
+        _write_redis_embedding(key, vector)
+    return vector
+
+
+def get_embedding_cache_stats() -> dict:
+    stats = dict(_embedding_cache_stats)
+    lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+    stats["size"] = len(_embedding_cache)
+    stats["hit_rate"] = round((stats["local_hits"] + stats["redis_hits"]) / lookups, 4) if lookups else 0.0
+    stats["model_id"] = EMBEDDING_MODEL_ID
+    return stats
+
+
 def search_knowledge(
     query: str,
     client_slug: str,
     limit: int = 5,
     score_threshold: float = 0.45,
+    *,
+    raise_on_error: bool = False,
 ) -> List[dict]:
-    """Search knowledge base in Qdrant."""
+    """Search knowledge base in Qdrant; with raise_on_error a failed search raises QdrantSearchError."""
 
     # Get embedding for query
     embedding = get_embedding(query)
 
     # Search in Qdrant
-    with httpx.Client(timeout=30.0) as client:
+    with http_client("qdrant") as client:
         response = client.post(
             f"{QDRANT_HOST}/collections/{QDRANT_COLLECTION}/points/search",
             headers={"api-key": QDRANT_API_KEY},
@@ -56,26 +292,61 @@ def search_knowledge(
         if response.status_code != 200:
             logger.error(f"Qdrant search error: {response.status_code} - {response.text}")
             alert_warning("Qdrant search failed", {"status": response.status_code, "query": query[:50]})
+            if raise_on_error:
+                raise QdrantSearchError(f"Qdrant search failed: {response.status_code}")
             return []
 
         data = response.json()
         results = []
 
         for point in data.get("result", []):
-            payload = point.get("payload", {})
-            results.append(
-                {
-                    "score": point.get("score"),
-                    "text": payload.get("content"),  # content field in Qdrant
-                    "source": payload.get("metadata", {}).get("doc_name"),
-                    "metadata": payload.get("metadata", {}),
-                }
-            )
+            results.append(_to_knowledge_result(point))
 
         logger.info(f"Knowledge search: found {len(results)} results for '{query[:30]}...'")
         return results
 
 
+def _to_knowledge_result(point: dict) -> dict:
+    payload = point.get("payload", {})
+    return {
+        "score": point.get("score"),
+        "text": payload.get("content"),  # content field in Qdrant
+        "source": payload.get("metadata", {}).get("doc_name"),
+        "metadata": payload.get("metadata", {}),
+    }
+
+
+def search_knowledge_batch(
+    queries: List[str],
+    client_slug: str,
+    limit: int = 5,
+    score_threshold: float = 0.45,
+) -> List[List[dict]]:
+    """
+    search_knowledge for several queries in one Qdrant round-trip; results in query order.
+
+    A failed search raises QdrantSearchError instead of returning empty results.
+    """
+    client_filter = {"must": [{"key": "metadata.client_slug", "match": {"value": client_slug}}]}
+    vector_queries = [
+        VectorQuery(
+            collection=QDRANT_COLLECTION,
+            vector=get_embedding(query),
+            limit=limit,
+            filter=client_filter,
+            score_threshold=score_threshold,
+        )
+        for query in queries
+    ]
+    batches = search_batch(vector_queries)
+    results = [[_to_knowledge_result(point) for point in points] for points in batches]
+    logger.info(
+        "Knowledge batch search",
+        extra={"context": {"client_slug": client_slug, "queries": len(queries), "results": [len(r) for r in results]}},
+    )
+    return results
+
+
 def format_knowledge_context(results: List[dict]) -> str:
     """Format knowledge search results for LLM context."""
     if not results:
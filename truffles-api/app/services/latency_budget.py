@@ -0,0 +1,145 @@
+"""
+Per-message latency budget.
+
+A message gets one overall deadline (MESSAGE_BUDGET_SECONDS), started when the
+webhook handler begins and shortened by the time the message already spent in the
+outbox queue after it became ready. The deadline rides in `timing_context` as a
+MessageBudget under the private `_budget` key, so it is threaded to every stage that
+already receives the context; the logged fields are plain values written once at start.
+Enrichment threads share the context with the event loop, so nothing here adds keys
+to it after start: skips go into the pre-created list under the budget's lock.
+
+Downstream calls derive their timeout from what is left (`budget_timeout`) and
+optional stages (query rewrites, contextual RAG retry) are skipped once the
+remainder drops below MESSAGE_BUDGET_OPTIONAL_MIN_SECONDS (`has_budget_for_optional`).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from app.logging_config import get_logger
+
+logger = get_logger("latency_budget")
+
+BUDGET_KEY = "_budget"
+BUDGET_SECONDS_KEY = "budget_seconds"
+QUEUE_WAIT_KEY = "budget_queue_wait_seconds"
+SKIPPED_KEY = "budget_skipped"
+
+
+def _is_env_enabled(value: str | None, default: bool = True) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _coerce_seconds(raw: str | None, default: float) -> float:
+    try:
+        value = float(raw) if raw is not None else default
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, value)
+
+
+def get_message_budget_settings() -> tuple[bool, float, float, float]:
+    enabled = _is_env_enabled(os.environ.get("MESSAGE_BUDGET_ENABLED"), default=True)
+    budget_seconds = _coerce_seconds(os.environ.get("MESSAGE_BUDGET_SECONDS"), 20.0)
+    optional_min_seconds = _coerce_seconds(os.environ.get("MESSAGE_BUDGET_OPTIONAL_MIN_SECONDS"), 4.0)
+    min_call_seconds = _coerce_seconds(os.environ.get("MESSAGE_BUDGET_MIN_CALL_SECONDS"), 2.0)
+    return enabled, budget_seconds, optional_min_seconds, min_call_seconds
+
+
+class MessageBudget:
+    """Deadline of one message and the optional stages skipped for it (thread-safe)."""
+
+    def __init__(self, deadline_at: float, skipped: list[str]) -> None:
+        self.deadline_at = deadline_at
+        self.skipped = skipped
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return self.deadline_at - time.monotonic()
+
+    def record_skip(self, stage: str) -> None:
+        with self._lock:
+            if stage not in self.skipped:
+                self.skipped.append(stage)
+
+
+def start_message_budget(timing_context: dict, *, queued_seconds: float = 0.0) -> None:
+    """Attach the message deadline to timing_context, minus time already spent queued."""
+    enabled, budget_seconds, _, _ = get_message_budget_settings()
+    if not enabled or budget_seconds <= 0:
+        return
+    queued = max(0.0, float(queued_seconds or 0.0))
+    skipped: list[str] = []
+    timing_context[BUDGET_KEY] = MessageBudget(time.monotonic() + budget_seconds - queued, skipped)
+    timing_context[BUDGET_SECONDS_KEY] = budget_seconds
+    timing_context[QUEUE_WAIT_KEY] = round(queued, 3)
+    timing_context[SKIPPED_KEY] = skipped
+
+
+def fork_message_budget(timing_context: dict) -> None:
+    """In a copied context, keep the deadline but record skips into the copy's own list."""
+    budget = _get_budget(timing_context)
+    if budget is None:
+        return
+    skipped = list(timing_context.get(SKIPPED_KEY) or [])
+    timing_context[BUDGET_KEY] = MessageBudget(budget.deadline_at, skipped)
+    timing_context[SKIPPED_KEY] = skipped
+
+
+def _get_budget(timing_context: dict | None) -> MessageBudget | None:
+    if not timing_context:
+        return None
+    budget = timing_context.get(BUDGET_KEY)
+    return budget if isinstance(budget, MessageBudget) else None
+
+
+def remaining_budget(timing_context: dict | None) -> float | None:
+    """Seconds left before the message deadline, or None when no budget is attached."""
+    budget = _get_budget(timing_context)
+    if budget is None:
+        return None
+    return budget.remaining()
+
+
+def budget_timeout(timing_context: dict | None, default_seconds: float) -> float:
+    """
+    Timeout for a downstream call: its own default, capped by the remaining budget.
+
+    Required calls never go below MESSAGE_BUDGET_MIN_CALL_SECONDS (or their default, if
+    smaller) so an overrun message still gets a real attempt instead of an instant timeout.
+    """
+    remaining = remaining_budget(timing_context)
+    if remaining is None:
+        return default_seconds
+    _, _, _, min_call_seconds = get_message_budget_settings()
+    floor = min(default_seconds, min_call_seconds)
+    return max(min(default_seconds, remaining), floor)
+
+
+def has_budget_for_optional(timing_context: dict | None, stage: str) -> bool:
+    """False when the remaining budget is too small for an optional stage; records the skip."""
+    budget = _get_budget(timing_context)
+    if budget is None:
+        return True
+    remaining = budget.remaining()
+    _, _, optional_min_seconds, _ = get_message_budget_settings()
+    if remaining >= optional_min_seconds:
+        return True
+    budget.record_skip(stage)
+    logger.info(
+        "Optional stage skipped: latency budget nearly spent",
+        extra={
+            "context": {
+                "stage": stage,
+                "remaining_seconds": round(remaining, 3),
+                "client_slug": timing_context.get("client_slug"),
+            }
+        },
+    )
+    return False
@@ -1,24 +1,33 @@
+import os
 import re
 import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from uuid import UUID
 
 import httpx
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from app.logging_config import get_logger
-from app.models import Client, ClientSettings, Handover
+from app.models import Client, ClientSettings, Handover, LearnedResponse
 from app.services.alert_service import alert_error, alert_warning
+from app.services.bm25_index import apply_points_to_bm25_index
+from app.services.http_clients import http_client
 from app.services.knowledge_service import (
     QDRANT_API_KEY,
     QDRANT_COLLECTION,
     QDRANT_HOST,
+    bump_knowledge_version,
     get_embedding,
+    get_embeddings,
 )
 
 logger = get_logger("learning_service")
 
 MAX_KNOWLEDGE_TEXT_LENGTH = 2000
+# Token-set Jaccard above which two queued questions of one client count as the same question.
+LEARNING_DEDUPE_SIMILARITY = float(os.environ.get("LEARNING_DEDUPE_SIMILARITY", "0.8"))
 MIN_QUESTION_LENGTH = 5
 MIN_ANSWER_LENGTH = 5
 LOW_VALUE_TEXTS = {
@@ -163,16 +172,8 @@ def _trim_text(text: str) -> str:
     return text[:MAX_KNOWLEDGE_TEXT_LENGTH]
 
 
-def add_to_knowledge(
-    db: Session,
-    handover: Handover,
-    source: str = "learned",
-) -> Optional[str]:
-    """
-    Add manager response to Qdrant knowledge base.
-
-    Returns point_id if successful, None otherwise.
-    """
+def _prepare_learning_sample(db: Session, handover: Handover) -> Optional[tuple[str, str, str]]:
+    """Validate a handover for learning; returns (client_slug, question, answer) or None if skipped."""
     if not handover.user_message or not handover.manager_response:
         logger.warning("Cannot add to knowledge: missing user_message or manager_response")
         alert_warning(
@@ -230,9 +231,30 @@ def add_to_knowledge(
         )
         return None
 
-    content = f"Вопрос: {question}\nОтвет: {answer}"
     if len(handover.user_message.strip()) > len(question) or len(handover.manager_response.strip()) > len(answer):
         logger.info("Truncated knowledge sample to fit length limits")
+    return client_slug, question, answer
+
+
+def _learning_content(question: str, answer: str) -> str:
+    return f"Вопрос: {question}\nОтвет: {answer}"
+
+
+def add_to_knowledge(
+    db: Session,
+    handover: Handover,
+    source: str = "learned",
+) -> Optional[str]:
+    """
+    Add manager response to Qdrant knowledge base.
+
+    Returns point_id if successful, None otherwise.
+    """
+    sample = _prepare_learning_sample(db, handover)
+    if sample is None:
+        return None
+    client_slug, question, answer = sample
+    content = _learning_content(question, answer)
 
     try:
         # Get embedding
@@ -241,30 +263,24 @@ def add_to_knowledge(
         # Generate point ID
         point_id = str(uuid.uuid4())
 
+        payload = {
+            "content": content,
+            "metadata": {
+                "client_slug": client_slug,
+                "source": source,
+                "handover_id": str(handover.id),
+                "question": question,
+                "answer": answer,
+                "learned_from": handover.assigned_to_name or "manager",
+            },
+        }
+
         # Upsert to Qdrant
-        with httpx.Client(timeout=30.0) as client:
+        with http_client("qdrant") as client:
             response = client.put(
                 f"{QDRANT_HOST}/collections/{QDRANT_COLLECTION}/points",
                 headers={"api-key": QDRANT_API_KEY},
-                json={
-                    "points": [
-                        {
-                            "id": point_id,
-                            "vector": embedding,
-                            "payload": {
-                                "content": content,
-                                "metadata": {
-                                    "client_slug": client_slug,
-                                    "source": source,
-                                    "handover_id": str(handover.id),
-                                    "question": question,
-                                    "answer": answer,
-                                    "learned_from": handover.assigned_to_name or "manager",
-                                },
-                            },
-                        }
-                    ]
-                },
+                json={"points": [{"id": point_id, "vector": embedding, "payload": payload}]},
             )
 
             if response.status_code not in [200, 201]:
@@ -272,6 +288,9 @@ def add_to_knowledge(
                 alert_error("Failed to add to knowledge", {"handover_id": str(handover.id), "status": response.status_code})
                 return None
 
+            version = bump_knowledge_version(client_slug)
+            apply_points_to_bm25_index(client_slug, [{"id": point_id, "payload": payload}], version=version)
+
             context = {
                 "point_id": point_id,
                 "client_slug": client_slug,
@@ -288,3 +307,263 @@ def add_to_knowledge(
         logger.error(f"Error adding to knowledge: {e}", exc_info=True)
         alert_error("Learning service error", {"handover_id": str(handover.id), "error": str(e)})
         return None
+
+
+# === LEARNING QUEUE ===
+#
+# Manager/owner answers are written to learned_responses (status "approved": owner answers
+# need no moderation) and indexed later by app.learning_worker. A row is waiting for
+# indexing while qdrant_point_id is NULL; rows collapsed into another answer become
+# inactive and share the point id of the answer that was indexed.
+
+
+def _learning_key(question: str) -> str:
+    normalized = re.sub(r"[^\w\s]", " ", _normalize_text(question))
+    return re.sub(r"\s+", " ", normalized).strip()
+
+
+def _learning_point_id(client_slug: str, learning_key: str) -> str:
+    """Same client + same normalized question -> same point, so a newer answer replaces the old one."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"truffles:{client_slug}:learned:{learning_key}"))
+
+
+def enqueue_learning(
+    db: Session,
+    handover: Handover,
+    source: str = "learned",
+) -> Optional[LearnedResponse]:
+    """
+    Queue a manager response for the knowledge base instead of indexing it inline.
+
+    Returns the added (uncommitted) row, or None when the sample is skipped.
+    """
+    sample = _prepare_learning_sample(db, handover)
+    if sample is None:
+        return None
+    client_slug, question, answer = sample
+    now = datetime.now(timezone.utc)
+    row = LearnedResponse(
+        client_id=handover.client_id,
+        handover_id=handover.id,
+        question_text=question,
+        question_normalized=_learning_key(question),
+        response_text=answer,
+        source=source,
+        source_name=handover.assigned_to_name or "manager",
+        source_role=source if source == "owner" else None,
+        source_channel="telegram",
+        status="approved",
+        approved_at=now,
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(row)
+    logger.info(
+        "Learning queued",
+        extra={"context": {"client_slug": client_slug, "handover_id": str(handover.id), "source": source}},
+    )
+    return row
+
+
+def claim_learning_batch(
+    db: Session,
+    *,
+    limit: int,
+    lease_seconds: float = 120.0,
+    max_attempts: int = 8,
+) -> list[dict]:
+    """
+    Claim the oldest approved answers not yet in Qdrant, as plain dicts (indexing runs outside the session).
+
+    Rows are locked with SKIP LOCKED and leased for lease_seconds, so other replicas skip them
+    until the pass records its result or the lease runs out. Rows that failed max_attempts
+    times are parked and no longer claimed.
+    """
+    now = datetime.now(timezone.utc)
+    rows = (
+        db.query(LearnedResponse, Client.name)
+        .join(Client, Client.id == LearnedResponse.client_id)
+        .filter(
+            LearnedResponse.status == "approved",
+            LearnedResponse.qdrant_point_id.is_(None),
+            LearnedResponse.is_active.isnot(False),
+            or_(LearnedResponse.index_attempts.is_(None), LearnedResponse.index_attempts < max_attempts),
+            or_(
+                LearnedResponse.index_lease_expires_at.is_(None),
+                LearnedResponse.index_lease_expires_at <= now,
+            ),
+        )
+        .order_by(LearnedResponse.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True, of=LearnedResponse)
+        .all()
+    )
+    lease_expires_at = now + timedelta(seconds=lease_seconds)
+    items = []
+    for row, client_slug in rows:
+        row.index_attempts = (row.index_attempts or 0) + 1
+        row.index_lease_expires_at = lease_expires_at
+        if not client_slug:
+            continue
+        items.append(
+            {
+                "id": row.id,
+                "client_slug": client_slug,
+                "handover_id": row.handover_id,
+                "question": row.question_text,
+                "answer": row.response_text,
+                "learning_key": row.question_normalized or _learning_key(row.question_text),
+                "source": row.source or "learned",
+                "learned_from": row.source_name or "manager",
+                "created_at": row.created_at,
+                "attempts": row.index_attempts,
+            }
+        )
+    db.commit()
+    return items
+
+
+def _token_similarity(left: set[str], right: set[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def collapse_learning_items(items: list[dict]) -> list[tuple[dict, list[dict]]]:
+    """
+    Group near-duplicate questions per client; the newest answer of each group is indexed.
+
+    Returns (kept, duplicates) pairs.
+    """
+    groups: list[tuple[dict, set[str], list[dict]]] = []
+    epoch = datetime.min.replace(tzinfo=timezone.utc)
+    for item in sorted(items, key=lambda entry: entry["created_at"] or epoch, reverse=True):
+        tokens = set(item["learning_key"].split())
+        for kept, kept_tokens, duplicates in groups:
+            if kept["client_slug"] != item["client_slug"]:
+                continue
+            if kept["learning_key"] == item["learning_key"] or (
+                _token_similarity(tokens, kept_tokens) >= LEARNING_DEDUPE_SIMILARITY
+            ):
+                duplicates.append(item)
+                break
+        else:
+            groups.append((item, tokens, []))
+    return [(kept, duplicates) for kept, _, duplicates in groups]
+
+
+def index_learning_batch(items: list[dict]) -> dict:
+    """
+    Embed and upsert a claimed batch in bulk: one BGE request and one Qdrant PUT.
+
+    Blocking (HTTP); returns {"point_ids": {row_id: point_id}, "superseded": [row_id, ...]}.
+    Raises on BGE/Qdrant errors so the rows stay queued for the next pass.
+    """
+    groups = collapse_learning_items(items)
+    if not groups:
+        return {"point_ids": {}, "superseded": []}
+    vectors = get_embeddings([_learning_content(kept["question"], kept["answer"]) for kept, _ in groups])
+
+    points_by_client: dict[str, list[dict]] = {}
+    point_ids: dict = {}
+    superseded: list = []
+    for (kept, duplicates), vector in zip(groups, vectors):
+        point_id = _learning_point_id(kept["client_slug"], kept["learning_key"])
+        payload = {
+            "content": _learning_content(kept["question"], kept["answer"]),
+            "metadata": {
+                "client_slug": kept["client_slug"],
+                "source": kept["source"],
+                "handover_id": str(kept["handover_id"]) if kept["handover_id"] else None,
+                "learned_response_id": str(kept["id"]),
+                "question": kept["question"],
+                "answer": kept["answer"],
+                "learned_from": kept["learned_from"],
+            },
+        }
+        points_by_client.setdefault(kept["client_slug"], []).append(
+            {"id": point_id, "vector": vector, "payload": payload}
+        )
+        point_ids[kept["id"]] = point_id
+        for duplicate in duplicates:
+            point_ids[duplicate["id"]] = point_id
+            superseded.append(duplicate["id"])
+
+    points = [point for client_points in points_by_client.values() for point in client_points]
+    with http_client("qdrant") as client:
+        response = client.put(
+            f"{QDRANT_HOST}/collections/{QDRANT_COLLECTION}/points",
+            headers={"api-key": QDRANT_API_KEY},
+            json={"points": points},
+        )
+    if response.status_code not in [200, 201]:
+        raise Exception(f"Qdrant upsert error: {response.status_code} - {response.text}")
+
+    for client_slug, client_points in points_by_client.items():
+        version = bump_knowledge_version(client_slug)
+        apply_points_to_bm25_index(
+            client_slug,
+            [{"id": point["id"], "payload": point["payload"]} for point in client_points],
+            version=version,
+        )
+    return {"point_ids": point_ids, "superseded": superseded}
+
+
+def record_learning_results(db: Session, *, point_ids: dict, superseded: list) -> int:
+    """Store qdrant_point_id on indexed rows; collapsed and replaced answers become inactive."""
+    if not point_ids:
+        return 0
+    now = datetime.now(timezone.utc)
+    rows = db.query(LearnedResponse).filter(LearnedResponse.id.in_(list(point_ids))).all()
+    for row in rows:
+        row.qdrant_point_id = point_ids[row.id]
+        row.index_lease_expires_at = None
+        row.index_last_error = None
+        row.updated_at = now
+        if row.id in superseded:
+            row.is_active = False
+    # Older answers to the same question were overwritten in Qdrant by the new point.
+    (
+        db.query(LearnedResponse)
+        .filter(
+            LearnedResponse.qdrant_point_id.in_(set(point_ids.values())),
+            LearnedResponse.id.notin_(list(point_ids)),
+            LearnedResponse.is_active.isnot(False),
+        )
+        .update({"is_active": False, "updated_at": now}, synchronize_session=False)
+    )
+    db.commit()
+    return len(rows)
+
+
+def record_learning_failures(
+    db: Session,
+    *,
+    errors: dict,
+    max_attempts: int = 8,
+    retry_backoff_seconds: float = 30.0,
+) -> list:
+    """
+    Schedule failed rows for another pass with exponential backoff.
+
+    Rows that used up max_attempts keep their last error and are parked (no longer claimed);
+    returns their ids.
+    """
+    if not errors:
+        return []
+    now = datetime.now(timezone.utc)
+    parked = []
+    rows = db.query(LearnedResponse).filter(LearnedResponse.id.in_(list(errors))).all()
+    for row in rows:
+        attempts = row.index_attempts or 0
+        row.index_last_error = str(errors[row.id])[:500]
+        row.updated_at = now
+        if attempts >= max_attempts:
+            row.index_lease_expires_at = None
+            parked.append(row.id)
+        else:
+            row.index_lease_expires_at = now + timedelta(
+                seconds=retry_backoff_seconds * 2 ** max(attempts - 1, 0)
+            )
+    db.commit()
+    return parked
@@ -1,4 +1,5 @@
 from app.services.llm.base import LLMProvider, LLMResponse
+from app.services.llm.executor import run_blocking, run_enrichment
 from app.services.llm.openai_provider import OpenAIProvider
 
-__all__ = ["LLMProvider", "LLMResponse", "OpenAIProvider"]
+__all__ = ["LLMProvider", "LLMResponse", "OpenAIProvider", "run_blocking", "run_enrichment"]
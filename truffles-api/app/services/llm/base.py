@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import List, Optional
 
+from app.services.llm.executor import run_blocking
+
 
 @dataclass
 class LLMResponse:
@@ -24,3 +26,21 @@ class LLMProvider(ABC):
     ) -> LLMResponse:
         """Generate response from LLM."""
         pass
+
+    async def agenerate(
+        self,
+        messages: List[dict],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        timeout_seconds: Optional[float] = None,
+    ) -> LLMResponse:
+        """Async generate; providers without a native async client run generate in the LLM pool."""
+        return await run_blocking(
+            self.generate,
+            messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout_seconds=timeout_seconds,
+        )
@@ -0,0 +1,87 @@
+"""Bounded thread pools for blocking LLM-bound work called from async code."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+_executor: ThreadPoolExecutor | None = None
+_enrichment_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_pool_size(env_name: str = "LLM_THREAD_POOL_SIZE", default: int = 8) -> int:
+    raw = os.environ.get(env_name, str(default))
+    try:
+        size = int(float(raw))
+    except (TypeError, ValueError):
+        return default
+    return max(1, size)
+
+
+def get_llm_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_get_pool_size(), thread_name_prefix="llm")
+    return _executor
+
+
+def get_enrichment_executor() -> ThreadPoolExecutor:
+    """
+    Separate pool for pre-decision enrichment calls.
+
+    An enrichment call that misses its deadline keeps its thread until the HTTP timeout;
+    in its own pool such stragglers cannot starve reply generation in the LLM pool.
+    """
+    global _enrichment_executor
+    if _enrichment_executor is None:
+        with _executor_lock:
+            if _enrichment_executor is None:
+                _enrichment_executor = ThreadPoolExecutor(
+                    max_workers=_get_pool_size("ENRICHMENT_THREAD_POOL_SIZE", 4),
+                    thread_name_prefix="enrichment",
+                )
+    return _enrichment_executor
+
+
+async def _run_in(executor: ThreadPoolExecutor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(executor, call)
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a sync (LLM-bound) call in the bounded pool so it does not block the event loop.
+
+    The caller awaits the result, so objects it passes in (e.g. a DB session) are never
+    used by two threads at once. Cancelling the await does not stop the thread; the
+    underlying HTTP timeout bounds it.
+    """
+    return await _run_in(get_llm_executor(), func, *args, **kwargs)
+
+
+async def run_enrichment(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """run_blocking for enrichment calls, on the enrichment pool."""
+    return await _run_in(get_enrichment_executor(), func, *args, **kwargs)
+
+
+def shutdown_llm_executor() -> None:
+    global _executor, _enrichment_executor
+    with _executor_lock:
+        executors = [_executor, _enrichment_executor]
+        _executor = None
+        _enrichment_executor = None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,8 +1,10 @@
+import asyncio
 from typing import List, Optional
 
 import httpx
 
 from app.logging_config import get_logger
+from app.services.http_clients import async_http_client, http_client
 from app.services.llm.base import LLMProvider, LLMResponse
 
 logger = get_logger("llm.openai")
@@ -17,6 +19,77 @@ class OpenAIProvider(LLMProvider):
         self.base_url = "https://api.openai.com/v1/chat/completions"
         self.audio_url = "https://api.openai.com/v1/audio/transcriptions"
 
+    def _build_chat_payload(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> dict:
+        return {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_completion_tokens": max_tokens,
+        }
+
+    def _chat_headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _parse_chat_response(self, response: httpx.Response, model: str) -> LLMResponse:
+        logger.debug(f"OpenAI response status: {response.status_code}")
+
+        if response.status_code != 200:
+            logger.error(f"OpenAI error: {response.text}")
+            raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
+
+        data = response.json()
+        logger.debug(f"OpenAI full response: {data}")
+
+        content = ""
+        if data.get("choices") and len(data["choices"]) > 0:
+            choice = data["choices"][0]
+            message = choice.get("message", {})
+            content = message.get("content") or ""
+            logger.debug(f"Choice: {choice}")
+        logger.debug(f"OpenAI content: {content[:100] if content else 'EMPTY'}")
+
+        return LLMResponse(
+            content=content,
+            model=data.get("model", model),
+            usage=data.get("usage"),
+        )
+
+    def _build_transcription_request(
+        self,
+        *,
+        audio_bytes: bytes,
+        filename: str,
+        mime_type: Optional[str],
+        model: Optional[str],
+        prompt: Optional[str],
+        language: Optional[str],
+    ) -> tuple[dict, dict]:
+        model = model or "whisper-1"
+        if not audio_bytes:
+            raise ValueError("audio_bytes is empty")
+
+        files = {"file": (filename or "audio", audio_bytes, mime_type or "application/octet-stream")}
+        data = {"model": model, "response_format": "text"}
+        if prompt:
+            data["prompt"] = prompt
+        if language:
+            data["language"] = language
+        return files, data
+
+    def _parse_transcription_response(self, response: httpx.Response) -> str:
+        logger.debug(f"OpenAI transcription status: {response.status_code}")
+        if response.status_code != 200:
+            logger.error(f"OpenAI transcription error: {response.text}")
+            raise Exception(f"OpenAI transcription error: {response.status_code} - {response.text}")
+
+        transcript = (response.text or "").strip()
+        if not transcript:
+            logger.warning("OpenAI transcription returned empty text")
+        return transcript
+
     def generate(
         self,
         messages: List[dict],
@@ -30,46 +103,41 @@ class OpenAIProvider(LLMProvider):
         model = model or self.default_model
 
         timeout = timeout_seconds if timeout_seconds is not None else 60.0
-        with httpx.Client(timeout=timeout) as client:
-            payload = {
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_completion_tokens": max_tokens,
-            }
+        with http_client("openai", timeout=timeout) as client:
+            payload = self._build_chat_payload(messages, model, temperature, max_tokens)
             logger.debug(f"OpenAI request: model={model}, messages_count={len(messages)}")
 
-            response = client.post(
-                self.base_url,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-            )
+            response = client.post(self.base_url, headers=self._chat_headers(), json=payload)
+            return self._parse_chat_response(response, model)
 
-            logger.debug(f"OpenAI response status: {response.status_code}")
-
-            if response.status_code != 200:
-                logger.error(f"OpenAI error: {response.text}")
-                raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
+    async def agenerate(
+        self,
+        messages: List[dict],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        timeout_seconds: Optional[float] = None,
+    ) -> LLMResponse:
+        """
+        Generate response from OpenAI without blocking the event loop.
 
-            data = response.json()
-            logger.debug(f"OpenAI full response: {data}")
+        The whole call (connect, send, read) is bounded by timeout_seconds; on expiry the
+        request task is cancelled and httpx.TimeoutException is raised, same as generate.
+        """
+        model = model or self.default_model
+        timeout = timeout_seconds if timeout_seconds is not None else 60.0
+        payload = self._build_chat_payload(messages, model, temperature, max_tokens)
+        logger.debug(f"OpenAI async request: model={model}, messages_count={len(messages)}")
 
-            content = ""
-            if data.get("choices") and len(data["choices"]) > 0:
-                choice = data["choices"][0]
-                message = choice.get("message", {})
-                content = message.get("content") or ""
-                logger.debug(f"Choice: {choice}")
-            logger.debug(f"OpenAI content: {content[:100] if content else 'EMPTY'}")
+        async def _post() -> httpx.Response:
+            async with async_http_client("openai", timeout=timeout) as client:
+                return await client.post(self.base_url, headers=self._chat_headers(), json=payload)
 
-            return LLMResponse(
-                content=content,
-                model=data.get("model", model),
-                usage=data.get("usage"),
-            )
+        try:
+            response = await asyncio.wait_for(_post(), timeout=timeout)
+        except asyncio.TimeoutError as exc:
+            raise httpx.TimeoutException(f"OpenAI request cancelled after {timeout}s") from exc
+        return self._parse_chat_response(response, model)
 
     def transcribe_audio(
         self,
@@ -83,19 +151,17 @@ class OpenAIProvider(LLMProvider):
         timeout_seconds: Optional[float] = None,
     ) -> str:
         """Transcribe audio using OpenAI speech-to-text."""
-        model = model or "whisper-1"
-        if not audio_bytes:
-            raise ValueError("audio_bytes is empty")
-
-        files = {"file": (filename or "audio", audio_bytes, mime_type or "application/octet-stream")}
-        data = {"model": model, "response_format": "text"}
-        if prompt:
-            data["prompt"] = prompt
-        if language:
-            data["language"] = language
+        files, data = self._build_transcription_request(
+            audio_bytes=audio_bytes,
+            filename=filename,
+            mime_type=mime_type,
+            model=model,
+            prompt=prompt,
+            language=language,
+        )
 
         timeout = timeout_seconds if timeout_seconds is not None else 30.0
-        with httpx.Client(timeout=timeout) as client:
+        with http_client("openai", timeout=timeout) as client:
             response = client.post(
                 self.audio_url,
                 headers={
@@ -105,12 +171,41 @@ class OpenAIProvider(LLMProvider):
                 data=data,
             )
 
-        logger.debug(f"OpenAI transcription status: {response.status_code}")
-        if response.status_code != 200:
-            logger.error(f"OpenAI transcription error: {response.text}")
-            raise Exception(f"OpenAI transcription error: {response.status_code} - {response.text}")
+        return self._parse_transcription_response(response)
 
-        transcript = (response.text or "").strip()
-        if not transcript:
-            logger.warning("OpenAI transcription returned empty text")
-        return transcript
+    async def atranscribe(
+        self,
+        *,
+        audio_bytes: bytes,
+        filename: str,
+        mime_type: Optional[str] = None,
+        model: Optional[str] = None,
+        prompt: Optional[str] = None,
+        language: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> str:
+        """Async transcribe_audio; cancelled on timeout like agenerate."""
+        files, data = self._build_transcription_request(
+            audio_bytes=audio_bytes,
+            filename=filename,
+            mime_type=mime_type,
+            model=model,
+            prompt=prompt,
+            language=language,
+        )
+        timeout = timeout_seconds if timeout_seconds is not None else 30.0
+
+        async def _post() -> httpx.Response:
+            async with async_http_client("openai", timeout=timeout) as client:
+                return await client.post(
+                    self.audio_url,
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    files=files,
+                    data=data,
+                )
+
+        try:
+            response = await asyncio.wait_for(_post(), timeout=timeout)
+        except asyncio.TimeoutError as exc:
+            raise httpx.TimeoutException(f"OpenAI transcription cancelled after {timeout}s") from exc
+        return self._parse_transcription_response(response)
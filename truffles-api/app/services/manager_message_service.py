@@ -17,7 +17,7 @@ from app.services.chatflow_service import (
     send_bot_response,
     send_whatsapp_media,
 )
-from app.services.learning_service import add_to_knowledge, get_client_slug, is_owner_response
+from app.services.learning_service import enqueue_learning, get_client_slug, is_owner_response
 from app.services.message_service import save_message
 from app.services.telegram_service import TelegramService
 
@@ -253,10 +253,8 @@ def process_manager_message(
             effective_manager_id or 0,
             manager_username,
         ):
-            logger.info("Owner response detected, auto-adding to knowledge base")
-            point_id = add_to_knowledge(db, handover, source="owner")
-            if point_id:
-                logger.info(f"Successfully added to knowledge: {point_id}")
+            logger.info("Owner response detected, queueing for knowledge base")
+            enqueue_learning(db, handover, source="owner")
     else:
         logger.info(
             "Owner response check skipped: missing manager identity",
@@ -423,10 +421,8 @@ def process_manager_media(
                 effective_manager_id or 0,
                 manager_username,
             ):
-                logger.info("Owner media caption detected, auto-adding to knowledge base")
-                point_id = add_to_knowledge(db, handover, source="owner")
-                if point_id:
-                    logger.info(f"Successfully added to knowledge: {point_id}")
+                logger.info("Owner media caption detected, queueing for knowledge base")
+                enqueue_learning(db, handover, source="owner")
 
     user_remote_jid = get_user_remote_jid(db, conversation.user_id)
     remote_jid = user_remote_jid
@@ -135,3 +135,31 @@ def generate_bot_response(
         pending_hint=pending_hint,
         timing_context=timing_context,
     )
+
+
+async def agenerate_bot_response(
+    db: Session,
+    conversation: Conversation,
+    user_message: str,
+    client_slug: str = "truffles",
+    append_user_message: bool = True,
+    pending_hint: bool = False,
+    timing_context: dict | None = None,
+) -> Result[Tuple[Optional[str], str]]:
+    """Async generate_bot_response: the LLM call is awaited and cancelled with the caller."""
+    allowed_states = [ConversationState.BOT_ACTIVE.value, ConversationState.PENDING.value]
+    if conversation.state not in allowed_states:
+        return Result.success((None, "bot_inactive"))
+
+    from app.services.ai_service import agenerate_ai_response
+
+    return await agenerate_ai_response(
+        db=db,
+        client_id=conversation.client_id,
+        client_slug=client_slug,
+        conversation_id=conversation.id,
+        user_message=user_message,
+        append_user_message=append_user_message,
+        pending_hint=pending_hint,
+        timing_context=timing_context,
+    )
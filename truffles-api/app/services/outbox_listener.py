@@ -0,0 +1,171 @@
+"""Postgres LISTEN/NOTIFY wakeups for the outbox worker."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from app.logging_config import get_logger
+from app.services.outbox_service import OUTBOX_NOTIFY_CHANNEL, parse_outbox_notify_payload
+
+try:
+    import psycopg2  # type: ignore
+    from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT  # type: ignore
+except Exception:  # pragma: no cover
+    psycopg2 = None
+    ISOLATION_LEVEL_AUTOCOMMIT = None
+
+logger = get_logger("outbox_listener")
+
+RETRY_WAKEUP_KEY = "__retry__"
+OUTBOX_BACKLOG_WAKEUP_KEY = "__backlog__"
+
+
+class OutboxNotifyListener:
+    """
+    Dedicated autocommit connection that LISTENs on the outbox channel.
+
+    The socket is registered with the event loop, so waiting costs no DB queries;
+    each notification records the conversation_id, when it was received and the
+    adaptive coalescing delay chosen at enqueue time (if any).
+    """
+
+    def __init__(self, dsn: str, channel: str = OUTBOX_NOTIFY_CHANNEL):
+        self._dsn = dsn
+        self._channel = channel
+        self._conn = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._event = asyncio.Event()
+        self._received: dict[str, tuple[float, float | None]] = {}
+
+    @property
+    def active(self) -> bool:
+        return self._conn is not None
+
+    def start(self) -> bool:
+        if psycopg2 is None:
+            return False
+        try:
+            conn = psycopg2.connect(self._dsn)
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self._channel}"')
+            self._loop = asyncio.get_running_loop()
+            self._loop.add_reader(conn.fileno(), self._on_readable)
+        except Exception as exc:
+            logger.warning(
+                "Outbox listener unavailable, falling back to polling",
+                extra={"context": {"error": str(exc)}},
+            )
+            return False
+        self._conn = conn
+        logger.info("Outbox listener started", extra={"context": {"channel": self._channel}})
+        return True
+
+    def _on_readable(self) -> None:
+        conn = self._conn
+        if conn is None:
+            return
+        try:
+            conn.poll()
+        except Exception as exc:
+            logger.warning("Outbox listener connection lost", extra={"context": {"error": str(exc)}})
+            self.close()
+            self._event.set()
+            return
+        received_at = time.monotonic()
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            conversation_id, coalesce_seconds = parse_outbox_notify_payload(notify.payload)
+            self._received[conversation_id] = (received_at, coalesce_seconds)
+        self._event.set()
+
+    def wake(self) -> None:
+        self._event.set()
+
+    def drain(self) -> dict[str, tuple[float, float | None]]:
+        received = self._received
+        self._received = {}
+        self._event.clear()
+        return received
+
+    async def wait(self, timeout: float) -> bool:
+        """Block until a notification arrives or timeout passes; True when woken by NOTIFY."""
+        if self._received:
+            return True
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=max(timeout, 0.0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def close(self) -> None:
+        conn = self._conn
+        self._conn = None
+        if conn is None:
+            return
+        try:
+            if self._loop is not None:
+                self._loop.remove_reader(conn.fileno())
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class OutboxWakeupSchedule:
+    """
+    Per-conversation deadlines for the coalescing window plus a slow safety sweep.
+
+    A conversation becomes claimable once its last message's coalescing delay (adaptive,
+    or idle_seconds) has passed, so the worker
+    sleeps until the earliest such deadline instead of polling at a fixed interval.
+    """
+
+    def __init__(self, *, sweep_seconds: float):
+        self.sweep_seconds = sweep_seconds
+        self.deadlines: dict[str, float] = {}
+        self.first_seen: dict[str, float] = {}
+        self.last_sweep_at: float | None = None
+
+    def note(self, key: str, due_at: float) -> None:
+        self.deadlines[key] = due_at
+
+    def note_received(
+        self,
+        received: dict[str, tuple[float, float | None]],
+        *,
+        idle_seconds: float,
+        max_wait_seconds: float | None = None,
+    ) -> None:
+        for conversation_id, (received_at, coalesce_seconds) in received.items():
+            delay = idle_seconds if coalesce_seconds is None else coalesce_seconds
+            due_at = received_at + delay
+            first_seen = self.first_seen.setdefault(conversation_id, received_at)
+            if max_wait_seconds is not None:
+                # A long typing burst must not push the reply past the hard bound.
+                due_at = min(due_at, first_seen + max_wait_seconds)
+            self.note(conversation_id, due_at)
+
+    def sweep_due(self, now: float) -> bool:
+        return self.last_sweep_at is None or now - self.last_sweep_at >= self.sweep_seconds
+
+    def mark_swept(self, now: float) -> None:
+        self.last_sweep_at = now
+
+    def seconds_until_due(self, now: float) -> float:
+        if self.sweep_due(now):
+            return 0.0
+        next_due = self.last_sweep_at + self.sweep_seconds
+        if self.deadlines:
+            next_due = min(next_due, min(self.deadlines.values()))
+        return max(0.0, next_due - now)
+
+    def pop_due(self, now: float) -> list[str]:
+        due = [key for key, due_at in self.deadlines.items() if due_at <= now]
+        for key in due:
+            del self.deadlines[key]
+            self.first_seen.pop(key, None)
+        return due
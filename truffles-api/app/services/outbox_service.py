@@ -1,15 +1,27 @@
 from __future__ import annotations
 
 import hashlib
+import os
 import uuid
-from datetime import datetime, timezone
-from typing import Any
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Mapping
 
 from sqlalchemy import text
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from app.models import OutboxMessage
+from app.schemas.webhook import WebhookRequest
+
+OUTBOX_NOTIFY_CHANNEL = os.environ.get("OUTBOX_NOTIFY_CHANNEL", "outbox_messages")
+
+
+def _is_outbox_notify_enabled() -> bool:
+    value = os.environ.get("OUTBOX_NOTIFY_ENABLED")
+    if value is None:
+        return True
+    return value.strip().lower() not in {"0", "false", "no", "off"}
 
 
 def build_inbound_message_id(
@@ -28,6 +40,71 @@ def build_inbound_message_id(
     return str(uuid.uuid4())
 
 
+@dataclass(slots=True)
+class OutboxRow:
+    """A claimed outbox row with its webhook payload validated exactly once."""
+
+    id: Any
+    client_id: Any
+    conversation_id: Any
+    inbound_message_id: str | None
+    attempts: int
+    created_at: datetime | None
+    eligible_at: datetime | None
+    payload_json: dict[str, Any]
+    payload: WebhookRequest | None
+    parse_error: str | None
+    has_media: bool
+
+    @classmethod
+    def from_mapping(cls, row: Mapping[str, Any]) -> "OutboxRow":
+        payload_json = row.get("payload_json") or {}
+        payload = None
+        parse_error = None
+        try:
+            payload = WebhookRequest.model_validate(payload_json)
+        except Exception as exc:
+            parse_error = str(exc)
+        has_media = False
+        if payload is not None:
+            message_type = (payload.body.messageType or "").strip().lower()
+            has_media = bool(payload.body.mediaData) or bool(message_type and message_type != "text")
+        return cls(
+            id=row.get("id"),
+            client_id=row.get("client_id"),
+            conversation_id=row.get("conversation_id"),
+            inbound_message_id=row.get("inbound_message_id"),
+            attempts=int(row.get("attempts") or 0),
+            created_at=row.get("created_at"),
+            eligible_at=row.get("eligible_at"),
+            payload_json=payload_json,
+            payload=payload,
+            parse_error=parse_error,
+            has_media=has_media,
+        )
+
+    @property
+    def client_slug(self) -> str | None:
+        if self.payload is not None:
+            return self.payload.client_slug
+        return self.payload_json.get("client_slug")
+
+
+def build_outbox_notify_payload(conversation_id, coalesce_seconds: float | None = None) -> str:
+    payload = str(conversation_id or "")
+    if coalesce_seconds is not None:
+        payload = f"{payload}|{coalesce_seconds:g}"
+    return payload
+
+
+def parse_outbox_notify_payload(payload: str | None) -> tuple[str, float | None]:
+    conversation_id, _, seconds = (payload or "").partition("|")
+    try:
+        return conversation_id, float(seconds) if seconds else None
+    except ValueError:
+        return conversation_id, None
+
+
 def enqueue_outbox_message(
     db: Session,
     *,
@@ -35,8 +112,16 @@ def enqueue_outbox_message(
     conversation_id,
     inbound_message_id: str,
     payload_json: dict[str, Any],
+    coalesce_seconds: float | None = None,
 ) -> bool:
+    """
+    Queue an inbound message for the worker.
+
+    coalesce_seconds is the adaptive wait before the conversation may be claimed;
+    None keeps the fixed OUTBOX_COALESCE_SECONDS idle window.
+    """
     now = datetime.now(timezone.utc)
+    ready_at = now + timedelta(seconds=coalesce_seconds) if coalesce_seconds is not None else None
     stmt = (
         insert(OutboxMessage)
         .values(
@@ -47,13 +132,21 @@ def enqueue_outbox_message(
             payload_json=payload_json,
             status="PENDING",
             attempts=0,
+            ready_at=ready_at,
             created_at=now,
             updated_at=now,
         )
         .on_conflict_do_nothing(index_elements=["client_id", "inbound_message_id"])
     )
     result = db.execute(stmt)
-    return result.rowcount > 0
+    inserted = result.rowcount > 0
+    if inserted and _is_outbox_notify_enabled():
+        # NOTIFY is transactional: listeners are woken only after the caller commits the row.
+        db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": OUTBOX_NOTIFY_CHANNEL, "payload": build_outbox_notify_payload(conversation_id, coalesce_seconds)},
+        )
+    return inserted
 
 
 def claim_pending_outbox(db: Session, *, limit: int = 10) -> list[dict[str, Any]]:
@@ -98,20 +191,67 @@ def claim_pending_outbox_batches(
     *,
     limit: int = 10,
     idle_seconds: int = 8,
-) -> list[dict[str, Any]]:
+    worker_id: str | None = None,
+    lease_seconds: float | None = None,
+    max_wait_seconds: float | None = None,
+) -> list[OutboxRow]:
     rows = (
         db.execute(
             text(
                 """
-                WITH candidates AS (
-                    SELECT conversation_id, MAX(created_at) AS last_created_at
+                WITH ready AS (
+                    SELECT client_id, conversation_id, MAX(created_at) AS last_created_at
                     FROM outbox_messages
                     WHERE status = 'PENDING'
                       AND conversation_id IS NOT NULL
                       AND (next_attempt_at IS NULL OR next_attempt_at <= NOW())
-                    GROUP BY conversation_id
-                    HAVING MAX(created_at) <= NOW() - (:idle_seconds * INTERVAL '1 second')
-                    ORDER BY last_created_at
+                      -- Another worker already owns this conversation: leave its new rows for
+                      -- the next pass so replies stay ordered and are never generated twice.
+                      AND NOT EXISTS (
+                          SELECT 1
+                          FROM outbox_messages p
+                          WHERE p.conversation_id = outbox_messages.conversation_id
+                            AND p.status = 'PROCESSING'
+                      )
+                    GROUP BY client_id, conversation_id
+                    -- The newest message decides how long to wait (adaptive ready_at, else the
+                    -- fixed idle window); max_wait_seconds bounds how long a burst can hold a reply.
+                    HAVING (ARRAY_AGG(
+                                COALESCE(ready_at, created_at + (:idle_seconds * INTERVAL '1 second'))
+                                ORDER BY created_at DESC
+                            ))[1] <= NOW()
+                        OR (
+                            CAST(:max_wait_seconds AS DOUBLE PRECISION) IS NOT NULL
+                            AND MIN(created_at)
+                                <= NOW() - (CAST(:max_wait_seconds AS DOUBLE PRECISION) * INTERVAL '1 second')
+                        )
+                ),
+                in_flight AS (
+                    SELECT client_id, COUNT(DISTINCT conversation_id) AS processing
+                    FROM outbox_messages
+                    WHERE status = 'PROCESSING'
+                    GROUP BY client_id
+                ),
+                ranked AS (
+                    SELECT ready.conversation_id,
+                           ready.last_created_at,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY ready.client_id ORDER BY ready.last_created_at
+                           ) AS tenant_rank,
+                           GREATEST(COALESCE(cs.outbox_weight, 1), 1) AS weight,
+                           COALESCE(cs.outbox_max_concurrency, 0) AS max_concurrency,
+                           COALESCE(in_flight.processing, 0) AS processing
+                    FROM ready
+                    LEFT JOIN client_settings cs ON cs.client_id = ready.client_id
+                    LEFT JOIN in_flight ON in_flight.client_id = ready.client_id
+                ),
+                candidates AS (
+                    -- Weighted fair share: a tenant's k-th conversation gets virtual time k / weight,
+                    -- so one busy tenant cannot fill the whole LIMIT ahead of everyone else.
+                    SELECT conversation_id, last_created_at
+                    FROM ranked
+                    WHERE max_concurrency <= 0 OR processing + tenant_rank <= max_concurrency
+                    ORDER BY tenant_rank::float / weight, last_created_at
                     LIMIT :limit
                 ),
                 to_claim AS (
@@ -124,6 +264,11 @@ def claim_pending_outbox_batches(
                 UPDATE outbox_messages
                 SET status = 'PROCESSING',
                     attempts = attempts + 1,
+                    locked_by = :worker_id,
+                    lease_expires_at = CASE
+                        WHEN CAST(:lease_seconds AS DOUBLE PRECISION) IS NULL THEN NULL
+                        ELSE NOW() + (CAST(:lease_seconds AS DOUBLE PRECISION) * INTERVAL '1 second')
+                    END,
                     updated_at = NOW()
                 WHERE id IN (SELECT id FROM to_claim)
                 RETURNING outbox_messages.id,
@@ -132,16 +277,31 @@ def claim_pending_outbox_batches(
                           outbox_messages.inbound_message_id,
                           outbox_messages.payload_json,
                           outbox_messages.attempts,
-                          outbox_messages.created_at
+                          outbox_messages.created_at,
+                          -- When the row became claimable: end of its coalescing window or of
+                          -- its retry backoff (GREATEST skips a NULL next_attempt_at).
+                          GREATEST(
+                              COALESCE(
+                                  outbox_messages.ready_at,
+                                  outbox_messages.created_at + (:idle_seconds * INTERVAL '1 second')
+                              ),
+                              outbox_messages.next_attempt_at
+                          ) AS eligible_at
                 """
             ),
-            {"limit": limit, "idle_seconds": idle_seconds},
+            {
+                "limit": limit,
+                "idle_seconds": idle_seconds,
+                "worker_id": worker_id,
+                "lease_seconds": lease_seconds,
+                "max_wait_seconds": max_wait_seconds,
+            },
         )
         .mappings()
         .all()
     )
     db.commit()
-    return rows
+    return [OutboxRow.from_mapping(row) for row in rows]
 
 
 def release_stale_processing(
@@ -171,9 +331,17 @@ def release_stale_processing(
                             WHEN attempts >= :max_attempts THEN NULL
                             ELSE NOW() + (:retry_backoff_seconds * INTERVAL '1 second')
                         END,
+                        locked_by = NULL,
+                        lease_expires_at = NULL,
                         updated_at = NOW()
                     WHERE status = 'PROCESSING'
-                      AND updated_at <= NOW() - (:stale_seconds * INTERVAL '1 second')
+                      AND (
+                          lease_expires_at <= NOW()
+                          OR (
+                              lease_expires_at IS NULL
+                              AND updated_at <= NOW() - (:stale_seconds * INTERVAL '1 second')
+                          )
+                      )
                     RETURNING status
                 )
                 SELECT status, COUNT(*) AS count
@@ -218,6 +386,8 @@ def mark_outbox_status(
             SET status = :status,
                 last_error = :last_error,
                 next_attempt_at = :next_attempt_at,
+                locked_by = NULL,
+                lease_expires_at = NULL,
                 updated_at = NOW()
             WHERE id = :id
             """
@@ -230,3 +400,189 @@ def mark_outbox_status(
         },
     )
     db.commit()
+
+
+def renew_outbox_leases(db: Session, *, worker_id: str, lease_seconds: float) -> int:
+    """Heartbeat: extend the lease on every row this worker is still processing."""
+    result = db.execute(
+        text(
+            """
+            UPDATE outbox_messages
+            SET lease_expires_at = NOW() + (:lease_seconds * INTERVAL '1 second')
+            WHERE status = 'PROCESSING'
+              AND locked_by = :worker_id
+            """
+        ),
+        {"worker_id": worker_id, "lease_seconds": lease_seconds},
+    )
+    db.commit()
+    return result.rowcount or 0
+
+
+def release_worker_claims(db: Session, *, worker_id: str, delivered_ids: Iterable[str] = ()) -> int:
+    """
+    Hand rows claimed by a stopping worker back to the queue without spending an attempt.
+
+    Rows in delivered_ids already had their reply sent: they are marked SENT instead, so a
+    restart does not answer them twice. Returns the number of rows put back to PENDING.
+    """
+    ids = [str(outbox_id) for outbox_id in delivered_ids if outbox_id]
+    if ids:
+        params: dict[str, Any] = {"worker_id": worker_id}
+        values = []
+        for index, outbox_id in enumerate(ids):
+            params[f"id_{index}"] = outbox_id
+            values.append(f"(CAST(:id_{index} AS UUID))")
+        db.execute(
+            text(
+                f"""
+                UPDATE outbox_messages AS o
+                SET status = 'SENT',
+                    last_error = NULL,
+                    next_attempt_at = NULL,
+                    locked_by = NULL,
+                    lease_expires_at = NULL,
+                    updated_at = NOW()
+                FROM (VALUES {", ".join(values)}) AS v(id)
+                WHERE o.id = v.id
+                  AND o.status = 'PROCESSING'
+                  AND o.locked_by = :worker_id
+                """
+            ),
+            params,
+        )
+    result = db.execute(
+        text(
+            """
+            UPDATE outbox_messages
+            SET status = 'PENDING',
+                attempts = GREATEST(attempts - 1, 0),
+                next_attempt_at = NULL,
+                last_error = 'worker_shutdown',
+                locked_by = NULL,
+                lease_expires_at = NULL,
+                updated_at = NOW()
+            WHERE status = 'PROCESSING'
+              AND locked_by = :worker_id
+            """
+        ),
+        {"worker_id": worker_id},
+    )
+    db.commit()
+    return result.rowcount or 0
+
+
+OUTBOX_OUTCOMES = {"SENT", "RETRY", "FAILED"}
+
+
+def finalize_outbox_rows(
+    db: Session,
+    *,
+    outbox_ids: list,
+    outcome: str,
+    last_error: str | None = None,
+    max_attempts: int = 5,
+    retry_backoff_seconds: float = 2.0,
+) -> dict[str, int]:
+    """
+    Finalize a coalesced group in one UPDATE ... FROM (VALUES ...) and one commit.
+
+    outcome=RETRY decides per row in SQL: rows that used up max_attempts become FAILED,
+    the rest go back to PENDING with exponential backoff from their own attempts count.
+    Returns the number of rows per resulting status.
+    """
+    if outcome not in OUTBOX_OUTCOMES:
+        raise ValueError(f"Unknown outbox outcome: {outcome}")
+    ids = [str(outbox_id) for outbox_id in outbox_ids if outbox_id]
+    counts = {"SENT": 0, "PENDING": 0, "FAILED": 0}
+    if not ids:
+        return counts
+
+    params: dict[str, Any] = {
+        "outcome": outcome,
+        "last_error": last_error,
+        "max_attempts": max_attempts,
+        "retry_backoff_seconds": retry_backoff_seconds,
+    }
+    values = []
+    for index, outbox_id in enumerate(ids):
+        params[f"id_{index}"] = outbox_id
+        values.append(f"(CAST(:id_{index} AS UUID))")
+
+    rows = (
+        db.execute(
+            text(
+                f"""
+                UPDATE outbox_messages AS o
+                SET status = CASE
+                        WHEN :outcome = 'SENT' THEN 'SENT'
+                        WHEN :outcome = 'FAILED' OR o.attempts >= :max_attempts THEN 'FAILED'
+                        ELSE 'PENDING'
+                    END,
+                    last_error = :last_error,
+                    next_attempt_at = CASE
+                        WHEN :outcome = 'RETRY' AND o.attempts < :max_attempts
+                            THEN NOW() + (
+                                :retry_backoff_seconds * POWER(2, GREATEST(o.attempts - 1, 0)) * INTERVAL '1 second'
+                            )
+                        ELSE NULL
+                    END,
+                    locked_by = NULL,
+                    lease_expires_at = NULL,
+                    updated_at = NOW()
+                FROM (VALUES {", ".join(values)}) AS v(id)
+                WHERE o.id = v.id
+                RETURNING o.status
+                """
+            ),
+            params,
+        )
+        .mappings()
+        .all()
+    )
+    db.commit()
+    for row in rows:
+        status = row.get("status")
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+def get_outbox_tenant_stats(db: Session) -> list[dict[str, Any]]:
+    """Per-tenant queue depth and wait time, to spot noisy neighbours."""
+    rows = (
+        db.execute(
+            text(
+                """
+                SELECT o.client_id,
+                       c.name AS client_slug,
+                       COUNT(*) FILTER (WHERE o.status = 'PENDING') AS pending,
+                       COUNT(DISTINCT o.conversation_id) FILTER (WHERE o.status = 'PENDING') AS pending_conversations,
+                       COUNT(*) FILTER (WHERE o.status = 'PROCESSING') AS processing,
+                       COUNT(DISTINCT o.conversation_id) FILTER (WHERE o.status = 'PROCESSING') AS processing_conversations,
+                       EXTRACT(EPOCH FROM NOW() - MIN(o.created_at) FILTER (WHERE o.status = 'PENDING'))
+                           AS oldest_pending_seconds,
+                       EXTRACT(EPOCH FROM AVG(NOW() - o.created_at) FILTER (WHERE o.status = 'PENDING'))
+                           AS avg_pending_seconds,
+                       COALESCE(cs.outbox_weight, 1) AS weight,
+                       COALESCE(cs.outbox_max_concurrency, 0) AS max_concurrency
+                FROM outbox_messages o
+                LEFT JOIN clients c ON c.id = o.client_id
+                LEFT JOIN client_settings cs ON cs.client_id = o.client_id
+                WHERE o.status IN ('PENDING', 'PROCESSING')
+                GROUP BY o.client_id, c.name, cs.outbox_weight, cs.outbox_max_concurrency
+                ORDER BY pending DESC
+                """
+            )
+        )
+        .mappings()
+        .all()
+    )
+    stats = []
+    for row in rows:
+        item = dict(row)
+        item["client_id"] = str(item["client_id"])
+        for key in ("oldest_pending_seconds", "avg_pending_seconds"):
+            value = item.get(key)
+            item[key] = round(float(value), 2) if value is not None else None
+        stats.append(item)
+    return stats
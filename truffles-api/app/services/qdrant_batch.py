@@ -0,0 +1,114 @@
+"""
+Batched Qdrant vector search.
+
+Callers describe each search as a VectorQuery. search_batch() groups them by collection,
+sends one `/points/search/batch` request per collection (collections in parallel) and
+returns the points for each query in input order. If a batch request fails or the
+endpoint is missing (older Qdrant, proxy without the route), that collection falls back
+to one `/points/search` per query; a missing endpoint is remembered so later messages go
+straight to single searches. A failed single search raises QdrantSearchError, so callers
+can tell "no matches" from "Qdrant unavailable".
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from app.logging_config import get_logger
+from app.services.http_clients import http_client
+
+logger = get_logger("qdrant_batch")
+
+QDRANT_HOST = os.environ.get("QDRANT_HOST", "http://qdrant:6333")
+QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY")
+
+class QdrantSearchError(RuntimeError):
+    """Qdrant answered a search with a non-200 status."""
+
+
+# Collections whose batch endpoint answered 404/405: skip straight to single searches.
+_batch_unsupported: set[str] = set()
+
+
+@dataclass(frozen=True)
+class VectorQuery:
+    collection: str
+    vector: list[float]
+    limit: int
+    filter: dict[str, Any] | None = None
+    score_threshold: float | None = None
+
+    def to_request(self) -> dict[str, Any]:
+        request: dict[str, Any] = {"vector": self.vector, "limit": self.limit, "with_payload": True}
+        if self.filter is not None:
+            request["filter"] = self.filter
+        if self.score_threshold is not None:
+            request["score_threshold"] = self.score_threshold
+        return request
+
+
+def _search_single(collection: str, query: VectorQuery) -> list[dict]:
+    with http_client("qdrant") as client:
+        response = client.post(
+            f"{QDRANT_HOST}/collections/{collection}/points/search",
+            headers={"api-key": QDRANT_API_KEY},
+            json=query.to_request(),
+        )
+    if response.status_code != 200:
+        logger.error(f"Qdrant search error: {response.status_code} - {response.text}")
+        raise QdrantSearchError(f"Qdrant search failed: {response.status_code}")
+    return response.json().get("result", []) or []
+
+
+def _search_collection(collection: str, queries: list[VectorQuery]) -> list[list[dict]]:
+    if len(queries) > 1 and collection not in _batch_unsupported:
+        try:
+            with http_client("qdrant") as client:
+                response = client.post(
+                    f"{QDRANT_HOST}/collections/{collection}/points/search/batch",
+                    headers={"api-key": QDRANT_API_KEY},
+                    json={"searches": [query.to_request() for query in queries]},
+                )
+            if response.status_code == 200:
+                batches = response.json().get("result") or []
+                if len(batches) == len(queries):
+                    return [points or [] for points in batches]
+            if response.status_code in (404, 405):
+                _batch_unsupported.add(collection)
+            logger.warning(
+                "Qdrant batch search failed, using single searches",
+                extra={"context": {"collection": collection, "status": response.status_code}},
+            )
+        except Exception as exc:
+            logger.warning(
+                "Qdrant batch search failed, using single searches",
+                extra={"context": {"collection": collection, "error": str(exc)}},
+            )
+    return [_search_single(collection, query) for query in queries]
+
+
+def search_batch(queries: list[VectorQuery]) -> list[list[dict]]:
+    """Raw Qdrant points for every query, in the order given."""
+    groups: dict[str, list[int]] = {}
+    for index, query in enumerate(queries):
+        groups.setdefault(query.collection, []).append(index)
+
+    results: list[list[dict]] = [[] for _ in queries]
+
+    def run(collection: str) -> None:
+        indexes = groups[collection]
+        for index, points in zip(indexes, _search_collection(collection, [queries[i] for i in indexes])):
+            results[index] = points
+
+    if len(groups) > 1:
+        # Short-lived pool: retrieval already runs on the LLM executor, so do not queue there.
+        with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix="qdrant-batch") as pool:
+            for future in [pool.submit(run, collection) for collection in groups]:
+                future.result()
+    else:
+        for collection in groups:
+            run(collection)
+    return results
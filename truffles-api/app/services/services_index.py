@@ -0,0 +1,215 @@
+"""
+In-memory services index for semantic service matching.
+
+`ops/sync_client.py sync_services_index` uploads each tenant's service catalog to the
+Qdrant `services_index` collection and also writes the same points (payload + vector)
+to `app/knowledge/<client_slug>/services_index.json`, stamped with the SHA-256 of the
+SALON_TRUTH.yaml they were built from. When that snapshot matches the current truth
+file, the API holds the vectors as one normalized float32 matrix (persisted as a
+memory-mapped `.npy` keyed by the truth hash) and answers top-k with a single
+matrix-vector product instead of a Qdrant round-trip.
+
+NumPy is optional: without it, or without a fresh snapshot, callers get None and
+fall back to Qdrant.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from app.logging_config import get_logger
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None
+
+logger = get_logger("services_index")
+
+_KNOWLEDGE_DIR = Path(__file__).resolve().parents[1] / "knowledge"
+SNAPSHOT_FILENAME = "services_index.json"
+
+# client_slug -> (index key, index or None); a None index is cached too so a missing or
+# stale snapshot is not re-read on every message.
+_indexes: dict[str, tuple[str, "LocalServicesIndex | None"]] = {}
+_indexes_lock = threading.Lock()
+_truth_hashes: dict[Path, tuple[int, int, str]] = {}
+
+
+@dataclass(frozen=True)
+class LocalServicesIndex:
+    truth_hash: str
+    matrix: Any
+    payloads: list[dict[str, Any]]
+
+    def search(self, embedding: list[float], limit: int) -> list[dict[str, Any]]:
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape != (self.matrix.shape[1],):
+            raise ValueError(f"embedding size {query.shape} does not match index {self.matrix.shape[1]}")
+        norm = float(np.linalg.norm(query))
+        if norm == 0.0 or limit <= 0:
+            return []
+        scores = self.matrix @ (query / norm)
+        count = min(limit, scores.shape[0])
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"score": float(scores[idx]), "payload": self.payloads[idx]}
+            for idx in top
+            if scores[idx] >= 0.0
+        ]
+
+
+def _is_env_enabled(value: str | None, default: bool = True) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _get_cache_dir() -> Path:
+    raw = os.environ.get("SERVICES_INDEX_CACHE_DIR")
+    return Path(raw) if raw else Path(tempfile.gettempdir()) / "truffles-services-index"
+
+
+def _truth_path(client_slug: str) -> Path:
+    return _KNOWLEDGE_DIR / client_slug / "SALON_TRUTH.yaml"
+
+
+def _snapshot_path(client_slug: str) -> Path:
+    return _KNOWLEDGE_DIR / client_slug / SNAPSHOT_FILENAME
+
+
+def truth_file_hash(path: Path) -> str | None:
+    try:
+        stat = path.stat()
+        cached = _truth_hashes.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+    _truth_hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def _load_matrix(cache_path: Path, vectors: list[list[float]]) -> Any:
+    if cache_path.exists():
+        try:
+            return np.load(cache_path, mmap_mode="r")
+        except Exception as exc:
+            logger.warning(
+                "services_index cache unreadable",
+                extra={"context": {"path": str(cache_path), "error": str(exc)}},
+            )
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as handle:
+            np.save(handle, matrix)
+        os.replace(tmp_path, cache_path)
+        return np.load(cache_path, mmap_mode="r")
+    except Exception as exc:
+        logger.warning(
+            "services_index cache write failed",
+            extra={"context": {"path": str(cache_path), "error": str(exc)}},
+        )
+        return matrix
+
+
+def _index_key(client_slug: str, truth_hash: str) -> str:
+    """Truth hash plus the snapshot version, so a re-sync with the same truth is picked up too."""
+    try:
+        stat = _snapshot_path(client_slug).stat()
+    except OSError:
+        return f"{truth_hash}:missing"
+    return f"{truth_hash}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _build_index(client_slug: str, truth_hash: str, index_key: str) -> LocalServicesIndex | None:
+    snapshot_path = _snapshot_path(client_slug)
+    try:
+        snapshot = json.loads(snapshot_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        logger.warning(
+            "services_index snapshot unreadable",
+            extra={"context": {"client_slug": client_slug, "error": str(exc)}},
+        )
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("truth_sha256") != truth_hash:
+        logger.info("services_index snapshot is stale, using Qdrant", extra={"context": {"client_slug": client_slug}})
+        return None
+
+    payloads: list[dict[str, Any]] = []
+    vectors: list[list[float]] = []
+    for point in snapshot.get("points") or []:
+        if not isinstance(point, dict):
+            continue
+        payload = point.get("payload")
+        vector = point.get("vector")
+        if isinstance(payload, dict) and isinstance(vector, list) and vector:
+            payloads.append(payload)
+            vectors.append(vector)
+    if not vectors or len({len(vector) for vector in vectors}) != 1:
+        return None
+
+    key_digest = hashlib.sha256(index_key.encode("utf-8")).hexdigest()[:8]
+    cache_path = _get_cache_dir() / f"{client_slug}-{truth_hash[:16]}-{key_digest}.npy"
+    matrix = _load_matrix(cache_path, vectors)
+    if matrix.shape[0] != len(payloads):
+        return None
+    logger.info(
+        "services_index loaded in memory",
+        extra={"context": {"client_slug": client_slug, "services": len(payloads), "dim": int(matrix.shape[1])}},
+    )
+    return LocalServicesIndex(truth_hash=truth_hash, matrix=matrix, payloads=payloads)
+
+
+def get_local_services_index(client_slug: str) -> LocalServicesIndex | None:
+    if np is None or not client_slug or not _is_env_enabled(os.environ.get("SERVICES_INDEX_LOCAL_ENABLED")):
+        return None
+    truth_hash = truth_file_hash(_truth_path(client_slug))
+    if not truth_hash:
+        return None
+    index_key = _index_key(client_slug, truth_hash)
+    cached = _indexes.get(client_slug)
+    if cached is not None and cached[0] == index_key:
+        return cached[1]
+    with _indexes_lock:
+        cached = _indexes.get(client_slug)
+        if cached is None or cached[0] != index_key:
+            cached = (index_key, _build_index(client_slug, truth_hash, index_key))
+            _indexes[client_slug] = cached
+    return cached[1]
+
+
+def clear_local_services_index() -> None:
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def search_local_services_index(client_slug: str, embedding: list[float], limit: int) -> list[dict[str, Any]] | None:
+    """Top-k services by cosine score, or None when the local index is unavailable."""
+    index = get_local_services_index(client_slug)
+    if index is None:
+        return None
+    try:
+        return index.search(embedding, limit)
+    except Exception as exc:
+        logger.warning(
+            "services_index local search failed",
+            extra={"context": {"client_slug": client_slug, "error": str(exc)}},
+        )
+        return None
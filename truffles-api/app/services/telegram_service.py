@@ -2,9 +2,8 @@ from pathlib import Path
 from typing import Optional
 from uuid import UUID
 
-import httpx
-
 from app.logging_config import get_logger
+from app.services.http_clients import http_client
 
 logger = get_logger("telegram_service")
 
@@ -22,7 +21,7 @@ class TelegramService:
         """Make request to Telegram API."""
         url = f"{self.base_url}/{method}"
         try:
-            with httpx.Client(timeout=30.0) as client:
+            with http_client("telegram") as client:
                 if files:
                     response = client.post(url, data=data or {}, files=files)
                 else:
@@ -230,7 +229,7 @@ class TelegramService:
         target_path.parent.mkdir(parents=True, exist_ok=True)
         size_bytes = 0
         try:
-            with httpx.Client(timeout=30.0) as client:
+            with http_client("telegram") as client:
                 with client.stream("GET", file_url) as response:
                     response.raise_for_status()
                     with target_path.open("wb") as handle:
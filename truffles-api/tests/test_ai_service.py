@@ -1,16 +1,25 @@
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from uuid import uuid4
 
+import httpx
+
 from app.services.ai_service import (
     ACKNOWLEDGEMENT_RESPONSE,
     GREETING_RESPONSE,
     KNOWLEDGE_CONFIDENCE_THRESHOLD,
     LOW_SIGNAL_RESPONSE,
     _sanitize_query_for_rag,
+    agenerate_ai_response,
+    attach_retrieval_context,
+    clear_retrieval_cache,
     generate_ai_response,
     get_conversation_history,
+    get_rag_confidence,
+    get_retrieval_cache_stats,
     get_system_prompt,
 )
+from app.services.latency_budget import SKIPPED_KEY, start_message_budget
+from app.services.qdrant_batch import QdrantSearchError
 from app.services.result import Result
 
 
@@ -124,7 +133,7 @@ class TestGenerateAIResponse:
             {"role": "assistant", "content": "Уточните вид педикюра."},
         ]
 
-        def search_side_effect(query: str, client_slug: str, limit: int = 3):
+        def search_side_effect(query: str, client_slug: str, limit: int = 3, **kwargs):
             if query == "классический интересует":
                 return [{"score": 0.1, "text": "Weak match"}]
             return [{"score": 0.8, "text": "Relevant info"}]
@@ -203,6 +212,40 @@ class TestGenerateAIResponse:
         assert "LLM error" in result.error
         mock_alert.assert_called_once()
 
+    @patch("app.services.ai_service.get_llm_provider")
+    @patch("app.services.ai_service.search_knowledge")
+    @patch("app.services.ai_service.get_system_prompt")
+    @patch("app.services.ai_service.get_conversation_history")
+    async def test_async_generation_awaits_provider(self, mock_history, mock_prompt, mock_search, mock_llm):
+        mock_prompt.return_value = "You are a helpful assistant"
+        mock_history.return_value = []
+        mock_search.return_value = [{"score": 0.85, "text": "Relevant info"}]
+        mock_llm.return_value.agenerate = AsyncMock(return_value=Mock(content="Async response"))
+
+        result = await agenerate_ai_response(Mock(), uuid4(), "test-client", uuid4(), "What is async X?")
+
+        assert result.value == ("Async response", "high")
+        mock_llm.return_value.agenerate.assert_awaited_once()
+        mock_llm.return_value.generate.assert_not_called()
+
+    @patch("app.services.ai_service.get_llm_provider")
+    @patch("app.services.ai_service.search_knowledge")
+    @patch("app.services.ai_service.get_system_prompt")
+    @patch("app.services.ai_service.get_conversation_history")
+    async def test_async_generation_timeout_escalates(self, mock_history, mock_prompt, mock_search, mock_llm):
+        mock_prompt.return_value = "You are a helpful assistant"
+        mock_history.return_value = []
+        mock_search.return_value = [{"score": 0.85, "text": "Relevant info"}]
+        mock_llm.return_value.agenerate = AsyncMock(side_effect=httpx.ReadTimeout("slow"))
+        timing_context: dict = {}
+
+        result = await agenerate_ai_response(
+            Mock(), uuid4(), "test-client", uuid4(), "What is slow X?", timing_context=timing_context
+        )
+
+        assert result.value == (None, "low_confidence")
+        assert timing_context["llm_timeout"] is True
+
 
 class TestLowConfidenceEscalation:
     @patch("app.services.ai_service.search_knowledge")
@@ -275,3 +318,251 @@ class TestAckAndLowSignal:
         assert result.ok is True
         assert result.value[1] == "medium"
         assert result.value[0] == LOW_SIGNAL_RESPONSE
+
+
+class TestRetrievalMemo:
+    @patch("app.services.ai_service.get_llm_provider")
+    @patch("app.services.ai_service.search_knowledge")
+    @patch("app.services.ai_service.get_system_prompt")
+    @patch("app.services.ai_service.get_conversation_history")
+    def test_generation_reuses_confidence_retrieval(self, mock_history, mock_prompt, mock_search, mock_llm):
+        mock_db = Mock()
+        conversation_id = uuid4()
+        mock_prompt.return_value = "You are a helpful assistant"
+        mock_history.return_value = [
+            {"role": "user", "content": "педикюр интересует"},
+            {"role": "assistant", "content": "Какой вид педикюра вас интересует?"},
+        ]
+
+        def search_side_effect(query: str, client_slug: str, limit: int = 3, **kwargs):
+            if query == "классический интересует":
+                return [{"score": 0.1, "text": "Weak match"}]
+            return [{"score": 0.8, "text": "Relevant info"}]
+
+        mock_search.side_effect = search_side_effect
+        mock_response = Mock()
+        mock_response.content = "AI generated response"
+        mock_llm.return_value.generate.return_value = mock_response
+
+        timing_context: dict = {}
+        attach_retrieval_context(timing_context)
+        confident, _ = get_rag_confidence(
+            db=mock_db,
+            conversation_id=conversation_id,
+            client_slug="demo_salon",
+            user_message="классический интересует",
+            timing_context=timing_context,
+        )
+        result = generate_ai_response(
+            mock_db,
+            uuid4(),
+            "demo_salon",
+            conversation_id,
+            "классический интересует",
+            timing_context=timing_context,
+        )
+
+        assert confident is True
+        assert result.value[0] == "AI generated response"
+        assert mock_search.call_count == 2
+        assert mock_history.call_count == 1
+        assert timing_context["rag_memo_hits"] == 2
+        generate_trace = [item for item in timing_context["rag_trace"] if item["phase"] == "generate"]
+        assert all(item.get("memo_hit") is True for item in generate_trace)
+
+    @patch("app.services.ai_service.search_knowledge")
+    def test_without_context_every_call_hits_search(self, mock_search):
+        mock_search.return_value = [{"score": 0.9, "text": "Relevant info"}]
+
+        for _ in range(2):
+            get_rag_confidence(
+                db=Mock(),
+                conversation_id=uuid4(),
+                client_slug="demo_salon",
+                user_message="сколько стоит маникюр",
+                timing_context={},
+            )
+
+        assert mock_search.call_count == 2
+
+
+class TestRetrievalCache:
+    def setup_method(self):
+        clear_retrieval_cache()
+
+    def teardown_method(self):
+        clear_retrieval_cache()
+
+    def _confidence(self, message: str, timing_context: dict) -> None:
+        get_rag_confidence(
+            db=Mock(),
+            conversation_id=uuid4(),
+            client_slug="demo_salon",
+            user_message=message,
+            timing_context=timing_context,
+        )
+
+    @patch("app.services.ai_service._is_retrieval_cache_enabled", return_value=True)
+    @patch("app.services.ai_service.read_shared_knowledge_version", return_value=3)
+    @patch("app.services.ai_service.search_knowledge")
+    def test_repeated_question_served_from_cache(self, mock_search, _mock_version, _mock_enabled):
+        mock_search.return_value = [{"score": 0.9, "text": "Relevant info"}]
+        first: dict = {}
+        second: dict = {}
+
+        self._confidence("Сколько стоит маникюр", first)
+        self._confidence("сколько  стоит маникюр", second)
+
+        assert mock_search.call_count == 1
+        assert first["rag_cache_misses"] == 1
+        assert second["rag_cache_hits"] == 1
+        assert second["rag_trace"][0]["cache_hit"] is True
+        assert second["rag_best_score"] == 0.9
+
+    @patch("app.services.ai_service._is_retrieval_cache_enabled", return_value=True)
+    @patch("app.services.ai_service.read_shared_knowledge_version")
+    @patch("app.services.ai_service.search_knowledge")
+    def test_version_bump_invalidates_entries(self, mock_search, mock_version, _mock_enabled):
+        mock_search.return_value = [{"score": 0.9, "text": "Old info"}]
+        mock_version.return_value = 3
+        self._confidence("сколько стоит маникюр", {})
+
+        mock_search.return_value = [{"score": 0.9, "text": "New info"}]
+        mock_version.return_value = 4
+        timing_context: dict = {}
+        self._confidence("сколько стоит маникюр", timing_context)
+
+        assert mock_search.call_count == 2
+        assert "rag_cache_hits" not in timing_context
+
+    @patch("app.services.ai_service._is_retrieval_cache_enabled", return_value=True)
+    @patch("app.services.ai_service.read_shared_knowledge_version", return_value=None)
+    @patch("app.services.ai_service.search_knowledge")
+    def test_unknown_version_bypasses_cache(self, mock_search, _mock_version, _mock_enabled):
+        mock_search.return_value = [{"score": 0.9, "text": "Relevant info"}]
+
+        for _ in range(2):
+            self._confidence("сколько стоит маникюр", {})
+
+        assert mock_search.call_count == 2
+        assert get_retrieval_cache_stats()["size"] == 0
+
+    @patch("app.services.ai_service._is_retrieval_cache_enabled", return_value=True)
+    @patch("app.services.ai_service.read_shared_knowledge_version", return_value=3)
+    @patch("app.services.ai_service.get_conversation_history", return_value=[])
+    @patch("app.services.ai_service.search_knowledge")
+    def test_failed_vector_search_is_not_cached(self, mock_search, _mock_history, _mock_version, _mock_enabled):
+        mock_search.side_effect = QdrantSearchError("Qdrant search failed: 503")
+        self._confidence("сколько стоит маникюр", {})
+
+        mock_search.side_effect = None
+        mock_search.return_value = [{"score": 0.9, "text": "Relevant info"}]
+        timing_context: dict = {}
+        self._confidence("сколько стоит маникюр", timing_context)
+
+        assert mock_search.call_count == 2
+        assert timing_context["rag_best_score"] == 0.9
+        assert get_retrieval_cache_stats()["size"] == 1
+
+
+class TestRetrievalBatchPrefetch:
+    @patch("app.services.ai_service._is_rag_batch_enabled", return_value=True)
+    @patch("app.services.ai_service.search_knowledge_batch")
+    @patch("app.services.ai_service.search_knowledge")
+    @patch("app.services.ai_service.get_conversation_history")
+    def test_follow_up_fetches_both_queries_in_one_batch(self, mock_history, mock_search, mock_batch, _enabled):
+        mock_history.return_value = [
+            {"role": "user", "content": "педикюр интересует"},
+            {"role": "assistant", "content": "Какой вид педикюра вас интересует?"},
+        ]
+        mock_batch.return_value = [
+            [{"score": 0.1, "text": "Weak match"}],
+            [{"score": 0.8, "text": "Relevant info"}],
+        ]
+        timing_context: dict = {}
+        attach_retrieval_context(timing_context)
+
+        confident, score = get_rag_confidence(
+            db=Mock(),
+            conversation_id=uuid4(),
+            client_slug="demo_salon",
+            user_message="классический интересует",
+            timing_context=timing_context,
+        )
+
+        assert confident is True
+        assert score == 0.8
+        mock_search.assert_not_called()
+        mock_batch.assert_called_once()
+        assert mock_batch.call_args.args[0] == ["классический интересует", "педикюр интересует классический интересует"]
+        assert timing_context["rag_batch_prefetch"]["queries"] == 2
+        assert timing_context["rag_memo_hits"] == 2
+
+    @patch("app.services.ai_service._is_rag_batch_enabled", return_value=True)
+    @patch("app.services.ai_service.search_knowledge_batch")
+    @patch("app.services.ai_service.search_knowledge")
+    def test_standalone_question_uses_single_search(self, mock_search, mock_batch, _enabled):
+        mock_search.return_value = [{"score": 0.9, "text": "Relevant info"}]
+        timing_context: dict = {}
+        attach_retrieval_context(timing_context)
+
+        get_rag_confidence(
+            db=Mock(),
+            conversation_id=uuid4(),
+            client_slug="demo_salon",
+            user_message="Сколько стоит маникюр и педикюр вместе?",
+            timing_context=timing_context,
+        )
+
+        mock_batch.assert_not_called()
+        mock_search.assert_called_once()
+
+    @patch("app.services.ai_service._is_rag_batch_enabled", return_value=True)
+    @patch("app.services.ai_service.search_knowledge_batch")
+    @patch("app.services.ai_service.search_knowledge")
+    @patch("app.services.ai_service.get_conversation_history")
+    def test_no_prefetch_without_budget_for_retry(self, mock_history, mock_search, mock_batch, _enabled):
+        mock_search.return_value = [{"score": 0.1, "text": "Weak match"}]
+        timing_context: dict = {}
+        attach_retrieval_context(timing_context)
+        with patch(
+            "app.services.latency_budget.get_message_budget_settings", return_value=(True, 0.5, 4.0, 2.0)
+        ):
+            start_message_budget(timing_context)
+
+        get_rag_confidence(
+            db=Mock(),
+            conversation_id=uuid4(),
+            client_slug="demo_salon",
+            user_message="классический интересует",
+            timing_context=timing_context,
+        )
+
+        mock_batch.assert_not_called()
+        mock_history.assert_not_called()
+        mock_search.assert_called_once()
+        assert timing_context[SKIPPED_KEY] == ["rag_retry"]
+
+    @patch("app.services.ai_service._is_rag_batch_enabled", return_value=True)
+    @patch("app.services.ai_service.search_knowledge_batch")
+    @patch("app.services.ai_service.search_knowledge")
+    @patch("app.services.ai_service.get_conversation_history")
+    def test_known_confident_primary_skips_contextual_query(self, mock_history, mock_search, mock_batch, _enabled):
+        timing_context: dict = {}
+        retrieval_context = attach_retrieval_context(timing_context)
+        retrieval_context.store_retrieval(
+            "demo_salon", "классический интересует", [{"score": 0.9, "text": "Relevant info"}], None
+        )
+
+        confident, _ = get_rag_confidence(
+            db=Mock(),
+            conversation_id=uuid4(),
+            client_slug="demo_salon",
+            user_message="классический интересует",
+            timing_context=timing_context,
+        )
+
+        assert confident is True
+        mock_batch.assert_not_called()
+        mock_history.assert_not_called()
+        mock_search.assert_not_called()
@@ -0,0 +1,145 @@
+import math
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import bm25_index
+from app.services.bm25_index import BM25Index, apply_points_to_bm25_index, get_bm25_index, invalidate_bm25_index
+
+
+def _point(point_id, content, doc_name="faq.md"):
+    return {"id": point_id, "payload": {"content": content, "metadata": {"doc_name": doc_name, "client_slug": "demo"}}}
+
+
+CORPUS = [
+    _point(1, "Маникюр классический стоит 5000 тенге"),
+    _point(2, "Педикюр аппаратный стоит 8000 тенге"),
+    _point(3, "Адрес салона: Абая 150, вход со двора"),
+]
+
+
+def _reference_bm25(query_tokens, docs_tokens):
+    k1, b = 1.5, 0.75
+    n = len(docs_tokens)
+    avg_len = sum(len(t) for t in docs_tokens) / n
+    scores = []
+    for tokens in docs_tokens:
+        score = 0.0
+        for term in query_tokens:
+            df = sum(1 for t in docs_tokens if term in t)
+            freq = tokens.count(term)
+            if not df or not freq:
+                continue
+            idf = math.log((n - df + 0.5) / (df + 0.5) + 1)
+            score += idf * (freq * (k1 + 1)) / (freq + k1 * (1 - b + b * len(tokens) / avg_len))
+        scores.append(score)
+    return scores
+
+
+class TestBM25Index:
+    def test_scores_match_reference_formula(self):
+        index = BM25Index(client_slug="demo", version=0)
+        index.add_points(CORPUS)
+
+        results = index.search("сколько стоит маникюр", limit=5)
+
+        docs_tokens = [bm25_index.tokenize_for_bm25(p["payload"]["content"]) for p in CORPUS]
+        expected = _reference_bm25(bm25_index.tokenize_for_bm25("сколько стоит маникюр"), docs_tokens)
+        assert results[0]["id"] == 1
+        assert math.isclose(results[0]["bm25_score"], expected[0])
+        assert results[0]["source"] == "faq.md"
+        assert {r["id"] for r in results} == {1, 2}
+
+    def test_upsert_replaces_existing_point(self):
+        index = BM25Index(client_slug="demo", version=0)
+        index.add_points(CORPUS)
+        index.add_points([_point(3, "Парковка бесплатная у входа")])
+
+        assert index.search("адрес", limit=5) == []
+        assert index.search("парковка", limit=5)[0]["id"] == 3
+        assert index.doc_count == 3
+
+
+class TestIndexRegistry:
+    def setup_method(self):
+        invalidate_bm25_index()
+
+    def test_index_is_reused_until_version_changes(self):
+        with (
+            patch("app.services.bm25_index.fetch_bm25_corpus", return_value=CORPUS) as mock_fetch,
+            patch("app.services.bm25_index.get_knowledge_version", return_value=1) as mock_version,
+        ):
+            first = get_bm25_index("demo")
+            second = get_bm25_index("demo")
+            assert first is second
+            assert mock_fetch.call_count == 1
+
+            mock_version.return_value = 2
+            third = get_bm25_index("demo")
+            assert third is not first
+            assert mock_fetch.call_count == 2
+
+    def test_local_write_is_applied_incrementally(self):
+        with (
+            patch("app.services.bm25_index.fetch_bm25_corpus", return_value=CORPUS) as mock_fetch,
+            patch("app.services.bm25_index.get_knowledge_version", return_value=4) as mock_version,
+        ):
+            index = get_bm25_index("demo")
+            assert apply_points_to_bm25_index("demo", [_point("learned-1", "Вопрос: есть парковка? Ответ: да")], version=5)
+
+            mock_version.return_value = 5
+            assert get_bm25_index("demo") is index
+            assert mock_fetch.call_count == 1
+            assert index.search("парковка", limit=3)[0]["id"] == "learned-1"
+
+    def test_stale_index_is_dropped_on_foreign_write(self):
+        with (
+            patch("app.services.bm25_index.fetch_bm25_corpus", return_value=CORPUS),
+            patch("app.services.bm25_index.get_knowledge_version", return_value=1),
+        ):
+            get_bm25_index("demo")
+        assert apply_points_to_bm25_index("demo", [_point(9, "новый документ")], version=7) is False
+        assert "demo" not in bm25_index._indexes
+
+    def test_failed_scroll_is_not_cached(self):
+        response = MagicMock(status_code=503)
+        with (
+            patch("app.services.bm25_index.http_client") as mock_client,
+            patch("app.services.bm25_index.get_knowledge_version", return_value=3),
+        ):
+            mock_client.return_value.__enter__.return_value.post.return_value = response
+            with pytest.raises(RuntimeError):
+                get_bm25_index("demo")
+        assert "demo" not in bm25_index._indexes
+
+        with (
+            patch("app.services.bm25_index.fetch_bm25_corpus", return_value=CORPUS),
+            patch("app.services.bm25_index.get_knowledge_version", return_value=3),
+        ):
+            assert get_bm25_index("demo").doc_count == 3
+
+    def test_slow_build_does_not_block_other_clients(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch(client_slug, *, max_docs):
+            if client_slug == "slow":
+                started.set()
+                release.wait(timeout=5)
+            return CORPUS
+
+        with (
+            patch("app.services.bm25_index.fetch_bm25_corpus", side_effect=fetch),
+            patch("app.services.bm25_index.get_knowledge_version", return_value=1),
+        ):
+            slow = threading.Thread(target=get_bm25_index, args=("slow",))
+            slow.start()
+            try:
+                assert started.wait(timeout=5)
+                assert get_bm25_index("demo").doc_count == 3
+                assert "slow" not in bm25_index._indexes
+            finally:
+                release.set()
+                slow.join(timeout=5)
+        assert "slow" in bm25_index._indexes
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from app.services.coalesce_service import decide_coalesce_seconds, plan_coalesce_window
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _decide(text, history=None, message_type="text"):
+    return decide_coalesce_seconds(
+        text,
+        message_type=message_type,
+        history=history,
+        now=NOW,
+        min_seconds=1.0,
+        max_seconds=8.0,
+    )
+
+
+class TestDecideCoalesceSeconds:
+    def test_complete_single_question_is_answered_fast(self):
+        decision = _decide("Сколько стоит маникюр?")
+
+        assert decision.seconds == 1.0
+        assert decision.reason == "complete"
+
+    def test_greeting_waits_for_follow_up(self):
+        decision = _decide("Здравствуйте")
+
+        assert decision.reason == "fragment"
+        assert decision.seconds == 4.0
+
+    def test_continuation_waits_for_follow_up(self):
+        assert _decide("Хотела узнать, а").reason == "fragment"
+        assert _decide("У вас есть окошко на завтра,").reason == "fragment"
+
+    def test_learns_users_typing_gaps(self):
+        history = [
+            (NOW - timedelta(seconds=60 + offset), 10)
+            for offset in (0, 5, 10, 15)
+        ]
+
+        decision = _decide("и на педикюр", history=history)
+
+        assert decision.typical_gap == 5.0
+        assert decision.reason == "short_open"
+        assert decision.seconds == 5.5
+
+    def test_complete_message_inside_burst_waits_half_gap(self):
+        history = [(NOW - timedelta(seconds=2), 30)]
+
+        decision = _decide("А сколько по времени?", history=history)
+
+        assert decision.in_burst
+        assert decision.reason == "complete_in_burst"
+        assert decision.seconds == 1.5
+
+    def test_hard_upper_bound(self):
+        history = [(NOW - timedelta(seconds=200 + offset * 19), 5) for offset in range(5)]
+
+        decision = _decide("ну", history=history)
+
+        assert decision.seconds == 8.0
+
+    def test_voice_message_uses_short_media_delay(self):
+        decision = _decide("[voice]", message_type="audio")
+
+        assert decision.reason == "media"
+        assert decision.seconds == 2.0
+
+
+class TestPlanCoalesceWindow:
+    def test_failed_history_lookup_is_rolled_back_to_savepoint(self):
+        db = MagicMock()
+        db.execute.side_effect = RuntimeError("relation does not exist")
+
+        with patch.dict("os.environ", {"OUTBOX_COALESCE_ADAPTIVE": "1"}):
+            decision = plan_coalesce_window(db, "conv-1", "hi", message_type="text", now=NOW)
+
+        assert decision is None
+        savepoint = db.begin_nested.return_value
+        savepoint.__enter__.assert_called_once()
+        exc_type = savepoint.__exit__.call_args.args[0]
+        assert exc_type is RuntimeError
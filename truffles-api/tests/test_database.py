@@ -0,0 +1,108 @@
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import make_url, text
+
+from app import database
+
+
+def _helper(db, value, *, scale):
+    db.execute(value)
+    return value * scale
+
+
+class TestRunDb:
+    async def test_sync_fallback_uses_fresh_session(self):
+        session = MagicMock()
+        with (
+            patch.object(database, "AsyncSessionLocal", None),
+            patch.object(database, "SessionLocal", return_value=session),
+        ):
+            result = await database.run_db(_helper, 2, scale=3)
+
+        assert result == 6
+        session.execute.assert_called_once_with(2)
+        session.close.assert_called_once()
+
+    async def test_async_session_runs_helper_via_run_sync(self):
+        sync_session = MagicMock()
+
+        class _AsyncSession:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def run_sync(self, func, *args, **kwargs):
+                return func(sync_session, *args, **kwargs)
+
+        with patch.object(database, "AsyncSessionLocal", _AsyncSession):
+            result = await database.run_db(_helper, 5, scale=2)
+
+        assert result == 10
+        sync_session.execute.assert_called_once_with(5)
+
+    async def test_run_on_session_keeps_caller_session_off_the_loop(self):
+        session = MagicMock()
+        loop_thread = threading.get_ident()
+
+        def helper(db, value):
+            db.execute(value)
+            return threading.get_ident()
+
+        worker_thread = await database.run_on_session(helper, session, 7)
+
+        assert worker_thread != loop_thread
+        session.execute.assert_called_once_with(7)
+        session.close.assert_not_called()
+
+
+class TestAsyncUrl:
+    def test_libpq_params_are_translated_for_asyncpg(self):
+        url = make_url(
+            "postgresql://user:pw@db:5432/truffles"
+            "?sslmode=require&connect_timeout=5&application_name=api&target_session_attrs=read-write"
+        )
+
+        async_url, connect_args = database.build_async_url(url)
+
+        assert async_url.drivername == "postgresql+asyncpg"
+        assert dict(async_url.query) == {"target_session_attrs": "read-write"}
+        assert connect_args == {"ssl": "require", "timeout": 5.0, "server_settings": {"application_name": "api"}}
+
+    def test_plain_url_has_no_connect_args(self):
+        async_url, connect_args = database.build_async_url(make_url("postgresql+psycopg2://user:pw@db/truffles"))
+
+        assert async_url.render_as_string(hide_password=False) == "postgresql+asyncpg://user:pw@db/truffles"
+        assert connect_args == {}
+
+
+class TestGetAsyncDb:
+    async def test_requires_async_engine(self):
+        with patch.object(database, "AsyncSessionLocal", None):
+            with pytest.raises(RuntimeError):
+                await database.get_async_db().__anext__()
+
+
+@pytest.mark.skipif(
+    database.asyncpg is None or not os.environ.get("TEST_ASYNC_DATABASE_URL"),
+    reason="needs asyncpg and TEST_ASYNC_DATABASE_URL (a libpq-style postgresql:// URL)",
+)
+class TestAsyncEngineIntegration:
+    async def test_run_db_and_get_async_db_on_real_asyncpg(self):
+        async_engine = database._build_async_engine(make_url(os.environ["TEST_ASYNC_DATABASE_URL"]))
+        session_factory = database.async_sessionmaker(async_engine, expire_on_commit=False)
+        try:
+            with patch.object(database, "AsyncSessionLocal", session_factory):
+                value = await database.run_db(lambda db: db.execute(text("SELECT 41 + 1")).scalar())
+                sessions = database.get_async_db()
+                db = await sessions.__anext__()
+                assert (await db.execute(text("SELECT 1"))).scalar() == 1
+                await sessions.aclose()
+        finally:
+            await async_engine.dispose()
+
+        assert value == 42
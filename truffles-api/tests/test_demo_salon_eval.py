@@ -363,7 +363,7 @@ def _run_webhook_case(user_text: str, case_id: str, local_time: str | None) -> s
         patch("app.routers.webhook._find_message_by_message_id", return_value=saved_message),
         patch("app.routers.webhook._get_user_branch_preference", return_value=None),
         patch(
-            "app.routers.webhook.generate_bot_response",
+            "app.routers.webhook.agenerate_bot_response",
             return_value=SimpleNamespace(ok=True, error=None, error_code=None, value=("", 0.0)),
         ),
         patch("app.services.demo_salon_knowledge.get_embedding", side_effect=lambda text, *_args, **_kwargs: demo_knowledge._local_text_embedding(text)),
@@ -441,7 +441,7 @@ def _run_webhook_conversation_turns(
         patch("app.routers.webhook._find_message_by_message_id", return_value=saved_message),
         patch("app.routers.webhook._get_user_branch_preference", return_value=None),
         patch(
-            "app.routers.webhook.generate_bot_response",
+            "app.routers.webhook.agenerate_bot_response",
             return_value=SimpleNamespace(ok=True, error=None, error_code=None, value=("", 0.0)),
         ),
         patch("app.services.demo_salon_knowledge.get_embedding", side_effect=lambda text, *_args, **_kwargs: demo_knowledge._local_text_embedding(text)),
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from app.routers.webhook import EnrichmentFanout, _detect_intent_signals
+from app.services.intent_service import Intent
+
+
+def _sleepy(value, seconds):
+    def call():
+        time.sleep(seconds)
+        return value
+
+    return call
+
+
+class TestEnrichmentFanout:
+    async def test_calls_run_concurrently(self):
+        start = time.monotonic()
+        fanout = EnrichmentFanout(
+            {"a": _sleepy("A", 0.15), "b": _sleepy("B", 0.15), "c": _sleepy("C", 0.15)},
+            deadline_seconds=2.0,
+        )
+
+        results = [await fanout.result(name) for name in ("a", "b", "c")]
+
+        assert results == ["A", "B", "C"]
+        assert time.monotonic() - start < 0.4
+        assert fanout.timed_out == set()
+
+    async def test_slow_call_misses_shared_deadline(self):
+        fanout = EnrichmentFanout(
+            {"fast": _sleepy("ok", 0.0), "slow": _sleepy("late", 0.5)},
+            deadline_seconds=0.1,
+        )
+
+        assert await fanout.result("fast") == "ok"
+        assert await fanout.result("slow") is None
+        assert fanout.timed_out == {"slow"}
+        assert await fanout.result("missing") is None
+        fanout.close()
+
+    async def test_calls_run_outside_llm_pool(self):
+        fanout = EnrichmentFanout({"thread": lambda: threading.current_thread().name}, deadline_seconds=1.0)
+
+        assert (await fanout.result("thread")).startswith("enrichment")
+
+    async def test_failed_call_yields_none(self):
+        def boom():
+            raise RuntimeError("qdrant down")
+
+        fanout = EnrichmentFanout({"question_type": boom}, deadline_seconds=1.0)
+
+        assert await fanout.result("question_type") is None
+        assert fanout.timed_out == set()
+
+    async def test_close_cancels_pending_calls(self):
+        fanout = EnrichmentFanout({"slow": _sleepy("late", 0.3)}, deadline_seconds=0.01)
+        task = fanout._tasks["slow"]
+
+        assert await fanout.result("slow") is None
+        fanout.close()
+        await asyncio.sleep(0)
+
+        assert task.cancelled()
+
+    async def test_deferred_call_starts_only_when_asked(self):
+        calls = []
+
+        def classify():
+            calls.append("classify")
+            return "intent"
+
+        fanout = EnrichmentFanout({}, deadline_seconds=0.05, deferred={"signals": classify})
+        await asyncio.sleep(0.1)
+
+        assert fanout.has("signals")
+        assert calls == []
+        # The deferred call gets its own deadline, not the one that already passed.
+        assert await fanout.result("signals") == "intent"
+        assert calls == ["classify"]
+
+    async def test_signals_combine_results_into_one_object(self):
+        question_type = object()
+        fanout = EnrichmentFanout(
+            {"question_type": lambda: question_type, "slow": _sleepy("late", 0.3)},
+            deadline_seconds=0.1,
+            deferred={"signals": lambda: _detect_intent_signals("спасибо", use_llm=False)},
+        )
+        assert await fanout.result("slow") is None
+
+        signals = await fanout.signals("спасибо")
+        fanout.close()
+
+        assert signals.intent == Intent.THANKS
+        assert signals.question_type is question_type
+        assert signals.enrichment_timed_out == ("slow",)
+
+
+class TestIntentSignalsWithoutLlm:
+    def test_keyword_fallback_skips_llm(self):
+        with patch("app.routers.webhook.classify_intent") as mock_classify:
+            signals = _detect_intent_signals("позовите менеджера", use_llm=False)
+
+        mock_classify.assert_not_called()
+        assert signals.intent == Intent.HUMAN_REQUEST
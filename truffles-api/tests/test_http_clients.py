@@ -0,0 +1,92 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+
+from app.services import http_clients
+from app.services.http_clients import async_http_client, close_http_clients, http_client
+
+
+def _mock_kwargs(seen):
+    def handler(request):
+        seen.append(request.extensions.get("timeout"))
+        return httpx.Response(200, json={"ok": True})
+
+    def build(upstream):
+        return {"timeout": 5.0, "transport": httpx.MockTransport(handler)}
+
+    def build_async(upstream):
+        async def async_handler(request):
+            return handler(request)
+
+        return {"timeout": 5.0, "transport": httpx.MockTransport(async_handler)}
+
+    return build, build_async
+
+
+class TestHttpClientRegistry:
+    async def test_pooled_client_is_reused_and_closed(self):
+        seen = []
+        build, _ = _mock_kwargs(seen)
+        with (
+            patch.object(http_clients, "_is_pool_enabled", return_value=True),
+            patch.object(http_clients, "_build_client_kwargs", side_effect=build) as mock_build,
+        ):
+            with http_client("qdrant") as first:
+                first.get("http://qdrant/collections")
+            with http_client("qdrant", timeout=2.0) as second:
+                second.get("http://qdrant/collections")
+            with http_client("openai") as other:
+                other.get("http://openai/models")
+
+            assert mock_build.call_count == 2
+            assert seen[0]["read"] == 5.0
+            assert seen[1]["read"] == 2.0
+            pooled = http_clients._clients["qdrant"]
+
+            await close_http_clients()
+            assert pooled.is_closed
+            assert http_clients._clients == {}
+
+    async def test_async_client_is_reused_on_same_loop(self):
+        seen = []
+        _, build_async = _mock_kwargs(seen)
+        with (
+            patch.object(http_clients, "_is_pool_enabled", return_value=True),
+            patch.object(http_clients, "_build_client_kwargs", side_effect=build_async),
+        ):
+            async with async_http_client("media") as first:
+                await first.get("http://media/a")
+            async with async_http_client("media") as second:
+                await second.get("http://media/b")
+            assert first is second
+            pooled = http_clients.get_async_http_client("media")
+
+            await close_http_clients()
+            assert pooled.is_closed
+
+    async def test_client_from_previous_loop_is_closed_when_replaced(self):
+        seen = []
+        _, build_async = _mock_kwargs(seen)
+        old_loop = asyncio.new_event_loop()
+        old_loop.close()
+        stale = httpx.AsyncClient(**build_async("media"))
+        with (
+            patch.object(http_clients, "_is_pool_enabled", return_value=True),
+            patch.object(http_clients, "_build_client_kwargs", side_effect=build_async),
+            patch.dict(http_clients._async_clients, {"media": (old_loop, stale)}),
+        ):
+            pooled = http_clients.get_async_http_client("media")
+            await asyncio.sleep(0)
+
+            assert pooled is not stale
+            assert stale.is_closed
+            await close_http_clients()
+
+    def test_disabled_pool_opens_client_per_call(self):
+        with patch("app.services.http_clients.httpx.Client") as mock_client:
+            with http_client("telegram", timeout=10) as client:
+                client.post("https://api.telegram.org/botX/sendMessage")
+        mock_client.assert_called_once_with(timeout=10)
+        mock_client.return_value.__exit__.assert_called_once()
+        assert "telegram" not in http_clients._clients
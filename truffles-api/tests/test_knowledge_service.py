@@ -2,10 +2,13 @@ from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 
+from app.services import knowledge_service
 from app.services.knowledge_service import (
     QDRANT_COLLECTION,
     format_knowledge_context,
     get_embedding,
+    get_embedding_cache_stats,
+    read_shared_knowledge_version,
     search_knowledge,
 )
 
@@ -129,3 +132,73 @@ class TestSearchKnowledge:
         assert result[0]["score"] == 0.85
         assert result[0]["text"] == "Test content"
         assert result[0]["source"] == "test.md"
+
+
+class TestEmbeddingCache:
+    def setup_method(self):
+        knowledge_service._embedding_cache.clear()
+        for key in knowledge_service._embedding_cache_stats:
+            knowledge_service._embedding_cache_stats[key] = 0
+
+    @patch("app.services.knowledge_service._get_knowledge_redis", return_value=None)
+    @patch("app.services.knowledge_service._is_embedding_cache_enabled", return_value=True)
+    @patch("app.services.knowledge_service._fetch_embedding", return_value=[0.1, 0.2, 0.3])
+    def test_repeated_text_is_embedded_once(self, mock_fetch, _enabled, _redis):
+        first = get_embedding("сколько стоит маникюр")
+        second = get_embedding("  сколько   стоит маникюр ")
+
+        assert first == second == [0.1, 0.2, 0.3]
+        assert mock_fetch.call_count == 1
+        stats = get_embedding_cache_stats()
+        assert stats["local_hits"] == 1
+        assert stats["misses"] == 1
+
+    @patch("app.services.knowledge_service._is_embedding_cache_enabled", return_value=True)
+    @patch("app.services.knowledge_service._fetch_embedding")
+    def test_redis_tier_roundtrip(self, mock_fetch, _enabled):
+        store = {}
+        redis_client = MagicMock()
+        redis_client.get.side_effect = store.get
+        redis_client.setex.side_effect = lambda key, _ttl, value: store.__setitem__(key, value)
+        mock_fetch.return_value = [0.5, 0.25, -1.0]
+
+        with patch("app.services.knowledge_service._get_knowledge_redis", return_value=redis_client):
+            get_embedding("адрес салона")
+            knowledge_service._embedding_cache.clear()
+            result = get_embedding("адрес салона")
+
+        assert result == [0.5, 0.25, -1.0]
+        assert mock_fetch.call_count == 1
+        assert get_embedding_cache_stats()["redis_hits"] == 1
+
+    @patch("app.services.knowledge_service._get_knowledge_redis", return_value=None)
+    @patch("app.services.knowledge_service._is_embedding_cache_enabled", return_value=True)
+    @patch("app.services.knowledge_service._fetch_embedding", return_value={"error": "bad"})
+    def test_invalid_vector_is_not_cached(self, mock_fetch, _enabled, _redis):
+        get_embedding("текст")
+        get_embedding("текст")
+
+        assert mock_fetch.call_count == 2
+        assert not knowledge_service._embedding_cache
+
+
+class TestReadSharedKnowledgeVersion:
+    def test_reads_counter_from_redis(self):
+        redis_client = MagicMock()
+        redis_client.get.return_value = b"7"
+        with patch("app.services.knowledge_service._get_knowledge_redis", return_value=redis_client):
+            assert read_shared_knowledge_version("demo_salon") == 7
+
+    def test_missing_counter_is_version_zero(self):
+        redis_client = MagicMock()
+        redis_client.get.return_value = None
+        with patch("app.services.knowledge_service._get_knowledge_redis", return_value=redis_client):
+            assert read_shared_knowledge_version("demo_salon") == 0
+
+    def test_unreadable_redis_is_unknown(self):
+        redis_client = MagicMock()
+        redis_client.get.side_effect = ConnectionError("down")
+        with patch("app.services.knowledge_service._get_knowledge_redis", return_value=redis_client):
+            assert read_shared_knowledge_version("demo_salon") is None
+        with patch("app.services.knowledge_service._get_knowledge_redis", return_value=None):
+            assert read_shared_knowledge_version("demo_salon") is None
@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from app.services import latency_budget
+from app.services.ai_service import rewrite_query_for_retrieval
+from app.services.latency_budget import (
+    budget_timeout,
+    has_budget_for_optional,
+    remaining_budget,
+    start_message_budget,
+)
+
+
+def _settings(budget=20.0, optional_min=4.0, min_call=2.0):
+    return patch.object(
+        latency_budget,
+        "get_message_budget_settings",
+        return_value=(True, budget, optional_min, min_call),
+    )
+
+
+class TestMessageBudget:
+    def test_queue_wait_is_charged_against_budget(self):
+        timing_context: dict = {}
+        with _settings(budget=20.0), patch.object(latency_budget.time, "monotonic", return_value=100.0):
+            start_message_budget(timing_context, queued_seconds=5.0)
+            assert remaining_budget(timing_context) == 15.0
+
+        assert timing_context["budget_queue_wait_seconds"] == 5.0
+
+    def test_timeout_is_capped_by_remaining_budget(self):
+        timing_context: dict = {}
+        with _settings(budget=20.0, min_call=0.5), patch.object(latency_budget.time, "monotonic") as clock:
+            clock.return_value = 0.0
+            start_message_budget(timing_context)
+            assert budget_timeout(timing_context, 6.0) == 6.0
+
+            clock.return_value = 17.0
+            assert budget_timeout(timing_context, 6.0) == 3.0
+
+            clock.return_value = 25.0
+            assert budget_timeout(timing_context, 6.0) == 0.5
+            assert budget_timeout(timing_context, 0.3) == 0.3
+
+    def test_without_budget_defaults_are_kept(self):
+        assert budget_timeout(None, 6.0) == 6.0
+        assert budget_timeout({}, 1.2) == 1.2
+        assert has_budget_for_optional({}, "rag_rewrite") is True
+
+    def test_disabled_budget_is_not_attached(self):
+        timing_context: dict = {}
+        with patch.object(latency_budget, "get_message_budget_settings", return_value=(False, 20.0, 4.0, 2.0)):
+            start_message_budget(timing_context)
+        assert remaining_budget(timing_context) is None
+
+    def test_optional_stage_skipped_when_budget_nearly_spent(self):
+        timing_context: dict = {}
+        with _settings(budget=20.0, optional_min=4.0), patch.object(latency_budget.time, "monotonic") as clock:
+            clock.return_value = 0.0
+            start_message_budget(timing_context)
+            assert has_budget_for_optional(timing_context, "rag_rewrite") is True
+
+            clock.return_value = 17.0
+            assert has_budget_for_optional(timing_context, "rag_rewrite") is False
+            assert has_budget_for_optional(timing_context, "rag_rewrite") is False
+
+        assert timing_context["budget_skipped"] == ["rag_rewrite"]
+
+    def test_skips_from_threads_do_not_add_context_keys(self):
+        timing_context: dict = {}
+        with _settings(budget=1.0, optional_min=4.0):
+            start_message_budget(timing_context)
+            keys = set(timing_context)
+            stages = [f"stage-{index % 4}" for index in range(32)]
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda stage: has_budget_for_optional(timing_context, stage), stages))
+
+        assert results == [False] * len(stages)
+        assert set(timing_context) == keys
+        assert sorted(timing_context["budget_skipped"]) == ["stage-0", "stage-1", "stage-2", "stage-3"]
+
+
+class TestBudgetPropagation:
+    def test_rag_rewrite_skipped_without_llm_call(self):
+        timing_context: dict = {}
+        with (
+            _settings(budget=1.0, optional_min=4.0),
+            patch("app.services.ai_service.OPENAI_API_KEY", "key"),
+            patch("app.services.ai_service.get_llm_provider") as mock_provider,
+        ):
+            start_message_budget(timing_context)
+            result = rewrite_query_for_retrieval("чо по адресу", "demo_salon", timing_context=timing_context)
+
+        assert result == {"rewrite_used": False, "rewrite_text": "", "reason": "budget"}
+        mock_provider.assert_not_called()
+
+    def test_llm_timeout_derived_from_remaining_budget(self):
+        timing_context: dict = {}
+        llm = MagicMock()
+        llm.generate.return_value = MagicMock(content='{"rewrite":"адрес салона","rewrite_used":true}')
+        with (
+            _settings(budget=10.0, optional_min=0.0, min_call=0.1),
+            patch("app.services.ai_service.OPENAI_API_KEY", "key"),
+            patch("app.services.ai_service.RAG_REWRITE_TIMEOUT_SECONDS", 30.0),
+            patch("app.services.ai_service.get_llm_provider", return_value=llm),
+        ):
+            start_message_budget(timing_context)
+            rewrite_query_for_retrieval("чо по адресу", "demo_salon", timing_context=timing_context)
+
+        timeout = llm.generate.call_args.kwargs["timeout_seconds"]
+        assert 9.0 < timeout <= 10.0
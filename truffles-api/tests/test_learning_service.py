@@ -1,9 +1,22 @@
 import uuid
+from datetime import datetime, timezone
 from unittest.mock import Mock, patch
 
 import pytest
 
-from app.services.learning_service import add_to_knowledge, get_client_slug, is_owner_response
+from app.learning_worker import LearningWorker
+from app.services.learning_service import (
+    _learning_key,
+    _learning_point_id,
+    add_to_knowledge,
+    claim_learning_batch,
+    collapse_learning_items,
+    enqueue_learning,
+    get_client_slug,
+    index_learning_batch,
+    is_owner_response,
+    record_learning_failures,
+)
 
 
 class TestIsOwnerResponse:
@@ -332,3 +345,184 @@ class TestAddToKnowledge:
         assert result is not None
         call_args = mock_httpx.return_value.__enter__.return_value.put.call_args
         assert call_args[1]["json"]["points"][0]["payload"]["metadata"]["learned_from"] == "manager"
+
+
+def _queued(question, answer="Маникюр стоит 5000 тенге", client_slug="demo_salon", minutes=0):
+    return {
+        "id": uuid.uuid4(),
+        "client_slug": client_slug,
+        "handover_id": uuid.uuid4(),
+        "question": question,
+        "answer": answer,
+        "learning_key": _learning_key(question),
+        "source": "owner",
+        "learned_from": "Owner",
+        "created_at": datetime(2026, 1, 1, 12, minutes, tzinfo=timezone.utc),
+    }
+
+
+class TestLearningQueue:
+    def test_enqueue_adds_approved_row_without_point(self):
+        mock_db = Mock()
+        mock_client = Mock()
+        mock_client.name = "demo_salon"
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_client
+
+        mock_handover = Mock()
+        mock_handover.id = uuid.uuid4()
+        mock_handover.client_id = uuid.uuid4()
+        mock_handover.user_message = "Сколько стоит маникюр?"
+        mock_handover.manager_response = "Маникюр стоит 5000 тенге"
+        mock_handover.assigned_to_name = "Owner"
+
+        with patch("app.services.learning_service.get_embedding") as mock_embedding:
+            row = enqueue_learning(mock_db, mock_handover, source="owner")
+
+        mock_embedding.assert_not_called()
+        mock_db.add.assert_called_once_with(row)
+        assert row.status == "approved"
+        assert row.qdrant_point_id is None
+        assert row.question_normalized == "сколько стоит маникюр"
+
+    def test_enqueue_skips_low_value_answers(self):
+        mock_db = Mock()
+        mock_db.query.return_value.filter.return_value.first.return_value = Mock(name="demo_salon")
+        mock_handover = Mock()
+        mock_handover.id = uuid.uuid4()
+        mock_handover.user_message = "Сколько стоит маникюр?"
+        mock_handover.manager_response = "спасибо"
+
+        assert enqueue_learning(mock_db, mock_handover) is None
+        mock_db.add.assert_not_called()
+
+    def test_near_duplicates_collapse_to_newest_answer(self):
+        old = _queued("Сколько стоит маникюр?", answer="4000 тенге", minutes=0)
+        new = _queued("сколько стоит маникюр", answer="5000 тенге", minutes=5)
+        other_client = _queued("Сколько стоит маникюр?", client_slug="other", minutes=1)
+        distinct = _queued("Во сколько вы открываетесь?", minutes=2)
+
+        groups = collapse_learning_items([old, new, other_client, distinct])
+
+        kept = {group[0]["id"]: [item["id"] for item in group[1]] for group in groups}
+        assert kept == {new["id"]: [old["id"]], other_client["id"]: [], distinct["id"]: []}
+
+    @patch("app.services.learning_service.apply_points_to_bm25_index")
+    @patch("app.services.learning_service.bump_knowledge_version", return_value=7)
+    @patch("app.services.learning_service.http_client")
+    @patch("app.services.learning_service.get_embeddings")
+    def test_batch_is_embedded_and_upserted_once(self, mock_embeddings, mock_http, mock_bump, mock_bm25):
+        items = [
+            _queued("Сколько стоит маникюр?", minutes=0),
+            _queued("Сколько стоит маникюр", minutes=3),
+            _queued("Во сколько вы открываетесь?", minutes=1),
+        ]
+        mock_embeddings.side_effect = lambda texts: [[0.1, 0.2]] * len(texts)
+        put = mock_http.return_value.__enter__.return_value.put
+        put.return_value = Mock(status_code=200)
+
+        result = index_learning_batch(items)
+
+        mock_embeddings.assert_called_once()
+        assert len(mock_embeddings.call_args.args[0]) == 2
+        put.assert_called_once()
+        assert len(put.call_args.kwargs["json"]["points"]) == 2
+        mock_bump.assert_called_once_with("demo_salon")
+        mock_bm25.assert_called_once()
+        assert result["superseded"] == [items[0]["id"]]
+        assert result["point_ids"][items[0]["id"]] == result["point_ids"][items[1]["id"]]
+        assert result["point_ids"][items[1]["id"]] == _learning_point_id("demo_salon", "сколько стоит маникюр")
+
+    @patch("app.services.learning_service.http_client")
+    @patch("app.services.learning_service.get_embeddings", return_value=[[0.1, 0.2]])
+    def test_qdrant_error_keeps_rows_queued(self, _mock_embeddings, mock_http):
+        mock_http.return_value.__enter__.return_value.put.return_value = Mock(status_code=500, text="down")
+
+        with pytest.raises(Exception, match="Qdrant upsert error"):
+            index_learning_batch([_queued("Сколько стоит маникюр?")])
+
+    def test_claim_locks_and_leases_rows(self):
+        row = Mock(index_attempts=0, index_lease_expires_at=None, question_normalized="маникюр")
+        mock_db = Mock()
+        query = mock_db.query.return_value.join.return_value.filter.return_value.order_by.return_value
+        query.limit.return_value.with_for_update.return_value.all.return_value = [(row, "demo_salon")]
+
+        items = claim_learning_batch(mock_db, limit=10, lease_seconds=60, max_attempts=3)
+
+        assert query.limit.return_value.with_for_update.call_args.kwargs["skip_locked"] is True
+        assert row.index_attempts == 1
+        assert row.index_lease_expires_at > datetime.now(timezone.utc)
+        assert items[0]["attempts"] == 1
+        mock_db.commit.assert_called_once()
+
+    def test_failures_back_off_and_park_after_max_attempts(self):
+        retried = Mock(id=uuid.uuid4(), index_attempts=1)
+        exhausted = Mock(id=uuid.uuid4(), index_attempts=3)
+        mock_db = Mock()
+        mock_db.query.return_value.filter.return_value.all.return_value = [retried, exhausted]
+
+        parked = record_learning_failures(
+            mock_db,
+            errors={retried.id: "bge down", exhausted.id: "bad payload"},
+            max_attempts=3,
+            retry_backoff_seconds=30,
+        )
+
+        assert parked == [exhausted.id]
+        assert retried.index_lease_expires_at > datetime.now(timezone.utc)
+        assert exhausted.index_lease_expires_at is None
+        assert exhausted.index_last_error == "bad payload"
+        mock_db.commit.assert_called_once()
+
+
+class TestLearningWorker:
+    async def test_pass_claims_indexes_and_records(self):
+        items = [_queued("Сколько стоит маникюр?")]
+        indexed = {"point_ids": {items[0]["id"]: "point-1"}, "superseded": []}
+        calls = []
+
+        async def fake_run_db(func, **kwargs):
+            calls.append(func.__name__)
+            return items if func.__name__ == "claim_learning_batch" else 1
+
+        with (
+            patch("app.learning_worker.run_db", side_effect=fake_run_db),
+            patch("app.learning_worker.index_learning_batch", return_value=indexed) as mock_index,
+            patch("app.learning_worker.alert_warning"),
+        ):
+            stats = await LearningWorker().run_pass(limit=10)
+
+        assert stats == {"claimed": 1, "indexed": 1, "collapsed": 0, "failed": 0}
+        assert calls == ["claim_learning_batch", "record_learning_results"]
+        mock_index.assert_called_once_with(items)
+
+    async def test_bad_row_fails_alone_and_alerts_when_parked(self):
+        good = _queued("Сколько стоит маникюр?")
+        bad = _queued("Во сколько вы открываетесь?")
+        recorded = {}
+
+        def index(batch):
+            if any(item["id"] == bad["id"] for item in batch):
+                raise ValueError("bad payload")
+            return {"point_ids": {item["id"]: "point-1" for item in batch}, "superseded": []}
+
+        async def fake_run_db(func, **kwargs):
+            recorded[func.__name__] = kwargs
+            if func.__name__ == "claim_learning_batch":
+                return [good, bad]
+            if func.__name__ == "record_learning_failures":
+                return list(kwargs["errors"])
+            return 1
+
+        with (
+            patch("app.learning_worker.run_db", side_effect=fake_run_db),
+            patch("app.learning_worker.index_learning_batch", side_effect=index),
+            patch("app.learning_worker.alert_warning"),
+            patch("app.learning_worker.alert_error") as mock_alert,
+        ):
+            stats = await LearningWorker().run_pass(limit=10)
+
+        assert stats == {"claimed": 2, "indexed": 1, "collapsed": 0, "failed": 1}
+        assert recorded["record_learning_results"]["point_ids"] == {good["id"]: "point-1"}
+        assert list(recorded["record_learning_failures"]["errors"]) == [bad["id"]]
+        mock_alert.assert_called_once()
+        assert mock_alert.call_args.args[1]["rows"] == [str(bad["id"])]
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.services.llm import OpenAIProvider, run_blocking
+
+
+def _fake_async_client(post):
+    class _Client:
+        async def post(self, url, **kwargs):
+            return await post(url, **kwargs)
+
+    @asynccontextmanager
+    async def factory(upstream, *, timeout=None):
+        yield _Client()
+
+    return factory
+
+
+class TestOpenAIAsync:
+    async def test_agenerate_parses_response(self):
+        async def post(url, **kwargs):
+            assert kwargs["json"]["max_completion_tokens"] == 50
+            return httpx.Response(
+                200,
+                json={"model": "gpt-5-mini", "choices": [{"message": {"content": "Привет"}}]},
+                request=httpx.Request("POST", url),
+            )
+
+        provider = OpenAIProvider(api_key="key")
+        with patch("app.services.llm.openai_provider.async_http_client", _fake_async_client(post)):
+            response = await provider.agenerate([{"role": "user", "content": "hi"}], max_tokens=50)
+
+        assert response.content == "Привет"
+        assert response.model == "gpt-5-mini"
+
+    async def test_agenerate_cancels_request_on_timeout(self):
+        cancelled = asyncio.Event()
+
+        async def post(url, **kwargs):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        provider = OpenAIProvider(api_key="key")
+        with patch("app.services.llm.openai_provider.async_http_client", _fake_async_client(post)):
+            with pytest.raises(httpx.TimeoutException):
+                await provider.agenerate([{"role": "user", "content": "hi"}], timeout_seconds=0.05)
+
+        assert cancelled.is_set()
+
+    async def test_atranscribe_rejects_empty_audio(self):
+        provider = OpenAIProvider(api_key="key")
+        with pytest.raises(ValueError):
+            await provider.atranscribe(audio_bytes=b"", filename="voice.ogg")
+
+
+class TestRunBlocking:
+    async def test_blocking_call_does_not_stall_loop(self):
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        def blocking(value):
+            time.sleep(0.1)
+            return value * 2
+
+        result, _ = await asyncio.gather(run_blocking(blocking, 21), ticker())
+
+        assert result == 42
+        assert len(ticks) == 5
@@ -616,7 +616,7 @@ def test_truth_gate_sets_decision_meta():
     low_confidence = SimpleNamespace(ok=True, value=(None, "low_confidence"))
 
     with patch("app.routers.webhook._get_policy_handler", return_value=policy_handler), patch(
-        "app.routers.webhook.generate_bot_response", return_value=low_confidence
+        "app.routers.webhook.agenerate_bot_response", return_value=low_confidence
     ), patch(
         "app.routers.webhook.send_bot_response", return_value=True
     ), patch(
@@ -726,7 +726,7 @@ def test_consult_reply_writes_decision_meta():
     ), patch(
         "app.routers.webhook.should_process_debounced_message", AsyncMock(return_value=True)
     ), patch(
-        "app.routers.webhook.generate_bot_response"
+        "app.routers.webhook.agenerate_bot_response"
     ) as mock_llm:
         response = asyncio.run(
             webhook_router._handle_webhook_payload(
@@ -840,7 +840,7 @@ def test_consult_precedence_over_booking_flow():
     ), patch(
         "app.routers.webhook.should_process_debounced_message", AsyncMock(return_value=True)
     ), patch(
-        "app.routers.webhook.generate_bot_response"
+        "app.routers.webhook.agenerate_bot_response"
     ) as mock_llm:
         response = asyncio.run(
             webhook_router._handle_webhook_payload(
@@ -953,7 +953,7 @@ def test_booking_info_interrupt_appends_prompt():
     ), patch(
         "app.routers.webhook.should_process_debounced_message", AsyncMock(return_value=True)
     ), patch(
-        "app.routers.webhook.generate_bot_response"
+        "app.routers.webhook.agenerate_bot_response"
     ) as mock_llm:
         response = asyncio.run(
             webhook_router._handle_webhook_payload(
@@ -1077,7 +1077,7 @@ def test_booking_time_service_question_keeps_time_contract():
     ), patch(
         "app.routers.webhook.should_process_debounced_message", AsyncMock(return_value=True)
     ), patch(
-        "app.routers.webhook.generate_bot_response"
+        "app.routers.webhook.agenerate_bot_response"
     ) as mock_llm:
         response = asyncio.run(
             webhook_router._handle_webhook_payload(
@@ -1209,7 +1209,7 @@ def test_service_carryover_applies_for_pricing():
     ), patch(
         "app.routers.webhook.should_process_debounced_message", AsyncMock(return_value=True)
     ), patch(
-        "app.routers.webhook.generate_bot_response"
+        "app.routers.webhook.agenerate_bot_response"
     ) as mock_llm:
         response = asyncio.run(
             webhook_router._handle_webhook_payload(
@@ -1296,7 +1296,7 @@ def test_semantic_service_matcher_handles_low_confidence_match():
     semantic = SemanticServiceMatch(action="match", response="Маникюр — 2 500 ₸.", score=0.52)
 
     with patch("app.routers.webhook._get_policy_handler", return_value=None), patch(
-        "app.routers.webhook.generate_bot_response", return_value=low_confidence
+        "app.routers.webhook.agenerate_bot_response", return_value=low_confidence
     ), patch(
         "app.routers.webhook.semantic_service_match", return_value=semantic
     ), patch(
@@ -1394,7 +1394,7 @@ def test_semantic_service_matcher_handles_low_confidence_suggest():
     )
 
     with patch("app.routers.webhook._get_policy_handler", return_value=None), patch(
-        "app.routers.webhook.generate_bot_response", return_value=low_confidence
+        "app.routers.webhook.agenerate_bot_response", return_value=low_confidence
     ), patch(
         "app.routers.webhook.semantic_service_match", return_value=semantic
     ), patch(
@@ -1492,7 +1492,7 @@ def test_semantic_service_matcher_uses_rewrite_on_low_confidence():
         return None
 
     with patch("app.routers.webhook._get_policy_handler", return_value=None), patch(
-        "app.routers.webhook.generate_bot_response", return_value=low_confidence
+        "app.routers.webhook.agenerate_bot_response", return_value=low_confidence
     ), patch(
         "app.routers.webhook.semantic_service_match", side_effect=semantic_side_effect
     ) as mock_semantic, patch(
@@ -1612,7 +1612,7 @@ def test_rag_rewrite_and_scores_logged():
         "app.routers.webhook.rewrite_query_for_retrieval",
         return_value={"rewrite_used": True, "rewrite_text": "адрес салона", "reason": "rewritten"},
     ), patch(
-        "app.routers.webhook.generate_bot_response",
+        "app.routers.webhook.agenerate_bot_response",
         side_effect=fake_generate_bot_response,
     ), patch(
         "app.routers.webhook.detect_multi_intent",
@@ -1767,7 +1767,7 @@ def test_service_matcher_short_circuits_llm():
     policy_handler = {"policy_type": "demo_salon", "service_matcher": webhook_router.get_demo_salon_service_decision}
 
     with patch("app.routers.webhook._get_policy_handler", return_value=policy_handler), patch(
-        "app.routers.webhook.generate_bot_response"
+        "app.routers.webhook.agenerate_bot_response"
     ) as mock_llm, patch(
         "app.routers.webhook.send_bot_response", return_value=True
     ), patch(
@@ -1867,7 +1867,7 @@ def test_price_clarify_asks_only_service_and_sets_reason():
     policy_handler = {"policy_type": "demo_salon", "service_matcher": _service_matcher}
 
     with patch("app.routers.webhook._get_policy_handler", return_value=policy_handler), patch(
-        "app.routers.webhook.generate_bot_response"
+        "app.routers.webhook.agenerate_bot_response"
     ) as mock_llm, patch(
         "app.routers.webhook.send_bot_response", return_value=True
     ), patch(
@@ -1960,7 +1960,7 @@ def test_context_manager_sets_refusal_flag_in_decision_meta():
     llm_result = SimpleNamespace(ok=True, value=("Понял вас.", "high"))
 
     with patch("app.routers.webhook._get_policy_handler", return_value=None), patch(
-        "app.routers.webhook.generate_bot_response", return_value=llm_result
+        "app.routers.webhook.agenerate_bot_response", return_value=llm_result
     ), patch(
         "app.routers.webhook.send_bot_response", return_value=True
     ), patch(
@@ -2156,7 +2156,7 @@ def test_llm_guard_blocks_payment_response():
     handover = SimpleNamespace(id="handover-123")
 
     with patch("app.routers.webhook._get_policy_handler", return_value=None), patch(
-        "app.routers.webhook.generate_bot_response", return_value=llm_result
+        "app.routers.webhook.agenerate_bot_response", return_value=llm_result
     ), patch(
         "app.routers.webhook._reuse_active_handover", return_value=(None, False, False)
     ), patch(
@@ -3043,7 +3043,7 @@ def test_expected_reply_type_clears_on_match():
     ), patch(
         "app.routers.webhook.should_process_debounced_message", AsyncMock(return_value=True)
     ), patch(
-        "app.routers.webhook.generate_bot_response", return_value=llm_result
+        "app.routers.webhook.agenerate_bot_response", return_value=llm_result
     ), patch(
         "app.routers.webhook._extract_service_hint", return_value="маникюр"
     ):
@@ -3375,7 +3375,7 @@ def test_multi_truth_reply_handles_hours_and_service_without_booking():
     ), patch(
         "app.services.demo_salon_knowledge._search_services_index", side_effect=_fake_search_services_index
     ), patch(
-        "app.routers.webhook.generate_bot_response",
+        "app.routers.webhook.agenerate_bot_response",
         side_effect=[
             Result.success((None, "low_confidence")),
             Result.success(("ok", "high")),
@@ -3532,7 +3532,7 @@ def test_multi_truth_reply_handles_hours_and_price_in_single_segment():
     ), patch(
         "app.services.demo_salon_knowledge.semantic_service_match", side_effect=_fake_semantic_match
     ), patch(
-        "app.routers.webhook.generate_bot_response",
+        "app.routers.webhook.agenerate_bot_response",
         return_value=Result.success((None, "low_confidence")),
     ), patch(
         "app.routers.webhook.send_bot_response", return_value=True
@@ -3669,7 +3669,7 @@ def test_intent_decomp_blocks_booking_and_drives_multi_truth():
     ), patch(
         "app.services.demo_salon_knowledge.semantic_service_match", side_effect=_fake_semantic_match
     ), patch(
-        "app.routers.webhook.generate_bot_response",
+        "app.routers.webhook.agenerate_bot_response",
         return_value=Result.success(("llm", "high")),
     ), patch(
         "app.routers.webhook.send_bot_response", return_value=True
@@ -3842,7 +3842,7 @@ def test_asr_low_confidence_requires_confirmation_then_accepts_yes():
     )
 
     with patch(
-        "app.routers.webhook.generate_bot_response",
+        "app.routers.webhook.agenerate_bot_response",
         return_value=Result.success(("ok", "high")),
     ) as mock_generate, patch(
         "app.routers.webhook.send_bot_response",
@@ -0,0 +1,607 @@
+import asyncio
+import base64
+import os
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from app.outbox_worker import OutboxWorker
+from app.routers import webhook as webhook_router
+from app.schemas.webhook import WebhookRequest, WebhookResponse
+from app.services.outbox_listener import OutboxWakeupSchedule
+from app.services.outbox_service import (
+    OutboxRow,
+    claim_pending_outbox_batches,
+    enqueue_outbox_message,
+    finalize_outbox_rows,
+    get_outbox_tenant_stats,
+    release_worker_claims,
+)
+
+
+def _row(conversation_id, text, created_at):
+    return {
+        "id": uuid4(),
+        "conversation_id": conversation_id,
+        "created_at": created_at,
+        "attempts": 1,
+        "payload_json": {"client_slug": "demo_salon", "body": {"message": text, "messageType": "text"}},
+    }
+
+
+def _build_rows():
+    base = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    conv_a = uuid4()
+    conv_b = uuid4()
+    rows = [
+        _row(conv_a, "a1", base),
+        _row(conv_b, "b1", base + timedelta(seconds=1)),
+        _row(conv_a, "a2", base + timedelta(seconds=30)),
+        _row(conv_b, "b2", base + timedelta(seconds=31)),
+    ]
+    return rows, conv_a, conv_b
+
+
+class TestOutboxConcurrency:
+    async def _run(self, rows, *, session_factory):
+        events = []
+
+        async def fake_handle(payload, db, **kwargs):
+            events.append(("start", payload.body.message, db))
+            await asyncio.sleep(0.02)
+            events.append(("end", payload.body.message, db))
+            return WebhookResponse(success=True, message="ok")
+
+        def fake_finalize(db, *, outbox_ids, outcome, **kwargs):
+            return {"SENT": len(outbox_ids), "PENDING": 0, "FAILED": 0}
+
+        with (
+            patch.object(webhook_router, "_handle_webhook_payload", side_effect=fake_handle),
+            patch.object(webhook_router, "finalize_outbox_rows", side_effect=fake_finalize),
+            patch.dict("os.environ", {"OUTBOX_CONCURRENCY": "4", "OUTBOX_WINDOW_MERGE_SECONDS": "2.5"}),
+        ):
+            results = await webhook_router._process_outbox_rows(
+                MagicMock(),
+                rows,
+                max_attempts=3,
+                retry_backoff_seconds=1,
+                session_factory=session_factory,
+            )
+        return results, events
+
+    async def test_conversations_overlap_and_keep_order(self):
+        rows, _, _ = _build_rows()
+        sessions = []
+
+        def factory():
+            session = MagicMock()
+            sessions.append(session)
+            return session
+
+        results, events = await self._run(rows, session_factory=factory)
+
+        assert results["sent"] == 4
+        messages = [(kind, text) for kind, text, _ in events]
+        # Second conversation starts before the first one finishes its first group.
+        assert messages.index(("start", "b1")) < messages.index(("end", "a1"))
+        # Within a conversation the groups are strictly sequential.
+        assert messages.index(("end", "a1")) < messages.index(("start", "a2"))
+        assert messages.index(("end", "b1")) < messages.index(("start", "b2"))
+        # One session per conversation task, closed afterwards.
+        assert len(sessions) == 2
+        assert all(session.close.called for session in sessions)
+        a_sessions = {db for _, text, db in events if text.startswith("a")}
+        assert len(a_sessions) == 1
+
+    async def test_without_session_factory_runs_sequentially(self):
+        rows, _, _ = _build_rows()
+
+        results, events = await self._run(rows, session_factory=None)
+
+        assert results["sent"] == 4
+        kinds = [kind for kind, _, _ in events]
+        assert kinds == ["start", "end"] * 4
+
+    async def test_escaping_task_error_schedules_unfinished_rows_for_retry(self):
+        rows, conv_a, _ = _build_rows()
+        finalized = []
+
+        async def fake_handle(payload, db, **kwargs):
+            return WebhookResponse(success=True, message="ok")
+
+        def fake_finalize(db, *, outbox_ids, outcome, **kwargs):
+            finalized.append((outcome, sorted(str(oid) for oid in outbox_ids)))
+            if outcome == "RETRY":
+                return {"SENT": 0, "PENDING": len(outbox_ids), "FAILED": 0}
+            return {"SENT": len(outbox_ids), "PENDING": 0, "FAILED": 0}
+
+        real_split = webhook_router._split_outbox_batches
+
+        def split(batch, window_seconds):
+            if batch[0].conversation_id == conv_a:
+                raise RuntimeError("split failed")
+            return real_split(batch, window_seconds)
+
+        with (
+            patch.object(webhook_router, "_handle_webhook_payload", side_effect=fake_handle),
+            patch.object(webhook_router, "finalize_outbox_rows", side_effect=fake_finalize),
+            patch.object(webhook_router, "_split_outbox_batches", side_effect=split),
+            patch.dict("os.environ", {"OUTBOX_CONCURRENCY": "4", "OUTBOX_WINDOW_MERGE_SECONDS": "2.5"}),
+        ):
+            results = await webhook_router._process_outbox_rows(
+                MagicMock(), rows, max_attempts=3, retry_backoff_seconds=1, session_factory=MagicMock
+            )
+
+        conv_a_ids = sorted(str(row["id"]) for row in rows if row["conversation_id"] == conv_a)
+        assert ("RETRY", conv_a_ids) in finalized
+        assert results["sent"] == 2
+        assert results["retry_scheduled"] == 2
+
+
+class TestOutboxWakeupSchedule:
+    def test_first_pass_sweeps_immediately(self):
+        schedule = OutboxWakeupSchedule(sweep_seconds=30)
+
+        assert schedule.seconds_until_due(100.0) == 0.0
+
+    def test_sleeps_until_coalescing_deadline(self):
+        schedule = OutboxWakeupSchedule(sweep_seconds=30)
+        schedule.mark_swept(100.0)
+        schedule.note_received({"conv-a": (101.0, None), "conv-b": (103.0, None)}, idle_seconds=2)
+
+        assert schedule.seconds_until_due(101.5) == 1.5
+        assert schedule.pop_due(103.0) == ["conv-a"]
+        assert schedule.seconds_until_due(103.0) == 2.0
+
+    def test_adaptive_delay_overrides_idle_window(self):
+        schedule = OutboxWakeupSchedule(sweep_seconds=30)
+        schedule.mark_swept(100.0)
+        schedule.note_received({"conv-a": (101.0, 1.0)}, idle_seconds=8)
+
+        assert schedule.seconds_until_due(101.0) == 1.0
+
+    def test_falls_back_to_sweep_interval_when_idle(self):
+        schedule = OutboxWakeupSchedule(sweep_seconds=30)
+        schedule.mark_swept(100.0)
+
+        assert schedule.seconds_until_due(110.0) == 20.0
+        assert schedule.sweep_due(130.0)
+
+
+class TestEnqueueNotify:
+    def test_notifies_listeners_on_insert(self):
+        db = MagicMock()
+        db.execute.return_value.rowcount = 1
+        conversation_id = uuid4()
+
+        assert enqueue_outbox_message(
+            db,
+            client_id=uuid4(),
+            conversation_id=conversation_id,
+            inbound_message_id="msg-1",
+            payload_json={},
+        )
+
+        notify_call = db.execute.call_args_list[-1]
+        assert "pg_notify" in str(notify_call.args[0])
+        assert notify_call.args[1]["payload"] == str(conversation_id)
+
+    def test_duplicate_does_not_notify(self):
+        db = MagicMock()
+        db.execute.return_value.rowcount = 0
+
+        assert not enqueue_outbox_message(
+            db,
+            client_id=uuid4(),
+            conversation_id=uuid4(),
+            inbound_message_id="msg-1",
+            payload_json={},
+        )
+        assert db.execute.call_count == 1
+
+
+class TestOutboxWorker:
+    async def test_pass_claims_with_lease(self):
+        worker = OutboxWorker(worker_id="worker-1")
+        with (
+            patch("app.outbox_worker.SessionLocal"),
+            patch("app.outbox_worker.release_stale_processing", return_value={"released": 0, "failed": 0}),
+            patch("app.outbox_worker.claim_pending_outbox_batches", return_value=[]) as mock_claim,
+            patch.dict("os.environ", {"OUTBOX_LEASE_SECONDS": "45"}),
+        ):
+            results = await worker.run_pass(
+                limit=5, idle_seconds=1, max_attempts=3, retry_backoff_seconds=1, stale_seconds=120
+            )
+
+        assert results["claimed"] == 0
+        assert mock_claim.call_args.kwargs["worker_id"] == "worker-1"
+        assert mock_claim.call_args.kwargs["lease_seconds"] == 45.0
+
+    async def test_drain_cancels_stuck_pass_and_releases_claims(self):
+        worker = OutboxWorker(worker_id="worker-1")
+        started = asyncio.Event()
+
+        async def stuck_run():
+            started.set()
+            await asyncio.sleep(60)
+
+        task = asyncio.create_task(stuck_run())
+        await started.wait()
+        with (
+            patch("app.outbox_worker.SessionLocal"),
+            patch("app.outbox_worker.release_worker_claims", return_value=2) as mock_release,
+        ):
+            await worker.drain(task, timeout=0.05)
+
+        assert task.cancelled()
+        assert worker.stopping
+        assert mock_release.call_args.kwargs["worker_id"] == "worker-1"
+
+    async def test_drain_marks_delivered_rows_sent_instead_of_requeueing(self):
+        worker = OutboxWorker(worker_id="worker-1")
+        delivered = str(uuid4())
+        started = asyncio.Event()
+
+        async def fake_process(db, rows, *, delivered_ids, **kwargs):
+            delivered_ids.add(delivered)
+            started.set()
+            await asyncio.sleep(60)
+
+        with (
+            patch("app.outbox_worker.SessionLocal"),
+            patch("app.outbox_worker.release_stale_processing", return_value={"released": 0, "failed": 0}),
+            patch("app.outbox_worker.claim_pending_outbox_batches", return_value=[{"id": delivered}]),
+            patch("app.outbox_worker._get_outbox_lease_settings", return_value=(60.0, 0.05)),
+            patch.object(webhook_router, "_process_outbox_rows", side_effect=fake_process),
+            patch("app.outbox_worker.release_worker_claims", return_value=0) as mock_release,
+        ):
+            task = asyncio.create_task(
+                worker.run_pass(limit=5, idle_seconds=1, max_attempts=3, retry_backoff_seconds=1, stale_seconds=120)
+            )
+            await started.wait()
+            await worker.drain(task, timeout=0.05)
+
+        assert task.cancelled()
+        assert mock_release.call_args.kwargs["delivered_ids"] == [delivered]
+
+    async def test_drain_waits_for_finishing_pass(self):
+        worker = OutboxWorker(worker_id="worker-1")
+
+        async def finishing_run():
+            await worker.wait_stop_requested()
+            await asyncio.sleep(0.01)
+            return "done"
+
+        task = asyncio.create_task(finishing_run())
+        with (
+            patch("app.outbox_worker.SessionLocal"),
+            patch("app.outbox_worker.release_worker_claims", return_value=0),
+        ):
+            await worker.drain(task, timeout=1)
+
+        assert task.result() == "done"
+
+
+class TestFinalizeOutboxRows:
+    def test_group_is_finalized_in_one_statement_and_commit(self):
+        db = MagicMock()
+        db.execute.return_value.mappings.return_value.all.return_value = [
+            {"status": "PENDING"},
+            {"status": "FAILED"},
+        ]
+        ids = [uuid4(), uuid4()]
+
+        counts = finalize_outbox_rows(
+            db, outbox_ids=ids, outcome="RETRY", last_error="boom", max_attempts=3, retry_backoff_seconds=2
+        )
+
+        assert counts == {"SENT": 0, "PENDING": 1, "FAILED": 1}
+        assert db.execute.call_count == 1
+        assert db.commit.call_count == 1
+        statement, params = db.execute.call_args.args
+        assert "FROM (VALUES (CAST(:id_0 AS UUID)), (CAST(:id_1 AS UUID)))" in str(statement)
+        assert params["id_1"] == str(ids[1])
+        assert params["outcome"] == "RETRY"
+
+    def test_release_marks_delivered_rows_sent(self):
+        db = MagicMock()
+        db.execute.return_value.rowcount = 1
+        delivered = uuid4()
+
+        released = release_worker_claims(db, worker_id="worker-1", delivered_ids=[delivered])
+
+        assert released == 1
+        assert db.execute.call_count == 2
+        sent_statement, sent_params = db.execute.call_args_list[0].args
+        assert "SET status = 'SENT'" in str(sent_statement)
+        assert "o.locked_by = :worker_id" in str(sent_statement)
+        assert sent_params["id_0"] == str(delivered)
+        assert "SET status = 'PENDING'" in str(db.execute.call_args_list[1].args[0])
+        assert db.commit.call_count == 1
+
+    def test_empty_group_is_noop(self):
+        db = MagicMock()
+
+        assert finalize_outbox_rows(db, outbox_ids=[None], outcome="SENT") == {"SENT": 0, "PENDING": 0, "FAILED": 0}
+        db.execute.assert_not_called()
+
+    async def test_failed_group_is_retried_in_one_call(self):
+        rows, conv_a, _ = _build_rows()
+        group = [row for row in rows if row["conversation_id"] == conv_a][:1]
+        group.append(_row(conv_a, "a1b", group[0]["created_at"] + timedelta(seconds=1)))
+
+        async def failing_handle(payload, db, **kwargs):
+            raise RuntimeError("llm down")
+
+        with (
+            patch.object(webhook_router, "_handle_webhook_payload", side_effect=failing_handle),
+            patch.object(
+                webhook_router,
+                "finalize_outbox_rows",
+                return_value={"SENT": 0, "PENDING": 2, "FAILED": 0},
+            ) as mock_finalize,
+            patch.dict("os.environ", {"OUTBOX_WINDOW_MERGE_SECONDS": "2.5"}),
+        ):
+            results = await webhook_router._process_outbox_rows(
+                MagicMock(), group, max_attempts=3, retry_backoff_seconds=1
+            )
+
+        assert mock_finalize.call_count == 1
+        assert mock_finalize.call_args.kwargs["outcome"] == "RETRY"
+        assert len(mock_finalize.call_args.kwargs["outbox_ids"]) == 2
+        assert results["retry_scheduled"] == 2
+
+
+class TestOutboxTenantStats:
+    def test_rounds_wait_times_per_tenant(self):
+        client_id = uuid4()
+        db = MagicMock()
+        db.execute.return_value.mappings.return_value.all.return_value = [
+            {
+                "client_id": client_id,
+                "client_slug": "demo_salon",
+                "pending": 12,
+                "pending_conversations": 3,
+                "processing": 1,
+                "processing_conversations": 1,
+                "oldest_pending_seconds": Decimal("42.1234"),
+                "avg_pending_seconds": None,
+                "weight": 2,
+                "max_concurrency": 0,
+            }
+        ]
+
+        stats = get_outbox_tenant_stats(db)
+
+        assert stats[0]["client_id"] == str(client_id)
+        assert stats[0]["oldest_pending_seconds"] == 42.12
+        assert stats[0]["avg_pending_seconds"] is None
+        assert stats[0]["pending"] == 12
+
+    def test_claim_query_applies_fair_share(self):
+        db = MagicMock()
+        db.execute.return_value.mappings.return_value.all.return_value = []
+
+        claim_pending_outbox_batches(db, limit=5, idle_seconds=1)
+
+        statement = str(db.execute.call_args.args[0])
+        assert "PARTITION BY ready.client_id" in statement
+        assert "tenant_rank::float / weight" in statement
+        assert "processing + tenant_rank <= max_concurrency" in statement
+        assert "AS eligible_at" in statement
+
+    def test_second_worker_skips_conversation_already_processing(self):
+        conversation_id = uuid4()
+        claimed = {
+            "id": uuid4(),
+            "client_id": uuid4(),
+            "conversation_id": conversation_id,
+            "inbound_message_id": None,
+            "payload_json": {},
+            "attempts": 1,
+            "created_at": datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc),
+        }
+        worker_a = MagicMock()
+        worker_a.execute.return_value.mappings.return_value.all.return_value = [claimed]
+        worker_b = MagicMock()
+        worker_b.execute.return_value.mappings.return_value.all.return_value = []
+
+        rows_a = claim_pending_outbox_batches(worker_a, limit=5, idle_seconds=1, worker_id="worker-a")
+        rows_b = claim_pending_outbox_batches(worker_b, limit=5, idle_seconds=1, worker_id="worker-b")
+
+        assert [row.conversation_id for row in rows_a] == [conversation_id]
+        assert rows_b == []
+        # A newer PENDING row of a conversation worker A holds must not become ready for worker B.
+        statement = str(worker_b.execute.call_args.args[0])
+        ready = statement.split("in_flight AS")[0]
+        assert "NOT EXISTS" in ready
+        assert "p.conversation_id = outbox_messages.conversation_id" in ready
+        assert "p.status = 'PROCESSING'" in ready
+        assert worker_b.execute.call_args.args[1]["worker_id"] == "worker-b"
+
+
+class TestOutboxWakeupMaxWait:
+    def test_burst_cannot_push_past_max_wait(self):
+        schedule = OutboxWakeupSchedule(sweep_seconds=60)
+        schedule.mark_swept(100.0)
+        schedule.note_received({"conv-a": (100.0, 4.0)}, idle_seconds=8, max_wait_seconds=10)
+        schedule.note_received({"conv-a": (108.0, 4.0)}, idle_seconds=8, max_wait_seconds=10)
+
+        assert schedule.deadlines["conv-a"] == 110.0
+        assert schedule.pop_due(110.0) == ["conv-a"]
+        assert "conv-a" not in schedule.first_seen
+
+
+class TestOutboxRowParsing:
+    def _conversation_rows(self, count):
+        base = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+        conversation_id = uuid4()
+        rows = []
+        for index in range(count):
+            row = _row(conversation_id, f"m{index}", base + timedelta(seconds=index))
+            row["payload_json"]["body"]["metadata"] = {"messageId": f"id-{index}", "remoteJid": "7701@s.whatsapp.net"}
+            rows.append(row)
+        return rows
+
+    async def test_payload_is_validated_once_per_row(self):
+        rows = self._conversation_rows(6)
+
+        async def fake_handle(payload, db, **kwargs):
+            return WebhookResponse(success=True, message="ok")
+
+        with (
+            patch.object(webhook_router, "_handle_webhook_payload", side_effect=fake_handle),
+            patch.object(
+                webhook_router,
+                "finalize_outbox_rows",
+                side_effect=lambda db, *, outbox_ids, outcome, **kw: {"SENT": len(outbox_ids), "PENDING": 0, "FAILED": 0},
+            ),
+            patch.object(WebhookRequest, "model_validate", wraps=WebhookRequest.model_validate) as mock_validate,
+        ):
+            results = await webhook_router._process_outbox_rows(
+                MagicMock(), rows, max_attempts=3, retry_backoff_seconds=1
+            )
+
+        assert results["sent"] == 6
+        assert mock_validate.call_count == len(rows)
+
+    async def test_group_queue_wait_starts_when_rows_became_ready(self):
+        rows = self._conversation_rows(3)
+        for index, row in enumerate(rows):
+            row["eligible_at"] = row["created_at"] + timedelta(seconds=8 + index)
+        seen = {}
+
+        async def fake_handle(payload, db, **kwargs):
+            seen.update(kwargs)
+            return WebhookResponse(success=True, message="ok")
+
+        with (
+            patch.object(webhook_router, "_handle_webhook_payload", side_effect=fake_handle),
+            patch.object(
+                webhook_router,
+                "finalize_outbox_rows",
+                side_effect=lambda db, *, outbox_ids, outcome, **kw: {"SENT": len(outbox_ids), "PENDING": 0, "FAILED": 0},
+            ),
+            patch.dict("os.environ", {"OUTBOX_WINDOW_MERGE_SECONDS": "2.5"}),
+        ):
+            await webhook_router._process_outbox_rows(MagicMock(), rows, max_attempts=3, retry_backoff_seconds=1)
+
+        assert seen["outbox_created_at"] == rows[-1]["created_at"]
+        assert seen["outbox_ready_at"] == rows[-1]["eligible_at"]
+
+    async def test_media_rows_are_parsed_once(self):
+        rows = self._conversation_rows(4)
+        for row in rows:
+            row["payload_json"]["body"]["mediaData"] = {"base64": "A" * 20000, "mimetype": "image/jpeg"}
+        media_flags = []
+
+        async def fake_handle(payload, db, **kwargs):
+            media_flags.append(bool(payload.body.mediaData))
+            return WebhookResponse(success=True, message="ok")
+
+        with (
+            patch.object(webhook_router, "_handle_webhook_payload", side_effect=fake_handle),
+            patch.object(
+                webhook_router,
+                "finalize_outbox_rows",
+                side_effect=lambda db, *, outbox_ids, outcome, **kw: {"SENT": len(outbox_ids), "PENDING": 0, "FAILED": 0},
+            ),
+            patch.object(OutboxRow, "from_mapping", wraps=OutboxRow.from_mapping) as mock_from_mapping,
+            patch.object(WebhookRequest, "model_validate", wraps=WebhookRequest.model_validate) as mock_validate,
+        ):
+            await webhook_router._process_outbox_rows(MagicMock(), rows, max_attempts=3, retry_backoff_seconds=1)
+
+        assert media_flags and all(media_flags)
+        assert mock_from_mapping.call_count == len(rows)
+        assert mock_validate.call_count == len(rows)
+
+
+class TestOutboxMediaOffload:
+    def _payload_json(self, data: bytes):
+        return {
+            "client_slug": "demo_salon",
+            "body": {
+                "message": "",
+                "messageType": "image",
+                "mediaData": {"base64": base64.b64encode(data).decode("ascii"), "mimetype": "image/jpeg"},
+            },
+        }
+
+    def test_offload_keeps_reference_and_rehydrates(self, tmp_path):
+        data = b"\xff\xd8jpeg-bytes" * 100
+        with patch.object(webhook_router, "MEDIA_STORAGE_DEFAULT_DIR", str(tmp_path)):
+            stored = webhook_router._offload_outbox_media(self._payload_json(data))
+            media = stored["body"]["mediaData"]
+            assert "base64" not in media
+            assert media["size"] == len(data)
+            assert media["mimetype"] == "image/jpeg"
+            assert open(media["base64_path"], "rb").read() == data
+
+            row = OutboxRow.from_mapping({"id": uuid4(), "payload_json": stored})
+            assert row.has_media
+            hydrated = webhook_router._rehydrate_outbox_media(row.payload)
+            assert base64.b64decode(hydrated.body.mediaData["base64"]) == data
+            assert "base64" not in row.payload.body.mediaData
+
+    def test_same_media_is_stored_once(self, tmp_path):
+        data = b"voice-note"
+        with patch.object(webhook_router, "MEDIA_STORAGE_DEFAULT_DIR", str(tmp_path)):
+            first = webhook_router._offload_outbox_media(self._payload_json(data))
+            second = webhook_router._offload_outbox_media(self._payload_json(data))
+        assert first["body"]["mediaData"]["base64_path"] == second["body"]["mediaData"]["base64_path"]
+        assert len([p for p in tmp_path.rglob("*") if p.is_file()]) == 1
+
+    def test_storage_failure_keeps_inline_payload(self, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("x")
+        payload_json = self._payload_json(b"data")
+        with patch.object(webhook_router, "MEDIA_STORAGE_DEFAULT_DIR", str(blocker)):
+            assert webhook_router._offload_outbox_media(payload_json) is payload_json
+
+    def test_dedup_hit_refreshes_file_mtime(self, tmp_path):
+        data = b"voice-note"
+        with patch.object(webhook_router, "MEDIA_STORAGE_DEFAULT_DIR", str(tmp_path)):
+            stored = webhook_router._offload_outbox_media(self._payload_json(data))
+            path = stored["body"]["mediaData"]["base64_path"]
+            os.utime(path, (1_000_000, 1_000_000))
+            webhook_router._offload_outbox_media(self._payload_json(data))
+        assert os.stat(path).st_mtime > 1_000_000
+
+    def test_missing_file_raises(self, tmp_path):
+        payload = WebhookRequest.model_validate(
+            {
+                "client_slug": "demo_salon",
+                "body": {"messageType": "image", "mediaData": {"base64_path": str(tmp_path / "gone"), "base64_sha256": "x"}},
+            }
+        )
+        with pytest.raises(RuntimeError, match="outbox_media_unavailable"):
+            webhook_router._rehydrate_outbox_media(payload)
+
+    async def test_missing_media_row_is_retried(self, tmp_path):
+        row = {
+            "id": uuid4(),
+            "conversation_id": uuid4(),
+            "created_at": datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc),
+            "attempts": 1,
+            "payload_json": {
+                "client_slug": "demo_salon",
+                "body": {"messageType": "image", "mediaData": {"base64_path": str(tmp_path / "gone"), "base64_sha256": "x"}},
+            },
+        }
+        outcomes = []
+
+        def fake_finalize(db, *, outbox_ids, outcome, **kwargs):
+            outcomes.append(outcome)
+            return {"SENT": 0, "PENDING": len(outbox_ids), "FAILED": 0}
+
+        with (
+            patch.object(webhook_router, "_handle_webhook_payload") as mock_handle,
+            patch.object(webhook_router, "finalize_outbox_rows", side_effect=fake_finalize),
+        ):
+            await webhook_router._process_outbox_rows(MagicMock(), [row], max_attempts=3, retry_backoff_seconds=1)
+
+        mock_handle.assert_not_called()
+        assert outcomes == ["RETRY"]
@@ -0,0 +1,91 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import qdrant_batch
+from app.services.qdrant_batch import QdrantSearchError, VectorQuery, search_batch
+
+
+def _response(status_code, payload=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload or {}
+    response.text = ""
+    return response
+
+
+@pytest.fixture
+def qdrant():
+    qdrant_batch._batch_unsupported.clear()
+    with patch.object(qdrant_batch, "http_client") as mock_client:
+        yield mock_client.return_value.__enter__.return_value
+    qdrant_batch._batch_unsupported.clear()
+
+
+def _query(collection, marker):
+    return VectorQuery(collection=collection, vector=[marker], limit=3)
+
+
+class TestSearchBatch:
+    def test_groups_by_collection_and_keeps_input_order(self, qdrant):
+        def post(url, headers=None, json=None):
+            collection = url.split("/collections/")[1].split("/")[0]
+            assert url.endswith("/points/search/batch") or collection == "services_index"
+            if url.endswith("/points/search/batch"):
+                return _response(
+                    200,
+                    {"result": [[{"id": f"{collection}-{s['vector'][0]}"}] for s in json["searches"]]},
+                )
+            return _response(200, {"result": [{"id": f"{collection}-{json['vector'][0]}"}]})
+
+        qdrant.post.side_effect = post
+        queries = [
+            _query("truffles_knowledge", 1.0),
+            _query("services_index", 2.0),
+            _query("truffles_knowledge", 3.0),
+        ]
+
+        results = search_batch(queries)
+
+        assert [points[0]["id"] for points in results] == [
+            "truffles_knowledge-1.0",
+            "services_index-2.0",
+            "truffles_knowledge-3.0",
+        ]
+        batch_calls = [call for call in qdrant.post.call_args_list if call.args[0].endswith("/batch")]
+        assert len(batch_calls) == 1
+
+    def test_missing_batch_endpoint_falls_back_and_is_remembered(self, qdrant):
+        def post(url, headers=None, json=None):
+            if url.endswith("/points/search/batch"):
+                return _response(404)
+            return _response(200, {"result": [{"id": json["vector"][0]}]})
+
+        qdrant.post.side_effect = post
+        queries = [_query("truffles_knowledge", 1.0), _query("truffles_knowledge", 2.0)]
+
+        assert search_batch(queries) == [[{"id": 1.0}], [{"id": 2.0}]]
+        assert "truffles_knowledge" in qdrant_batch._batch_unsupported
+
+        qdrant.post.reset_mock()
+        search_batch(queries)
+        assert all(not call.args[0].endswith("/batch") for call in qdrant.post.call_args_list)
+
+    def test_batch_error_falls_back_to_single_searches(self, qdrant):
+        def post(url, headers=None, json=None):
+            if url.endswith("/points/search/batch"):
+                raise ConnectionError("reset")
+            return _response(200, {"result": [{"id": json["vector"][0]}]})
+
+        qdrant.post.side_effect = post
+
+        results = search_batch([_query("truffles_knowledge", 1.0), _query("truffles_knowledge", 2.0)])
+
+        assert results == [[{"id": 1.0}], [{"id": 2.0}]]
+        assert "truffles_knowledge" not in qdrant_batch._batch_unsupported
+
+    def test_failed_single_search_raises(self, qdrant):
+        qdrant.post.return_value = _response(503)
+
+        with pytest.raises(QdrantSearchError):
+            search_batch([_query("truffles_knowledge", 1.0)])
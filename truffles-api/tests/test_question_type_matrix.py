@@ -0,0 +1,129 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.services import demo_salon_knowledge
+from app.services.demo_salon_knowledge import (
+    QuestionTypeMatrix,
+    _cosine_similarity,
+    _local_text_embedding,
+    semantic_question_type,
+)
+
+
+def _loop_scores(query_vector, embeddings):
+    return {
+        kind: max([0.0, *(_cosine_similarity(query_vector, vector) for vector in vectors)])
+        for kind, vectors in embeddings.items()
+    }
+
+
+class TestQuestionTypeMatrix:
+    def test_matmul_scores_match_pairwise_cosine(self):
+        pytest.importorskip("numpy")
+        embeddings = {
+            "pricing": [_local_text_embedding("сколько стоит"), _local_text_embedding("какая цена")],
+            "duration": [_local_text_embedding("сколько по времени")],
+            "hours": [_local_text_embedding("до скольки работаете"), _local_text_embedding("график работы")],
+        }
+        query = _local_text_embedding("сколько стоит маникюр")
+
+        matrix = QuestionTypeMatrix.build(embeddings)
+        scores = matrix.scores(query, {"pricing", "duration", "hours"})
+
+        expected = _loop_scores(query, embeddings)
+        assert scores.keys() == expected.keys()
+        for kind, score in expected.items():
+            assert scores[kind] == pytest.approx(score, abs=1e-5)
+
+    def test_dimension_mismatch_returns_none(self):
+        pytest.importorskip("numpy")
+        matrix = QuestionTypeMatrix.build({"pricing": [[1.0, 0.0]]})
+
+        assert matrix.scores([1.0, 0.0, 0.0], {"pricing"}) is None
+
+    def test_same_classification_with_and_without_numpy(self):
+        embed = lambda text, *_args, **_kwargs: _local_text_embedding(text)  # noqa: E731
+        messages = ["Сколько стоит маникюр?", "Сколько по времени педикюр?", "До скольки вы работаете?"]
+
+        def classify():
+            demo_salon_knowledge._question_type_examples.cache_clear()
+            demo_salon_knowledge._question_type_embeddings.cache_clear()
+            return [semantic_question_type(text, include_kinds={"pricing", "duration", "hours"}) for text in messages]
+
+        with patch.object(demo_salon_knowledge, "get_embedding", side_effect=embed):
+            vectorized = classify()
+            with patch.object(demo_salon_knowledge, "np", None):
+                looped = classify()
+        demo_salon_knowledge._question_type_embeddings.cache_clear()
+
+        assert [item.kind if item else None for item in vectorized] == [item.kind if item else None for item in looped]
+        for fast, slow in zip(vectorized, looped):
+            if fast and slow:
+                assert fast.score == pytest.approx(slow.score, abs=1e-5)
+
+
+class TestQuestionTypeWarmup:
+    @pytest.fixture
+    def artifact_path(self, tmp_path):
+        demo_salon_knowledge._question_type_examples.cache_clear()
+        demo_salon_knowledge._question_type_embeddings.cache_clear()
+        path = tmp_path / "question_type_embeddings.json"
+        with patch.object(demo_salon_knowledge, "_QUESTION_TYPE_ARTIFACT_PATH", path):
+            yield path
+        demo_salon_knowledge._question_type_embeddings.cache_clear()
+
+    def test_cold_warmup_embeds_live_and_writes_artifact(self, artifact_path):
+        embed = lambda text, *_args, **_kwargs: _local_text_embedding(text)  # noqa: E731
+        with patch.object(demo_salon_knowledge, "get_embedding", side_effect=embed) as mock_embed:
+            status = demo_salon_knowledge.warm_question_type_embeddings()
+
+        phrases = sum(len(items) for items in demo_salon_knowledge._question_type_examples().values())
+        assert status["state"] == "ready"
+        assert status["source"] == "live"
+        assert status["artifact_written"] is True
+        assert mock_embed.call_count == phrases
+        artifact = json.loads(artifact_path.read_text(encoding="utf-8"))
+        assert artifact["truth_sha256"] == demo_salon_knowledge._truth_version()
+        assert artifact["model_id"] == demo_salon_knowledge.EMBEDDING_MODEL_ID
+        assert demo_salon_knowledge.get_question_type_warmup_status()["state"] == "ready"
+
+    def test_restart_loads_artifact_without_embedding_calls(self, artifact_path):
+        embed = lambda text, *_args, **_kwargs: _local_text_embedding(text)  # noqa: E731
+        with patch.object(demo_salon_knowledge, "get_embedding", side_effect=embed):
+            demo_salon_knowledge.warm_question_type_embeddings()
+        demo_salon_knowledge._question_type_embeddings.cache_clear()
+
+        with patch.object(demo_salon_knowledge, "get_embedding") as mock_embed:
+            status = demo_salon_knowledge.warm_question_type_embeddings()
+
+        assert status["source"] == "artifact"
+        assert status["embedded_live"] == 0
+        mock_embed.assert_not_called()
+
+    def test_artifact_for_other_model_is_ignored(self, artifact_path):
+        artifact_path.write_text(
+            json.dumps(
+                {
+                    "truth_sha256": demo_salon_knowledge._truth_version(),
+                    "model_id": "other-model",
+                    "examples": {"pricing": [{"text": "Сколько стоит маникюр?", "vector": [1.0, 0.0]}]},
+                }
+            ),
+            encoding="utf-8",
+        )
+
+        assert demo_salon_knowledge._load_question_type_artifact(demo_salon_knowledge._truth_version()) == {}
+
+    def test_failed_embeddings_are_not_pinned(self, artifact_path):
+        with patch.object(demo_salon_knowledge, "get_embedding", side_effect=RuntimeError("bge down")):
+            status = demo_salon_knowledge.warm_question_type_embeddings()
+
+        assert status["state"] == "partial"
+        assert not artifact_path.exists()
+        assert demo_salon_knowledge._question_type_embeddings.cache_info().currsize == 0
+
+    def test_warmup_thread_disabled_under_tests(self):
+        assert demo_salon_knowledge.start_question_type_warmup() is False
+        assert demo_salon_knowledge.get_question_type_warmup_status()["state"] == "disabled"
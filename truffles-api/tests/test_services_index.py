@@ -0,0 +1,92 @@
+import hashlib
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.services import demo_salon_knowledge, services_index
+from app.services.services_index import clear_local_services_index, search_local_services_index
+
+
+@pytest.fixture
+def knowledge_dir(tmp_path):
+    client_dir = tmp_path / "knowledge" / "demo_salon"
+    client_dir.mkdir(parents=True)
+    truth_path = client_dir / "SALON_TRUTH.yaml"
+    truth_path.write_text("client_pack: {}\n", encoding="utf-8")
+    clear_local_services_index()
+    with (
+        patch.object(services_index, "_KNOWLEDGE_DIR", tmp_path / "knowledge"),
+        patch.dict("os.environ", {"SERVICES_INDEX_CACHE_DIR": str(tmp_path / "cache")}),
+    ):
+        yield client_dir
+    clear_local_services_index()
+
+
+def _write_snapshot(client_dir, points, truth_sha256=None):
+    if truth_sha256 is None:
+        truth_sha256 = hashlib.sha256((client_dir / "SALON_TRUTH.yaml").read_bytes()).hexdigest()
+    snapshot = {"client_slug": "demo_salon", "truth_sha256": truth_sha256, "points": points}
+    (client_dir / "services_index.json").write_text(json.dumps(snapshot), encoding="utf-8")
+
+
+class TestLocalServicesIndex:
+    def test_top_k_by_cosine(self, knowledge_dir, tmp_path):
+        pytest.importorskip("numpy")
+        _write_snapshot(
+            knowledge_dir,
+            [
+                {"payload": {"canonical_name": "Маникюр"}, "vector": [1.0, 0.0, 0.0]},
+                {"payload": {"canonical_name": "Педикюр"}, "vector": [0.0, 2.0, 0.0]},
+                {"payload": {"canonical_name": "Массаж"}, "vector": [0.6, 0.8, 0.0]},
+            ],
+        )
+
+        results = search_local_services_index("demo_salon", [0.0, 1.0, 0.0], 2)
+
+        assert [item["payload"]["canonical_name"] for item in results] == ["Педикюр", "Массаж"]
+        assert results[0]["score"] == pytest.approx(1.0)
+        assert results[1]["score"] == pytest.approx(0.8)
+        assert list((tmp_path / "cache").glob("demo_salon-*.npy"))
+
+    def test_stale_snapshot_is_ignored(self, knowledge_dir):
+        pytest.importorskip("numpy")
+        _write_snapshot(
+            knowledge_dir,
+            [{"payload": {"canonical_name": "Маникюр"}, "vector": [1.0, 0.0]}],
+            truth_sha256="outdated",
+        )
+
+        assert search_local_services_index("demo_salon", [1.0, 0.0], 3) is None
+
+    def test_missing_snapshot_returns_none(self, knowledge_dir):
+        assert search_local_services_index("demo_salon", [1.0, 0.0], 3) is None
+
+
+class TestSearchServicesIndex:
+    def test_local_results_skip_qdrant(self):
+        local = [{"score": 0.9, "payload": {"canonical_name": "Маникюр"}}]
+        with (
+            patch.object(demo_salon_knowledge, "get_embedding", return_value=[1.0, 0.0]),
+            patch.object(demo_salon_knowledge, "search_local_services_index", return_value=local),
+            patch.object(demo_salon_knowledge, "http_client") as mock_client,
+        ):
+            results = demo_salon_knowledge._search_services_index("маникюр", "demo_salon", 3)
+
+        assert results == local
+        mock_client.assert_not_called()
+
+    def test_falls_back_to_qdrant_without_local_index(self):
+        with (
+            patch.object(demo_salon_knowledge, "get_embedding", return_value=[1.0, 0.0]),
+            patch.object(demo_salon_knowledge, "search_local_services_index", return_value=None),
+            patch.object(demo_salon_knowledge, "http_client") as mock_client,
+        ):
+            response = mock_client.return_value.__enter__.return_value.post.return_value
+            response.status_code = 200
+            response.json.return_value = {
+                "result": [{"score": 0.7, "payload": {"canonical_name": "Педикюр"}}],
+            }
+            results = demo_salon_knowledge._search_services_index("педикюр", "demo_salon", 3)
+
+        assert results == [{"score": 0.7, "payload": {"canonical_name": "Педикюр"}}]
@@ -0,0 +1,204 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from app.routers import webhook as webhook_router
+from app.routers.webhook import (
+    DECISION_TRACE_KEY,
+    SpeculativeLLMCall,
+    _fork_timing_context,
+    _run_speculative_llm,
+    _run_truth_gate,
+    _speculative_llm_key,
+)
+from app.services import latency_budget
+from app.services.ai_service import RETRIEVAL_CONTEXT_KEY, AIGenerationRequest, attach_retrieval_context
+from app.services.latency_budget import SKIPPED_KEY, has_budget_for_optional, start_message_budget
+from app.services.result import Result
+
+
+def _speculate(call, key=("маникюр", True, False)):
+    return SpeculativeLLMCall(call, key=key, timing_context={"llm_used": True})
+
+
+def _answer(value=None):
+    async def call(cancelled):
+        return value
+
+    return call
+
+
+def _slow_call(seen):
+    async def call(cancelled):
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            seen.append("cancelled")
+            raise
+        seen.append("finished")
+        return Result.success(("Ответ", "high"))
+
+    return call
+
+
+class TestSpeculativeLLMCall:
+    async def test_result_adopted_when_inputs_match(self):
+        speculative = _speculate(_answer(Result.success(("Ответ", "high"))))
+
+        result, context = await speculative.take(("маникюр", True, False))
+
+        assert result.value == ("Ответ", "high")
+        assert context == {"llm_used": True}
+        assert speculative.outcome == "adopted"
+
+    async def test_deterministic_reply_cancels_speculation(self):
+        seen = []
+        speculative = _speculate(_slow_call(seen))
+        await asyncio.sleep(0.01)
+
+        speculative.cancel("deterministic_reply")
+
+        assert await speculative.take(("маникюр", True, False)) == (None, {})
+        assert speculative.outcome == "deterministic_reply"
+        await asyncio.sleep(0.1)
+        assert seen == ["cancelled"]
+
+    async def test_stale_inputs_are_not_adopted(self):
+        speculative = _speculate(_answer(Result.success(("Ответ", "high"))))
+
+        result, _ = await speculative.take(("маникюр и педикюр", True, False))
+
+        assert result is None
+        assert speculative.outcome == "stale"
+
+    async def test_handler_exit_cancels_unadopted_speculation(self):
+        seen = []
+
+        async def process(payload, db, *, speculative_calls, **kwargs):
+            speculative_calls.append(_speculate(_slow_call(seen)))
+            await asyncio.sleep(0.01)
+            raise RuntimeError("escalation failed")
+
+        with patch.object(webhook_router, "_process_webhook_payload", side_effect=process):
+            with pytest.raises(RuntimeError):
+                await webhook_router._handle_webhook_payload(MagicMock(), MagicMock(), provided_secret=None, enforce_secret=False)
+
+        await asyncio.sleep(0.1)
+        assert seen == ["cancelled"]
+
+
+class TestSpeculativeInputs:
+    def test_forked_context_does_not_share_mutable_values(self):
+        timing_context: dict = {"outbox_ids": ["a"], "rag_batch_prefetch": {"queries": 2}}
+        retrieval_context = attach_retrieval_context(timing_context)
+        with patch.object(latency_budget, "get_message_budget_settings", return_value=(True, 1.0, 4.0, 2.0)):
+            start_message_budget(timing_context)
+            forked = _fork_timing_context(timing_context)
+            has_budget_for_optional(forked, "rag_retry")
+
+        forked["outbox_ids"].append("b")
+        forked["rag_batch_prefetch"]["queries"] = 5
+
+        assert timing_context["outbox_ids"] == ["a"]
+        assert timing_context["rag_batch_prefetch"] == {"queries": 2}
+        assert forked[RETRIEVAL_CONTEXT_KEY] is retrieval_context
+        assert forked[SKIPPED_KEY] == ["rag_retry"]
+        assert timing_context[SKIPPED_KEY] == []
+
+    def test_key_tracks_conversation_state_and_context(self):
+        conversation = MagicMock(state="bot_active", context={"intent_queue": ["price"]})
+
+        def key():
+            return _speculative_llm_key(conversation, "маникюр", append_user_message=True, pending_hint=False)
+
+        started = key()
+        conversation.context = {"intent_queue": ["price"], DECISION_TRACE_KEY: [{"stage": "truth_gate"}]}
+        assert key() == started
+
+        conversation.context = {"intent_queue": []}
+        assert key() != started
+
+        conversation.context = {"intent_queue": ["price"]}
+        conversation.state = "pending"
+        assert key() != started
+
+    def test_truth_gate_decision_is_reused(self):
+        truth_gate = MagicMock(return_value=None)
+        memo: dict = {}
+
+        for _ in range(3):
+            assert (
+                _run_truth_gate(
+                    truth_gate, "маникюр", policy_type="demo_salon", client_slug="demo_salon", intent_decomp=None, memo=memo
+                )
+                is None
+            )
+
+        truth_gate.assert_called_once_with("маникюр", client_slug="demo_salon", intent_decomp=None)
+
+
+class TestRunSpeculativeLLM:
+    async def _run(self, rag_score, cancelled=None, state="bot_active"):
+        context: dict = {}
+        prepared = AIGenerationRequest(
+            client_id=uuid4(),
+            client_slug="demo_salon",
+            user_message="сколько стоит маникюр",
+            messages=[{"role": "user", "content": "сколько стоит маникюр"}],
+            model_name="gpt-5-mini",
+            model_tier="fast",
+            confidence_level="medium",
+        )
+        with (
+            patch("app.routers.webhook.SessionLocal") as mock_session,
+            patch("app.routers.webhook.get_rag_confidence", return_value=(False, rag_score)),
+            patch("app.routers.webhook.prepare_ai_generation", return_value=prepared),
+            patch(
+                "app.routers.webhook.agenerate_prepared_response",
+                return_value=Result.success(("Ответ", "high")),
+            ) as mock_generate,
+        ):
+            mock_session.return_value.get.return_value.state = state
+            result = await _run_speculative_llm(
+                cancelled or threading.Event(),
+                conversation_id=uuid4(),
+                message_text="сколько стоит маникюр",
+                client_slug="demo_salon",
+                append_user_message=True,
+                pending_hint=False,
+                timing_context=context,
+            )
+        mock_session.return_value.close.assert_called_once()
+        return result, mock_generate, context
+
+    async def test_generates_in_mid_confidence_band(self):
+        result, mock_generate, context = await self._run(0.6)
+
+        assert result.value == ("Ответ", "high")
+        mock_generate.assert_awaited_once()
+        assert context["speculative_rag_score"] == 0.6
+
+    async def test_skips_generation_outside_mid_band(self):
+        for score in (0.2, 0.95):
+            result, mock_generate, _ = await self._run(score)
+            assert result is None
+            mock_generate.assert_not_called()
+
+    async def test_inactive_bot_does_not_generate(self):
+        result, mock_generate, _ = await self._run(0.6, state="manager_active")
+
+        assert result.value == (None, "bot_inactive")
+        mock_generate.assert_not_called()
+
+    async def test_cancelled_before_start_does_nothing(self):
+        cancelled = threading.Event()
+        cancelled.set()
+
+        result, mock_generate, context = await self._run(0.6, cancelled=cancelled)
+
+        assert result is None
+        mock_generate.assert_not_called()
+        assert context == {}